@@ -1,11 +1,21 @@
 """
 Should take in a sam file from a aligner like bwa aln or bwa mem and convert it into a
 """
+import atexit
 from copy import copy
+import fcntl
+import hashlib
 import itertools
+import json
 import os
+import pickle
 import re
+import signal
+import socket
+import sqlite3
 import subprocess
+import tempfile
+import time
 import warnings
 
 import pysam
@@ -13,9 +23,10 @@ import pysam
 from .bam import cigar as _cigar
 from .bam import read as _read
 from .breakpoint import BreakpointPair, Breakpoint
-from .constants import CIGAR, COLUMNS, MavisNamespace, ORIENT, reverse_complement, STRAND, SVTYPE, NA_MAPPING_QUALITY
+from .constants import CIGAR, COLUMNS, MavisNamespace, ORIENT, STRAND, SVTYPE, NA_MAPPING_QUALITY
 from .error import InvalidRearrangement
 from .interval import Interval
+from .sequence import reverse_complement
 from .util import DEVNULL
 
 
@@ -154,6 +165,323 @@ def get_aligner_version(aligner):
         raise NotImplementedError(aligner)
 
 
+_SERVER_RECORD_DIR = None
+"""str: directory the aligner servers started by this process are recorded in (see :func:`record_aligner_servers`)"""
+
+
+def record_aligner_servers(record_dir):
+    """
+    record the aligner servers started by this process in a directory so that they can be stopped by another process
+    (see :func:`stop_recorded_aligner_servers`). Used by the local scheduler worker processes, which exit without
+    running their atexit hooks
+
+    Args:
+        record_dir (str): path to the directory. Servers are not recorded if None
+    """
+    global _SERVER_RECORD_DIR
+    _SERVER_RECORD_DIR = record_dir
+
+
+def _process_name(pid):
+    try:
+        with open('/proc/{}/cmdline'.format(pid), 'rb') as fh:
+            return os.path.basename(fh.read().split(b'\0')[0].decode())
+    except OSError:
+        return None
+
+
+def recorded_aligner_servers(record_dir):
+    """
+    Args:
+        record_dir (str): path to the directory the servers were recorded in (see :func:`record_aligner_servers`)
+
+    Returns:
+        list of int: the process ids of the recorded servers which are still running
+    """
+    pids = []
+    for name in os.listdir(record_dir) if record_dir and os.path.isdir(record_dir) else []:
+        try:
+            with open(os.path.join(record_dir, name), 'r') as fh:
+                process_name = fh.read().strip()
+        except FileNotFoundError:  # stopped in the meantime
+            continue
+        # the process id may have been re-used by another process once the server stopped
+        if _process_name(int(name)) == process_name:
+            pids.append(int(name))
+    return pids
+
+
+def stop_recorded_aligner_servers(record_dir):
+    """
+    stop the aligner servers recorded in a directory (see :func:`record_aligner_servers`) and remove their records
+
+    Returns:
+        list of int: the process ids of the servers which were stopped
+    """
+    pids = recorded_aligner_servers(record_dir)
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    for name in os.listdir(record_dir) if record_dir and os.path.isdir(record_dir) else []:
+        os.remove(os.path.join(record_dir, name))
+    return pids
+
+
+class BlatServer:
+    """
+    A local gfServer which keeps the 2bit reference loaded between alignments. The contigs are aligned against it
+    using gfClient instead of standalone blat (which loads the reference for every call)
+    """
+    def __init__(self, aligner_reference, host='localhost', port=None, startup_timeout=1800, log=DEVNULL):
+        self.aligner_reference = os.path.abspath(aligner_reference)
+        self.host = host
+        self.port = port
+        self.startup_timeout = startup_timeout
+        self.process = None
+        self.log = log
+
+    @property
+    def seq_dir(self):
+        return os.path.dirname(self.aligner_reference)
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        if self.port is None:
+            # let the os pick an open port
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+                sock.bind((self.host, 0))
+                self.port = sock.getsockname()[1]
+        # the server is started from the reference directory so that gfClient can find the file using seq_dir
+        command = [
+            'gfServer', 'start', self.host, str(self.port), '-stepSize=5', '-repMatch=2253',
+            os.path.basename(self.aligner_reference)
+        ]
+        self.log('starting:', ' '.join(command), time_stamp=False)
+        self.process = subprocess.Popen(
+            command, cwd=self.seq_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if _SERVER_RECORD_DIR:
+            with open(os.path.join(_SERVER_RECORD_DIR, str(self.process.pid)), 'w') as fh:
+                fh.write(os.path.basename(self.process.args[0]))
+        start_time = time.time()
+        while subprocess.call(
+            ['gfServer', 'status', self.host, str(self.port)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        ) != 0:
+            if not self.is_alive():
+                raise subprocess.CalledProcessError(self.process.returncode, ' '.join(command))
+            if time.time() - start_time > self.startup_timeout:
+                self.stop()
+                raise OSError('gfServer did not start within {}s'.format(self.startup_timeout))
+            time.sleep(1)
+        self.log('gfServer ready after {:.0f}s'.format(time.time() - start_time), time_stamp=False)
+
+    def command(self, aligner_fa_input_file, aligner_output_file, align_options):
+        return ' '.join([
+            'gfClient', self.host, str(self.port), self.seq_dir, aligner_fa_input_file, aligner_output_file,
+            '-out=pslx', '-nohead', align_options])
+
+    def stop(self):
+        if self.is_alive():
+            # the server is not started with -canStop so it is stopped through its process instead of gfServer stop
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if self.process is not None and _SERVER_RECORD_DIR:
+            try:
+                os.remove(os.path.join(_SERVER_RECORD_DIR, str(self.process.pid)))
+            except FileNotFoundError:
+                pass
+        self.process = None
+
+
+def _open_shared_file(filename):
+    """
+    open (creating it if it does not exist) a file which is shared between the users on this host
+
+    Returns:
+        file: the file opened for reading and writing or None if this user does not have permission to open it
+    """
+    try:
+        fd = os.open(filename, os.O_RDWR | os.O_CREAT, 0o666)
+    except PermissionError:
+        return None
+    try:
+        os.fchmod(fd, 0o666)  # the mode given on creation is reduced by the umask
+    except PermissionError:  # created by another user
+        pass
+    return os.fdopen(fd, 'r+')
+
+
+class BwaSharedIndex:
+    """
+    Loads the bwa index into shared memory (bwa shm) so that subsequent bwa mem calls do not re-load it. The shared
+    memory is host-wide so the index is shared by the mavis jobs on the same host. Each job holds a shared lock on
+    the users file while it is running and the last job to stop removes the index. Since bwa shm -d removes every
+    index in shared memory, it is only run when all of the loaded indices were loaded by mavis. The files are shared
+    by all users on the host. Where a user cannot open them, the index is not loaded into (or removed from) shared
+    memory
+
+    Attributes:
+        lock_file (str): path to the lock file which serializes loading and removing the index between processes
+        users_file (str): path to the file each process using the index holds a shared lock on
+        loaded_file (str): path to the file listing the indices loaded by mavis on this host
+        shared (bool): False if the shared files could not be opened and the shared memory is not managed
+    """
+    def __init__(self, aligner_reference, lock_file=None, log=DEVNULL):
+        self.aligner_reference = os.path.abspath(aligner_reference)
+        self.lock_file = lock_file if lock_file else os.path.join(tempfile.gettempdir(), 'mavis-bwa-shm.lock')
+        self.users_file = self.lock_file + '.users'
+        self.loaded_file = self.lock_file + '.loaded'
+        self.loaded = False
+        self.shared = True
+        self.users_fh = None
+        self.log = log
+
+    @staticmethod
+    def shared_indices():
+        # bwa lists (and looks up) the shared indices by their base name
+        return [line.split('\t')[0] for line in subprocess.getoutput('bwa shm -l').split('\n') if line.strip()]
+
+    def is_loaded(self):
+        return os.path.basename(self.aligner_reference) in self.shared_indices()
+
+    def is_alive(self):
+        return not self.shared or (self.users_fh is not None and self.is_loaded())
+
+    def _read_loaded(self):
+        if not os.path.exists(self.loaded_file):
+            return set()
+        fh = _open_shared_file(self.loaded_file)
+        if fh is None:
+            return set()
+        with fh:
+            return {line.strip() for line in fh if line.strip()}
+
+    def _write_loaded(self, names):
+        fh = _open_shared_file(self.loaded_file)
+        if fh is None:
+            return  # the index is not recorded as loaded by mavis so it is never removed
+        with fh:
+            fh.truncate()
+            fh.write(''.join(name + '\n' for name in sorted(names)))
+
+    def _unshared(self, filename):
+        self.log('cannot open {}, not using a shared bwa index'.format(filename), time_stamp=False)
+        self.shared = False
+
+    def start(self):
+        lock_fh = _open_shared_file(self.lock_file)
+        if lock_fh is None:
+            self._unshared(self.lock_file)
+            return
+        with lock_fh:
+            # otherwise concurrent jobs on the same host may all find the index missing and load it
+            fcntl.flock(lock_fh, fcntl.LOCK_EX)
+            try:
+                if self.users_fh is None:
+                    self.users_fh = _open_shared_file(self.users_file)
+                    if self.users_fh is None:
+                        self._unshared(self.users_file)
+                        return
+                    fcntl.flock(self.users_fh, fcntl.LOCK_SH)
+                if not self.is_loaded():
+                    self.log('loading the bwa index into shared memory:', self.aligner_reference, time_stamp=False)
+                    subprocess.check_call(['bwa', 'shm', self.aligner_reference])
+                    self._write_loaded(self._read_loaded() | {os.path.basename(self.aligner_reference)})
+                    self.loaded = True
+            finally:
+                fcntl.flock(lock_fh, fcntl.LOCK_UN)
+
+    def stop(self):
+        if self.users_fh is None:
+            return
+        self.users_fh.close()
+        self.users_fh = None
+        self.loaded = False
+        remove_unused_bwa_indices(self.lock_file, log=self.log)
+
+
+def remove_unused_bwa_indices(lock_file=None, log=DEVNULL):
+    """
+    Removes the bwa indices loaded by mavis from shared memory when no process on this host is still using them. This
+    is also called when worker processes exit without running their atexit hooks (ex. multiprocessing pool workers)
+
+    Args:
+        lock_file (str): path to the lock file used by :class:`BwaSharedIndex`
+
+    Returns:
+        bool: True if the indices were removed
+    """
+    lock_file = lock_file if lock_file else os.path.join(tempfile.gettempdir(), 'mavis-bwa-shm.lock')
+    shared_index = BwaSharedIndex('', lock_file=lock_file, log=log)
+    if not os.path.exists(shared_index.loaded_file):
+        return False  # no index has been loaded by mavis on this host
+    lock_fh = _open_shared_file(lock_file)
+    if lock_fh is None:
+        return False
+    with lock_fh:
+        fcntl.flock(lock_fh, fcntl.LOCK_EX)
+        try:
+            users_fh = _open_shared_file(shared_index.users_file)
+            if users_fh is None:
+                return False
+            with users_fh:
+                try:
+                    fcntl.flock(users_fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return False  # other jobs on the host are still using the shared index
+                loaded_by_mavis = shared_index._read_loaded()
+                shared = shared_index.shared_indices()
+                if not shared or not set(shared) <= loaded_by_mavis:
+                    return False
+                log('removing the bwa indices from shared memory:', ', '.join(shared), time_stamp=False)
+                subprocess.call(['bwa', 'shm', '-d'])
+                shared_index._write_loaded(set())
+                return True
+        finally:
+            fcntl.flock(lock_fh, fcntl.LOCK_UN)
+
+
+_PERSISTENT_ALIGNERS = {}
+
+
+def get_persistent_aligner(aligner, aligner_reference, log=DEVNULL):
+    """
+    Returns the persistent aligner for this process, starting it if it is not already running. The aligner is
+    stopped by an atexit hook when the process exits normally. Local scheduler worker processes do not run atexit
+    hooks, so their aligner servers are recorded and stopped when the scheduler is closed (see
+    :func:`record_aligner_servers`)
+
+    Args:
+        aligner (SUPPORTED_ALIGNER): the name of the aligner
+        aligner_reference (str): path to the aligner reference file
+    """
+    key = (aligner, os.path.abspath(aligner_reference))
+    persistent_aligner = _PERSISTENT_ALIGNERS.get(key, None)
+    if persistent_aligner is None or not persistent_aligner.is_alive():
+        if aligner == SUPPORTED_ALIGNER.BLAT:
+            persistent_aligner = BlatServer(aligner_reference, log=log)
+        elif aligner == SUPPORTED_ALIGNER.BWA_MEM:
+            persistent_aligner = BwaSharedIndex(aligner_reference, log=log)
+        else:
+            raise NotImplementedError('unsupported aligner', aligner)
+        persistent_aligner.start()
+        _PERSISTENT_ALIGNERS[key] = persistent_aligner
+    return persistent_aligner
+
+
+@atexit.register
+def stop_persistent_aligners():
+    for persistent_aligner in _PERSISTENT_ALIGNERS.values():
+        persistent_aligner.stop()
+    _PERSISTENT_ALIGNERS.clear()
+
+
 def query_coverage_interval(read):
     """
     Returns:
@@ -334,6 +662,167 @@ def call_paired_read_event(read1, read2, is_stranded=False):
         read2=read2)
 
 
+class AlignmentCache:
+    """
+    Persistent (sqlite) cache of the parsed contig alignments. Alignments are stored by the md5 hash of the contig
+    sequence and a hash of the aligner settings (aligner name and version, the aligner reference file and the alignment
+    options) so that re-validating the same contigs with the same settings does not call the aligner again
+
+    Note:
+        the database file should be on a local disk. sqlite relies on file locking, which is unreliable on network file
+        systems (NFS), so a cache shared between the jobs on different nodes may be corrupted
+
+    Attributes:
+        max_size (int): the maximum number of sequences to keep. The least recently used are removed on close
+        max_age (float): sequences not used in this many days are removed on close
+    """
+    BATCH_SIZE = 500  # below the sqlite limit for the number of query parameters
+
+    def __init__(
+        self, filename, aligner, aligner_reference, aligner_version=None, options=None, max_size=None, max_age=None
+    ):
+        if aligner_version is None:
+            aligner_version = get_aligner_version(aligner)
+        reference_stat = os.stat(aligner_reference)
+        config = {
+            'aligner': aligner,
+            'aligner_version': aligner_version,
+            'aligner_reference': [os.path.abspath(aligner_reference), reference_stat.st_size, reference_stat.st_mtime],
+            'options': options or {}
+        }
+        self.config_key = hashlib.md5(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()
+        self.filename = filename
+        self.max_size = max_size
+        self.max_age = max_age
+        # the connection may be used by the aligner thread when validating in batches (see contig_aln_batch_size)
+        self.connection = sqlite3.connect(filename, timeout=600, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS alignments ('
+                'seq_key TEXT, config_key TEXT, reads BLOB, last_access REAL, PRIMARY KEY (seq_key, config_key))')
+
+    @staticmethod
+    def sequence_key(seq):
+        return hashlib.md5(seq.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def read_to_dict(read):
+        result = {
+            'reference_name': read.reference_name,
+            'query_sequence': read.query_sequence,
+            'reference_start': read.reference_start,
+            'cigar': list(read.cigar),
+            'query_name': read.query_name,
+            'mapping_quality': read.mapping_quality,
+            'query_qualities': None if read.query_qualities is None else list(read.query_qualities),
+            'template_length': read.template_length,
+            'alignment_rank': getattr(read, 'alignment_rank', None),
+            'alignment_score': getattr(read, 'alignment_score', None),
+            'tags': read.get_tags(),
+            'flag': read.flag
+        }
+        if read.is_paired:
+            result['next_reference_name'] = read.next_reference_name
+            result['next_reference_start'] = read.next_reference_start
+        return result
+
+    @staticmethod
+    def read_from_dict(row, input_bam_cache):
+        """
+        Raises:
+            KeyError: if the reference name is not in the bam header
+        """
+        read = _read.SamRead(reference_name=row['reference_name'])
+        read.query_sequence = row['query_sequence']
+        read.reference_start = row['reference_start']
+        read.reference_id = input_bam_cache.reference_id(row['reference_name'])
+        read.cigar = row['cigar']
+        read.query_name = row['query_name']
+        read.mapping_quality = row['mapping_quality']
+        if row['query_qualities'] is not None:
+            read.query_qualities = row['query_qualities']
+        read.template_length = row['template_length']
+        read.alignment_rank = row['alignment_rank']
+        read.alignment_score = row['alignment_score']
+        read.set_tags(row['tags'])
+        read.flag = row['flag']
+        if read.is_paired:
+            read._next_reference_name = row['next_reference_name']
+            read.next_reference_id = input_bam_cache.reference_id(row['next_reference_name'])
+            read.next_reference_start = row['next_reference_start']
+        read.set_key()
+        return read
+
+    def get(self, sequences, input_bam_cache):
+        """
+        Args:
+            sequences (Iterable of str): the sequences to look for
+            input_bam_cache (BamCache): used to set the reference ids of the cached alignments
+
+        Returns:
+            dict of list of SamRead by str: the cached alignments by sequence (only for the sequences in the cache)
+        """
+        sequences_by_key = {self.sequence_key(seq): seq for seq in sequences}
+        seq_keys = sorted(sequences_by_key)
+        reads_by_query = {}
+        with self.connection:
+            for i in range(0, len(seq_keys), self.BATCH_SIZE):
+                batch = seq_keys[i:i + self.BATCH_SIZE]
+                params = ','.join(['?' for k in batch])
+                rows = self.connection.execute(
+                    'SELECT seq_key, reads FROM alignments WHERE config_key = ? AND seq_key IN ({})'.format(params),
+                    [self.config_key] + batch
+                ).fetchall()
+                for seq_key, reads in rows:
+                    seq_reads = []
+                    for row in pickle.loads(reads):
+                        try:
+                            seq_reads.append(self.read_from_dict(row, input_bam_cache))
+                        except KeyError:
+                            pass  # dropped as unknown reference when aligned against this bam
+                    reads_by_query[sequences_by_key[seq_key]] = seq_reads
+                if rows:
+                    self.connection.execute(
+                        'UPDATE alignments SET last_access = ? WHERE config_key = ? AND seq_key IN ({})'.format(
+                            ','.join(['?' for r in rows])),
+                        [time.time(), self.config_key] + [seq_key for seq_key, reads in rows]
+                    )
+        return reads_by_query
+
+    def put(self, reads_by_query):
+        """
+        Args:
+            reads_by_query (dict of list of SamRead by str): the alignments by sequence. An empty list caches that
+                the sequence did not align
+        """
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO alignments (seq_key, config_key, reads, last_access) VALUES (?, ?, ?, ?)',
+                [
+                    (self.sequence_key(seq), self.config_key, pickle.dumps([self.read_to_dict(r) for r in reads]), now)
+                    for seq, reads in reads_by_query.items()
+                ]
+            )
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM alignments').fetchone()[0]
+
+    def evict(self):
+        with self.connection:
+            if self.max_age is not None:
+                self.connection.execute(
+                    'DELETE FROM alignments WHERE last_access < ?', [time.time() - self.max_age * 24 * 60 * 60])
+            if self.max_size is not None:
+                self.connection.execute(
+                    'DELETE FROM alignments WHERE rowid IN '
+                    '(SELECT rowid FROM alignments ORDER BY last_access DESC LIMIT -1 OFFSET ?)', [self.max_size])
+
+    def close(self):
+        self.evict()
+        self.connection.close()
+
+
 def align_sequences(
     sequences,
     input_bam_cache,
@@ -346,6 +835,8 @@ def align_sequences(
     blat_limit_top_aln=25,
     blat_min_identity=0.7,
     clean_files=True,
+    persistent_aligner=False,
+    alignment_cache=None,
     log=DEVNULL,
     **kwargs
 ):
@@ -358,7 +849,29 @@ def align_sequences(
         reference_genome: the reference genome
         aligner (SUPPORTED_ALIGNER): the name of the aligner to be used
         aligner_reference (str): path to the aligner reference file
+        persistent_aligner (bool): keep the aligner reference loaded between calls (see :func:`get_persistent_aligner`)
+        alignment_cache (AlignmentCache): if given, only sequences without cached alignments are sent to the aligner
     """
+    if alignment_cache is not None:
+        reads_by_query = alignment_cache.get(sequences.values(), input_bam_cache)
+        uncached = {name: seq for name, seq in sequences.items() if seq not in reads_by_query}
+        log('found', len(reads_by_query), 'of', len(set(sequences.values())), 'sequences in the alignment cache', time_stamp=False)
+        if uncached:
+            aligned = align_sequences(
+                uncached, input_bam_cache, reference_genome, aligner, aligner_reference,
+                aligner_output_file=aligner_output_file,
+                aligner_fa_input_file=aligner_fa_input_file,
+                aligner_output_log=aligner_output_log,
+                blat_limit_top_aln=blat_limit_top_aln,
+                blat_min_identity=blat_min_identity,
+                clean_files=clean_files,
+                persistent_aligner=persistent_aligner,
+                log=log,
+                **kwargs
+            )
+            alignment_cache.put({seq: aligned.get(seq, []) for seq in uncached.values()})
+            reads_by_query.update(aligned)
+        return reads_by_query
     try:
         # write the input sequences to a fasta file
         count = 1
@@ -376,14 +889,20 @@ def align_sequences(
             from .blat import process_blat_output
             # call the aligner using subprocess
             blat_min_identity *= 100
-            blat_options = kwargs.pop(
-                'align_options', '-stepSize=5 -repMatch=2253 -minScore=0 -minIdentity={0}'.format(blat_min_identity))
-            # call the blat subprocess
-            # will raise subprocess.CalledProcessError if non-zero exit status
-            # parameters from https://genome.ucsc.edu/FAQ/FAQblat.html#blat4
-            command = ' '.join([
-                SUPPORTED_ALIGNER.BLAT, aligner_reference, aligner_fa_input_file, aligner_output_file,
-                '-out=pslx', '-noHead', blat_options])
+            if persistent_aligner:
+                # the step size and repeat settings are given to the server on start
+                blat_options = kwargs.pop('align_options', '-minScore=0 -minIdentity={0}'.format(blat_min_identity))
+                server = get_persistent_aligner(aligner, aligner_reference, log=log)
+                command = server.command(aligner_fa_input_file, aligner_output_file, blat_options)
+            else:
+                blat_options = kwargs.pop(
+                    'align_options', '-stepSize=5 -repMatch=2253 -minScore=0 -minIdentity={0}'.format(blat_min_identity))
+                # call the blat subprocess
+                # will raise subprocess.CalledProcessError if non-zero exit status
+                # parameters from https://genome.ucsc.edu/FAQ/FAQblat.html#blat4
+                command = ' '.join([
+                    SUPPORTED_ALIGNER.BLAT, aligner_reference, aligner_fa_input_file, aligner_output_file,
+                    '-out=pslx', '-noHead', blat_options])
             log('writing aligner logging to:', aligner_output_log, time_stamp=False)
             with open(aligner_output_log, 'w') as log_fh:
                 log_fh.write('>>> {}\n'.format(command))
@@ -398,6 +917,9 @@ def align_sequences(
 
         elif aligner == SUPPORTED_ALIGNER.BWA_MEM:
             align_options = kwargs.get('align_options', '')
+            if persistent_aligner:
+                # bwa mem uses the shared memory index when it has been loaded
+                get_persistent_aligner(aligner, aligner_reference, log=log)
             command = '{} -Y {} {} {}'.format(aligner, align_options, aligner_reference, aligner_fa_input_file)
             log('writing aligner logging to:', aligner_output_log, time_stamp=False)
             with open(aligner_output_log, 'w') as log_fh, open(aligner_output_file, 'w') as aligner_output_fh:
@@ -437,14 +959,78 @@ def align_sequences(
                         warnings.warn(repr(err))
 
 
+def _possible_paired_event_types(break1, break2):
+    """
+    the event types a paired read event could be classified as based only on the breakpoint chromosomes and
+    orientations (a superset of :meth:`BreakpointPair.classify` for the event). Expects the breakpoints to be sorted
+    """
+    if break1.chr != break2.chr:
+        return {SVTYPE.TRANS, SVTYPE.ITRANS}
+    elif break1.orient == break2.orient:
+        return {SVTYPE.INV}
+    elif break1.orient == ORIENT.LEFT:
+        return {SVTYPE.DEL, SVTYPE.INS}
+    return {SVTYPE.DUP}
+
+
+def _candidate_read_pairs(evidence, std_reads, putative_types):
+    """
+    pairs of standardized contig alignments which could be called as a paired event (see
+    :func:`call_paired_read_event`) supporting the putative event types within the evidence windows. Alignments are
+    indexed by chromosome so only alignments on the two breakpoint chromosomes are paired, and pairs are then pruned by
+    their possible event types, the outer windows and mapping quality
+
+    Returns:
+        tuple of list and int: the candidate read pairs and the total number of pairs considered
+    """
+    reads_by_chr = {}
+    for read in std_reads:
+        try:
+            breakpoint = read_breakpoint(read)
+        except AssertionError:  # cannot be paired
+            continue
+        reads_by_chr.setdefault(breakpoint.chr, []).append((read, breakpoint))
+
+    if evidence.break1.chr == evidence.break2.chr:
+        pairs = itertools.combinations(reads_by_chr.get(evidence.break1.chr, []), 2)
+        total = len(reads_by_chr.get(evidence.break1.chr, []))
+        total = total * (total - 1) // 2
+    else:
+        pairs = itertools.product(reads_by_chr.get(evidence.break1.chr, []), reads_by_chr.get(evidence.break2.chr, []))
+        total = len(reads_by_chr.get(evidence.break1.chr, [])) * len(reads_by_chr.get(evidence.break2.chr, []))
+
+    candidates = []
+    for (read1, break1), (read2, break2) in pairs:
+        if break2.key < break1.key:
+            read1, read2 = read2, read1
+            break1, break2 = break2, break1
+        if not _possible_paired_event_types(break1, break2) & putative_types:
+            continue
+        if not break1 & evidence.outer_window1:
+            continue
+        # the second breakpoint moves by the query overlap of the alignments when the event is called
+        max_shift = len(read1.query_sequence)
+        if not Interval(max(1, break2.start - max_shift), break2.end + max_shift) & evidence.outer_window2:
+            continue
+        if read1.mapping_quality == 0 and read2.mapping_quality == 0:
+            continue
+        candidates.append((read1, read2))
+    return candidates, total
+
+
 def select_contig_alignments(evidence, reads_by_query):
     """
     standardize/simplify reads and filter bad/irrelevant alignments
     adds the contig alignments to the contigs
+
+    Returns:
+        MavisNamespace: counts of the alignment pairs which were considered (pairs), tried after pruning
+        (candidate_pairs) and which supported the event (supporting_pairs), summed over all contigs
     """
     putative_types = BreakpointPair.classify(evidence)
     if {SVTYPE.DUP, SVTYPE.INS} & putative_types:
         putative_types.update({SVTYPE.DUP, SVTYPE.INS})
+    stats = MavisNamespace(pairs=0, candidate_pairs=0, supporting_pairs=0)
 
     def filter_pass(alignment):
         return not any([
@@ -496,7 +1082,10 @@ def select_contig_alignments(evidence, reads_by_query):
                 min_anchor_size=evidence.contig_aln_min_anchor_size
             ))
 
-        for read1, read2 in itertools.combinations(std_reads, 2):
+        candidate_pairs, total_pairs = _candidate_read_pairs(evidence, std_reads, putative_types)
+        stats.pairs += total_pairs
+        stats.candidate_pairs += len(candidate_pairs)
+        for read1, read2 in candidate_pairs:
             try:
                 paired_event = call_paired_read_event(read1, read2, is_stranded=evidence.bam_cache.stranded)
 
@@ -504,6 +1093,7 @@ def select_contig_alignments(evidence, reads_by_query):
                 continue
             if supports_primary_event(paired_event):
                 alignments.append(paired_event)
+                stats.supporting_pairs += 1
         filtered_alignments = set()
         for alignment in sorted(alignments, key=lambda x: (x.read2 is None, -1 * x.alignment_rank().center, x.score()), reverse=True):
             if alignment in filtered_alignments:  # filter out identical primary events called by different reads
@@ -525,3 +1115,4 @@ def select_contig_alignments(evidence, reads_by_query):
                     if supp_event not in filtered_alignments and filter_pass(supp_event):
                         filtered_alignments.add(supp_event)
         contig.alignments.update(filtered_alignments)
+    return stats
@@ -12,8 +12,9 @@ import tab
 from .base import BioInterval, ReferenceName
 from .genomic import Exon, Gene, Template, Transcript, PreTranscript
 from .protein import Domain, Translation
-from ..constants import CODON_SIZE, GIEMSA_STAIN, START_AA, STOP_AA, STRAND, translate
+from ..constants import CODON_SIZE, GIEMSA_STAIN, START_AA, STOP_AA, STRAND
 from ..interval import Interval
+from ..sequence import translate
 from ..util import DEVNULL, LOG, filepath, WeakMavisNamespace
 
 
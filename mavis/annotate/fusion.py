@@ -1,9 +1,10 @@
 from .genomic import Exon, Transcript, PreTranscript
 from .protein import calculate_orf, Domain, Translation
 from ..breakpoint import Breakpoint
-from ..constants import ORIENT, PRIME, PROTOCOL, reverse_complement, STRAND, SVTYPE
+from ..constants import ORIENT, PRIME, PROTOCOL, STRAND, SVTYPE
 from ..error import NotSpecifiedError
 from ..interval import Interval, IntervalMapping
+from ..sequence import reverse_complement
 
 
 def determine_prime(transcript, breakpoint):
@@ -1,12 +1,14 @@
+import bisect
 from copy import copy
 import itertools
 
 from .base import BioInterval, ReferenceName
 from .constants import SPLICE_SITE_TYPE
 from .splicing import SpliceSite, SplicingPattern
-from ..constants import ORIENT, reverse_complement, STRAND
+from ..constants import ORIENT, STRAND
 from ..error import NotSpecifiedError
 from ..interval import Interval
+from ..sequence import reverse_complement
 
 
 class Template(BioInterval):
@@ -245,6 +247,144 @@ class Exon(BioInterval):
             self.end, '' if self.end_splice_site.intact else '*')
 
 
+class CdnaCoordinateIndex:
+    """
+    precomputed exon boundaries for a single splicing pattern of a pre-transcript. Converts between genomic and cdna
+    coordinates by bisecting the sorted exon boundaries instead of rebuilding and scanning the interval mappings
+    """
+
+    def __init__(self, starts, ends, is_reverse):
+        """
+        Args:
+            starts (:class:`list` of :class:`int`): genomic start positions of the spliced exons (sorted)
+            ends (:class:`list` of :class:`int`): genomic end positions of the spliced exons (sorted)
+            is_reverse (bool): True if the transcript is on the reverse strand
+        """
+        self.starts = tuple(starts)
+        self.ends = tuple(ends)
+        self.is_reverse = is_reverse
+        # number of cdna bases before each exon (in genomic order) and up to the end of each exon
+        offsets = []
+        cumulative_ends = []
+        length = 0
+        for start, end in zip(self.starts, self.ends):
+            offsets.append(length)
+            length += end - start + 1
+            cumulative_ends.append(length)
+        self.offsets = tuple(offsets)
+        self.cumulative_ends = tuple(cumulative_ends)
+        self.length = length
+
+    @classmethod
+    def from_splicing_pattern(cls, pre_transcript, splicing_pattern):
+        """
+        Args:
+            pre_transcript (PreTranscript): the unspliced transcript
+            splicing_pattern (SplicingPattern): list of genomic splice sites 3'5' repeating
+
+        Raises:
+            NotSpecifiedError: if the transcript strand is not given
+        """
+        if pre_transcript.get_strand() not in {STRAND.POS, STRAND.NEG}:
+            raise NotSpecifiedError('cannot convert without strand information')
+        pos = sorted([s.pos for s in splicing_pattern] + [pre_transcript.start, pre_transcript.end])
+        return cls(pos[::2], pos[1::2], pre_transcript.get_strand() == STRAND.NEG)
+
+    def _exonic_cdna(self, index, pos):
+        cdna_pos = self.offsets[index] + pos - self.starts[index]
+        return self.length - cdna_pos if self.is_reverse else cdna_pos + 1
+
+    def convert_genomic_to_nearest_cdna(self, pos, stick_direction=None, allow_outside=True):
+        """
+        converts a genomic position to its cdna equivalent or (if intronic) the nearest cdna and shift
+
+        Args:
+            pos (int): the genomic position
+
+        Returns:
+            tuple of int and int:
+                * *int* - the exonic cdna position
+                * *int* - the intronic shift
+
+        See Also:
+            :meth:`PreTranscript.convert_genomic_to_nearest_cdna`
+        """
+        index = bisect.bisect_right(self.starts, pos) - 1
+        if index >= 0 and pos <= self.ends[index]:
+            return self._exonic_cdna(index, pos), 0
+        elif index >= 0 and index < len(self.starts) - 1:  # intronic
+            prev_end = self.ends[index]
+            next_start = self.starts[index + 1]
+            if (abs(pos - prev_end) <= abs(pos - next_start) or stick_direction == ORIENT.LEFT) and stick_direction != ORIENT.RIGHT:
+                return self._exonic_cdna(index, prev_end), prev_end - pos if self.is_reverse else pos - prev_end
+            return self._exonic_cdna(index + 1, next_start), next_start - pos if self.is_reverse else pos - next_start
+        elif not allow_outside:
+            raise IndexError('position does not fall within the current transcript', pos)
+        elif pos < self.starts[0]:  # before the first exon
+            return self.length if self.is_reverse else 1, pos - self.starts[0]
+        return 1 if self.is_reverse else self.length, pos - self.ends[-1]
+
+    def convert_genomic_to_nearest_cdna_many(self, positions, **kwargs):
+        """
+        Args:
+            positions (:class:`list` of :class:`int`): the genomic positions
+
+        Returns:
+            :class:`list` of :class:`tuple` of :class:`int` and :class:`int`: the cdna position and intronic shift for each input position
+        """
+        return [self.convert_genomic_to_nearest_cdna(pos, **kwargs) for pos in positions]
+
+    def convert_cdna_to_genomic(self, pos):
+        """
+        Args:
+            pos (int): cdna position
+
+        Returns:
+            int: the genomic equivalent
+
+        Raises:
+            IndexError: if the position is 0
+        """
+        if pos < 0:
+            if self.is_reverse:
+                return self.ends[-1] + abs(pos)
+            return self.starts[0] + pos
+        elif pos > self.length:
+            pos -= self.length
+            if self.is_reverse:
+                return self.starts[0] - pos
+            return self.ends[-1] + pos
+        elif pos == 0:
+            raise IndexError(pos, 'is outside mapped range')
+        if self.is_reverse:
+            pos = self.length - pos + 1
+        index = bisect.bisect_left(self.cumulative_ends, pos)
+        return self.starts[index] + pos - self.offsets[index] - 1
+
+    def convert_cdna_to_genomic_many(self, positions):
+        """
+        Args:
+            positions (:class:`list` of :class:`int`): cdna positions
+
+        Returns:
+            :class:`list` of :class:`int`: the genomic equivalent of each input position
+        """
+        return [self.convert_cdna_to_genomic(pos) for pos in positions]
+
+    def genomic_to_cdna_mapping(self):
+        """
+        Returns:
+            :class:`dict` of :class:`Interval` by :class:`Interval`: the cdna interval for each genomic (exonic) interval
+        """
+        mapping = {}
+        for start, end, offset in zip(self.starts, self.ends, self.offsets):
+            if self.is_reverse:
+                mapping[Interval(start, end)] = Interval(self.length - offset - (end - start), self.length - offset)
+            else:
+                mapping[Interval(start, end)] = Interval(offset + 1, offset + end - start + 1)
+        return mapping
+
+
 class PreTranscript(BioInterval):
     """
     """
@@ -327,27 +467,42 @@ class PreTranscript(BioInterval):
         """:any:`Gene`: the gene this transcript belongs to"""
         return self.reference_object
 
-    def _genomic_to_cdna_mapping(self, splicing_pattern):
+    @property
+    def exons(self):
+        """:class:`list` of :class:`Exon`: the exons of this transcript. Setting the exons clears the cached coordinate indices"""
+        return self._exons
+
+    @exons.setter
+    def exons(self, exons):
+        self._exons = exons
+        self._cdna_coordinate_indices = {}
+
+    def cdna_coordinate_index(self, splicing_pattern):
         """
         Args:
             splicing_pattern (SplicingPattern): list of genomic splice sites 3'5' repeating
-        """
-        mapping = {}
-        length = 1
-        pos = sorted([s.pos for s in splicing_pattern] + [self.start, self.end])
-        genome_intervals = [Interval(s, t) for s, t in zip(pos[::2], pos[1::2])]
 
-        if self.get_strand() == STRAND.POS:
-            pass
-        elif self.get_strand() == STRAND.NEG:
-            genome_intervals.reverse()
-        else:
-            raise NotSpecifiedError('cannot convert without strand information')
+        Returns:
+            CdnaCoordinateIndex: the (cached) coordinate index for the given splicing pattern
 
-        for exon in genome_intervals:
-            mapping[exon] = Interval(length, length + len(exon) - 1)
-            length += len(exon)
-        return mapping
+        Note:
+            indices are keyed on the transcript start, end, strand and the splicing pattern positions so a change
+            to any of these results in a new index
+        """
+        key = (self.start, self.end, self.get_strand(), tuple(sorted([s.pos for s in splicing_pattern])))
+        try:
+            return self._cdna_coordinate_indices[key]
+        except KeyError:
+            index = CdnaCoordinateIndex.from_splicing_pattern(self, splicing_pattern)
+            self._cdna_coordinate_indices[key] = index
+            return index
+
+    def _genomic_to_cdna_mapping(self, splicing_pattern):
+        """
+        Args:
+            splicing_pattern (SplicingPattern): list of genomic splice sites 3'5' repeating
+        """
+        return self.cdna_coordinate_index(splicing_pattern).genomic_to_cdna_mapping()
 
     def _cdna_to_genomic_mapping(self, splicing_pattern):
         """
@@ -389,33 +544,8 @@ class PreTranscript(BioInterval):
                 * *int* - the intronic shift
 
         """
-        mapping = self._genomic_to_cdna_mapping(splicing_pattern)
-        exons = sorted(list(mapping.keys()))
-        # exonic
-        for ex in exons:
-            if pos <= ex.end and pos >= ex.start:
-                # in the current exon
-                cdna_pos = Interval.convert_pos(mapping, pos, True if self.get_strand() == STRAND.NEG else False)
-                return cdna_pos, 0
-        # intronic
-        for ex1, ex2 in zip(exons, exons[1::]):
-            if pos > ex1.end and pos < ex2.start:
-                # in the current intron
-                if (abs(pos - ex1.end) <= abs(pos - ex2.start) or stick_direction == ORIENT.LEFT) and stick_direction != ORIENT.RIGHT:
-                    # closest to the first exon
-                    cdna_pos = Interval.convert_pos(mapping, ex1.end, True if self.get_strand() == STRAND.NEG else False)
-                    return cdna_pos, pos - ex1.end if self.get_strand() == STRAND.POS else ex1.end - pos
-                cdna_pos = Interval.convert_pos(mapping, ex2.start, True if self.get_strand() == STRAND.NEG else False)
-                return cdna_pos, pos - ex2.start if self.get_strand() == STRAND.POS else ex2.start - pos
-        if allow_outside:
-            cdna_length = sum([len(e) for e in exons])
-            if pos < exons[0].start:  # before the first exon
-                return cdna_length if self.is_reverse else 1, pos - exons[0].start
-            elif pos > exons[-1].end:
-                return 1 if self.is_reverse else cdna_length, pos - exons[-1].end
-            else:
-                raise NotImplementedError('Unexpected error', self.exons, pos)
-        raise IndexError('position does not fall within the current transcript', pos, mapping)
+        return self.cdna_coordinate_index(splicing_pattern).convert_genomic_to_nearest_cdna(
+            pos, stick_direction=stick_direction, allow_outside=allow_outside)
 
     def convert_cdna_to_genomic(self, pos, splicing_pattern):
         """
@@ -426,19 +556,7 @@ class PreTranscript(BioInterval):
         Returns:
             int: the genomic equivalent
         """
-        mapping = self._cdna_to_genomic_mapping(splicing_pattern)
-        exons = sorted(mapping.values())
-        length = sum([len(e) for e in mapping])
-        if pos < 0:
-            if self.is_reverse:
-                return exons[-1].end + abs(pos)
-            return exons[0].start + pos
-        if pos > length:
-            pos -= length
-            if self.is_reverse:
-                return exons[0].start - pos
-            return exons[-1].end + pos
-        return Interval.convert_pos(mapping, pos, True if self.get_strand() == STRAND.NEG else False)
+        return self.cdna_coordinate_index(splicing_pattern).convert_cdna_to_genomic(pos)
 
     def exon_number(self, exon):
         """
@@ -572,6 +690,11 @@ class Transcript(BioInterval):
     def convert_genomic_to_nearest_cdna(self, pos, **kwargs):
         return self.reference_object.convert_genomic_to_nearest_cdna(pos, self.splicing_pattern, **kwargs)
 
+    @property
+    def cdna_coordinate_index(self):
+        """:class:`CdnaCoordinateIndex`: precomputed genomic/cdna coordinate conversion for this splicing pattern"""
+        return self.unspliced_transcript.cdna_coordinate_index(self.splicing_pattern)
+
     def convert_cdna_to_genomic(self, pos):
         """
         Args:
@@ -10,12 +10,12 @@ from .genomic import PreTranscript
 from .variant import annotate_events, choose_more_annotated, choose_transcripts_by_priority, call_protein_indel, flatten_fusion_transcript, flatten_fusion_translation
 from .fusion import determine_prime
 from ..cluster.constants import DEFAULTS as CLUSTER_DEFAULTS
-from ..constants import COLUMNS, PRIME, PROTOCOL, sort_columns
+from ..constants import COLUMNS, PRIME, PROTOCOL, sort_columns, SUBCOMMAND
 from ..error import DrawingFitError, NotSpecifiedError
 from ..illustrate.constants import DEFAULTS as ILLUSTRATION_DEFAULTS
 from ..illustrate.constants import DiagramSettings
 from ..illustrate.diagram import draw_sv_summary_diagram
-from ..util import LOG, mkdirp, read_inputs
+from ..util import LOG, mkdirp, read_inputs, resource_usage, write_resource_report
 
 
 ACCEPTED_FILTERS = {
@@ -116,6 +116,7 @@ def main(
         min_orf_size (int): minimum size of an :term:`open reading frame` to keep as a putative translation
         max_orf_cap (int): the maximum number of :term:`open reading frame` s to collect for any given event
     """
+    initial_usage = resource_usage()
     # error early on missing input files
     annotations.files_exist()
     reference_genome.files_exist()
@@ -264,3 +265,7 @@ def main(
         tabbed_fh.close()
         LOG('closing:', fa_output_file)
         fasta_fh.close()
+    write_resource_report(output, SUBCOMMAND.ANNOTATE, start_time, items={
+        'breakpoint_pairs': len(bpps),
+        'annotations': len(annotated_events)
+    }, inputs=inputs, library=library, initial_usage=initial_usage, log=LOG)
@@ -1,9 +1,10 @@
 import itertools
 
 from .base import BioInterval
-from ..constants import CODON_SIZE, START_AA, STOP_AA, translate
+from ..constants import CODON_SIZE, START_AA, STOP_AA
 from ..error import NotSpecifiedError
 from ..interval import Interval
+from ..sequence import translate
 
 
 def calculate_orf(spliced_cdna_sequence, min_orf_size=None):
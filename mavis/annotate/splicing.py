@@ -2,8 +2,9 @@ import itertools
 
 from .base import BioInterval
 from .constants import ACCEPTOR_SEQ, DONOR_SEQ, SPLICE_SITE_RADIUS, SPLICE_SITE_TYPE, SPLICE_TYPE
-from ..constants import reverse_complement, STRAND
+from ..constants import STRAND
 from ..interval import Interval
+from ..sequence import reverse_complement
 
 
 class SplicingPattern(list):
@@ -6,7 +6,7 @@ import networkx as nx
 
 from .bam import cigar as _cigar
 from .bam.read import calculate_alignment_score, nsb_align, sequence_complexity
-from .constants import reverse_complement
+from .sequence import reverse_complement
 from .interval import Interval
 from .util import DEVNULL
 
@@ -330,6 +330,7 @@ def assemble(
     assembly_min_uniq=0.01,
     min_complexity=0,
     log=lambda *pos, **kwargs: None,
+    stats=None,
     **kwargs
 ):
     """
@@ -349,6 +350,7 @@ def assemble(
         remap_min_exact_match: see :term:`assembly_min_exact_match_to_remap`
         assembly_max_paths: see :term:`assembly_max_paths`
         log (function): the log function
+        stats (dict): if given, updated with the size (assembly_nodes, assembly_edges) of the initial assembly graph
 
     Returns:
         :class:`list` of :class:`Contig`: a list of putative contigs
@@ -371,6 +373,8 @@ def assemble(
         kmers_list = kmers(s, kmer_size)
         for kmer in kmers_list:
             assembly.add_edge(kmer[:-1], kmer[1:])
+    if stats is not None:
+        stats.update({'assembly_nodes': assembly.number_of_nodes(), 'assembly_edges': assembly.number_of_edges()})
     # use the ab min edge weight to remove all low weight edges first
     nodes = list(assembly.nodes())
     for n in nodes:
@@ -24,6 +24,10 @@ class BamCache:
         """
         self.cache = {}
         self.stranded = stranded
+        # counters for reporting on how much work fetching reads required
+        self.fetched_reads = 0
+        self.mate_cache_hits = 0
+        self.mate_cache_misses = 0
         self.fh = bamfile
         if not hasattr(bamfile, 'fetch'):
             self.fh = pysam.AlignmentFile(bamfile, 'rb')
@@ -161,6 +165,7 @@ class BamCache:
                 _util.LOG('ignoring invalid read', read.query_name, level=logging.DEBUG)
                 continue
             read = SamRead.copy(read)
+            self.fetched_reads += 1
             if not filter_if(read):
                 result.append(read)
             if cache_if(read):
@@ -216,6 +221,7 @@ class BamCache:
                     _util.LOG('ignoring invalid read', read.query_name, level=logging.DEBUG)
                     continue
                 read = SamRead.copy(read)
+                self.fetched_reads += 1
                 if not filter_if(read):
                     result.append(read)
                 if read.query_name not in temp_cache:
@@ -249,6 +255,10 @@ class BamCache:
                 ]):
                     continue
             mates.append(mate)
+        if mates:
+            self.mate_cache_hits += 1
+        else:
+            self.mate_cache_misses += 1
         if len(mates) == 0:
             if not allow_file_access or read.mate_is_unmapped:
                 raise KeyError('mate is not found in the cache')
@@ -3,8 +3,13 @@ holds methods related to processing cigar tuples. Cigar tuples are generally
 an iterable list of tuples where the first element in each tuple is the
 CIGAR value (i.e. 1 for an insertion), and the second value is the frequency
 """
+import itertools
 import re
-from ..constants import CIGAR, DNA_ALPHABET, GAP
+
+import numpy as np
+
+from ..constants import CIGAR, GAP
+from ..sequence import dna_match, match_mask
 
 EVENT_STATES = {CIGAR.D, CIGAR.I, CIGAR.X}
 ALIGNED_STATES = {CIGAR.M, CIGAR.X, CIGAR.EQ}
@@ -26,26 +31,35 @@ def recompute_cigar_mismatch(read, ref):
         :class:`list` of :class:`tuple` of :class:`int` and :class:`int`: the cigar tuple
     """
     result = []
-    offset = 0
+    ref = getattr(ref, 'seq', ref)  # SeqRecord slices are not strings
+    query_sequence = read.query_sequence
 
     ref_pos = read.reference_start
     seq_pos = 0
 
+    def append(cigar_value, freq):
+        if result and result[-1][0] == cigar_value:
+            result[-1] = (cigar_value, result[-1][1] + freq)
+        else:
+            result.append((cigar_value, freq))
+
     for cigar_value, freq in read.cigar:
         if cigar_value in ALIGNED_STATES:
-            for offset in range(0, freq):
-                if DNA_ALPHABET.match(ref[ref_pos], read.query_sequence[seq_pos]):
-                    if len(result) == 0 or result[-1][0] != CIGAR.EQ:
-                        result.append((CIGAR.EQ, 1))
-                    else:
-                        result[-1] = (CIGAR.EQ, result[-1][1] + 1)
-                else:
-                    if len(result) == 0 or result[-1][0] != CIGAR.X:
-                        result.append((CIGAR.X, 1))
-                    else:
-                        result[-1] = (CIGAR.X, result[-1][1] + 1)
-                ref_pos += 1
-                seq_pos += 1
+            if freq <= 0:
+                continue
+            ref_block = ref[ref_pos:ref_pos + freq]
+            seq_block = query_sequence[seq_pos:seq_pos + freq]
+            if len(ref_block) != freq or len(seq_block) != freq:
+                raise IndexError('aligned block extends past the end of the sequence', ref_pos, seq_pos, freq)
+            matches = match_mask(ref_block, seq_block)
+            # run-length encode the matches/mismatches
+            changes = np.flatnonzero(matches[1:] != matches[:-1]) + 1
+            start = 0
+            for end in itertools.chain(changes.tolist(), [freq]):
+                append(CIGAR.EQ if matches[start] else CIGAR.X, end - start)
+                start = end
+            ref_pos += freq
+            seq_pos += freq
             continue
         if cigar_value in QUERY_ALIGNED_STATES:
             seq_pos += freq
@@ -225,7 +239,7 @@ def compute(ref, alt, force_softclipping=True, min_exact_to_stop_softclipping=6)
             cigar.append((CIGAR.I, 1))
         elif a == GAP:
             cigar.append((CIGAR.D, 1))
-        elif DNA_ALPHABET.match(r, a):
+        elif dna_match(r, a):
             cigar.append((CIGAR.EQ, 1))
         else:
             cigar.append((CIGAR.X, 1))
@@ -8,8 +8,9 @@ from Bio.Data import IUPACData as iupac
 
 from . import cigar as _cigar
 from .cigar import EVENT_STATES, QUERY_ALIGNED_STATES, REFERENCE_ALIGNED_STATES, convert_cigar_to_string
-from ..constants import CIGAR, DNA_ALPHABET, ORIENT, READ_PAIR_TYPE, STRAND, SVTYPE, NA_MAPPING_QUALITY
+from ..constants import CIGAR, ORIENT, READ_PAIR_TYPE, STRAND, SVTYPE, NA_MAPPING_QUALITY
 from ..interval import Interval
+from ..sequence import dna_match
 
 
 class SamRead(pysam.AlignedSegment):
@@ -305,7 +306,7 @@ def nsb_align(
                 cigar.append((CIGAR.S, 1))
                 length -= 1
                 continue
-            if DNA_ALPHABET.match(ref[r], seq[i]):
+            if dna_match(ref[r], seq[i]):
                 cigar.append((CIGAR.EQ, 1))
             else:
                 cigar.append((CIGAR.X, 1))
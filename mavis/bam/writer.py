@@ -0,0 +1,122 @@
+"""
+writing coordinate-sorted bam files incrementally (without a separate sort pass over the written file)
+"""
+import heapq
+import os
+import tempfile
+
+import pysam
+
+from . import cigar as _cigar
+
+UNMAPPED_REFERENCE_ID = 2 ** 31  # sort reads without a reference after all mapped reads (same as samtools)
+
+
+class SortedBamWriter:
+    """
+    Writes reads to a coordinate-sorted bam file. Reads are copied as they are written (so the originals can be
+    released and are not modified) and held in an in-memory buffer. The buffer is sorted and spilled to a temporary
+    file whenever it reaches the buffer size. On close the spilled runs are merged into the final bam, which is then
+    indexed
+
+    Attributes:
+        count (int): the number of reads written
+
+    Note:
+        requires pysam 0.14 or later (AlignmentHeader, AlignedSegment.fromstring and AlignedSegment.to_string)
+    """
+
+    def __init__(self, filename, template, buffer_size=100000, convert_for_igv=True, index=True):
+        """
+        Args:
+            filename (str): path to the output bam file
+            template (pysam.AlignmentFile): the bam file to use the header from
+            buffer_size (int): the number of reads to hold in memory before spilling to disk
+            convert_for_igv (bool): convert the read cigars for viewing in IGV (see :func:`~mavis.bam.cigar.convert_for_igv`)
+            index (bool): index the bam file on close
+        """
+        self.filename = filename
+        self.header = template.header
+        self.buffer_size = buffer_size
+        self.convert_for_igv = convert_for_igv
+        self.index = index
+        self.buffer = []
+        self.spills = []
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @staticmethod
+    def sort_key(read):
+        reference_id = read.reference_id if read.reference_id >= 0 else UNMAPPED_REFERENCE_ID
+        return reference_id, read.reference_start
+
+    def _copy(self, read):
+        """
+        copy a read onto a new segment with the output header so that the copy can be converted to/from SAM
+        """
+        result = pysam.AlignedSegment(self.header)
+        result.query_name = read.query_name
+        result.flag = read.flag
+        result.reference_id = read.reference_id
+        result.reference_start = read.reference_start
+        result.mapping_quality = read.mapping_quality
+        result.cigar = _cigar.convert_for_igv(read.cigar) if self.convert_for_igv else read.cigar
+        result.next_reference_id = read.next_reference_id
+        result.next_reference_start = read.next_reference_start
+        result.template_length = read.template_length
+        result.query_sequence = read.query_sequence
+        result.query_qualities = read.query_qualities
+        result.set_tags(read.get_tags(with_value_type=True))
+        return result
+
+    def write(self, read):
+        """
+        Args:
+            read (pysam.AlignedSegment): the read to write
+        """
+        self.buffer.append(self._copy(read))
+        self.count += 1
+        if len(self.buffer) >= self.buffer_size:
+            self._spill()
+
+    def _spill(self):
+        self.buffer.sort(key=self.sort_key)
+        with tempfile.NamedTemporaryFile(
+                'w', prefix='mavis-sort-', suffix='.sam', dir=os.path.dirname(os.path.abspath(self.filename)), delete=False
+        ) as fh:
+            for read in self.buffer:
+                fh.write('{}\t{}\t{}\n'.format(*self.sort_key(read), read.to_string()))
+        self.spills.append(fh.name)
+        self.buffer = []
+
+    def _iter_spill(self, filename):
+        with open(filename, 'r') as fh:
+            for line in fh:
+                reference_id, reference_start, line = line.rstrip('\n').split('\t', 2)
+                yield (int(reference_id), int(reference_start)), line
+
+    def close(self):
+        """
+        merge the buffered and spilled reads into the output bam file and index it
+        """
+        self.buffer.sort(key=self.sort_key)
+        runs = [self._iter_spill(filename) for filename in self.spills]
+        runs.append(((self.sort_key(read), read) for read in self.buffer))
+        try:
+            with pysam.AlignmentFile(self.filename, 'wb', header=self.header) as fh:
+                for _, read in heapq.merge(*runs, key=lambda x: x[0]):
+                    if isinstance(read, str):
+                        read = pysam.AlignedSegment.fromstring(read, self.header)
+                    fh.write(read)
+        finally:
+            for filename in self.spills:
+                os.remove(filename)
+            self.spills = []
+            self.buffer = []
+        if self.index:
+            pysam.index(self.filename)
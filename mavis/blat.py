@@ -23,9 +23,10 @@ from .align import query_coverage_interval
 from .bam import cigar as _cigar
 from .bam.cigar import QUERY_ALIGNED_STATES
 from .bam.read import SamRead
-from .constants import CIGAR, DNA_ALPHABET, NA_MAPPING_QUALITY, PYSAM_READ_FLAGS, reverse_complement, STRAND
+from .constants import CIGAR, NA_MAPPING_QUALITY, PYSAM_READ_FLAGS, STRAND
 from .util import LOG
 from .interval import Interval
+from .sequence import dna_match, reverse_complement
 
 
 class Blat:
@@ -211,7 +212,7 @@ class Blat:
                 rpos = ref_ranges[i][1] + 1
                 shift = 0
                 while qpos + shift < len(query_sequence) and rpos + shift < len(reference_sequence):
-                    if DNA_ALPHABET.match(query_sequence[qpos + shift], reference_sequence[rpos + shift]):
+                    if dna_match(query_sequence[qpos + shift], reference_sequence[rpos + shift]):
                         shift += 1
                     else:
                         break
@@ -267,7 +268,7 @@ class Blat:
                 cigar.append((CIGAR.M, size))
             else:
                 for ref_seq, query_seq in zip(reference_sequence[rcurr[0]:rcurr[1] + 1], query_sequence[qcurr[0]:qcurr[1] + 1]):
-                    if DNA_ALPHABET.match(ref_seq, query_seq):
+                    if dna_match(ref_seq, query_seq):
                         cigar.append((CIGAR.EQ, 1))
                     else:
                         cigar.append((CIGAR.X, 1))
@@ -1,9 +1,10 @@
 from __future__ import division
 from copy import copy as _copy
 
-from .constants import CIGAR, COLUMNS, DNA_ALPHABET, ORIENT, reverse_complement, STRAND, SVTYPE
+from .constants import CIGAR, COLUMNS, ORIENT, STRAND, SVTYPE
 from .error import InvalidRearrangement, NotSpecifiedError
 from .interval import Interval
+from .sequence import dna_match, reverse_complement
 
 
 class Breakpoint(Interval):
@@ -380,7 +381,7 @@ class BreakpointPair:
         ]):
             break1_bp = b1_refseq[pos1] if self.break1.strand == STRAND.POS else reverse_complement(b1_refseq[pos1])
             break2_bp = b2_refseq[pos2] if self.break2.strand == STRAND.POS else reverse_complement(b2_refseq[pos2])
-            if DNA_ALPHABET.match(break1_bp, break2_bp):
+            if dna_match(break1_bp, break2_bp):
                 first_seq.append(b1_refseq[pos1])
             else:
                 break
@@ -407,7 +408,7 @@ class BreakpointPair:
         ]):
             break1_bp = b1_refseq[pos1] if self.break1.strand == STRAND.POS else reverse_complement(b1_refseq[pos1])
             break2_bp = b2_refseq[pos2] if self.break2.strand == STRAND.POS else reverse_complement(b2_refseq[pos2])
-            if DNA_ALPHABET.match(break1_bp, break2_bp):
+            if dna_match(break1_bp, break2_bp):
                 second_seq.append(b2_refseq[pos2])
             else:
                 break
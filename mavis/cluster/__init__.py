@@ -18,6 +18,8 @@ Types of Output Files
 +--------------------------------+------------------+----------------------------------------------------------------------+
 | ``cluster-*.tab``              | text/tabbed      | computed clusters                                                    |
 +--------------------------------+------------------+----------------------------------------------------------------------+
+| ``split_cost_estimates.tab``   | text/tabbed      | estimated validation cost per cluster file (:term:`split_by_cost`)   |
++--------------------------------+------------------+----------------------------------------------------------------------+
 
 Algorithm Overview
 --------------------
@@ -1,9 +1,12 @@
 from __future__ import division
 
 from collections import namedtuple
+from concurrent import futures
 from copy import copy
 import itertools
 
+import numpy as np
+
 from ..breakpoint import Breakpoint, BreakpointPair
 from ..constants import ORIENT, STRAND
 from ..interval import Interval
@@ -40,6 +43,58 @@ def weighted_mean(values, weights=None):
     return sum(x * w for x, w in zip(values, weights)) / sum(weights)
 
 
+class WeightedIntervalSum:
+    """
+    Running sums used to compute the weighted mean interval (see :func:`merge_integer_intervals`)
+    of a growing set of integer intervals without iterating over all of the previous intervals
+    each time a new interval is added
+    """
+    FLOAT_OFFSET = 0.99999999
+
+    def __init__(self, weight_adjustment=0):
+        """
+        Args:
+            weight_adjustment (int): add to length to lower weighting differences between small intervals
+        """
+        self.weight_adjustment = weight_adjustment
+        self.weighted_centers = 0
+        self.weights = 0
+        self.lengths = 0
+        self.count = 0
+        self.min_start = None
+        self.max_end = None
+
+    def copy(self):
+        return copy(self)
+
+    def add(self, *intervals):
+        for curr in intervals:
+            curr = Interval(curr[0], curr[1] + self.FLOAT_OFFSET)
+            for _ in range(0, curr.freq):
+                weight = (self.weight_adjustment + 1) / (curr.length() + self.weight_adjustment)
+                self.weighted_centers += curr.center * weight
+                self.weights += weight
+                self.lengths += curr.length()
+                self.count += 1
+            self.min_start = curr[0] if self.min_start is None else min(self.min_start, curr[0])
+            self.max_end = curr[1] if self.max_end is None else max(self.max_end, curr[1])
+        return self
+
+    def interval(self):
+        """
+        Returns:
+            Interval: the weighted mean interval of all intervals added so far
+        """
+        if not self.count:
+            raise AttributeError('cannot compute the weighted mean interval of an empty set of intervals')
+        center = round(self.weighted_centers / self.weights * 2, 0) / 2
+        size = self.lengths / self.count
+        start = max([round(center - size / 2, 0), self.min_start])
+        end = min([round(center + size / 2, 0), self.max_end])
+        offset = min([center - start, end - center])
+        return Interval(int(round(center - offset, 0)), int(round(center + max(0, offset - self.FLOAT_OFFSET), 0)))
+
+
 def merge_integer_intervals(*intervals, weight_adjustment=0):
     """
     Merges a set of integer intervals into a single interval where the center is the
@@ -51,29 +106,63 @@ def merge_integer_intervals(*intervals, weight_adjustment=0):
     Args:
         weight_adjustment (int): add to length to lower weighting differences between small intervals
     """
-    float_offset = 0.99999999
-    intervals = list(intervals)
-    centers = []
-    weights = []
-    lengths = []
-
-    if not intervals:
-        raise AttributeError('cannot compute the weighted mean interval of an empty set of intervals')
-    for i in range(0, len(intervals)):
-        curr = intervals[i]
-        intervals[i] = Interval(curr[0], curr[1] + float_offset)
-        for _ in range(0, intervals[i].freq):
-            centers.append(intervals[i].center)
-            weights.append((weight_adjustment + 1) / (intervals[i].length() + weight_adjustment))
-            lengths.append(intervals[i].length())
-
-    center = round(weighted_mean(centers, weights=weights) * 2, 0) / 2
-    size = weighted_mean(lengths)  # -1 b/c center counts as one
-    start = max([round(center - size / 2, 0), min([i[0] for i in intervals])])
-    end = min([round(center + size / 2, 0), max([i[1] for i in intervals])])
-    offset = min([center - start, end - center])
-    result = Interval(int(round(center - offset, 0)), int(round(center + max(0, offset - float_offset), 0)))
-    return result
+    return WeightedIntervalSum(weight_adjustment).add(*intervals).interval()
+
+
+class PairCenterIndex:
+    """
+    Grid-based spatial index of breakpoint pairs by the centers of their first and second breakpoints. Used
+    to find the nearest (sum of the center distances) pairs without comparing against every indexed pair
+    """
+
+    def __init__(self, cell_size):
+        """
+        Args:
+            cell_size (int): the size of the grid cells, should be the maximum distance that will be queried
+        """
+        self.cell_size = max(1, cell_size)
+        self.cells = {}
+        self.order = {}  # insertion order is used to break ties between equidistant pairs
+        self.count = 0
+
+    def cell(self, pair):
+        return (int(pair.break1.center // self.cell_size), int(pair.break2.center // self.cell_size))
+
+    def add(self, pair):
+        self.cells.setdefault(self.cell(pair), set()).add(pair)
+        self.order[pair] = self.count
+        self.count += 1
+
+    def remove(self, pair):
+        cell = self.cell(pair)
+        self.cells[cell].discard(pair)
+        if not self.cells[cell]:
+            del self.cells[cell]
+        del self.order[pair]
+
+    def __contains__(self, pair):
+        return pair in self.order
+
+    def nearest(self, pair, max_distance):
+        """
+        Args:
+            pair (BreakpointPair): the pair to find the nearest indexed pairs to
+            max_distance (int): the maximum distance, must not exceed the cell size
+
+        Returns:
+            list of BreakpointPair: all indexed pairs tied for the minimum distance (if within max_distance) in the order they were added
+        """
+        row, col = self.cell(pair)
+        candidates = []
+        for cell in itertools.product([row - 1, row, row + 1], [col - 1, col, col + 1]):
+            for node in self.cells.get(cell, []):
+                dist = abs(pair.break1.center - node.break1.center) + abs(pair.break2.center - node.break2.center)
+                if dist <= max_distance:
+                    candidates.append((dist, self.order[node], node))
+        if not candidates:
+            return []
+        best = min(candidates)[0]
+        return [node for dist, order, node in sorted(candidates) if dist == best]
 
 
 def pair_key(pair):
@@ -112,56 +201,72 @@ def all_pair_group_keys(pair, explicit_strand=False):
     return result
 
 
+def union_find_components(starts1, ends1, starts2, ends2, cluster_radius):
+    """
+    Computes the connected components of a set of breakpoint pair coordinates where two pairs are
+    connected if the sum of the distances between their first and second breakpoints is within the
+    cluster radius. Candidate neighbours are found using a sweep over the first breakpoint start
+    positions and then merged using a union-find (disjoint set) structure
+
+    Args:
+        starts1 (numpy.ndarray): start positions of the first breakpoints
+        ends1 (numpy.ndarray): end positions of the first breakpoints
+        starts2 (numpy.ndarray): start positions of the second breakpoints
+        ends2 (numpy.ndarray): end positions of the second breakpoints
+        cluster_radius (int): maximum distance allowed for two pairs to be connected
+
+    Returns:
+        numpy.ndarray: the component label (root index) for each input position
+
+    Example:
+        >>> union_find_components(np.array([1, 5, 500]), np.array([1, 5, 500]), np.array([10, 10, 10]), np.array([10, 10, 10]), 10)
+        array([0, 0, 2])
+    """
+    parent = np.arange(len(starts1))
+
+    def find(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]  # path halving
+            node = parent[node]
+        return node
+
+    order = np.argsort(starts1, kind='mergesort')
+    starts1, ends1 = starts1[order], ends1[order]
+    starts2, ends2 = starts2[order], ends2[order]
+    # the last position (exclusive) within reach of each first breakpoint by the first breakpoint alone
+    upper_bounds = np.searchsorted(starts1, ends1 + cluster_radius, side='right')
+
+    for i in range(0, len(order)):
+        if upper_bounds[i] <= i + 1:
+            continue
+        others = slice(i + 1, upper_bounds[i])
+        distance = np.maximum(0, starts1[others] - ends1[i])
+        distance += np.maximum(0, np.maximum(starts2[others] - ends2[i], starts2[i] - ends2[others]))
+        root = find(order[i])
+        for j in np.flatnonzero(distance <= cluster_radius) + i + 1:
+            other_root = find(order[j])
+            if other_root != root:
+                parent[other_root] = root
+    return np.array([find(node) for node in range(0, len(parent))], dtype=parent.dtype)
+
+
 def merge_by_union(input_pairs, group_key, weight_adjustment=10, cluster_radius=200):
     """
     for a given set of breakpoint pairs, merge the union of all pairs that are
     within the given distance (cluster_radius)
     """
-    pairs_by_start = sorted(input_pairs, key=lambda x: x.break1.start)
-    pairs_by_end = sorted(input_pairs, key=lambda x: x.break2.start)
-    edges = {pair_key(p): set() for p in input_pairs}
     pairs_by_key = {}
-
-    for i in range(0, len(input_pairs)):
-        pairs_by_key.setdefault(pair_key(pairs_by_start[i]), []).append(pairs_by_start[i])
-        for ordering in [pairs_by_start, pairs_by_end]:
-            # try all combinations until start distance alone is too far
-            curr = ordering[i]
-            ckey = pair_key(curr)
-            edges.setdefault(ckey, set())
-
-            for j in range(i + 1, len(input_pairs)):
-                other = ordering[j]
-                okey = pair_key(other)
-                distance = abs(Interval.dist(curr.break1, other.break1))
-                if distance > cluster_radius:
-                    break
-                distance += abs(Interval.dist(curr.break2, other.break2))
-                if distance <= cluster_radius:
-                    edges[ckey].add(okey)
-                    edges[okey].add(ckey)
-
-    merged = set()
-    merge_nodes = []
-    for node in edges:
-        if node in merged:
-            continue
-        adj = edges[node] | {node}
-        merged.add(node)
-        unmerged = adj - merged
-        # follow edges to merge all connected nodes until all edges have been visited
-        # extracts the current connected component
-        while unmerged:
-            for other in unmerged:
-                adj.update(edges[other])
-                merged.add(other)
-            unmerged = adj - merged
-        merge_nodes.append(adj)
+    for pair in input_pairs:
+        pairs_by_key.setdefault(pair_key(pair), []).append(pair)
+    keys = list(pairs_by_key)
+    coordinates = np.array([(k[2], k[4], k[3], k[5]) for k in keys], dtype=np.int64).reshape(-1, 4)
+    labels = union_find_components(*coordinates.T, cluster_radius=cluster_radius)
+
+    merge_nodes = {}  # components in order of the first appearance of their members
+    for label, pkey in zip(labels, keys):
+        merge_nodes.setdefault(label, []).extend(pairs_by_key[pkey])
     nodes = {}
-    for node_keys in merge_nodes:
-        pairs = []
-        for pkey in node_keys:
-            pairs.extend(pairs_by_key[pkey])
+    for pairs in merge_nodes.values():
         itvl1 = merge_integer_intervals(*[p.break1 for p in pairs], weight_adjustment=weight_adjustment)
         itvl2 = merge_integer_intervals(*[p.break2 for p in pairs], weight_adjustment=weight_adjustment)
         if group_key.chr1 == group_key.chr2:
@@ -178,7 +283,104 @@ def merge_by_union(input_pairs, group_key, weight_adjustment=10, cluster_radius=
     return nodes
 
 
-def merge_breakpoint_pairs(input_pairs, cluster_radius=200, cluster_initial_size_limit=25, verbose=False):
+def merge_group(group_key, pairs, phase2_pairs, cluster_radius=200, cluster_initial_size_limit=25, explicit_strand=False):
+    """
+    merges the breakpoint pairs for a single group (see :func:`merge_breakpoint_pairs`)
+
+    Args:
+        group_key (BreakpointPairGroupKey): the group the pairs belong to
+        pairs (list of BreakpointPair): the pairs to be merged in the first phase
+        phase2_pairs (list of BreakpointPair): the pairs with breakpoint intervals too large for the first phase
+        cluster_radius (int) maximum distance allowed for a node to merge
+        cluster_initial_size_limit (int): maximum size of breakpoint intervals allowed in the first merging phase
+        explicit_strand (bool): the merged pairs should be stranded
+
+    Returns:
+        dict of list of BreakpointPair by BreakpointPair: mapping of merged breakpoint pairs to the input pairs used in the merge
+    """
+    nodes = merge_by_union(
+        pairs, group_key,
+        weight_adjustment=cluster_initial_size_limit, cluster_radius=cluster_radius)
+
+    # phase 2. Sort all the breakpoint pairs left by size and merge the smaller ones in first
+    # this is be/c we assume that a larger breakpoint interval indicates less certainty in the call
+    phase2_pairs = sorted(
+        phase2_pairs, key=lambda p: (len(p.break1) + len(p.break2), pair_key(p)))
+
+    index = PairCenterIndex(cluster_radius)
+    sums = {}  # running interval sums of the input pairs for each node
+
+    def add_node(new_bpp, pairs, node_sums=None):
+        if new_bpp in nodes or node_sums is None:
+            nodes.setdefault(new_bpp, []).extend(pairs)
+            node_sums = (
+                WeightedIntervalSum(cluster_initial_size_limit).add(*[p.break1 for p in nodes[new_bpp]]),
+                WeightedIntervalSum(cluster_initial_size_limit).add(*[p.break2 for p in nodes[new_bpp]])
+            )
+        else:
+            nodes[new_bpp] = pairs
+        if new_bpp not in index:
+            index.add(new_bpp)
+        sums[new_bpp] = node_sums
+
+    for node, pairs in list(nodes.items()):  # index the nodes from the first phase
+        del nodes[node]
+        add_node(node, pairs)
+
+    for pair in phase2_pairs:
+        merged = False
+
+        for node in index.nearest(pair, cluster_radius):
+            pairs = nodes[node] + [pair]
+            sum1 = sums[node][0].copy().add(pair.break1)
+            sum2 = sums[node][1].copy().add(pair.break2)
+            itvl1 = sum1.interval()
+            itvl2 = sum2.interval()
+            if group_key.chr1 == group_key.chr2:
+                itvl1.end = min(itvl2.end, itvl1.end)
+                itvl2.start = max(itvl2.start, itvl1.start)
+                itvl1.start = min(itvl1.start, itvl1.end)
+                itvl2.end = max(itvl2.end, itvl2.start)
+
+            b1 = Breakpoint(
+                group_key.chr1, itvl1.start, itvl1.end, orient=group_key.orient1, strand=group_key.strand1)
+            b2 = Breakpoint(
+                group_key.chr2, itvl2.start, itvl2.end, orient=group_key.orient2, strand=group_key.strand2)
+
+            new_bpp = BreakpointPair(
+                b1, b2, opposing_strands=group_key.opposing_strands, stranded=explicit_strand)
+            del nodes[node]
+            del sums[node]
+            index.remove(node)
+            add_node(new_bpp, pairs, (sum1, sum2))
+            merged = True
+        if not merged:
+            b1 = Breakpoint(
+                group_key.chr1, pair.break1.start, pair.break1.end,
+                orient=group_key.orient1, strand=group_key.strand1)
+
+            b2 = Breakpoint(
+                group_key.chr2, pair.break2.start, pair.break2.end,
+                orient=group_key.orient2, strand=group_key.strand2)
+
+            new_bpp = BreakpointPair(
+                b1, b2, opposing_strands=group_key.opposing_strands, stranded=explicit_strand)
+            add_node(new_bpp, [pair])
+    return nodes
+
+
+def merge_group_tags(group_key, *pos, **kwargs):
+    """
+    wrapper for :func:`merge_group` for running in a subprocess. Returns the merged pairs with the tags of their
+    input pairs so that the input pairs do not need to be returned from the subprocess
+    """
+    nodes = merge_group(group_key, *pos, **kwargs)
+    return group_key, [(node, [p.data['tag'] for p in pairs]) for node, pairs in nodes.items()]
+
+
+def merge_breakpoint_pairs(
+    input_pairs, cluster_radius=200, cluster_initial_size_limit=25, verbose=False, processes=1, explicit_strand=None
+):
     """
     two-step merging process
 
@@ -192,23 +394,19 @@ def merge_breakpoint_pairs(input_pairs, cluster_radius=200, cluster_initial_size
         input_pairs (list of BreakpointPair): the pairs to be merged
         cluster_radius (int) maximum distance allowed for a node to merge
         cluster_initial_size_limit (int): maximum size of breakpoint intervals allowed in the first merging phase
+        processes (int): number of processes to use in merging the groups. Groups are independent and are
+            merged in parallel when this is greater than 1. The result does not depend on the number of processes
+        explicit_strand (bool): group the pairs by strand. If not given, this is True when any of the input pairs are stranded
 
     Returns:
         dict of list of BreakpointPair by BreakpointPair: mapping of merged breakpoint pairs to the input pairs used in the merge
     """
-    def pair_center_distance(pair1, pair2):
-        d = abs(pair1.break1.center - pair2.break1.center)
-        d += abs(pair1.break2.center - pair2.break2.center)
-        return d
     mapping = {}
     groups = {}  # split the groups by putative pairings
     pair_weight = {}
-    explicit_strand = False
     phase2_groups = {}
-    for pair in input_pairs:
-        if pair.stranded:
-            explicit_strand = True
-            break
+    if explicit_strand is None:
+        explicit_strand = any([pair.stranded for pair in input_pairs])
 
     doubled = 0
     for i, old_pair in enumerate(input_pairs):
@@ -226,63 +424,40 @@ def merge_breakpoint_pairs(input_pairs, cluster_radius=200, cluster_initial_size
                 phase2_groups.setdefault(key, []).append(pair)
             else:
                 groups.setdefault(key, []).append(pair)
+    group_keys = sorted(set(list(groups) + list(phase2_groups)))
+    nodes_by_group = {}
+
+    def group_size(group_key):
+        return len(groups.get(group_key, [])) + len(phase2_groups.get(group_key, []))
+
+    if processes > 1 and len(group_keys) > 1:
+        pairs_by_tag = {}
+        for pair in itertools.chain.from_iterable(list(groups.values()) + list(phase2_groups.values())):
+            pairs_by_tag[pair.data['tag']] = pair
+        # start the largest groups first so that they do not determine the total run time
+        with futures.ProcessPoolExecutor(max_workers=processes) as pool:
+            responses = [
+                pool.submit(
+                    merge_group_tags, group_key, groups.get(group_key, []), phase2_groups.get(group_key, []),
+                    cluster_radius=cluster_radius, cluster_initial_size_limit=cluster_initial_size_limit,
+                    explicit_strand=explicit_strand)
+                for group_key in sorted(group_keys, key=lambda k: (-1 * group_size(k), k))
+            ]
+            for response in futures.as_completed(responses):
+                group_key, nodes = response.result()
+                nodes_by_group[group_key] = {node: [pairs_by_tag[tag] for tag in tags] for node, tags in nodes}
     # now try all pairwise combinations within groups
-    for group_key in sorted(set(list(groups) + list(phase2_groups))):
-        count = len(groups.get(group_key, [])) + len(phase2_groups.get(group_key, []))
+    for group_key in group_keys:
+        count = group_size(group_key)
         if verbose:
             LOG(group_key, 'pairs:', count)
-        nodes = merge_by_union(
-            groups.get(group_key, []), group_key,
-            weight_adjustment=cluster_initial_size_limit, cluster_radius=cluster_radius)
-
-        # phase 2. Sort all the breakpoint pairs left by size and merge the smaller ones in first
-        # this is be/c we assume that a larger breakpoint interval indicates less certainty in the call
-        phase2_pairs = sorted(
-            phase2_groups.get(group_key, []), key=lambda p: (len(p.break1) + len(p.break2), pair_key(p)))
-
-        for pair in phase2_pairs:
-            distances = sorted([(pair_center_distance(pair, node), node) for node in nodes], key=lambda x: x[0])
-            merged = False
-
-            if len(distances) > 0:
-                best = min(distances, key=lambda x: x[0])
-                for dist, node in distances:
-                    if dist > best[0] or dist > cluster_radius:
-                        break
-                    pairs = nodes[node] + [pair]
-
-                    itvl1 = merge_integer_intervals(
-                        *[p.break1 for p in pairs], weight_adjustment=cluster_initial_size_limit)
-                    itvl2 = merge_integer_intervals(
-                        *[p.break2 for p in pairs], weight_adjustment=cluster_initial_size_limit)
-                    if group_key.chr1 == group_key.chr2:
-                        itvl1.end = min(itvl2.end, itvl1.end)
-                        itvl2.start = max(itvl2.start, itvl1.start)
-                        itvl1.start = min(itvl1.start, itvl1.end)
-                        itvl2.end = max(itvl2.end, itvl2.start)
-
-                    b1 = Breakpoint(
-                        group_key.chr1, itvl1.start, itvl1.end, orient=group_key.orient1, strand=group_key.strand1)
-                    b2 = Breakpoint(
-                        group_key.chr2, itvl2.start, itvl2.end, orient=group_key.orient2, strand=group_key.strand2)
-
-                    new_bpp = BreakpointPair(
-                        b1, b2, opposing_strands=group_key.opposing_strands, stranded=explicit_strand)
-                    del nodes[node]
-                    nodes.setdefault(new_bpp, []).extend(pairs)
-                    merged = True
-            if not merged:
-                b1 = Breakpoint(
-                    group_key.chr1, pair.break1.start, pair.break1.end,
-                    orient=group_key.orient1, strand=group_key.strand1)
-
-                b2 = Breakpoint(
-                    group_key.chr2, pair.break2.start, pair.break2.end,
-                    orient=group_key.orient2, strand=group_key.strand2)
-
-                new_bpp = BreakpointPair(
-                    b1, b2, opposing_strands=group_key.opposing_strands, stranded=explicit_strand)
-                nodes.setdefault(new_bpp, []).append(pair)
+        if group_key in nodes_by_group:
+            nodes = nodes_by_group.pop(group_key)
+        else:
+            nodes = merge_group(
+                group_key, groups.get(group_key, []), phase2_groups.get(group_key, []),
+                cluster_radius=cluster_radius, cluster_initial_size_limit=cluster_initial_size_limit,
+                explicit_strand=explicit_strand)
         if verbose:
             LOG('merged', count, 'down to', len(nodes))
         for node, pairs in nodes.items():
@@ -3,16 +3,25 @@ from ..util import WeakMavisNamespace
 
 DEFAULTS = WeakMavisNamespace()
 """
+- :term:`cluster_id_seed`
 - :term:`cluster_initial_size_limit`
+- :term:`cluster_processes`
 - :term:`cluster_radius`
 - :term:`limit_to_chr`
 - :term:`max_files`
 - :term:`max_proximity`
 - :term:`min_clusters_per_file`
+- :term:`split_by_cost`
+- :term:`stream_chunk_size`
 - :term:`uninformative_filter`
 """
 DEFAULTS.add('min_clusters_per_file', 50, defn='the minimum number of breakpoint pairs to output to a file')
 DEFAULTS.add('max_files', 200, defn='The maximum number of files to output from clustering/splitting')
+DEFAULTS.add(
+    'split_by_cost', False,
+    defn='split the clusters into files so that the estimated validation cost (based on the evidence window sizes, '
+    'protocol, interchromosomal events and read density from the bam index) of each file is balanced rather than the '
+    'number of clusters')
 DEFAULTS.add(
     'cluster_initial_size_limit', 25,
     defn='the maximum cumulative size of both breakpoints for breakpoint pairs to be used in the initial clustering '
@@ -20,6 +29,19 @@ DEFAULTS.add(
 DEFAULTS.add(
     'cluster_radius', 100,
     defn='maximum distance allowed between paired breakpoint pairs')
+DEFAULTS.add(
+    'cluster_processes', 1,
+    defn='number of processes used to merge the breakpoint pair groups (chromosome pair, orientation and strand) '
+    'in parallel')
+DEFAULTS.add(
+    'cluster_id_seed', None, cast_type=int, nullable=True,
+    defn='seed used to generate the cluster ids. When given, the cluster ids are reproducible between runs on the '
+    'same input, library and batch id. Otherwise they are randomly generated')
+DEFAULTS.add(
+    'stream_chunk_size', None, cast_type=int, nullable=True,
+    defn='number of input rows to read at a time. When given, the inputs are streamed and the filtered pairs are spilled '
+    'to temporary files on disk by chromosome pair and clustered one chromosome pair at a time. This bounds the memory '
+    'used by clustering to the largest chromosome pair rather than the total input')
 DEFAULTS.add(
     'max_proximity', 5000,
     defn='the maximum distance away from an annotation before the region in considered to be uninformative')
@@ -1,59 +1,372 @@
+import heapq
 import inspect
 import itertools
 import os
+import pickle
+import re
+import shutil
 from shortuuid import uuid
+import tempfile
 import time
 
+import pysam
+
 from .cluster import merge_breakpoint_pairs
 from .constants import DEFAULTS
-from ..constants import COLUMNS
-from ..util import filter_on_overlap, filter_uninformative, generate_complete_stamp, LOG, log_arguments, mkdirp, output_tabbed_file, read_inputs, write_bed_file
+from ..constants import COLUMNS, PROTOCOL, SUBCOMMAND
+from ..interval import Interval
+from ..util import (
+    filter_on_overlap, filter_uninformative, generate_complete_stamp, LOG, log_arguments, mkdirp, output_tabbed_file,
+    read_inputs, read_inputs_in_chunks, resource_usage, SpooledTabbedFile, write_resource_report
+)
+
 
+def estimate_cluster_cost(
+    cluster, window_buffer=1000, protocol=PROTOCOL.GENOME, read_density=None, transcriptome_weight=2, interchromosomal_weight=1.5
+):
+    """
+    Estimates the relative cost of validating a cluster. The cost is proportional to the size of the evidence windows
+    (or the expected number of reads in them when the read density is given) and is increased for transcriptome
+    libraries and interchromosomal events
 
-def split_clusters(clusters, outputdir, batch_id, min_clusters_per_file=0, max_files=1, write_bed_summary=True):
+    Args:
+        cluster (BreakpointPair): the cluster to estimate the cost for
+        window_buffer (int): approximate distance the evidence windows extend beyond the breakpoints
+        protocol (PROTOCOL): the library protocol
+        read_density (dict of float by str): expected number of reads per base by chromosome (see :func:`read_density_from_index`)
+        transcriptome_weight (float): multiplier for transcriptome libraries
+        interchromosomal_weight (float): multiplier for interchromosomal events
+
+    Returns:
+        float: the estimated cost
+    """
+    windows = [
+        (bp.chr, Interval(max(1, bp.start - window_buffer), bp.end + window_buffer))
+        for bp in [cluster.break1, cluster.break2]
+    ]
+    if windows[0][0] == windows[1][0] and Interval.overlaps(windows[0][1], windows[1][1]):
+        windows = [(windows[0][0], Interval.union(windows[0][1], windows[1][1]))]
+    cost = 0
+    for chrom, window in windows:
+        cost += len(window) * (read_density.get(chrom, 0) if read_density else 1)
+    if cluster.interchromosomal:
+        cost *= interchromosomal_weight
+    if protocol == PROTOCOL.TRANS:
+        cost *= transcriptome_weight
+    return cost
+
+
+def read_density_from_index(bam_file):
+    """
+    Uses the bam index statistics to compute the average number of mapped reads per base for each chromosome
+
+    Args:
+        bam_file (str): path to the indexed bam file
+
+    Returns:
+        dict of float by str: the read density by chromosome name (without the chr prefix)
+    """
+    result = {}
+    with pysam.AlignmentFile(bam_file, 'rb') as fh:
+        for stat in fh.get_index_statistics():
+            length = fh.get_reference_length(stat.contig)
+            if length:
+                result[re.sub('^chr', '', stat.contig)] = stat.mapped / length
+    return result
+
+
+class PairPartitions:
+    """
+    Breakpoint pairs spilled to temporary files on disk by partition key so that the pairs can be read back one
+    partition at a time. Pairs are held in memory until :meth:`flush` is called
+    """
+    def __init__(self):
+        self.dirname = tempfile.mkdtemp(prefix='mavis-partitions-')
+        self.counts = {}
+        self._buffer = {}
+        self._filenames = {}
+
+    def add(self, key, pair):
+        self._buffer.setdefault(key, []).append(pair)
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def flush(self):
+        for key, pairs in self._buffer.items():
+            if key not in self._filenames:
+                self._filenames[key] = os.path.join(self.dirname, 'partition-{}.pkl'.format(len(self._filenames)))
+            with open(self._filenames[key], 'ab') as fh:
+                pickle.dump(pairs, fh)
+        self._buffer = {}
+
+    def keys(self):
+        return sorted(self.counts)
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+    def iter_partition(self, key):
+        """
+        Yields the pairs of a partition in the order they were added
+        """
+        self.flush()
+        with open(self._filenames[key], 'rb') as fh:
+            while True:
+                try:
+                    pairs = pickle.load(fh)
+                except EOFError:
+                    break
+                for pair in pairs:
+                    yield pair
+
+    def load(self, key):
+        return list(self.iter_partition(key))
+
+    def close(self):
+        shutil.rmtree(self.dirname, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def cluster_sort_key(cluster):
+    return (cluster.break1.chr, cluster.break1.start, cluster.break2.chr, cluster.break2.start)
+
+
+def split_clusters(
+    clusters, outputdir, batch_id, min_clusters_per_file=0, max_files=1, write_bed_summary=True, cost_func=None
+):
     """
     For a set of clusters creates a bed file representation of all clusters.
     Also splits the clusters evenly into multiple files based on the user parameters (min_clusters_per_file, max_files)
 
+    Args:
+        cost_func (callable): if given, this is used to estimate the validation cost of each cluster (see
+            :func:`estimate_cluster_cost`) and the clusters are split into files with balanced total estimated cost
+            rather than the same number of clusters
+
     Returns:
         list: of output file names (not including the bed file)
     """
-    if write_bed_summary:
-        bedfile = os.path.join(outputdir, 'clusters.bed')
-        write_bed_file(bedfile, itertools.chain.from_iterable([b.get_bed_repesentation() for b in clusters]))
+    clusters = sorted(clusters, key=cluster_sort_key)
+    return split_sorted_clusters(
+        lambda: iter(clusters), len(clusters), outputdir, batch_id,
+        min_clusters_per_file=min_clusters_per_file,
+        max_files=max_files,
+        write_bed_summary=write_bed_summary,
+        cost_func=cost_func
+    )
+
+
+def split_sorted_clusters(
+    iter_clusters, cluster_count, outputdir, batch_id, min_clusters_per_file=0, max_files=1, write_bed_summary=True,
+    cost_func=None
+):
+    """
+    Splits the clusters into files as in :func:`split_clusters` without holding all of the clusters in memory
+
+    Args:
+        iter_clusters (callable): returns a new iterator over the clusters (sorted by :func:`cluster_sort_key`) each
+            time it is called. Called once to write the output files and once more to estimate costs if cost_func is given
+        cluster_count (int): the number of clusters
 
-    number_of_jobs = len(clusters) // min_clusters_per_file
+    Returns:
+        list: of output file names (not including the bed file)
+    """
+    number_of_jobs = cluster_count // min_clusters_per_file
     if number_of_jobs > max_files:
         number_of_jobs = max_files
     elif number_of_jobs == 0:
         number_of_jobs = 1
 
-    jobs = [[] for j in range(0, number_of_jobs)]
-    clusters = sorted(clusters, key=lambda x: (x.break1.chr, x.break1.start, x.break2.chr, x.break2.start))
+    assignment = None
+    if cost_func is not None:
+        # assign the most costly clusters first, each to the file with the lowest current total cost. Ties (ex. clusters
+        # without any estimated cost) go to the file with the fewest clusters
+        costs = [cost_func(cluster) for cluster in iter_clusters()]
+        assignment = [None for i in range(0, cluster_count)]
+        job_costs = [0 for j in range(0, number_of_jobs)]
+        heap = [(0, 0, j) for j in range(0, number_of_jobs)]
+        for i in sorted(range(0, cluster_count), key=lambda i: (-1 * costs[i], i)):
+            job_cost, job_size, j = heapq.heappop(heap)
+            assignment[i] = j
+            job_costs[j] += costs[i]
+            heapq.heappush(heap, (job_cost + costs[i], job_size + 1, j))
+        job_costs = [round(c, 2) for c in job_costs]
+
+    output_files = [os.path.join(outputdir, '{}-{}.tab'.format(batch_id, i + 1)) for i in range(0, number_of_jobs)]
+    jobs = [SpooledTabbedFile(filename) for filename in output_files]
+    bed_fh = None
+    if write_bed_summary:
+        bedfile = os.path.join(outputdir, 'clusters.bed')
+        LOG('writing:', bedfile)
+        bed_fh = open(bedfile, 'w')
+    try:
+        for i, cluster in enumerate(iter_clusters()):
+            # split up consecutive clusters unless they have been assigned by cost
+            jobs[i % len(jobs) if assignment is None else assignment[i]].write(cluster)
+            if bed_fh:
+                for bed in cluster.get_bed_repesentation():
+                    bed_fh.write('\t'.join([str(c) for c in bed]) + '\n')
+    finally:
+        if bed_fh:
+            bed_fh.close()
 
-    # split up consecutive clusters
-    for i, cluster in enumerate(clusters):
-        jobs[i % len(jobs)].append(cluster)
+    assert sum([j.count for j in jobs]) == cluster_count
+    for job in jobs:
+        job.close()
 
-    assert sum([len(j) for j in jobs]) == len(clusters)
-    output_files = []
-    for i, job in enumerate(jobs):
-        # generate an output file
-        filename = os.path.join(outputdir, '{}-{}.tab'.format(batch_id, i + 1))
-        output_files.append(filename)
-        output_tabbed_file(job, filename)
+    if cost_func is not None:
+        LOG('estimated cost per file (min, max):', min(job_costs), max(job_costs))
+        output_tabbed_file(
+            [{'filename': f, 'clusters': j.count, 'estimated_cost': c} for f, j, c in zip(output_files, jobs, job_costs)],
+            os.path.join(outputdir, 'split_cost_estimates.tab')
+        )
     return output_files
 
 
+def filter_pairs(
+    breakpoint_pairs, library, masking, annotations,
+    limit_to_chr=DEFAULTS.limit_to_chr,
+    uninformative_filter=DEFAULTS.uninformative_filter,
+    max_proximity=DEFAULTS.max_proximity
+):
+    """
+    Filters the input breakpoint pairs by library, chromosome name, masking and (optionally) informative-ness
+
+    Returns:
+        tuple: the list of pairs which passed the filters, the list of filtered pairs (with the filter comment set),
+        the set of other library names and the set of other chromosome names
+    """
+    # filter any breakpoint pairs where the library and protocol don't match
+    other_libs = set()
+    other_chr = set()
+    unfiltered_breakpoint_pairs = []
+    filtered_pairs = []
+    LOG('filtering by library and chr name')
+    for bpp in breakpoint_pairs:
+        if bpp.library is None:
+            bpp.library = library
+        if bpp.library != library:
+            other_libs.add(bpp.library)
+            bpp.data[COLUMNS.filter_comment] = 'Not the target library name'
+            filtered_pairs.append(bpp)
+        elif None in limit_to_chr or (bpp.break1.chr in limit_to_chr and bpp.break2.chr in limit_to_chr):
+            unfiltered_breakpoint_pairs.append(bpp)
+        else:
+            other_chr.update({bpp.break1.chr, bpp.break2.chr})
+            bpp.data[COLUMNS.filter_comment] = 'Non standard chromosome name'
+            filtered_pairs.append(bpp)
+    other_chr -= set(limit_to_chr)
+    breakpoint_pairs = unfiltered_breakpoint_pairs
+    # filter by masking file
+    breakpoint_pairs, masked_pairs = filter_on_overlap(breakpoint_pairs, masking.content)
+    for bpp in masked_pairs:
+        filtered_pairs.append(bpp)
+    # filter by informative
+    if uninformative_filter:
+        LOG('filtering from', len(breakpoint_pairs), 'breakpoint pairs using informative filter')
+        pass_clusters, uninformative_clusters = filter_uninformative(annotations.content, breakpoint_pairs, max_proximity=max_proximity)
+        LOG(
+            'filtered from', len(breakpoint_pairs),
+            'down to', len(pass_clusters),
+            '(removed {})'.format(len(uninformative_clusters))
+        )
+        breakpoint_pairs = pass_clusters
+        for bpp in uninformative_clusters:
+            bpp.data[COLUMNS.filter_comment] = 'Uninformative'
+            filtered_pairs.append(bpp)
+    else:
+        LOG('did not apply uninformative filter')
+    return breakpoint_pairs, filtered_pairs, other_libs, other_chr
+
+
+def summarize_clusters(
+    clusters, cluster_id_seed=None, first_index=0, hist=None, length_hist=None, library=None, batch_id=None
+):
+    """
+    Adds the cluster id, size and the data common to the input pairs to each cluster
+
+    Args:
+        clusters (dict of list of BreakpointPair by BreakpointPair): mapping of clusters to their input pairs
+        cluster_id_seed (int): seed for generating reproducible cluster ids
+        library (str): the library being clustered (used in generating reproducible cluster ids)
+        batch_id (str): the batch id (used in generating reproducible cluster ids)
+        first_index (int): index of the first cluster (used in generating reproducible cluster ids)
+        hist (dict of int by int): histogram of the number of input pairs per cluster to be updated
+        length_hist (dict of int by int): histogram of the cluster interval lengths to be updated
+    """
+    hist = {} if hist is None else hist
+    length_hist = {} if length_hist is None else length_hist
+    for cluster_index, cluster in enumerate(clusters, start=first_index):
+        input_pairs = clusters[cluster]
+        hist[len(input_pairs)] = hist.get(len(input_pairs), 0) + 1
+        cluster1 = round(len(cluster[0]), -2)
+        cluster2 = round(len(cluster[1]), -2)
+        length_hist[cluster1] = length_hist.get(cluster1, 0) + 1
+        length_hist[cluster2] = length_hist.get(cluster2, 0) + 1
+        if cluster_id_seed is None:
+            cluster.data[COLUMNS.cluster_id] = str(uuid())
+        else:
+            # the library and batch are included so that ids do not collide between libraries using the same seed
+            cluster.data[COLUMNS.cluster_id] = str(uuid('{}-{}-{}-{}'.format(cluster_id_seed, library, batch_id, cluster_index)))
+        cluster.data[COLUMNS.cluster_size] = len(input_pairs)
+        temp = set()
+        data_items = set()
+        combined_tracking_id = set()  # group the tracking ids
+        for pair in input_pairs:
+            temp.update(pair.data[COLUMNS.tools])
+            data_items.update(pair.data.keys())
+            if COLUMNS.tracking_id in pair.data and pair.tracking_id:
+                combined_tracking_id.update(pair.tracking_id.split(';'))
+        cluster.data[COLUMNS.tools] = ';'.join(sorted(list(temp)))
+        cluster.data[COLUMNS.tracking_id] = ';'.join(sorted(list(combined_tracking_id)))
+
+        data_items -= {COLUMNS.tools, COLUMNS.tracking_id}
+        # retain all data where data is consistent between the input pairs
+        for item in data_items:
+            common_data = [p.data.get(item, None) for p in input_pairs]
+            common_data = set(common_data)
+            if len(common_data) == 1:
+                cluster.data[item] = list(common_data)[0]
+    return hist, length_hist
+
+
+def cluster_assignment_rows(clusters):
+    """
+    map input pairs to cluster ids. Creates the mapping from the original input files to the cluster(s)
+    """
+    rows = {}
+    for cluster, input_pairs in clusters.items():
+        for pair in input_pairs:
+            if pair not in rows:
+                rows[pair] = pair.flatten()
+            rows[pair][COLUMNS.tools].update(pair.data[COLUMNS.tools])
+            rows[pair].setdefault('clusters', set()).add(cluster.data[COLUMNS.cluster_id])
+    for row in rows.values():
+        row['clusters'] = ';'.join([str(c) for c in sorted(list(row['clusters']))])
+        row[COLUMNS.tools] = ';'.join(sorted(list(row[COLUMNS.tools])))
+    return list(rows.values())
+
+
 def main(
     inputs, output, strand_specific, library, protocol, disease_status, masking, annotations,
     limit_to_chr=DEFAULTS.limit_to_chr,
     cluster_initial_size_limit=DEFAULTS.cluster_initial_size_limit,
     cluster_radius=DEFAULTS.cluster_radius,
+    cluster_processes=DEFAULTS.cluster_processes,
+    cluster_id_seed=DEFAULTS.cluster_id_seed,
     uninformative_filter=DEFAULTS.uninformative_filter,
     max_proximity=DEFAULTS.max_proximity,
     min_clusters_per_file=DEFAULTS.min_clusters_per_file,
     max_files=DEFAULTS.max_files,
+    split_by_cost=DEFAULTS.split_by_cost,
+    stream_chunk_size=DEFAULTS.stream_chunk_size,
+    bam_file=None,
+    median_fragment_size=None,
+    stdev_fragment_size=None,
     batch_id=None,
     split_only=False,
     start_time=int(time.time()),
@@ -69,6 +382,8 @@ def main(
         masking (object): see :func:`~mavis.annotate.file_io.load_masking_regions`
         cluster_clique_size (int): the maximum size of cliques to search for using the exact algorithm
         cluster_radius (int): distance (in breakpoint pairs) used in deciding to join bpps in a cluster
+        cluster_processes (int): number of processes used to merge the breakpoint pair groups
+        cluster_id_seed (int): seed for generating reproducible cluster ids (random if not given)
         uninformative_filter (bool): if True then clusters should be filtered out if they are not
           within a specified (max_proximity) distance to any annotation
         max_proximity (int): the maximum distance away an annotation can be before the uninformative_filter
@@ -76,7 +391,14 @@ def main(
         annotations (ReferenceFile): see :func:`~mavis.annotate.file_io.load_reference_genes`
         min_clusters_per_file (int): the minimum number of clusters to output to a file
         max_files (int): the maximum number of files to split clusters into
+        split_by_cost (bool): split the clusters into files by balancing their estimated validation cost
+        stream_chunk_size (int): if given, the inputs are read this many rows at a time and clustered one chromosome
+          pair at a time from temporary files on disk
+        bam_file (str): path to the indexed bam file, used in estimating the cost of the clusters
+        median_fragment_size (int): median insert size, used in estimating the size of the evidence windows
+        stdev_fragment_size (int): insert size standard deviation, used in estimating the size of the evidence windows
     """
+    initial_usage = resource_usage()
     if uninformative_filter:
         annotations.load()
     if masking:
@@ -87,9 +409,7 @@ def main(
     filtered_output = os.path.join(output, 'filtered_pairs.tab')
     cluster_assign_output = os.path.join(output, 'cluster_assignment.tab')
 
-    # load the input files
-    breakpoint_pairs = read_inputs(
-        inputs,
+    read_kwargs = dict(
         cast={COLUMNS.tools: lambda x: set(x.split(';')) if x else set() if not split_only else x},
         add_default={
             COLUMNS.library: library,
@@ -101,50 +421,50 @@ def main(
         },
         expand_strand=False, expand_orient=True, expand_svtype=True
     )
-    # filter any breakpoint pairs where the library and protocol don't match
-    other_libs = set()
-    other_chr = set()
-    unfiltered_breakpoint_pairs = []
-    filtered_pairs = []
-    LOG('filtering by library and chr name')
-    for bpp in breakpoint_pairs:
-        if bpp.library is None:
-            bpp.library = library
-        if bpp.library != library:
-            other_libs.add(bpp.library)
-            bpp.data[COLUMNS.filter_comment] = 'Not the target library name'
-            filtered_pairs.append(bpp)
-        elif None in limit_to_chr or (bpp.break1.chr in limit_to_chr and bpp.break2.chr in limit_to_chr):
-            unfiltered_breakpoint_pairs.append(bpp)
-        else:
-            other_chr.update({bpp.break1.chr, bpp.break2.chr})
-            bpp.data[COLUMNS.filter_comment] = 'Non standard chromosome name'
-            filtered_pairs.append(bpp)
-    other_chr -= set(limit_to_chr)
-    breakpoint_pairs = unfiltered_breakpoint_pairs
+    filter_kwargs = dict(
+        limit_to_chr=limit_to_chr, uninformative_filter=uninformative_filter, max_proximity=max_proximity)
+
+    cost_func = None
+    if split_by_cost:
+        read_density = None
+        if bam_file:
+            LOG('estimating read density from the bam index:', bam_file)
+            read_density = read_density_from_index(bam_file)
+        window_buffer = 1000
+        if median_fragment_size is not None and stdev_fragment_size is not None:
+            window_buffer = median_fragment_size + 3 * stdev_fragment_size
+
+        def _density_cost(cluster):
+            return estimate_cluster_cost(
+                cluster, window_buffer=window_buffer, protocol=protocol, read_density=read_density)
+        cost_func = _density_cost
+
+    split_kwargs = dict(
+        min_clusters_per_file=min_clusters_per_file, max_files=max_files, write_bed_summary=True, cost_func=cost_func)
+
+    if stream_chunk_size:
+        stats = {}
+        output_files = stream_clusters(
+            read_inputs_in_chunks(inputs, stream_chunk_size, **read_kwargs), output, batch_id,
+            library=library, masking=masking, annotations=annotations, filter_kwargs=filter_kwargs,
+            split_kwargs=split_kwargs, cluster_initial_size_limit=cluster_initial_size_limit,
+            cluster_radius=cluster_radius, cluster_processes=cluster_processes,
+            cluster_id_seed=cluster_id_seed, split_only=split_only, stats=stats
+        )
+        write_resource_report(
+            output, SUBCOMMAND.CLUSTER, start_time, items=stats, inputs=inputs, library=library, initial_usage=initial_usage, log=LOG)
+        generate_complete_stamp(output, LOG, start_time=start_time, prefix='MAVIS-{}.'.format(batch_id))
+        return output_files
+
+    # load the input files
+    breakpoint_pairs = read_inputs(inputs, **read_kwargs)
+    stats = {'breakpoint_pairs': len(breakpoint_pairs)}
+    breakpoint_pairs, filtered_pairs, other_libs, other_chr = filter_pairs(
+        breakpoint_pairs, library, masking, annotations, **filter_kwargs)
     if other_libs:
         LOG('warning: ignoring breakpoints found for other libraries:', sorted([l for l in other_libs]))
     if other_chr:
         LOG('warning: filtered events on chromosomes', other_chr)
-    # filter by masking file
-    breakpoint_pairs, masked_pairs = filter_on_overlap(breakpoint_pairs, masking.content)
-    for bpp in masked_pairs:
-        filtered_pairs.append(bpp)
-    # filter by informative
-    if uninformative_filter:
-        LOG('filtering from', len(breakpoint_pairs), 'breakpoint pairs using informative filter')
-        pass_clusters, uninformative_clusters = filter_uninformative(annotations.content, breakpoint_pairs, max_proximity=max_proximity)
-        LOG(
-            'filtered from', len(breakpoint_pairs),
-            'down to', len(pass_clusters),
-            '(removed {})'.format(len(uninformative_clusters))
-        )
-        breakpoint_pairs = pass_clusters
-        for bpp in uninformative_clusters:
-            bpp.data[COLUMNS.filter_comment] = 'Uninformative'
-            filtered_pairs.append(bpp)
-    else:
-        LOG('did not apply uninformative filter')
 
     output_tabbed_file(filtered_pairs, filtered_output)
     mkdirp(output)
@@ -152,64 +472,116 @@ def main(
     if not split_only:
         LOG('computing clusters')
         clusters = merge_breakpoint_pairs(
-            breakpoint_pairs, cluster_radius=cluster_radius, cluster_initial_size_limit=cluster_initial_size_limit)
+            breakpoint_pairs, cluster_radius=cluster_radius, cluster_initial_size_limit=cluster_initial_size_limit,
+            processes=cluster_processes)
 
-        hist = {}
-        length_hist = {}
-        for cluster in clusters:
-            input_pairs = clusters[cluster]
-            hist[len(input_pairs)] = hist.get(len(input_pairs), 0) + 1
-            cluster1 = round(len(cluster[0]), -2)
-            cluster2 = round(len(cluster[1]), -2)
-            length_hist[cluster1] = length_hist.get(cluster1, 0) + 1
-            length_hist[cluster2] = length_hist.get(cluster2, 0) + 1
-            cluster.data[COLUMNS.cluster_id] = str(uuid())
-            cluster.data[COLUMNS.cluster_size] = len(input_pairs)
-            temp = set()
-            data_items = set()
-            combined_tracking_id = set()  # group the tracking ids
-            for pair in input_pairs:
-                temp.update(pair.data[COLUMNS.tools])
-                data_items.update(pair.data.keys())
-                if COLUMNS.tracking_id in pair.data and pair.tracking_id:
-                    combined_tracking_id.update(pair.tracking_id.split(';'))
-            cluster.data[COLUMNS.tools] = ';'.join(sorted(list(temp)))
-            cluster.data[COLUMNS.tracking_id] = ';'.join(sorted(list(combined_tracking_id)))
-
-            data_items -= {COLUMNS.tools, COLUMNS.tracking_id}
-            # retain all data where data is consistent between the input pairs
-            for item in data_items:
-                common_data = [p.data.get(item, None) for p in input_pairs]
-                common_data = set(common_data)
-                if len(common_data) == 1:
-                    cluster.data[item] = list(common_data)[0]
+        hist, length_hist = summarize_clusters(
+            clusters, cluster_id_seed=cluster_id_seed, library=library, batch_id=batch_id)
         LOG('computed', len(clusters), 'clusters', time_stamp=False)
         LOG('cluster input pairs distribution', sorted(hist.items()), time_stamp=False)
         LOG('cluster intervals lengths', sorted(length_hist.items()), time_stamp=False)
-        # map input pairs to cluster ids
-        # now create the mapping from the original input files to the cluster(s)
-
-        rows = {}
-        for cluster, input_pairs in clusters.items():
-            for pair in input_pairs:
-                if pair not in rows:
-                    rows[pair] = pair.flatten()
-                rows[pair][COLUMNS.tools].update(pair.data[COLUMNS.tools])
-                rows[pair].setdefault('clusters', set()).add(cluster.data[COLUMNS.cluster_id])
-        for row in rows.values():
-            row['clusters'] = ';'.join([str(c) for c in sorted(list(row['clusters']))])
-            row[COLUMNS.tools] = ';'.join(sorted(list(row[COLUMNS.tools])))
-        output_tabbed_file(rows.values(), cluster_assign_output)
+        output_tabbed_file(cluster_assignment_rows(clusters), cluster_assign_output)
         breakpoint_pairs = list(clusters.keys())
 
-    output_files = split_clusters(
-        breakpoint_pairs,
-        output,
-        batch_id,
-        min_clusters_per_file=min_clusters_per_file,
-        max_files=max_files,
-        write_bed_summary=True
-    )
+    output_files = split_clusters(breakpoint_pairs, output, batch_id, **split_kwargs)
+    if not split_only:
+        stats['clusters'] = len(breakpoint_pairs)
 
+    write_resource_report(output, SUBCOMMAND.CLUSTER, start_time, items=stats, inputs=inputs, library=library, initial_usage=initial_usage, log=LOG)
     generate_complete_stamp(output, LOG, start_time=start_time, prefix='MAVIS-{}.'.format(batch_id))
     return output_files
+
+
+def stream_clusters(
+    chunks, output, batch_id, library, masking, annotations, filter_kwargs=None, split_kwargs=None,
+    cluster_initial_size_limit=DEFAULTS.cluster_initial_size_limit,
+    cluster_radius=DEFAULTS.cluster_radius,
+    cluster_processes=DEFAULTS.cluster_processes,
+    cluster_id_seed=DEFAULTS.cluster_id_seed,
+    split_only=False,
+    stats=None
+):
+    """
+    Memory-bounded version of the filtering, clustering and splitting steps of :func:`main`. The filtered pairs from
+    each chunk of input are spilled to temporary files on disk by chromosome pair. Since pairs on different chromosome
+    pairs are never merged, the clusters can then be computed one chromosome pair at a time. The clusters are
+    spilled to disk in sorted order and merged back when splitting them into files. The outputs are the same as
+    the non-streaming version except for the order of the rows in the filtered pairs and cluster assignment files
+
+    Args:
+        chunks (iterable): lists of input breakpoint pairs (see :func:`~mavis.util.read_inputs_in_chunks`)
+        stats (dict): updated with the number of breakpoint pairs read and clusters computed
+
+    Returns:
+        list: of output file names (not including the bed file)
+    """
+    filter_kwargs = {} if filter_kwargs is None else filter_kwargs
+    split_kwargs = {} if split_kwargs is None else split_kwargs
+    other_libs = set()
+    other_chr = set()
+    explicit_strand = False
+    input_pairs = 0
+    mkdirp(output)
+
+    with PairPartitions() as partitions, PairPartitions() as cluster_partitions:
+        with SpooledTabbedFile(os.path.join(output, 'filtered_pairs.tab')) as filtered_output:
+            for chunk in chunks:
+                input_pairs += len(chunk)
+                breakpoint_pairs, filtered_pairs, libs, chrs = filter_pairs(
+                    chunk, library, masking, annotations, **filter_kwargs)
+                other_libs.update(libs)
+                other_chr.update(chrs)
+                for bpp in filtered_pairs:
+                    filtered_output.write(bpp)
+                for bpp in breakpoint_pairs:
+                    if bpp.stranded:
+                        explicit_strand = True
+                    partitions.add((bpp.break1.chr, bpp.break2.chr), bpp)
+                partitions.flush()
+        if other_libs:
+            LOG('warning: ignoring breakpoints found for other libraries:', sorted(other_libs))
+        if other_chr:
+            LOG('warning: filtered events on chromosomes', other_chr)
+        LOG('spilled', len(partitions), 'breakpoint pairs to', len(partitions.counts), 'partitions')
+
+        hist = {}
+        length_hist = {}
+        cluster_assign_output = None
+        if not split_only:
+            LOG('computing clusters')
+            cluster_assign_output = SpooledTabbedFile(os.path.join(output, 'cluster_assignment.tab'))
+        for key in partitions.keys():
+            breakpoint_pairs = partitions.load(key)
+            if not split_only:
+                clusters = merge_breakpoint_pairs(
+                    breakpoint_pairs, cluster_radius=cluster_radius,
+                    cluster_initial_size_limit=cluster_initial_size_limit,
+                    processes=cluster_processes, explicit_strand=explicit_strand)
+                summarize_clusters(
+                    clusters, cluster_id_seed=cluster_id_seed, first_index=len(cluster_partitions),
+                    hist=hist, length_hist=length_hist, library=library, batch_id=batch_id)
+                for row in cluster_assignment_rows(clusters):
+                    cluster_assign_output.write(row)
+                breakpoint_pairs = list(clusters.keys())
+            for cluster in sorted(breakpoint_pairs, key=cluster_sort_key):
+                cluster_partitions.add(key, cluster)
+            cluster_partitions.flush()
+        if stats is not None:
+            stats['breakpoint_pairs'] = input_pairs
+            if not split_only:
+                stats['clusters'] = len(cluster_partitions)
+        if not split_only:
+            LOG('computed', len(cluster_partitions), 'clusters', time_stamp=False)
+            LOG('cluster input pairs distribution', sorted(hist.items()), time_stamp=False)
+            LOG('cluster intervals lengths', sorted(length_hist.items()), time_stamp=False)
+            cluster_assign_output.close()
+
+        def iter_clusters():
+            # clusters on different chromosome pairs with the same first chromosome are interleaved when sorted
+            for chr1, keys in itertools.groupby(cluster_partitions.keys(), key=lambda k: k[0]):
+                for cluster in heapq.merge(
+                    *[cluster_partitions.iter_partition(k) for k in keys], key=cluster_sort_key
+                ):
+                    yield cluster
+
+        return split_sorted_clusters(iter_clusters, len(cluster_partitions), output, batch_id, **split_kwargs)
@@ -8,9 +8,10 @@ import os
 from Bio.Alphabet import Gapped
 from Bio.Alphabet.IUPAC import ambiguous_dna
 from Bio.Data.IUPACData import ambiguous_dna_values
-from Bio.Seq import Seq
 from tab import cast_boolean, cast_null
 
+from .sequence import reverse_complement, translate  # noqa: F401 (re-exported for backwards compatibility)
+
 
 PROGNAME = 'mavis'
 EXIT_OK = 0
@@ -439,52 +440,6 @@ CODON_SIZE = 3
 """:class:`int`: the number of bases making up a codon"""
 
 
-def reverse_complement(s):
-    """
-    wrapper for the Bio.Seq reverse_complement method
-
-    Args:
-        s (str): the input DNA sequence
-
-    Returns:
-        :class:`str`: the reverse complement of the input sequence
-
-    Warning:
-        assumes the input is a DNA sequence
-
-    Example:
-        >>> reverse_complement('ATCCGGT')
-        'ACCGGAT'
-    """
-    input_string = str(s)
-    if not re.match('^[A-Za-z]*$', input_string):
-        raise ValueError('unexpected sequence format. cannot reverse complement', input_string)
-    input_string = Seq(input_string, DNA_ALPHABET)
-    return str(input_string.reverse_complement())
-
-
-def translate(s, reading_frame=0):
-    """
-    given a DNA sequence, translates it and returns the protein amino acid sequence
-
-    Args:
-        s (str): the input DNA sequence
-        reading_frame (int): where to start translating the sequence
-
-    Returns:
-        str: the amino acid sequence
-    """
-    reading_frame = reading_frame % CODON_SIZE
-
-    temp = s[reading_frame:]
-    if len(temp) % 3 == 1:
-        temp = temp[:-1]
-    elif len(temp) % 3 == 2:
-        temp = temp[:-2]
-    temp = Seq(temp, DNA_ALPHABET)
-    return str(temp.translate())
-
-
 GAP = '-'
 
 ORIENT = MavisNamespace(LEFT='L', RIGHT='R', NS='?')
@@ -1,3 +1,4 @@
+import bisect
 
 
 class Interval:
@@ -437,6 +438,8 @@ class IntervalMapping:
                 raise ValueError('cannot defined an opposing direction for an interval that in not mapped', i)
         for i in self.mapping:
             self.opposing_directions.setdefault(i, False)
+        self._sources = None
+        self._source_starts = None
 
     def keys(self):
         return self.mapping.keys()
@@ -447,11 +450,37 @@ class IntervalMapping:
     def add(self, src_interval, tgt_interval, opposing_directions=True):
         src_interval = Interval(src_interval[0], src_interval[1])
         tgt_interval = Interval(tgt_interval[0], tgt_interval[1])
-        for curr in self.mapping:
-            if Interval.overlaps(curr, src_interval):
-                raise ValueError('source intervals in mapping must not overlap')
+        sources, starts = self._sorted_sources()
+        index = bisect.bisect_right(starts, src_interval.end)
+        if index > 0 and Interval.overlaps(sources[index - 1], src_interval):
+            raise ValueError('source intervals in mapping must not overlap')
         self.mapping[src_interval] = tgt_interval
         self.opposing_directions[src_interval] = opposing_directions
+        self._sources = None
+
+    def _sorted_sources(self):
+        """
+        Returns:
+            tuple of list and list: the source intervals sorted by start and their start positions
+        """
+        if self._sources is None:
+            self._sources = sorted(self.mapping)
+            self._source_starts = [src_interval.start for src_interval in self._sources]
+        return self._sources, self._source_starts
+
+    def _find_source(self, pos):
+        """
+        Returns:
+            Interval: the source interval containing the input position
+
+        Raises:
+            IndexError: if the input position is not in any of the mapped intervals
+        """
+        sources, starts = self._sorted_sources()
+        index = bisect.bisect_right(starts, pos) - 1
+        if index < 0 or pos > sources[index].end:
+            raise IndexError(pos, 'position not found in mapping', self.mapping.keys())
+        return sources[index]
 
     def convert_ratioed_pos(self, pos):
         """ convert any given position given a mapping of intervals to another range
@@ -474,18 +503,17 @@ class IntervalMapping:
             >>> mapping.convert_pos(15)
             559
         """
-        for src_interval, tgt_interval in self.mapping.items():
-            if pos in src_interval:
-                if src_interval.length() > 0:
-                    ratio = tgt_interval.length() / src_interval.length()
-                    shift = (pos - src_interval.start) * ratio
-                    if self.opposing_directions[src_interval]:
-                        return Interval(tgt_interval.end - shift - ratio, tgt_interval.end - shift)
-                    else:
-                        return Interval(tgt_interval.start + shift, tgt_interval.start + shift + ratio)
-                else:
-                    return tgt_interval
-        raise IndexError(pos, 'position not found in mapping', self.mapping.keys())
+        src_interval = self._find_source(pos)
+        tgt_interval = self.mapping[src_interval]
+        if src_interval.length() > 0:
+            ratio = tgt_interval.length() / src_interval.length()
+            shift = (pos - src_interval.start) * ratio
+            if self.opposing_directions[src_interval]:
+                return Interval(tgt_interval.end - shift - ratio, tgt_interval.end - shift)
+            else:
+                return Interval(tgt_interval.start + shift, tgt_interval.start + shift + ratio)
+        else:
+            return tgt_interval
 
     def convert_pos(self, pos):
         """ convert any given position given a mapping of intervals to another range
@@ -508,15 +536,14 @@ class IntervalMapping:
             >>> mapping.convert_pos(15)
             559
         """
-        for src_interval, tgt_interval in self.mapping.items():
-            if pos in src_interval:
-                if src_interval.length() > 0:
-                    ratio = tgt_interval.length() / src_interval.length()
-                    shift = (pos - src_interval.start) * ratio
-                    if self.opposing_directions[src_interval]:
-                        return int(round(tgt_interval.end - shift, 0))
-                    else:
-                        return int(round(tgt_interval.start + shift, 0))
-                else:
-                    return int(round(tgt_interval.start, 0))
-        raise IndexError(pos, 'position not found in mapping', self.mapping.keys())
+        src_interval = self._find_source(pos)
+        tgt_interval = self.mapping[src_interval]
+        if src_interval.length() > 0:
+            ratio = tgt_interval.length() / src_interval.length()
+            shift = (pos - src_interval.start) * ratio
+            if self.opposing_directions[src_interval]:
+                return int(round(tgt_interval.end - shift, 0))
+            else:
+                return int(round(tgt_interval.start + shift, 0))
+        else:
+            return int(round(tgt_interval.start, 0))
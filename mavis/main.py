@@ -22,6 +22,7 @@ from .illustrate.diagram import draw_multi_transcript_overlay
 from .illustrate.scatter import bam_to_scatter
 from .pairing.constants import DEFAULTS as PAIRING_DEFAULTS
 from .pairing import main as pairing_main
+from .profiling import CommandProfiler
 from .summary.constants import DEFAULTS as SUMMARY_DEFAULTS
 from .summary import main as summary_main
 from .tools import convert_tool_output, SUPPORTED_TOOL
@@ -31,6 +32,9 @@ from .validate import main as validate_main
 from .schedule import pipeline as _pipeline
 
 
+PROFILE_ARGS = ['profile', 'profile_memory', 'profile_top']
+
+
 def check_overlay_args(args, parser):
     """
     parse the overlay options and check the formatting
@@ -220,12 +224,17 @@ def main(argv=None):
 
     for command in set(SUBCOMMAND.values()) - {SUBCOMMAND.CONFIG, SUBCOMMAND.CONVERT}:
         required[command].add_argument('-o', '--output', help='path to the output directory', required=True)
+        _config.augment_parser(PROFILE_ARGS, optional[command])
 
     # pipeline
     _config.augment_parser(['config'], required[SUBCOMMAND.SETUP])
     optional[SUBCOMMAND.SETUP].add_argument(
         '--skip_stage', choices=[SUBCOMMAND.CLUSTER, SUBCOMMAND.VALIDATE], action='append', default=[],
         help='Use flag once per stage to skip. Can skip clustering or validation or both')
+    optional[SUBCOMMAND.SETUP].add_argument(
+        '--plan', type=tab.cast_boolean, default=False,
+        help='set up and submit the jobs which follow the (completed) clustering jobs of a pipeline set up with '
+        'scheduled_clustering. This is run by the plan job')
 
     # schedule arguments
     optional[SUBCOMMAND.SCHEDULE].add_argument('--submit', action='store_true', default=False, help='submit jobs to the the scheduler specified')
@@ -240,6 +249,7 @@ def main(argv=None):
         ['library', 'protocol', 'strand_specific', 'disease_status'],
         required[SUBCOMMAND.CLUSTER])
     _config.augment_parser(list(CLUSTER_DEFAULTS.keys()) + ['masking', 'annotations'], optional[SUBCOMMAND.CLUSTER])
+    _config.augment_parser(['bam_file', 'median_fragment_size', 'stdev_fragment_size'], optional[SUBCOMMAND.CLUSTER])
     optional[SUBCOMMAND.CLUSTER].add_argument('--batch_id', help='batch id to use for prefix of split files', type=_config.nameable_string)
     optional[SUBCOMMAND.CLUSTER].add_argument('--split_only', help='Cluster the files or simply split them without clustering', type=tab.cast_boolean)
 
@@ -253,6 +263,10 @@ def main(argv=None):
     )
     _config.augment_parser(VALIDATION_DEFAULTS.keys(), optional[SUBCOMMAND.VALIDATE])
     _config.augment_parser(['masking', 'annotations'], optional[SUBCOMMAND.VALIDATE])
+    optional[SUBCOMMAND.VALIDATE].add_argument(
+        '--work_queue', metavar='DIRPATH',
+        help='claim the input files one at a time from this work queue (shared with the other validation jobs of the '
+        'library) and write the results of each to the output directory given by the queue')
 
     # annotate
     _config.augment_parser(
@@ -309,9 +323,14 @@ def main(argv=None):
     _util.LOG('hostname:', platform.node(), time_stamp=False)
     _util.log_arguments(args)
     rfile_args = args
+    profiler = None
+    if args.get('profile', False):
+        profiler = CommandProfiler(args.output, args.command, memory=args.profile_memory, top=args.profile_top)
 
+    plan = args.get('plan', False)
     if args.command == SUBCOMMAND.SETUP:  # load the configuration file
         config = _config.MavisConfig.read(args.config)
+        config.config_file = os.path.abspath(args.config)
         config.output = args.output
         config.skip_stage = args.skip_stage
         config.command = SUBCOMMAND.SETUP
@@ -361,12 +380,17 @@ def main(argv=None):
     log_to_file = args.get('log', None)
 
     # discard any arguments needed for redirect/setup only
-    for init_arg in ['command', 'log', 'log_level']:
+    for init_arg in ['command', 'log', 'log_level'] + PROFILE_ARGS:
         args.discard(init_arg)
 
     try:
+        if profiler:
+            _util.LOG('profiling:', command, '(with memory allocations)' if profiler.memory else '', time_stamp=True)
+            profiler.start()
         if command == SUBCOMMAND.CLUSTER:
             ret_val = cluster_main.main(**args, start_time=start_time)
+        elif command == SUBCOMMAND.VALIDATE and args.get('work_queue', None):
+            validate_main.queue_main(**args, start_time=start_time)
         elif command == SUBCOMMAND.VALIDATE:
             validate_main.main(**args, start_time=start_time)
         elif command == SUBCOMMAND.ANNOTATE:
@@ -384,14 +408,28 @@ def main(argv=None):
         elif command == SUBCOMMAND.SCHEDULE:
             build_file = os.path.join(args.output, 'build.cfg')
             args.discard('output')
-            pipeline = _pipeline.Pipeline.read_build_file(build_file)
-            try:
-                code = pipeline.check_status(log=_util.LOG, **args)
-            finally:
-                _util.LOG('rewriting:', build_file)
-                pipeline.write_build_file(build_file)
+            # otherwise the jobs added by the plan job in the meantime could be overwritten
+            with _pipeline.build_file_lock(build_file):
+                pipeline = _pipeline.Pipeline.read_build_file(build_file)
+                try:
+                    code = pipeline.check_status(log=_util.LOG, **args)
+                finally:
+                    _util.LOG('rewriting:', build_file)
+                    pipeline.write_build_file(build_file)
             if code != EXIT_OK:
                 sys.exit(code)  # EXIT
+        elif plan:  # PIPELINE (after the scheduled clustering)
+            config.reference = rfile_args
+            build_file = os.path.join(config.output, 'build.cfg')
+            with _pipeline.build_file_lock(build_file):
+                pipeline = _pipeline.Pipeline.read_build_file(build_file)
+                if not pipeline.pairing:  # otherwise a previous plan job already set up the jobs
+                    pipeline.add_stage_jobs(config)
+                try:
+                    pipeline.check_status(submit=True, log=_util.LOG)
+                finally:
+                    _util.LOG('rewriting:', build_file)
+                    pipeline.write_build_file(build_file)
         else:  # PIPELINE
             config.reference = rfile_args
             pipeline = _pipeline.Pipeline.build(config)
@@ -413,6 +451,8 @@ def main(argv=None):
             logging.exception(err)  # capture the error in the logging output file
         raise err
     finally:
+        if profiler:
+            profiler.stop()
         for handler in logging.root.handlers:
             logging.root.removeHandler(handler)
         for handler in original_logging_handlers:
@@ -5,8 +5,8 @@ import time
 from .pairing import inferred_equivalent, product_key, pair_by_distance
 from .constants import DEFAULTS
 from ..annotate.constants import SPLICE_TYPE
-from ..constants import CALL_METHOD, COLUMNS, PROTOCOL, SVTYPE
-from ..util import generate_complete_stamp, LOG, output_tabbed_file, read_inputs
+from ..constants import CALL_METHOD, COLUMNS, PROTOCOL, SUBCOMMAND, SVTYPE
+from ..util import generate_complete_stamp, LOG, output_tabbed_file, read_inputs, resource_usage, write_resource_report
 
 
 def main(
@@ -26,6 +26,7 @@ def main(
         split_call_distance (int): pairing distance for pairing with an event called by :term:`split read`
         contig_call_distance (int): pairing distance for pairing with an event called by contig or :term:`spanning read`
     """
+    initial_usage = resource_usage()
     annotations.load()
     # load the file
     distances = {
@@ -133,3 +134,8 @@ def main(
         'mavis_paired_{}.tab'.format('_'.join(sorted(list(libraries))))
     )
     output_tabbed_file(bpps, fname)
+    write_resource_report(output, SUBCOMMAND.PAIR, start_time, items={
+        'breakpoint_pairs': len(bpps),
+        'distance_pairings': sum([len(pkeys) for pkeys in distance_pairings.values()]) // 2,
+        'inferred_pairings': sum([len(pkeys) for pkeys in product_pairings.values()]) // 2
+    }, inputs=inputs, initial_usage=initial_usage, log=LOG)
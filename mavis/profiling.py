@@ -0,0 +1,74 @@
+"""
+Profiling for the mavis subcommands (see :term:`profile`)
+"""
+import cProfile
+import io
+import os
+import pstats
+import tracemalloc
+
+from .util import LOG, mkdirp
+
+
+class CommandProfiler:
+    """
+    Profiles a subcommand with cProfile and (optionally) tracemalloc. On stop the raw profile is written as a pstats
+    file and a text report of the top functions (and allocation sites) is written alongside it in the output directory
+
+    Note:
+        cProfile only profiles the thread it was started on. Work done on other threads (for example aligning contigs
+        in batches during validation) is only seen as time spent waiting on that work
+    """
+
+    def __init__(self, output, command, memory=False, top=40):
+        """
+        Args:
+            output (str): path to the output directory
+            command (SUBCOMMAND): the subcommand being profiled (used in naming the output files)
+            memory (bool): also trace memory allocations
+            top (int): the number of functions/allocation sites to include in the report
+        """
+        self.output = output
+        self.memory = memory
+        self.top = top
+        self.pstats_file = os.path.join(output, 'profile.{}.pstats'.format(command))
+        self.report_file = os.path.join(output, 'profile.{}.txt'.format(command))
+        self.profiler = None
+
+    def start(self):
+        if self.memory:
+            tracemalloc.start()
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def stop(self):
+        """
+        stop profiling and write the pstats file and report
+
+        Returns:
+            str: the path to the report file
+        """
+        self.profiler.disable()
+        snapshot = None
+        peak_memory = None
+        if self.memory:
+            snapshot = tracemalloc.take_snapshot()
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        mkdirp(self.output)
+        LOG('writing:', self.pstats_file, time_stamp=True)
+        self.profiler.dump_stats(self.pstats_file)
+        LOG('writing:', self.report_file, time_stamp=True)
+        with open(self.report_file, 'w') as fh:
+            for sort_key, label in [('cumulative', 'cumulative'), ('tottime', 'internal')]:
+                fh.write('top {} functions by {} time\n'.format(self.top, label))
+                stream = io.StringIO()
+                stats = pstats.Stats(self.profiler, stream=stream)
+                stats.sort_stats(sort_key).print_stats(self.top)
+                fh.write(stream.getvalue())
+            if snapshot is not None:
+                fh.write('peak traced memory (MB): {:.1f}\n\n'.format(peak_memory / 2 ** 20))
+                fh.write('top {} allocation sites by size\n'.format(self.top))
+                for stat in snapshot.statistics('lineno')[:self.top]:
+                    fh.write('{}\n'.format(stat))
+        return self.report_file
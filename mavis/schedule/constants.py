@@ -53,29 +53,73 @@ OPTIONS = WeakMavisNamespace(__name__='~mavis.schedule.constants.options')
 """:class:`~mavis.constants.MavisNamespace`: submission options
 
 - :term:`annotation_memory`
+- :term:`cluster_memory`
 - :term:`concurrency_limit`
 - :term:`import_env`
+- :term:`local_measure_memory`
+- :term:`local_memory_limit`
+- :term:`local_warm_workers`
 - :term:`mail_type`
 - :term:`mail_user`
 - :term:`memory_limit`
+- :term:`profile`
+- :term:`profile_memory`
+- :term:`profile_top`
 - :term:`queue`
 - :term:`remote_head_ssh`
+- :term:`scheduled_clustering`
 - :term:`scheduler`
 - :term:`time_limit`
 - :term:`trans_validation_memory`
 - :term:`validation_memory`
+- :term:`validation_queue_timeout`
+- :term:`validation_queue_workers`
 
 """
 OPTIONS.add('annotation_memory', 12000, defn='default memory limit (MB) for the annotation stage')
+OPTIONS.add('cluster_memory', 16000, defn='default memory limit (MB) for the cluster stage (see scheduled_clustering)')
 OPTIONS.add('import_env', True, defn='flag to import environment variables')
+OPTIONS.add(
+    'local_measure_memory', False,
+    defn='for a local run, also count the measured memory of the worker processes against the local_memory_limit')
+OPTIONS.add(
+    'local_memory_limit', None, nullable=True, cast_type=int,
+    defn='the total memory (MB) the jobs of a local run may claim at any one time. Jobs are started when their '
+    'memory_limit fits. Defaults to the memory available on the node')
+OPTIONS.add(
+    'local_warm_workers', False,
+    defn='for a local run, load the reference files of all jobs before starting the worker processes and keep them '
+    'loaded in every worker so that jobs do not re-load them')
 OPTIONS.add('mail_type', MAIL_TYPE.NONE, cast_type=MAIL_TYPE, defn='When to notify the mail_user (if given)')
 OPTIONS.add('mail_user', '', defn='User(s) to send notifications to')
 OPTIONS.add('memory_limit', 16000, defn='the maximum number of megabytes (MB) any given job is allowed')  # 16 GB
+OPTIONS.add(
+    'profile', False,
+    defn='profile the mavis commands (cProfile) and write the stats and a report of the top functions to their output '
+    'directories')
+OPTIONS.add(
+    'profile_memory', False,
+    defn='also trace memory allocations (tracemalloc) when profiling. Note: this slows the commands down considerably')
+OPTIONS.add('profile_top', 40, defn='the number of functions/allocation sites to list in the profiling reports')
 OPTIONS.add('queue', '', cast_type=str, defn='the queue jobs are to be submitted to')
+OPTIONS.add(
+    'scheduled_clustering', False,
+    defn='run the clustering of each library as its own job instead of during setup. A dependent plan job sets up the '
+    'validation and annotation jobs once the clustering has completed. For a local run the libraries are clustered '
+    'concurrently during setup')
 OPTIONS.add('scheduler', SCHEDULER.SLURM, defn='The scheduler being used', cast_type=SCHEDULER)
 OPTIONS.add('time_limit', 16 * 60 * 60, defn='the time in seconds any given jobs is allowed')  # 16 hours
 OPTIONS.add('trans_validation_memory', 18000, defn='default memory limit (MB) for the validation stage (for transcriptomes)')
 OPTIONS.add('validation_memory', 16000, defn='default memory limit (MB) for the validation stage')
+OPTIONS.add(
+    'validation_queue_timeout', 600, cast_type=int,
+    defn='the time (s) after which a clustered file claimed from the validation work queue is considered abandoned (its '
+    'worker has stopped sending heartbeats) and may be claimed by another worker')
+OPTIONS.add(
+    'validation_queue_workers', None, nullable=True, cast_type=int,
+    defn='the number of validation jobs (or array tasks) per library which claim the clustered files from a shared work '
+    'queue. When not given, or not fewer than the number of clustered files, each clustered file is validated by its '
+    'own job (or array task)')
 OPTIONS.add(
     'concurrency_limit',
     None,
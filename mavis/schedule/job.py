@@ -63,6 +63,7 @@ class Job:
         created_at=None,
         status=JOB_STATUS.NOT_SUBMITTED,
         status_comment='',
+        work_queue=None,
         **options
     ):
         """
@@ -77,6 +78,7 @@ class Job:
             created_at (int): the time stamp for when the job was created (created != submitted)
             status (~mavis.schedule.constants.JOB_STATUS): The current (since last checked) status of the job
             status_comment (str): the comment which describes the status, generally this is used for reporting errors from the log file or failed dependencies (SLURM)
+            work_queue (str): path to the work queue the job claims its inputs from (see :class:`~mavis.work_queue.WorkQueue`)
             options (**dict): override default options specified by OPTIONS
         """
         self.stage = SUBCOMMAND.enforce(stage)
@@ -91,6 +93,7 @@ class Job:
         self.created_at = int(created_at if created_at else time.time())
         self.status = status
         self.status_comment = status_comment
+        self.work_queue = work_queue
 
         # inputs to the function call should override the default values
         for option, value in [(o, OPTIONS[o]) for o in STD_OPTIONS]:
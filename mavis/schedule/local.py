@@ -4,11 +4,18 @@ from datetime import datetime
 import logging
 import multiprocessing
 import os
+import shutil
+import tempfile
+import threading
 
 import shortuuid
 
+from ..align import (
+    record_aligner_servers, recorded_aligner_servers, remove_unused_bwa_indices, stop_recorded_aligner_servers)
+from ..config import NullableType
 from ..util import LOG
 from ..annotate.file_io import REFERENCE_DEFAULTS, ReferenceFile
+from ..validate.constants import STATS_SUMMARY_FILENAME
 
 from .job import Job
 from .scheduler import Scheduler
@@ -33,6 +40,22 @@ class LocalJob(Job):
             setattr(self, filetype, kwargs.pop(filetype, None))
         Job.__init__(self, *pos, **kwargs)
 
+    def reference_files(self):
+        """
+        Returns:
+            :class:`list` of :class:`tuple` of :class:`str` and :class:`tuple`: the file type and paths of the reference
+            files this job uses (not including the aligner reference)
+        """
+        references = []
+        for filetype in [f for f in REFERENCE_DEFAULTS.keys() if f != 'aligner_reference']:
+            paths = getattr(self, filetype)
+            if not paths:
+                continue
+            if isinstance(paths, str):  # multiple files are newline delimited when read from the build file
+                paths = [path.strip() for path in paths.split('\n') if path.strip()]
+            references.append((filetype, tuple(paths)))
+        return references
+
     def check_complete(self):
         """
         check that the complete stamp associated with this job exists
@@ -45,74 +68,314 @@ class LocalJob(Job):
         return {k: v for k, v in result.items() if k not in omit}
 
 
+def load_references(references):
+    """
+    load reference files into the :class:`~mavis.annotate.file_io.ReferenceFile` cache of the current process
+
+    Args:
+        references (list of tuple of str and tuple): the file type and paths of each reference file
+    """
+    for filetype, paths in references:
+        ReferenceFile(filetype, *paths).load(verbose=False)
+
+
+def run_job(func, args, aligner_servers=None):
+    """
+    run a job in a worker process
+
+    Args:
+        aligner_servers (str): directory to record the aligner servers started by the job in (see :func:`~mavis.align.record_aligner_servers`)
+    """
+    record_aligner_servers(aligner_servers)
+    return func(args)
+
+
+def run_warm(func, args, references, aligner_servers=None):
+    """
+    run a job in a warm worker process. The reference files are only loaded by the first job a worker runs (or not at
+    all if they were inherited from the parent process) and are re-used from the cache by every job after it
+    """
+    load_references(references)
+    return run_job(func, args, aligner_servers=aligner_servers)
+
+
 def write_stamp_callback(response):
-    if response.exception() or response.cancelled() or response.running():
-        return
     try:
+        if response.exception() or response.cancelled() or response.running():
+            return
         LOG('writing:', response.complete_stamp, time_stamp=True, indent_level=1)
         with open(response.complete_stamp, 'w') as fh:
             fh.write('end: {}\n'.format(int(datetime.timestamp(datetime.utcnow()))))
+            summary_file = os.path.join(os.path.dirname(response.complete_stamp), STATS_SUMMARY_FILENAME)
+            if os.path.exists(summary_file):
+                with open(summary_file, 'r') as summary_fh:
+                    fh.write(summary_fh.read())
+    except futures.CancelledError:
+        pass
     except Exception as err:
         LOG('error writing the complete stamp', level=logging.CRITICAL, indent_level=1)
         raise err
+    finally:
+        if hasattr(response, 'stamp_written'):
+            response.stamp_written.set()
+
+
+def available_memory():
+    """
+    Returns:
+        int: the memory (MB) currently available on this node. Falls back to the total physical memory where the
+        available memory cannot be read
+    """
+    try:
+        with open('/proc/meminfo', 'r') as fh:
+            for line in fh:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // 2 ** 20
+
+
+def process_rss(pid):
+    """
+    Returns:
+        int: the current resident set size (MB) of the process or 0 if it cannot be read
+    """
+    try:
+        with open('/proc/{}/statm'.format(pid), 'r') as fh:
+            return int(fh.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 2 ** 20
+    except (OSError, ValueError, IndexError):
+        return 0
 
 
 class LocalScheduler(Scheduler):
     """
     Scheduler class for dealing with running mavis locally
+
+    Jobs are started when their dependencies have completed and their :term:`memory_limit` fits in the memory which
+    has not already been claimed by the running jobs. Jobs waiting on memory are started largest first
     """
     NAME = SCHEDULER.LOCAL
     """:attr:`~mavis.schedule.constants.SCHEDULER`: the type of scheduler"""
 
-    def __init__(self, *pos, **kwargs):
+    def __init__(self, *pos, memory_limit=None, measure_memory=False, warm_workers=False, **kwargs):
+        """
+        Args:
+            memory_limit (int): the total memory (MB) the running jobs may claim. Defaults to the memory available on this node
+            measure_memory (bool): also count the measured memory of the worker processes against the memory limit
+            warm_workers (bool): keep the reference files of all preloaded jobs (see :meth:`preload`) loaded in every worker process
+        """
         Scheduler.__init__(self, *pos, **kwargs)
-        self.concurrency_limit = multiprocessing.cpu_count() - 1 if not self.concurrency_limit else self.concurrency_limit
+        self.concurrency_limit = max(1, multiprocessing.cpu_count() - 1) if not self.concurrency_limit else self.concurrency_limit
+        self.memory_limit = NullableType(int)(memory_limit)
+        self.memory_budget = self.memory_limit if self.memory_limit else available_memory()
+        self.measure_memory = measure_memory
+        self.warm_workers = warm_workers
+        self.references = []  # reference files to keep loaded in the worker processes
         self.pool = None  # set this at the first submission
+        self.aligner_servers = None  # directory the aligner servers started by the worker processes are recorded in
         self.submitted = {}  # submitted jobs process response objects by job ID
+        self.held = {}  # submitted jobs waiting on their dependencies to complete by job ID
+        self.queued = {}  # submitted jobs waiting on memory or a free worker by job ID
         atexit.register(self.close)  # makes the pool 'auto close' on normal python exit
 
+    def _dependency_status(self, dependency):
+        """
+        Args:
+            dependency (LocalJob): the job to check
+
+        Returns:
+            JOB_STATUS: the current status of the dependency
+        """
+        if dependency.job_ident and os.path.exists(dependency.complete_stamp()):
+            return JOB_STATUS.COMPLETED
+        if dependency.job_ident in self.submitted:
+            dependency = self.submitted[dependency.job_ident]
+            self.update_info(dependency)
+            return dependency.status
+        return JOB_STATUS.NOT_SUBMITTED
+
     def submit(self, job):
         """
-        Add a job to the pool
+        Add a job to the pool. Jobs with dependencies which have not yet completed are held and queued as their
+        dependencies complete (see :meth:`wait`). Jobs with dependencies which have not been submitted or
+        have failed are not submitted. Queued jobs are added to the pool when there is memory for them
 
         Args:
             job (LocalJob): the job to be submitted
         """
-        if self.pool is None:
-            self.pool = futures.ProcessPoolExecutor(max_workers=self.concurrency_limit)
-        if not job.job_ident:
-            job.job_ident = str(shortuuid.uuid())
-            job.status = JOB_STATUS.SUBMITTED
-        args = [arg.format(job_ident=job.job_ident, name=job.name) for arg in job.args]
         # if this job exists in the pool, return its response object
         if job.job_ident in self.submitted:
             return self.submitted[job.job_ident]
+        dependency_states = {self._dependency_status(dep) for dep in job.dependencies}
+        if dependency_states - {JOB_STATUS.COMPLETED, JOB_STATUS.PENDING, JOB_STATUS.RUNNING}:
+            LOG('not submitting', job.name, '(dependencies not complete)', indent_level=1)
+            return job
+        if not job.job_ident:
+            job.job_ident = str(shortuuid.uuid())
+            job.status = JOB_STATUS.SUBMITTED
 
         # load any reference files not cached into the parent memory space
-        for filetype in [f for f in REFERENCE_DEFAULTS.keys() if f != 'aligner_reference']:
-            if getattr(job, filetype) is not None:
-                ref = ReferenceFile(filetype, getattr(job, filetype))
-                ref.load(verbose=False)
-        # otherwise add it to the pool
-        job.response = self.pool.submit(job.func, args)  # no arguments, defined all in the job object
-        setattr(job.response, 'complete_stamp', job.complete_stamp())
-        job.response.add_done_callback(write_stamp_callback)
+        load_references(job.reference_files())
         self.submitted[job.job_ident] = job
         job.rank = len(self.submitted)
-        LOG('submitted', job.name, indent_level=1)
+        if dependency_states - {JOB_STATUS.COMPLETED}:
+            self.held[job.job_ident] = job
+            LOG('submitted', job.name, '(held until dependencies complete)', indent_level=1)
+        else:
+            self.queued[job.job_ident] = job
+            LOG('submitted', job.name, indent_level=1)
+            self._start_queued()
         return job
 
-    def wait(self):
+    def preload(self, jobs):
+        """
+        load the reference files of the given jobs into the parent process before the worker processes are started.
+        Worker processes started by forking inherit the loaded files. For warm workers the files are also loaded by
+        any worker which did not inherit them, before it runs its first job
+
+        Args:
+            jobs (list of LocalJob): the jobs which are going to be submitted
         """
-        wait for everything in the current pool to finish
+        for job in jobs:
+            for reference in job.reference_files():
+                if reference not in self.references:
+                    self.references.append(reference)
+        load_references(self.references)
+
+    def _running_jobs(self):
+        return [job for job in self.submitted.values() if job.response is not None and not job.response.done()]
+
+    def worker_pids(self):
+        """
+        Returns:
+            list of int: the process ids of the worker processes of the pool
         """
         if self.pool is None:
-            return
-        self.pool.shutdown(True)
-        self.pool = None
+            return []
+        # the pool does not expose its worker processes publicly
+        processes = getattr(self.pool, '_processes', None)
+        if isinstance(processes, dict):
+            return list(processes)
+        # otherwise fall back to all the child processes (which may over-estimate the memory of the workers)
+        return [process.pid for process in multiprocessing.active_children()]
+
+    def committed_memory(self, running=None):
+        """
+        Args:
+            running (list of LocalJob): the jobs currently running
+
+        Returns:
+            int: the memory (MB) claimed by the running jobs. When measuring memory, this is the larger of the
+            memory limits of the running jobs and the measured memory of the worker processes (and the aligner servers
+            they started)
+        """
+        running = self._running_jobs() if running is None else running
+        committed = sum([job.memory_limit for job in running])
+        if self.measure_memory and self.pool is not None:
+            # the aligner servers are separate processes started by the workers
+            pids = self.worker_pids() + recorded_aligner_servers(self.aligner_servers)
+            committed = max(committed, sum([process_rss(pid) for pid in pids]))
+        return committed
+
+    def _start_queued(self):
+        """
+        add queued jobs to the pool, largest memory limit first, while there are free workers and the jobs fit in the
+        memory which has not been claimed. A job which is larger than the memory limit is only started when
+        nothing else is running
+        """
+        running = self._running_jobs()
+        committed = self.committed_memory(running)
+        for job in sorted(self.queued.values(), key=lambda job: (-job.memory_limit, job.rank)):
+            if len(running) >= self.concurrency_limit:
+                break
+            if running and committed + job.memory_limit > self.memory_budget:
+                continue
+            del self.queued[job.job_ident]
+            self._add_to_pool(job)
+            running.append(job)
+            committed += job.memory_limit
+
+    def _add_to_pool(self, job):
+        if self.pool is None:
+            self.pool = futures.ProcessPoolExecutor(max_workers=self.concurrency_limit)
+            self.aligner_servers = tempfile.mkdtemp(prefix='mavis-aligner-servers-')
+        args = [arg.format(job_ident=job.job_ident, name=job.name) for arg in job.args]
+        if self.warm_workers:
+            job.response = self.pool.submit(run_warm, job.func, args, self.references + [
+                r for r in job.reference_files() if r not in self.references], aligner_servers=self.aligner_servers)
+        else:
+            job.response = self.pool.submit(run_job, job.func, args, aligner_servers=self.aligner_servers)
+        setattr(job.response, 'complete_stamp', job.complete_stamp())
+        setattr(job.response, 'stamp_written', threading.Event())  # callbacks run after waiters are notified
+        job.response.add_done_callback(write_stamp_callback)
+
+    def _release_held(self):
+        """
+        queue held jobs whose dependencies have all completed and cancel held jobs with failed
+        dependencies. Repeats until no further jobs can be released or cancelled (cancelling a job may cancel
+        the jobs depending on it)
+        """
+        changed = True
+        while changed:
+            changed = False
+            for job in list(self.held.values()):
+                dependency_states = {dep.name: self._dependency_status(dep) for dep in job.dependencies}
+                failed = sorted([name for name, state in dependency_states.items() if state not in {
+                    JOB_STATUS.COMPLETED, JOB_STATUS.PENDING, JOB_STATUS.RUNNING}])
+                if failed:
+                    del self.held[job.job_ident]
+                    job.status = JOB_STATUS.CANCELLED
+                    job.status_comment = 'dependencies did not complete: {}'.format(', '.join(failed))
+                    LOG('cancelled', job.name, '({})'.format(job.status_comment), time_stamp=True, indent_level=1)
+                    changed = True
+                elif all([state == JOB_STATUS.COMPLETED for state in dependency_states.values()]):
+                    del self.held[job.job_ident]
+                    self.queued[job.job_ident] = job
+                    LOG('released', job.name, time_stamp=True, indent_level=1)
+                    changed = True
+
+    def wait(self):
+        """
+        wait for everything submitted to finish, adding held jobs to the pool as their dependencies complete. The
+        pool is kept open so that it can be re-used by further submissions
+        """
+        while True:
+            self._release_held()
+            self._start_queued()
+            running = [job.response for job in self._running_jobs()]
+            if not running:
+                break
+            futures.wait(running, return_when=futures.FIRST_COMPLETED)
         for job in self.submitted.values():
+            if job.response is not None:
+                job.response.stamp_written.wait()
             self.update_info(job)
 
+    def cancel(self, job, task_ident=None):
+        """
+        cancel a job which has not started running and remove it from the submitted jobs so that it may be
+        re-submitted. Jobs which are already running cannot be stopped
+
+        Args:
+            job (LocalJob): the job to be cancelled
+        """
+        if job.job_ident not in self.submitted:
+            return
+        job = self.submitted[job.job_ident]
+        if job.response is not None and not job.response.cancel() and not job.response.done():
+            LOG('cannot cancel running job', job.name, indent_level=1)
+            return
+        self.held.pop(job.job_ident, None)
+        self.queued.pop(job.job_ident, None)
+        del self.submitted[job.job_ident]
+        job.response = None
+        job.status = JOB_STATUS.CANCELLED
+
+    def query_info(self, job_idents):
+        # the status of local jobs is checked directly (see update_info) so there is nothing to query
+        return []
+
     def update_info(self, job):
         """
         Args:
@@ -126,7 +389,12 @@ class LocalScheduler(Scheduler):
         elif os.path.exists(job.logfile()) and job.job_ident not in self.submitted:
             job.status = JOB_STATUS.UNKNOWN
         elif job.job_ident in self.submitted:
-            if job.response.done():
+            if job.response is None:
+                if job.job_ident in self.held or job.job_ident in self.queued:
+                    job.status = JOB_STATUS.PENDING
+                else:
+                    job.status = JOB_STATUS.CANCELLED
+            elif job.response.done():
                 excpt = job.response.exception()
                 if excpt is None:
                     job.status = JOB_STATUS.COMPLETED
@@ -144,3 +412,11 @@ class LocalScheduler(Scheduler):
         if self.pool is not None:
             self.pool.shutdown()
             self.pool = None
+            # pool workers exit without running their atexit hooks so their aligner servers are not stopped and the
+            # shared bwa index is not removed by them
+            stopped = stop_recorded_aligner_servers(self.aligner_servers)
+            if stopped:
+                LOG('stopped the aligner servers of the worker processes:', stopped)
+            shutil.rmtree(self.aligner_servers, ignore_errors=True)
+            self.aligner_servers = None
+            remove_unused_bwa_indices(log=LOG)
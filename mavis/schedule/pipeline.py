@@ -1,4 +1,7 @@
 from configparser import ConfigParser, ExtendedInterpolation
+from contextlib import contextmanager
+import fcntl
+from glob import glob
 import os
 import re
 import shutil
@@ -9,11 +12,12 @@ from shortuuid import uuid
 from ..cluster import constants as _CLUSTER
 from ..constants import SUBCOMMAND, PROTOCOL, EXIT_ERROR, EXIT_OK, EXIT_INCOMPLETE
 from ..tools import convert_tool_output
-from ..util import mkdirp, output_tabbed_file, LOG, DEVNULL
+from ..util import mkdirp, output_tabbed_file, load_resource_reports, LOG, DEVNULL
 from ..validate import constants as _VALIDATE
 from ..annotate import constants as _ANNOTATE
 from ..annotate import file_io as _file_io
 from ..summary import constants as _SUMMARY
+from ..work_queue import WorkQueue
 from .job import Job, ArrayJob, LogFile, TorqueArrayJob
 from .scheduler import SlurmScheduler, TorqueScheduler, SgeScheduler, consecutive_ranges
 from .local import LocalJob, LocalScheduler
@@ -22,6 +26,25 @@ from .constants import JOB_STATUS, STD_OPTIONS, OPTIONS, SCHEDULER
 PROGNAME = shutil.which('mavis')
 SHEBANG = '#!/bin/bash'
 SCHEDULERS_BY_NAME = {sched.NAME: sched for sched in [SlurmScheduler, TorqueScheduler, LocalScheduler, SgeScheduler]}
+RESOURCES_FILENAME = 'resources.tab'
+
+
+@contextmanager
+def build_file_lock(build_file):
+    """
+    hold an exclusive lock on the lock file next to the build file. The schedule command and the plan job both
+    read, update, and rewrite the build file, so each must hold the lock from reading the file until it is rewritten
+
+    Args:
+        build_file (str): path to the build.cfg file
+    """
+    with open(build_file + '.lock', 'a') as fh:
+        # lockf (POSIX) locks are also respected between hosts on NFS
+        fcntl.lockf(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.lockf(fh, fcntl.LOCK_UN)
 
 
 def stringify_args_to_command(args):
@@ -59,6 +82,72 @@ def parse_run_time(filename):
     return -1
 
 
+def summarize_resource_reports(reports):
+    """
+    aggregate the resource reports of the pipeline stages into one row per library and stage. Reports from stages
+    which are not specific to a library (pairing and summary) are grouped under the library 'all'
+
+    Returns:
+        :class:`list` of :class:`dict`: the rows of the resource table
+    """
+    stage_order = [SUBCOMMAND.CLUSTER, SUBCOMMAND.VALIDATE, SUBCOMMAND.ANNOTATE, SUBCOMMAND.PAIR, SUBCOMMAND.SUMMARY]
+    groups = {}
+    for report in reports:
+        groups.setdefault((report.get('library') or 'all', report['command']), []).append(report)
+    rows = []
+    for (library, stage), group in sorted(groups.items(), key=lambda x: (x[0][0], stage_order.index(x[0][1]))):
+        row = {
+            'library': library,
+            'stage': stage,
+            'tasks': len(group),
+            'wall_time_total': round(sum([r['wall_time'] for r in group]), 2),
+            'wall_time_max': max([r['wall_time'] for r in group]),
+            'cpu_time_total': round(sum([r['cpu_time'] for r in group]), 2),
+            'cpu_time_max': max([r['cpu_time'] for r in group]),
+            'max_rss_mb': max([r['max_rss_mb'] for r in group]),
+            'input_bytes': sum([r['input_bytes'] for r in group]),
+            'output_bytes': sum([r['output_bytes'] for r in group])
+        }
+        for attr in ['read_bytes', 'write_bytes']:
+            values = [r[attr] for r in group if r.get(attr) is not None]
+            row[attr] = sum(values) if values else None
+        items = {}
+        for report in group:
+            for item, count in report.get('items', {}).items():
+                items[item] = items.get(item, 0) + count
+        for item, count in items.items():
+            row[item] = count
+            row['{}_per_second'.format(item)] = round(count / row['wall_time_total'], 3) if row['wall_time_total'] else None
+        rows.append(row)
+    return rows
+
+
+def library_output_dir(output, libconf):
+    """
+    Returns:
+        str: path to the output directory for the library
+    """
+    return os.path.join(output, '{}_{}_{}'.format(libconf.library, libconf.disease_status, libconf.protocol))
+
+
+def find_clustered_files(cluster_output, batch_id):
+    """
+    Args:
+        cluster_output (str): path to the output directory of the cluster stage
+        batch_id (str): the batch id the clustered files are prefixed with
+
+    Returns:
+        :class:`list` of :class:`str`: the clustered files in the order of their task number
+    """
+    pattern = re.compile(r'^{}-(\d+)\.tab$'.format(re.escape(batch_id)))
+    clustered_files = {}
+    for filename in os.listdir(cluster_output):
+        match = pattern.match(filename)
+        if match:
+            clustered_files[int(match.group(1))] = os.path.join(cluster_output, filename)
+    return [clustered_files[task_ident] for task_ident in sorted(clustered_files)]
+
+
 def run_conversion(config, libconf, conversion_dir, assume_no_untemplated=True):
     """
     Converts files if not already converted. Returns a list of filenames
@@ -190,6 +279,7 @@ def cluster_args(config, libconf):
         'disease_status',
         'strand_specific'
     ] + list(_CLUSTER.DEFAULTS.keys())
+    optional_args = ['bam_file', 'median_fragment_size', 'stdev_fragment_size']  # only used to estimate cluster cost
     args = {}
     args.update(_CLUSTER.DEFAULTS.items())
     args.update({k: v.name for k, v in config.reference.items()})
@@ -197,10 +287,30 @@ def cluster_args(config, libconf):
     args.update(config.illustrate.items())
     args.update(config.annotate.items())
     args.update(libconf.items())
-    args = {k: v for k, v in args.items() if k in allowed_args}
+    args = {
+        k: v for k, v in args.items()
+        if k in allowed_args or (k in optional_args and v is not None and args.get('split_by_cost', False))
+    }
     return args
 
 
+def profile_args(config):
+    """
+    Pull the profiling arguments (see :term:`profile`) from the schedule section of the main config to pass through to
+    each stage
+
+    Args:
+        config (MavisConfig): the main program config
+    """
+    if not config.schedule.get('profile', OPTIONS.profile):
+        return {}
+    return {
+        'profile': True,
+        'profile_memory': config.schedule.get('profile_memory', OPTIONS.profile_memory),
+        'profile_top': config.schedule.get('profile_top', OPTIONS.profile_top)
+    }
+
+
 class Pipeline:
     ERROR_STATES = {JOB_STATUS.ERROR, JOB_STATUS.FAILED, JOB_STATUS.CANCELLED, JOB_STATUS.UNKNOWN, JOB_STATUS.NOT_SUBMITTED}
 
@@ -208,6 +318,8 @@ class Pipeline:
         self,
         output_dir,
         scheduler,
+        clusterings=None,
+        plan=None,
         validations=None,
         annotations=None,
         pairing=None,
@@ -219,6 +331,8 @@ class Pipeline:
         Args:
             output_dir (str): path to main output directory for all mavis pipeline results
             scheduler (Scheduler): the class for interacting with a job scheduler
+            clusterings (:class:`list` of :class:`Job`): list of clustering jobs (see :term:`scheduled_clustering`)
+            plan (Job): the job which sets up the remaining jobs once the clustering jobs have completed
             validations (:class:`list` of :class:`Job`): list of validation jobs
             annotations (:class:`list` of :class:`Job`): list of annotation jobs
             pairing (Job): pairing job
@@ -227,6 +341,8 @@ class Pipeline:
         """
         self.scheduler = scheduler
         self.output_dir = output_dir
+        self.clusterings = [] if clusterings is None else clusterings
+        self.plan = plan
         self.validations = [] if validations is None else validations
         self.annotations = [] if annotations is None else annotations
         self.pairing = pairing
@@ -235,12 +351,13 @@ class Pipeline:
         self.batch_id = batch_id
         self.args = {}  # for local runs only, store config to be passed to MAVIS stage
 
-    def write_submission_script(self, subcommand, job, args, aligner_path=None):
+    def write_submission_script(self, subcommand, job, args, aligner_path=None, positional=None):
         """
         Args:
             subcommand (SUBCOMMAND): the pipeline step this script will run
             job (Job): the job the script is for
             args (dict): arguments for the subcommand
+            positional (list of str): arguments written (quoted) before the named arguments
         """
         LOG('writing:', job.script, time_stamp=True)
         with open(job.script, 'w') as fh:
@@ -252,7 +369,8 @@ START_TIME=$(date +%s)\n\n""".format(
                 aligner_path='export PATH={}:$PATH'.format(os.path.dirname(aligner_path)) if aligner_path else '',
                 cwd=os.getcwd()
             ))
-            commands = [PROGNAME, subcommand] + stringify_args_to_command(args)
+            commands = [PROGNAME, subcommand] + ['"{}"'.format(arg) for arg in (positional or [])]
+            commands.extend(stringify_args_to_command(args))
             fh.write(' \\\n\t'.join(commands) + '\n\n')
             fh.write("""
 code=$?
@@ -269,6 +387,11 @@ echo "start: $START_TIME end: $END_TIME" > {}/MAVIS-${}.COMPLETE
             """.format(
                 args['output'],
                 self.scheduler.ENV_JOB_IDENT if not isinstance(job, ArrayJob) else self.scheduler.ENV_ARRAY_IDENT))
+            if subcommand == SUBCOMMAND.VALIDATE:
+                # add the summary of the per-evidence stats to the complete stamp
+                fh.write('cat {0}/{1} >> {0}/MAVIS-${2}.COMPLETE\n'.format(
+                    args['output'], _VALIDATE.STATS_SUMMARY_FILENAME,
+                    self.scheduler.ENV_JOB_IDENT if not isinstance(job, ArrayJob) else self.scheduler.ENV_ARRAY_IDENT))
 
     @classmethod
     def format_args(cls, subcommand, args):
@@ -298,38 +421,153 @@ echo "start: $START_TIME end: $END_TIME" > {}/MAVIS-${}.COMPLETE
         if config.schedule.scheduler not in SCHEDULERS_BY_NAME:
             raise NotImplementedError('unsupported scheduler', config.schedule.scheduler, list(SCHEDULERS_BY_NAME.keys()))
 
+        scheduler_options = {}
+        if config.schedule.scheduler == SCHEDULER.LOCAL:
+            scheduler_options['memory_limit'] = config.schedule.get('local_memory_limit', OPTIONS.local_memory_limit)
+            scheduler_options['measure_memory'] = config.schedule.get('local_measure_memory', OPTIONS.local_measure_memory)
+            scheduler_options['warm_workers'] = config.schedule.get('local_warm_workers', OPTIONS.local_warm_workers)
         scheduler = SCHEDULERS_BY_NAME[config.schedule.scheduler](
             config.schedule.get('concurrency_limit', OPTIONS.concurrency_limit),
-            remote_head_ssh=config.schedule.get('remote_head_ssh', OPTIONS.remote_head_ssh)
+            remote_head_ssh=config.schedule.get('remote_head_ssh', OPTIONS.remote_head_ssh),
+            **scheduler_options
         )
         pipeline = Pipeline(output_dir=config.output, scheduler=scheduler)
 
-        annotation_output_files = []
+        clustered_files = {}
         for libconf in config.libraries.values():
-            base = os.path.join(config.output, '{}_{}_{}'.format(libconf.library, libconf.disease_status, libconf.protocol))
+            base = library_output_dir(config.output, libconf)
             LOG('setting up the directory structure for', libconf.library, 'as', base)
             libconf.inputs = run_conversion(config, libconf, conversion_dir)
 
             # run the cluster stage
             cluster_output = mkdirp(os.path.join(base, SUBCOMMAND.CLUSTER))  # creates the clustering output dir
             args = cluster_args(config, libconf)
+            args.update(profile_args(config))
             args.update({'batch_id': pipeline.batch_id, 'output': cluster_output})
             args['split_only'] = SUBCOMMAND.CLUSTER in config.get('skip_stage', [])
             args['inputs'] = libconf.inputs
+            if config.schedule.get('scheduled_clustering', OPTIONS.scheduled_clustering):
+                pipeline.clusterings.append(pipeline._cluster_job(config, libconf, args))
+                continue
             LOG('clustering', '(split only)' if args['split_only'] else '', time_stamp=True)
             clustering_log = os.path.join(args['output'], 'MC_{}_{}.log'.format(libconf.library, pipeline.batch_id))
             LOG('writing:', clustering_log, time_stamp=True)
             args['log'] = clustering_log
-            clustered_files = _main(cls.format_args(SUBCOMMAND.CLUSTER, args))
+            clustered_files[libconf.library] = _main(cls.format_args(SUBCOMMAND.CLUSTER, args))
+
+        if pipeline.clusterings and isinstance(scheduler, LocalScheduler):
+            # cluster the libraries concurrently before setting up the jobs which depend on the clustered files
+            LOG('clustering', len(pipeline.clusterings), 'libraries', time_stamp=True)
+            for job in pipeline.clusterings:
+                scheduler.submit(job)
+            scheduler.wait()
+            failed = [job.name for job in pipeline.clusterings if job.status != JOB_STATUS.COMPLETED]
+            if failed:
+                raise RuntimeError('clustering did not complete for: {}'.format(', '.join(failed)))
+        elif pipeline.clusterings:
+            # the remaining jobs are set up by the plan job once the clustering has completed
+            pipeline.plan = pipeline._plan_job(config)
+            return pipeline
+        # the clustered files of the clustering jobs are found in their output directories
+        pipeline.add_stage_jobs(config, None if pipeline.clusterings else clustered_files)
+        return pipeline
+
+    def _cluster_job(self, config, libconf, args):
+        """
+        Args:
+            config (MavisConfig): the main program config
+            libconf (LibraryConfig): library specific configuration
+            args (dict): arguments for the cluster stage
+
+        Returns:
+            Job: the job which clusters the library
+        """
+        from ..main import main as _main
+
+        job_options = {k: v for k, v in config.schedule.items() if k in STD_OPTIONS}
+        job_options['memory_limit'] = config.schedule.get('cluster_memory', OPTIONS.cluster_memory)
+        job_name = 'MC_{}_{}'.format(libconf.library, self.batch_id)
+        script_name = os.path.join(args['output'], 'submit.sh')
+
+        if isinstance(self.scheduler, LocalScheduler):
+            args['log'] = os.path.join(args['output'], 'job-{name}-{job_ident}.log')
+            return LocalJob(
+                stage=SUBCOMMAND.CLUSTER,
+                script=script_name,
+                output_dir=args['output'],
+                stdout=args['log'],
+                name=job_name,
+                args=self.format_args(SUBCOMMAND.CLUSTER, args),
+                func=_main,
+                **job_options
+            )
+        job = Job(
+            stage=SUBCOMMAND.CLUSTER,
+            script=script_name,
+            output_dir=args['output'],
+            name=job_name,
+            **job_options
+        )
+        self.write_submission_script(SUBCOMMAND.CLUSTER, job, args)
+        return job
+
+    def _plan_job(self, config):
+        """
+        the plan job re-runs setup (see :func:`~mavis.main.main`) once all the clustering jobs have completed to set
+        up the remaining jobs (sized by the number of clustered files) and submit them
+
+        Args:
+            config (MavisConfig): the main program config
+        """
+        job = Job(
+            stage=SUBCOMMAND.SETUP,
+            script=os.path.join(config.output, 'submit_plan.sh'),
+            output_dir=config.output,
+            name='MPL_{}'.format(self.batch_id),
+            dependencies=self.clusterings[:],
+            **{k: v for k, v in config.schedule.items() if k in STD_OPTIONS}
+        )
+        positional = [config.config_file]
+        for stage in config.get('skip_stage', []):
+            positional.extend(['--skip_stage', stage])
+        self.write_submission_script(
+            SUBCOMMAND.SETUP, job, {'output': config.output, 'plan': True}, positional=positional)
+        return job
+
+    def add_stage_jobs(self, config, library_clustered_files=None):
+        """
+        set up the validation, annotation, pairing and summary jobs from the clustered files
+
+        Args:
+            config (MavisConfig): the main program config
+            library_clustered_files (:class:`dict` of :class:`list` of :class:`str` by :class:`str`): the clustered
+                files by library. Read from the clustering output directories when not given (see :term:`scheduled_clustering`)
+        """
+        from ..main import main as _main
+
+        annotation_output_files = []
+        for libconf in config.libraries.values():
+            base = library_output_dir(config.output, libconf)
+            cluster_output = os.path.join(base, SUBCOMMAND.CLUSTER)
+            if library_clustered_files is None:
+                clustered_files = find_clustered_files(cluster_output, self.batch_id)
+            else:
+                clustered_files = library_clustered_files[libconf.library]
 
             # make a validation job for each cluster file
             validate_jobs = []
+            work_queue = None
 
             if SUBCOMMAND.VALIDATE not in config.skip_stage:
                 mkdirp(os.path.join(base, SUBCOMMAND.VALIDATE))
                 for task_ident in range(1, len(clustered_files) + 1):
-                    mkdirp(os.path.join(base, SUBCOMMAND.VALIDATE, '{}-{}'.format(pipeline.batch_id, task_ident)))
+                    mkdirp(os.path.join(base, SUBCOMMAND.VALIDATE, '{}-{}'.format(self.batch_id, task_ident)))
                 args = validate_args(config, libconf)
+                args.update(profile_args(config))
+                if args.get('persistent_aligner') and self.scheduler.NAME != SCHEDULER.LOCAL:
+                    # each task aligns in a new process so the reference would be loaded and discarded for every task
+                    LOG('warning: ignoring persistent_aligner, which only applies to the local scheduler')
+                    args['persistent_aligner'] = False
 
                 script_name = os.path.join(base, SUBCOMMAND.VALIDATE, 'submit.sh')
                 job_options = {k: v for k, v in config.schedule.items() if k in STD_OPTIONS}
@@ -338,67 +576,90 @@ echo "start: $START_TIME end: $END_TIME" > {}/MAVIS-${}.COMPLETE
                 if libconf.protocol == PROTOCOL.TRANS:
                     job_options['memory_limit'] = config.schedule.trans_validation_memory
 
-                if scheduler.NAME == SCHEDULER.LOCAL:
+                # validate the cluster files with a fixed number of workers claiming them from a shared queue
+                queue_workers = config.schedule.get('validation_queue_workers', OPTIONS.validation_queue_workers)
+                if queue_workers and queue_workers < len(clustered_files):
+                    work_queue = os.path.join(base, SUBCOMMAND.VALIDATE, '{}.queue'.format(self.batch_id))
+                    LOG('writing:', work_queue, time_stamp=True)
+                    WorkQueue.create(work_queue, [(
+                        os.path.join(cluster_output, '{}-{}.tab'.format(self.batch_id, task_ident)),
+                        os.path.join(base, SUBCOMMAND.VALIDATE, '{}-{}'.format(self.batch_id, task_ident))
+                    ) for task_ident in range(1, len(clustered_files) + 1)], timeout=config.schedule.get(
+                        'validation_queue_timeout', OPTIONS.validation_queue_timeout))
+                    for worker in range(1, queue_workers + 1):
+                        mkdirp(os.path.join(base, SUBCOMMAND.VALIDATE, '{}-worker-{}'.format(self.batch_id, worker)))
+                    job_options['work_queue'] = work_queue
+                    args['work_queue'] = work_queue
+                    args['inputs'] = [item[0] for item in WorkQueue(work_queue).items]
+
+                if self.scheduler.NAME == SCHEDULER.LOCAL:
                     job_options['reference_genome'] = args['reference_genome']
                     if libconf.protocol == PROTOCOL.TRANS:
                         job_options['annotations'] = args['annotations']
 
-                    for task_ident in range(1, len(clustered_files) + 1):
-                        args['inputs'] = [os.path.join(cluster_output, '{}-{}.tab'.format(pipeline.batch_id, task_ident))]
-                        args['output'] = os.path.join(base, SUBCOMMAND.VALIDATE, '{}-{}'.format(pipeline.batch_id, task_ident))
-                        job_name = 'MV_{}_{}-{}'.format(libconf.library, pipeline.batch_id, task_ident)
+                    for task_ident in range(1, (queue_workers if work_queue else len(clustered_files)) + 1):
+                        if work_queue:
+                            task_name = '{}-worker-{}'.format(self.batch_id, task_ident)
+                        else:
+                            task_name = '{}-{}'.format(self.batch_id, task_ident)
+                            args['inputs'] = [os.path.join(cluster_output, '{}.tab'.format(task_name))]
+                        args['output'] = os.path.join(base, SUBCOMMAND.VALIDATE, task_name)
+                        job_name = 'MV_{}_{}'.format(libconf.library, task_name)
                         args['log'] = os.path.join(args['output'], 'job-{name}-{job_ident}.log')
                         validate_job = LocalJob(
                             stage=SUBCOMMAND.VALIDATE,
                             output_dir=args['output'],
                             stdout=args['log'],
                             name=job_name,
-                            args=cls.format_args(SUBCOMMAND.VALIDATE, args),
+                            args=self.format_args(SUBCOMMAND.VALIDATE, args),
                             func=_main,
                             **job_options
                         )
-                        pipeline.validations.append(validate_job)
+                        self.validations.append(validate_job)
                         validate_jobs.append(validate_job)
                 else:
-                    args['inputs'] = os.path.join(cluster_output, '{}-${}.tab'.format(pipeline.batch_id, scheduler.ENV_TASK_IDENT))
-                    args['output'] = os.path.join(base, SUBCOMMAND.VALIDATE, '{}-${}'.format(pipeline.batch_id, scheduler.ENV_TASK_IDENT))
+                    task_prefix = '{}-worker'.format(self.batch_id) if work_queue else self.batch_id
+                    if not work_queue:
+                        args['inputs'] = os.path.join(cluster_output, '{}-${}.tab'.format(self.batch_id, self.scheduler.ENV_TASK_IDENT))
+                    args['output'] = os.path.join(base, SUBCOMMAND.VALIDATE, '{}-${}'.format(task_prefix, self.scheduler.ENV_TASK_IDENT))
                     aligner_path = shutil.which(args['aligner'].split(' ')[0])
-                    job_class = ArrayJob if scheduler.NAME != SCHEDULER.TORQUE else TorqueArrayJob
+                    job_class = ArrayJob if self.scheduler.NAME != SCHEDULER.TORQUE else TorqueArrayJob
                     validate_job = job_class(
                         stage=SUBCOMMAND.VALIDATE,
-                        task_list=len(clustered_files),
-                        output_dir=os.path.join(base, SUBCOMMAND.VALIDATE, '{}-{{task_ident}}'.format(pipeline.batch_id)),
+                        task_list=queue_workers if work_queue else len(clustered_files),
+                        output_dir=os.path.join(base, SUBCOMMAND.VALIDATE, '{}-{{task_ident}}'.format(task_prefix)),
                         script=script_name,
-                        name='MV_{}_{}'.format(libconf.library, pipeline.batch_id),
+                        name='MV_{}_{}'.format(libconf.library, self.batch_id),
                         **job_options
                     )
-                    pipeline.write_submission_script(SUBCOMMAND.VALIDATE, validate_job, args, aligner_path=aligner_path)
-                    pipeline.validations.append(validate_job)
+                    self.write_submission_script(SUBCOMMAND.VALIDATE, validate_job, args, aligner_path=aligner_path)
+                    self.validations.append(validate_job)
                     validate_jobs.append(validate_job)
 
             # make an annotation job for each validation/cluster job/file
             mkdirp(os.path.join(base, SUBCOMMAND.ANNOTATE))
             for task_ident in range(1, len(clustered_files) + 1):
-                mkdirp(os.path.join(base, SUBCOMMAND.ANNOTATE, '{}-{}'.format(pipeline.batch_id, task_ident)))
+                mkdirp(os.path.join(base, SUBCOMMAND.ANNOTATE, '{}-{}'.format(self.batch_id, task_ident)))
             args = annotate_args(config, libconf)
+            args.update(profile_args(config))
 
             script_name = os.path.join(base, SUBCOMMAND.ANNOTATE, 'submit.sh')
             job_options = {k: v for k, v in config.schedule.items() if k in STD_OPTIONS}
             job_options['memory_limit'] = config.schedule.annotation_memory
 
-            if isinstance(scheduler, LocalScheduler):
+            if isinstance(self.scheduler, LocalScheduler):
                 job_options['annotations'] = args['annotations']
                 job_options['reference_genome'] = args['reference_genome']
                 if args['template_metadata']:
                     job_options['template_metadata'] = args['template_metadata']
                 for task_ident in range(1, len(clustered_files) + 1):
-                    args['output'] = os.path.join(base, SUBCOMMAND.ANNOTATE, '{}-{}'.format(pipeline.batch_id, task_ident))
+                    args['output'] = os.path.join(base, SUBCOMMAND.ANNOTATE, '{}-{}'.format(self.batch_id, task_ident))
                     # annotate 'clustered' files if the pipeline does not include the validation step
                     if SUBCOMMAND.VALIDATE not in config.skip_stage:
-                        args['inputs'] = [os.path.join(base, SUBCOMMAND.VALIDATE, '{}-{}'.format(pipeline.batch_id, task_ident), _VALIDATE.PASS_FILENAME)]
+                        args['inputs'] = [os.path.join(base, SUBCOMMAND.VALIDATE, '{}-{}'.format(self.batch_id, task_ident), _VALIDATE.PASS_FILENAME)]
                     else:
-                        args['inputs'] = [os.path.join(cluster_output, '{}-{}.tab'.format(pipeline.batch_id, task_ident))]
-                    job_name = 'MA_{}_{}-{}'.format(libconf.library, pipeline.batch_id, task_ident)
+                        args['inputs'] = [os.path.join(cluster_output, '{}-{}.tab'.format(self.batch_id, task_ident))]
+                    job_name = 'MA_{}_{}-{}'.format(libconf.library, self.batch_id, task_ident)
                     args['log'] = os.path.join(args['output'], 'job-{name}-{job_ident}.log')
                     annotate_job = LocalJob(
                         stage=SUBCOMMAND.ANNOTATE,
@@ -406,112 +667,118 @@ echo "start: $START_TIME end: $END_TIME" > {}/MAVIS-${}.COMPLETE
                         name=job_name,
                         stdout=args['log'],
                         output_dir=args['output'],
-                        args=cls.format_args(SUBCOMMAND.ANNOTATE, args),
+                        args=self.format_args(SUBCOMMAND.ANNOTATE, args),
                         func=_main,
                         **job_options
                     )
-                    pipeline.annotations.append(annotate_job)
+                    self.annotations.append(annotate_job)
                     annotation_output_files.append(os.path.join(args['output'], _ANNOTATE.PASS_FILENAME))
-                    if validate_jobs:
+                    if work_queue:  # any of the workers may validate the input for this annotation
+                        annotate_job.dependencies.extend(validate_jobs)
+                    elif validate_jobs:
                         annotate_job.dependencies.append(validate_jobs[task_ident - 1])
             else:
-                args['output'] = os.path.join(base, SUBCOMMAND.ANNOTATE, '{}-${}'.format(pipeline.batch_id, scheduler.ENV_TASK_IDENT))
+                args['output'] = os.path.join(base, SUBCOMMAND.ANNOTATE, '{}-${}'.format(self.batch_id, self.scheduler.ENV_TASK_IDENT))
                 # annotate 'clustered' files if the pipeline does not include the validation step
                 if SUBCOMMAND.VALIDATE not in config.skip_stage:
-                    args['inputs'] = [os.path.join(base, SUBCOMMAND.VALIDATE, '{}-${}'.format(pipeline.batch_id, scheduler.ENV_TASK_IDENT), _VALIDATE.PASS_FILENAME)]
+                    args['inputs'] = [os.path.join(base, SUBCOMMAND.VALIDATE, '{}-${}'.format(self.batch_id, self.scheduler.ENV_TASK_IDENT), _VALIDATE.PASS_FILENAME)]
                 else:
-                    args['inputs'] = [os.path.join(cluster_output, '{}-${}.tab'.format(pipeline.batch_id, scheduler.ENV_TASK_IDENT))]
+                    args['inputs'] = [os.path.join(cluster_output, '{}-${}.tab'.format(self.batch_id, self.scheduler.ENV_TASK_IDENT))]
 
-                job_class = ArrayJob if scheduler.NAME != SCHEDULER.TORQUE else TorqueArrayJob
+                job_class = ArrayJob if self.scheduler.NAME != SCHEDULER.TORQUE else TorqueArrayJob
                 annotate_job = job_class(
                     stage=SUBCOMMAND.ANNOTATE,
                     task_list=len(clustered_files),
                     script=script_name,
-                    name='MA_{}_{}'.format(libconf.library, pipeline.batch_id),
-                    output_dir=os.path.join(base, SUBCOMMAND.ANNOTATE, '{}-{{task_ident}}'.format(pipeline.batch_id)),
+                    name='MA_{}_{}'.format(libconf.library, self.batch_id),
+                    output_dir=os.path.join(base, SUBCOMMAND.ANNOTATE, '{}-{{task_ident}}'.format(self.batch_id)),
                     **job_options
                 )
-                pipeline.write_submission_script(SUBCOMMAND.ANNOTATE, annotate_job, args)
-                pipeline.annotations.append(annotate_job)
+                self.write_submission_script(SUBCOMMAND.ANNOTATE, annotate_job, args)
+                self.annotations.append(annotate_job)
                 if validate_jobs:
                     annotate_job.dependencies.extend(validate_jobs)
 
                 # add the expected output file names for input to pairing
                 for taskid in range(1, len(clustered_files) + 1):
                     fname = os.path.join(args['output'], _ANNOTATE.PASS_FILENAME)
-                    fname = re.sub(r'\${}'.format(scheduler.ENV_TASK_IDENT), str(taskid), fname)
+                    fname = re.sub(r'\${}'.format(self.scheduler.ENV_TASK_IDENT), str(taskid), fname)
                     annotation_output_files.append(fname)
 
         # set up the pairing job
         args = {}
         args.update(config.pairing.items())
+        args.update(profile_args(config))
         args['output'] = os.path.join(config.output, SUBCOMMAND.PAIR)
         args['annotations'] = config.reference.annotations
         mkdirp(args['output'])
         args['inputs'] = annotation_output_files
-        job_name = 'MP_{}'.format(pipeline.batch_id)
+        job_name = 'MP_{}'.format(self.batch_id)
 
         script_name = os.path.join(config.output, SUBCOMMAND.PAIR, 'submit.sh')
 
-        if isinstance(scheduler, LocalScheduler):
+        if isinstance(self.scheduler, LocalScheduler):
             args['log'] = os.path.join(args['output'], 'job-{name}-{job_ident}.log')
-            pipeline.pairing = LocalJob(
+            self.pairing = LocalJob(
                 stage=SUBCOMMAND.PAIR,
                 script=script_name,
                 output_dir=args['output'],
                 stdout=args['log'],
                 name=job_name,
-                dependencies=pipeline.annotations,
-                args=cls.format_args(SUBCOMMAND.PAIR, args),
+                dependencies=self.annotations,
+                args=self.format_args(SUBCOMMAND.PAIR, args),
                 func=_main,
                 **{k: v for k, v in config.schedule.items() if k in STD_OPTIONS}
             )
         else:
-            pipeline.pairing = Job(
+            self.pairing = Job(
                 SUBCOMMAND.PAIR,
                 script=script_name,
                 output_dir=args['output'],
                 name=job_name,
-                dependencies=pipeline.annotations,
+                dependencies=self.annotations,
                 **{k: v for k, v in config.schedule.items() if k in STD_OPTIONS}
             )
-            pipeline.write_submission_script(SUBCOMMAND.PAIR, pipeline.pairing, args)
+            self.write_submission_script(SUBCOMMAND.PAIR, self.pairing, args)
         # set up the summary job
         args = summary_args(config)
+        args.update(profile_args(config))
         args['output'] = os.path.join(config.output, SUBCOMMAND.SUMMARY)
         mkdirp(args['output'])
         args['inputs'] = [os.path.join(config.output, SUBCOMMAND.PAIR, 'mavis_paired*.tab')]
         script_name = os.path.join(args['output'], 'submit.sh')
-        job_name = 'MS_{}'.format(pipeline.batch_id)
-        if isinstance(scheduler, LocalScheduler):
+        job_name = 'MS_{}'.format(self.batch_id)
+        if isinstance(self.scheduler, LocalScheduler):
             args['log'] = os.path.join(args['output'], 'job-{name}-{job_ident}.log')
-            pipeline.summary = LocalJob(
+            self.summary = LocalJob(
                 stage=SUBCOMMAND.SUMMARY,
                 name=job_name,
                 output_dir=args['output'],
                 stdout=args['log'],
                 script=script_name,
-                dependencies=[pipeline.pairing],
-                args=cls.format_args(SUBCOMMAND.SUMMARY, args),
+                dependencies=[self.pairing],
+                args=self.format_args(SUBCOMMAND.SUMMARY, args),
                 func=_main,
                 **{k: v for k, v in config.schedule.items() if k in STD_OPTIONS}
             )
         else:
-            pipeline.summary = Job(
+            self.summary = Job(
                 stage=SUBCOMMAND.SUMMARY,
                 name=job_name,
                 output_dir=args['output'],
                 script=script_name,
-                dependencies=[pipeline.pairing],
+                dependencies=[self.pairing],
                 **{k: v for k, v in config.schedule.items() if k in STD_OPTIONS}
             )
-            pipeline.write_submission_script(SUBCOMMAND.SUMMARY, pipeline.summary, args)
-        return pipeline
+            self.write_submission_script(SUBCOMMAND.SUMMARY, self.summary, args)
 
     def _resubmit_job(self, job):
         """
         Given a failed job, cancel it and all of its dependencies and then resubmit them
         """
+        if job.work_queue and os.path.exists(job.work_queue):
+            # let the resubmitted workers claim the inputs which failed
+            WorkQueue(job.work_queue).reset_failed()
         # resubmit the job or all failed tasks for the job. Update any dependencies
         failed_tasks = set()
         try:
@@ -555,7 +822,7 @@ echo "start: $START_TIME end: $END_TIME" > {}/MAVIS-${}.COMPLETE
             # cancel and resubmit annotate, pairing and summary jobs
             new_annotations = []
             for ajob in self.annotations:
-                if ajob.dependencies == [job] and failed_tasks:  # only dependent on this job
+                if ajob.dependencies == [job] and failed_tasks and not job.work_queue:  # only dependent on this job
                     try:
                         new_ajob = ajob.copy_with_tasks(failed_tasks)
                         new_annotations.append(new_ajob)
@@ -582,6 +849,10 @@ echo "start: $START_TIME end: $END_TIME" > {}/MAVIS-${}.COMPLETE
         elif new_job.stage == SUBCOMMAND.ANNOTATE:
             if new_job not in self.annotations:
                 self.annotations.append(new_job)
+        elif new_job.stage == SUBCOMMAND.CLUSTER and self.plan:
+            # the plan job must wait for the resubmitted clustering
+            self.scheduler.cancel(self.plan)
+            self.plan.reset()
 
         if new_job.stage in {SUBCOMMAND.VALIDATE, SUBCOMMAND.ANNOTATE}:
             # cancel pairing
@@ -589,9 +860,18 @@ echo "start: $START_TIME end: $END_TIME" > {}/MAVIS-${}.COMPLETE
             self.pairing.reset()
             self.pairing.dependencies = self.annotations[:]
 
-        # all resubmissions result in cancelling summary
-        self.scheduler.cancel(self.summary)
-        self.summary.reset()
+        # all resubmissions result in cancelling summary (if it has been set up)
+        if self.summary:
+            self.scheduler.cancel(self.summary)
+            self.summary.reset()
+
+    def jobs(self):
+        """
+        Returns:
+            :class:`list` of :class:`Job`: all the jobs of the pipeline in the order they are submitted
+        """
+        jobs = self.clusterings + [self.plan] + self.validations + self.annotations + [self.pairing, self.summary]
+        return [job for job in jobs if job is not None]
 
     def _job_status(self, job, submit=False, resubmit=False, log=DEVNULL):
         """
@@ -656,60 +936,67 @@ echo "start: $START_TIME end: $END_TIME" > {}/MAVIS-${}.COMPLETE
         jobs_not_complete = 0
         jobs_with_errors = 0
 
-        for job in self.validations + self.annotations + [self.pairing, self.summary]:
-            self.scheduler.update_info(job)
+        jobs = self.jobs()
+        with self.scheduler.cached_info(jobs):
+            for job in jobs:
+                self.scheduler.update_info(job)
+        if isinstance(self.scheduler, LocalScheduler) and self.scheduler.warm_workers and (submit or resubmit):
+            log('preloading reference files', time_stamp=True)
+            self.scheduler.preload([job for job in jobs if job.status != JOB_STATUS.COMPLETED])
+        if self.clusterings:
+            log('cluster', time_stamp=True)
+            for job in self.clusterings:
+                self._job_status(job, submit=submit, resubmit=resubmit, log=log.indent())
+        if self.plan:
+            log('plan', time_stamp=True)
+            self._job_status(self.plan, submit=submit, resubmit=resubmit, log=log.indent())
         log('validate', time_stamp=True)
         for job in self.validations:
             run_time = self._job_status(job, submit=submit, resubmit=resubmit, log=log.indent())
             if job.status == JOB_STATUS.COMPLETED:
                 if run_time >= 0:
                     run_times[0].append(run_time)
-        self.scheduler.wait()
 
         log('annotate', time_stamp=True)
-        if not all([job.status == JOB_STATUS.COMPLETED for job in self.validations]) and self.scheduler.NAME == 'LOCAL' and (submit or resubmit):
-            log('Stopping submission. Dependencies not complete', indent_level=1)
-            submit = False
-            resubmit = False
-
         for job in self.annotations:
-            self._job_status(job, submit=submit, resubmit=resubmit, log=log.indent())
+            run_time = self._job_status(job, submit=submit, resubmit=resubmit, log=log.indent())
             if job.status == JOB_STATUS.COMPLETED:
                 if run_time >= 0:
                     run_times[1].append(run_time)
-        self.scheduler.wait()
 
-        log('pairing', time_stamp=True)
-        if not all([job.status == JOB_STATUS.COMPLETED for job in self.annotations]) and self.scheduler.NAME == 'LOCAL' and (submit or resubmit):
-            log('Stopping submission. Dependencies not complete', indent_level=1)
-            submit = False
-            resubmit = False
-
-        run_time = self._job_status(self.pairing, submit=submit, resubmit=resubmit, log=log.indent())
-        if self.pairing.status == JOB_STATUS.COMPLETED:
-            if run_time >= 0:
-                run_times[2].append(run_time)
-        self.scheduler.wait()
-
-        log('summary', time_stamp=True)
-        if self.pairing.status != JOB_STATUS.COMPLETED and self.scheduler.NAME == 'LOCAL' and (submit or resubmit):
-            log('Stopping submission. Dependencies not complete', indent_level=1)
-            submit = False
-            resubmit = False
+        if self.pairing:  # not set up until the plan job has run
+            log('pairing', time_stamp=True)
+            run_time = self._job_status(self.pairing, submit=submit, resubmit=resubmit, log=log.indent())
+            if self.pairing.status == JOB_STATUS.COMPLETED:
+                if run_time >= 0:
+                    run_times[2].append(run_time)
 
-        run_time = self._job_status(self.summary, submit=submit, resubmit=resubmit, log=log.indent())
-        if self.summary.status == JOB_STATUS.COMPLETED:
-            if run_time >= 0:
-                run_times[3].append(run_time)
+        if self.summary:
+            log('summary', time_stamp=True)
+            run_time = self._job_status(self.summary, submit=submit, resubmit=resubmit, log=log.indent())
+            if self.summary.status == JOB_STATUS.COMPLETED:
+                if run_time >= 0:
+                    run_times[3].append(run_time)
+        # the local scheduler runs jobs as their dependencies complete so all stages are waited on together
         self.scheduler.wait()
 
-        for job in self.validations + self.annotations + [self.pairing, self.summary]:
-            if submit or resubmit and job.status != JOB_STATUS.COMPLETED:
+        jobs = self.jobs()
+        # jobs may have been (re)submitted since the first status check so the status is queried again
+        updated_jobs = [job for job in jobs if submit or resubmit and job.status != JOB_STATUS.COMPLETED]
+        with self.scheduler.cached_info(updated_jobs):
+            for job in updated_jobs:
                 self.scheduler.update_info(job)
+        for job in jobs:
             if job.status in self.ERROR_STATES:
                 jobs_with_errors += 1
             elif job.status != JOB_STATUS.COMPLETED:
                 jobs_not_complete += 1
+        if self.plan and self.pairing is None:
+            # the build file was read before the plan job added the remaining jobs to it
+            log('the jobs following the plan job have not been set up yet', time_stamp=True)
+            jobs_not_complete += 1
+
+        self.report_resources(log=log)
 
         if jobs_not_complete + jobs_with_errors == 0:
             if all([r for r in run_times]):
@@ -720,6 +1007,35 @@ echo "start: $START_TIME end: $END_TIME" > {}/MAVIS-${}.COMPLETE
         else:
             return EXIT_ERROR
 
+    def report_resources(self, log=DEVNULL):
+        """
+        collect the resource reports of the clustering and completed jobs and write the per library and stage resource
+        table to the output directory
+
+        Returns:
+            :class:`list` of :class:`dict`: the rows of the resource table
+        """
+        output_dirs = sorted(glob(os.path.join(self.output_dir, '*', SUBCOMMAND.CLUSTER)))
+        for job in self.validations + self.annotations + [self.pairing, self.summary]:
+            if job is None or job.status != JOB_STATUS.COMPLETED:
+                continue
+            if isinstance(job, ArrayJob):
+                output_dirs.extend([os.path.dirname(task.complete_stamp()) for task in job.task_list])
+            else:
+                output_dirs.append(os.path.dirname(job.complete_stamp()))
+        rows = summarize_resource_reports(load_resource_reports(*output_dirs))
+        if not rows:
+            return rows
+        log('resources', time_stamp=True)
+        for row in rows:
+            log('{} {} ({} {}):'.format(
+                row['library'], row['stage'], row['tasks'], 'task' if row['tasks'] == 1 else 'tasks'), indent_level=1)
+            log('wall time (s): total {}; max {}'.format(row['wall_time_total'], row['wall_time_max']), indent_level=2)
+            log('cpu time (s): total {}; max {}'.format(row['cpu_time_total'], row['cpu_time_max']), indent_level=2)
+            log('max rss (MB):', row['max_rss_mb'], indent_level=2)
+        output_tabbed_file(rows, os.path.join(self.output_dir, RESOURCES_FILENAME))
+        return rows
+
     @classmethod
     def read_build_file(cls, filepath):
         """
@@ -736,11 +1052,20 @@ echo "start: $START_TIME end: $END_TIME" > {}/MAVIS-${}.COMPLETE
         parser.read(filepath)
         cast = {'None': None, 'False': False, 'True': True}
 
+        scheduler_options = {}
+        if parser['general']['scheduler'] == SCHEDULER.LOCAL:
+            scheduler_options['memory_limit'] = cast.get(
+                parser['general'].get('local_memory_limit'), parser['general'].get('local_memory_limit'))
+            scheduler_options['measure_memory'] = cast.get(
+                parser['general'].get('local_measure_memory'), OPTIONS.local_measure_memory)
+            scheduler_options['warm_workers'] = cast.get(
+                parser['general'].get('local_warm_workers'), OPTIONS.local_warm_workers)
         pipeline = cls(
             output_dir=parser['general']['output_dir'],
             scheduler=SCHEDULERS_BY_NAME[parser['general']['scheduler']](
                 concurrency_limit=parser['general']['concurrency_limit'] if 'concurrency_limit' in parser['general'] else OPTIONS.concurrency_limit,
-                remote_head_ssh=parser['general']['remote_head_ssh'] if 'remote_head_ssh' in parser['general'] else OPTIONS.remote_head_ssh
+                remote_head_ssh=parser['general']['remote_head_ssh'] if 'remote_head_ssh' in parser['general'] else OPTIONS.remote_head_ssh,
+                **scheduler_options
             ),
             batch_id=parser['general']['batch_id']
         )
@@ -773,7 +1098,13 @@ echo "start: $START_TIME end: $END_TIME" > {}/MAVIS-${}.COMPLETE
                 job.dependencies[i] = jobs[prior_job_name]
 
         for job in jobs.values():
-            if job.stage == SUBCOMMAND.VALIDATE:
+            if job.stage == SUBCOMMAND.CLUSTER:
+                pipeline.clusterings.append(job)
+            elif job.stage == SUBCOMMAND.SETUP:
+                if pipeline.plan:
+                    raise ValueError('mavis pipeline expects a single plan job')
+                pipeline.plan = job
+            elif job.stage == SUBCOMMAND.VALIDATE:
                 pipeline.validations.append(job)
             elif job.stage == SUBCOMMAND.ANNOTATE:
                 pipeline.annotations.append(job)
@@ -810,9 +1141,16 @@ echo "start: $START_TIME end: $END_TIME" > {}/MAVIS-${}.COMPLETE
             'remote_head_ssh': self.scheduler.remote_head_ssh,
             'concurrency_limit': str(self.scheduler.concurrency_limit)
         }
+        if isinstance(self.scheduler, LocalScheduler):
+            parser['general']['local_memory_limit'] = str(self.scheduler.memory_limit)
+            parser['general']['local_measure_memory'] = str(self.scheduler.measure_memory)
+            parser['general']['local_warm_workers'] = str(self.scheduler.warm_workers)
 
-        for job in [self.summary, self.pairing] + self.validations + self.annotations:
+        for job in self.jobs():
             parser[job.display_name] = {k: re.sub(r'\$', '$$', v) for k, v in job.flatten().items()}
 
-        with open(filename, 'w') as configfile:
+        # replace the file in one step so that it is never read partially written
+        temp_file = '{}.{}'.format(filename, uuid())
+        with open(temp_file, 'w') as configfile:
             parser.write(configfile)
+        os.replace(temp_file, filename)
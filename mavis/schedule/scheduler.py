@@ -1,3 +1,4 @@
+from contextlib import contextmanager
 from datetime import timedelta
 import subprocess
 import re
@@ -46,6 +47,8 @@ class Scheduler:  # pragma: no cover
     ENV_JOB_IDENT = '{JOB_IDENT}'
     """:class:`str`: the expected pattern of environment variables which store the job id"""
     HEADER_PREFIX = '#'
+    STATUS_BATCH_SIZE = 200
+    """:class:`int`: the maximum number of jobs to query the status of in a single scheduler command"""
 
     def __init__(self, concurrency_limit=None, remote_head_ssh=''):
         """
@@ -54,6 +57,7 @@ class Scheduler:  # pragma: no cover
         """
         self.concurrency_limit = NullableType(int)(concurrency_limit)
         self.remote_head_ssh = remote_head_ssh
+        self.info_cache = None
 
     def command(self, command, shell=False):
         """
@@ -87,6 +91,54 @@ class Scheduler:  # pragma: no cover
         """
         raise NotImplementedError('abstract method')
 
+    def query_info(self, job_idents):
+        """
+        query the scheduler for the status of the given jobs with a single command
+
+        Args:
+            job_idents (list of str): the job ids to query
+
+        Returns:
+            :class:`list` of :class:`dict`: rows with the job_ident, task_ident, name, status and status_comment
+        """
+        raise NotImplementedError('abstract method')
+
+    def job_info(self, job):
+        """
+        Returns:
+            :class:`list` of :class:`dict`: the rows for the given job from the cache or else from querying the scheduler
+        """
+        if self.info_cache is not None and job.job_ident in self.info_cache:
+            return self.info_cache[job.job_ident]
+        return self.query_info([job.job_ident])
+
+    @contextmanager
+    def cached_info(self, jobs):
+        """
+        query the status of all the given jobs in batches and cache the result so that calls to
+        :meth:`update_info` within the context do not query the scheduler once per job. Jobs which are missing
+        from the batched result (or whose batch failed) are still queried individually
+
+        Args:
+            jobs (list of Job): the jobs to query
+        """
+        job_idents = sorted({job.job_ident for job in jobs if job.job_ident})
+        self.info_cache = {}
+        try:
+            for start in range(0, len(job_idents), self.STATUS_BATCH_SIZE):
+                batch = job_idents[start:start + self.STATUS_BATCH_SIZE]
+                try:
+                    rows = self.query_info(batch)
+                except subprocess.CalledProcessError as err:
+                    LOG('unable to query the status of {} jobs together:'.format(len(batch)), err, level=logging.DEBUG)
+                    continue
+                for row in rows:
+                    if row['job_ident'] in batch:
+                        self.info_cache.setdefault(row['job_ident'], []).append(row)
+            yield self.info_cache
+        finally:
+            self.info_cache = None
+
     def cancel(self, job, task_ident=None):
         raise NotImplementedError('abstract method')
 
@@ -240,6 +292,17 @@ class SlurmScheduler(Scheduler):
             })
         return rows
 
+    def query_info(self, job_idents):
+        """
+        runs a single sacct command for all the given jobs
+
+        Args:
+            job_idents (list of str): the job ids to query
+        """
+        command = ['sacct', '-j', ','.join(job_idents), '--long', '--parsable2']
+        content = self.command(command)
+        return self.parse_sacct(content)
+
     def update_info(self, job):
         """
         Pull job information about status etc from the scheduler. Updates the input job
@@ -249,9 +312,7 @@ class SlurmScheduler(Scheduler):
         """
         if not job.job_ident:
             return
-        command = ['sacct', '-j', job.job_ident, '--long', '--parsable2']
-        content = self.command(command)
-        rows = self.parse_sacct(content)
+        rows = self.job_info(job)
         updated = False
         updated_tasks = set()
 
@@ -413,12 +474,13 @@ class SgeScheduler(Scheduler):
         return rows
 
     @classmethod
-    def parse_qstat(cls, content, job_id):
+    def parse_qstat(cls, content, job_id=None):
         """
         parses the qstat content into rows/dicts representing individual jobs
 
         Args:
             content (str): content returned from the qstat command
+            job_id (str): only return rows for this job. Defaults to all jobs
         """
         header = ['job-ID', 'prior', 'name', 'user', 'state', 'submit/start at', 'queue', 'slots', 'ja-task-ID']
         content = content.strip()
@@ -444,7 +506,7 @@ class SgeScheduler(Scheduler):
             task_ident = row['ja-task-ID']
             if not task_ident or set(task_ident) & set(',:-'):
                 task_ident = None
-            if row['job-ID'] == job_id:
+            if job_id is None or row['job-ID'] == job_id:
                 rows.append({
                     'task_ident': task_ident,
                     'job_ident': row['job-ID'],
@@ -525,6 +587,32 @@ class SgeScheduler(Scheduler):
         except AttributeError:
             pass
 
+    def query_info(self, job_idents):
+        """
+        runs a single qstat command for the jobs still on the scheduler and a single (compound) qacct command for the
+        jobs which are no longer scheduled
+
+        Args:
+            job_idents (list of str): the job ids to query
+        """
+        try:
+            content = self.command(['qstat', '-u', "*"])
+            rows = [row for row in self.parse_qstat(content) if row['job_ident'] in job_idents]
+        except subprocess.CalledProcessError:  # no jobs queued
+            rows = []
+        queued = {row['job_ident'] for row in rows}
+        finished = [job_ident for job_ident in job_idents if job_ident not in queued]
+        if len(finished) == 1:
+            content = self.command(['qacct', '-j', finished[0]])
+            rows.extend(self.parse_qacct(content))
+        elif finished:
+            # qacct takes a single job id so the queries are chained into one command. Jobs without accounting
+            # information are left out and so are queried again individually
+            command = ' ; '.join(['qacct -j {} 2>/dev/null'.format(job_ident) for job_ident in finished] + ['true'])
+            content = self.command(command, shell=True)
+            rows.extend(self.parse_qacct(content))
+        return rows
+
     def update_info(self, job):
         """
         runs a subprocess scontrol command to get job details and add them to the current job
@@ -537,19 +625,8 @@ class SgeScheduler(Scheduler):
         """
         if not job.job_ident:
             return
-        try:
-            content = self.command(['qstat', '-u', "*"])
-            rows = self.parse_qstat(content, job.job_ident)
-        except subprocess.CalledProcessError:  # job not queued
-            rows = []
-
+        rows = self.job_info(job)
         updated = False
-        if not rows:
-            # job no longer scheduled
-            command = ['qacct', '-j', job.job_ident]
-            content = self.command(command)
-            rows = self.parse_qacct(content)
-            # job is still on the scheduler
         for row in rows:
             if row['job_ident'] != job.job_ident:
                 continue
@@ -742,6 +819,17 @@ class TorqueScheduler(SgeScheduler):
             })
         return rows
 
+    def query_info(self, job_idents):
+        """
+        runs a single qstat command for all the given jobs
+
+        Args:
+            job_idents (list of str): the job ids to query
+        """
+        command = ['qstat', '-f', '-t'] + list(job_idents)  # always split into tasks
+        content = self.command(command)
+        return self.parse_qstat(content)
+
     def submit(self, job):
         """
         runs a subprocess qsub command
@@ -813,9 +901,7 @@ class TorqueScheduler(SgeScheduler):
         if job.job_ident is None:
             job.status = JOB_STATUS.NOT_SUBMITTED
             return
-        command = ['qstat', '-f', '-t', job.job_ident]  # always split into tasks
-        content = self.command(command)
-        rows = self.parse_qstat(content)
+        rows = self.job_info(job)
         tasks_updated = False
 
         for row in rows:
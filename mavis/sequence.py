@@ -0,0 +1,173 @@
+"""
+fast primitives for operating on DNA sequences (plain strings). These give the same results as the equivalent Bio.Seq
+operations but avoid building Seq objects on every call, which is costly when they are called per-base or per-read
+
+Note:
+    this module must not import from :mod:`mavis.constants` (which re-exports from here)
+"""
+import re
+
+from Bio.Alphabet import Gapped
+from Bio.Alphabet.IUPAC import ambiguous_dna
+from Bio.Data.CodonTable import standard_dna_table
+from Bio.Data.IUPACData import ambiguous_dna_complement, ambiguous_dna_values
+from Bio.Seq import Seq
+import numpy as np
+
+_CODON_SIZE = 3
+_LETTERS_ONLY = re.compile('^[A-Za-z]*$')
+
+
+def _complement_table():
+    mapping = {}
+    for base, comp in ambiguous_dna_complement.items():
+        mapping[base.upper()] = comp.upper()
+        mapping[base.lower()] = comp.lower()
+    return str.maketrans(mapping)
+
+
+_COMPLEMENT = _complement_table()
+
+
+def reverse_complement(s):
+    """
+    reverse complement a DNA sequence. Handles ambiguous (IUPAC) bases and preserves the case of the input. Letters
+    which are not DNA codes are left as-is
+
+    Args:
+        s (str): the input DNA sequence
+
+    Returns:
+        :class:`str`: the reverse complement of the input sequence
+
+    Warning:
+        assumes the input is a DNA sequence
+
+    Example:
+        >>> reverse_complement('ATCCGGT')
+        'ACCGGAT'
+    """
+    input_string = str(s)
+    if not _LETTERS_ONLY.match(input_string):
+        raise ValueError('unexpected sequence format. cannot reverse complement', input_string)
+    return input_string.translate(_COMPLEMENT)[::-1]
+
+
+def _codon_table():
+    table = {}
+    for codon, amino_acid in standard_dna_table.forward_table.items():
+        table[codon] = amino_acid
+        table[codon.lower()] = amino_acid
+    for codon in standard_dna_table.stop_codons:
+        table[codon] = '*'
+        table[codon.lower()] = '*'
+    return table
+
+
+_CODONS = _codon_table()
+
+
+def _translate_codon(codon):
+    """
+    translate a codon which is not in the precomputed table (ambiguous, mixed case, gaps, etc.) using Bio.Seq and
+    remember the result. Invalid codons raise the Bio.Seq error
+    """
+    amino_acid = str(Seq(codon, Gapped(ambiguous_dna, '-')).translate())
+    _CODONS[codon] = amino_acid
+    return amino_acid
+
+
+def translate(s, reading_frame=0):
+    """
+    given a DNA sequence, translates it (standard codon table) and returns the protein amino acid sequence. Any
+    trailing partial codon is ignored
+
+    Args:
+        s (str): the input DNA sequence
+        reading_frame (int): where to start translating the sequence
+
+    Returns:
+        str: the amino acid sequence
+
+    Example:
+        >>> translate('ATGGCCTAA')
+        'MA*'
+        >>> translate('CATGGCCTAA', 1)
+        'MA*'
+    """
+    s = str(s)
+    codons = _CODONS
+    return ''.join([
+        codons.get(codon) or _translate_codon(codon)
+        for codon in (s[i:i + _CODON_SIZE] for i in range(reading_frame % _CODON_SIZE, len(s) - _CODON_SIZE + 1, _CODON_SIZE))
+    ])
+
+
+def _iupac_bit_table():
+    """
+    lookup table from the character code to a bitmask of the DNA bases it can represent (A=1, C=2, G=4, T=8). Characters
+    which are not IUPAC DNA codes are 0
+    """
+    bits = {'A': 1, 'C': 2, 'G': 4, 'T': 8}
+    table = np.zeros(256, dtype=np.uint8)
+    for code, bases in ambiguous_dna_values.items():
+        mask = 0
+        for base in bases:
+            mask |= bits[base]
+        table[ord(code.upper())] = mask
+        table[ord(code.lower())] = mask
+    return table
+
+
+IUPAC_BITS = _iupac_bit_table()
+""":class:`numpy.ndarray`: bitmask (A=1, C=2, G=4, T=8) of the bases each character code can represent"""
+
+_IUPAC_BITS_BY_CHAR = {chr(i): int(mask) for i, mask in enumerate(IUPAC_BITS) if mask}
+_UPPER = np.array([ord(chr(c).upper()) if c < 128 else c for c in range(0, 256)], dtype=np.uint8)
+
+
+def _encode(seq):
+    return np.frombuffer(str(seq).encode('latin-1'), dtype=np.uint8)
+
+
+def dna_match(x, y):
+    """
+    check if two bases are compatible, allowing ambiguous (IUPAC) DNA codes. Characters which are not DNA codes only
+    match the same (case-insensitive) character
+
+    Example:
+        >>> dna_match('A', 'N')
+        True
+        >>> dna_match('A', 'T')
+        False
+        >>> dna_match('a', 'R')
+        True
+    """
+    x_bits = _IUPAC_BITS_BY_CHAR.get(x, 0)
+    y_bits = _IUPAC_BITS_BY_CHAR.get(y, 0)
+    if x_bits and y_bits:
+        return bool(x_bits & y_bits)
+    elif x_bits or y_bits:
+        if len(x) == 1 and len(y) == 1:
+            return False
+    # not single DNA codes, compare as sets of characters
+    x = x.upper()
+    y = y.upper()
+    return bool(set(ambiguous_dna_values.get(x, x)) & set(ambiguous_dna_values.get(y, y)))
+
+
+def match_mask(ref, seq):
+    """
+    compares two sequences of equal length position by position, allowing ambiguous (IUPAC) DNA matches. Gives the same
+    result as :func:`dna_match` for each pair of characters
+
+    Returns:
+        numpy.ndarray: boolean array which is True where the characters match
+    """
+    ref = _encode(ref)
+    seq = _encode(seq)
+    ref_bits = IUPAC_BITS[ref]
+    seq_bits = IUPAC_BITS[seq]
+    # characters which are not DNA codes only match the same (case-insensitive) character
+    other = (ref_bits == 0) & (seq_bits == 0) & (_UPPER[ref] == _UPPER[seq])
+    return ((ref_bits & seq_bits) != 0) | other
@@ -7,9 +7,9 @@ import tab
 
 from .constants import DEFAULTS, HOMOPOLYMER_MIN_LENGTH
 from .summary import annotate_dgv, filter_by_annotations, filter_by_call_method, filter_by_evidence, get_pairing_state, group_by_distance
-from ..constants import CALL_METHOD, COLUMNS, PROTOCOL, SVTYPE
+from ..constants import CALL_METHOD, COLUMNS, PROTOCOL, SUBCOMMAND, SVTYPE
 from ..pairing.constants import DEFAULTS as PAIRING_DEFAULTS
-from ..util import generate_complete_stamp, LOG, output_tabbed_file, read_inputs, soft_cast
+from ..util import generate_complete_stamp, LOG, output_tabbed_file, read_inputs, resource_usage, soft_cast, write_resource_report
 
 
 def soft_cast_null(value):
@@ -38,6 +38,7 @@ def main(
     start_time=int(time.time()),
     **kwargs
 ):
+    initial_usage = resource_usage()
     annotations.load()
     if dgv_annotation:
         dgv_annotation.load()
@@ -113,6 +114,7 @@ def main(
             COLUMNS.cdna_synon: soft_cast_null
         }
     ))
+    input_pairs = len(bpps)
     # load all transcripts
     reference_transcripts = dict()
     best_transcripts = dict()
@@ -363,3 +365,8 @@ def main(
             ]):
                 lib_rows.append(row)
         output_tabbed_file(lib_rows, filename, header=output_columns)
+    write_resource_report(output, SUBCOMMAND.SUMMARY, start_time, items={
+        'breakpoint_pairs': input_pairs,
+        'filtered_pairs': len(filtered_pairs),
+        'structural_variants': len(rows)
+    }, inputs=inputs, initial_usage=initial_usage, log=LOG)
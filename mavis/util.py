@@ -3,11 +3,17 @@ from datetime import datetime
 import errno
 from functools import partial
 from glob import glob
+import io
 import itertools
+import json
 import os
+import pickle
 import re
+import resource
+import tempfile
 import time
 import logging
+import platform
 import sys
 
 from braceexpand import braceexpand
@@ -20,6 +26,7 @@ from .error import InvalidRearrangement
 from .interval import Interval
 
 ENV_VAR_PREFIX = 'MAVIS_'
+RESOURCE_REPORT_FILENAME = 'MAVIS.resources.json'
 
 
 class Log:
@@ -250,6 +257,51 @@ def read_inputs(inputs, **kwargs):
     return bpps
 
 
+def read_inputs_in_chunks(inputs, chunk_size, **kwargs):
+    """
+    Reads the input files as in :func:`read_inputs` but only holds chunk_size rows of a file in memory at a time
+
+    Args:
+        inputs (:class:`List` of :class:`str`): list of input files to read
+        chunk_size (int): the maximum number of rows to read at a time
+
+    Yields:
+        :class:`list` of :class:`~mavis.breakpoint.BreakpointPair`: the pairs read from each chunk of rows
+    """
+    kwargs.setdefault('require', [])
+    kwargs['require'] = list(set(kwargs['require'] + [COLUMNS.protocol]))
+    kwargs.setdefault('in_', {})
+    kwargs['in_'][COLUMNS.protocol] = PROTOCOL.values()
+    total = 0
+    for finput in bash_expands(*inputs):
+        LOG('loading:', finput)
+        with open(finput, 'r') as fh:
+            # comment lines and the header are repeated for each chunk
+            header_lines = []
+            for line in fh:
+                header_lines.append(line)
+                if not re.match(r'^\s*##', line):
+                    break
+            line_offset = 0
+            while True:
+                lines = list(itertools.islice(fh, chunk_size))
+                if not lines and line_offset:  # the previous chunk ended exactly at the end of the file
+                    break
+                try:
+                    pairs = read_bpp_from_input_file(io.StringIO(''.join(header_lines + lines)), **kwargs)
+                except tab.EmptyFileError:
+                    LOG('ignoring empty file:', finput)
+                    break
+                for pair in pairs:
+                    pair.data['line_no'] += line_offset
+                line_offset += len(lines)
+                total += len(pairs)
+                yield pairs
+                if len(lines) < chunk_size:
+                    break
+    LOG('loaded', total, 'breakpoint pairs')
+
+
 def output_tabbed_file(bpps, filename, header=None):
     if header is None:
         custom_header = False
@@ -272,6 +324,48 @@ def output_tabbed_file(bpps, filename, header=None):
             fh.write('\t'.join([str(row.get(c, None)) for c in header]) + '\n')
 
 
+class SpooledTabbedFile:
+    """
+    Writes a tabbed file (see :func:`output_tabbed_file`) one row at a time. The header is not known until all the
+    rows have been added so the rows are pickled to a temporary file (kept in memory up to max_size bytes) and the
+    output file is written on close
+    """
+    def __init__(self, filename, header=None, max_size=2 ** 20):
+        self.filename = filename
+        self.custom_header = header is not None
+        self.header = set() if header is None else header
+        self.count = 0
+        self._spool = tempfile.SpooledTemporaryFile(max_size=max_size)
+
+    def write(self, row):
+        if not isinstance(row, dict):
+            row = row.flatten()
+        if not self.custom_header:
+            self.header.update(row.keys())
+        pickle.dump(row, self._spool)
+        self.count += 1
+
+    def close(self):
+        header = sort_columns(self.header)
+        self._spool.seek(0)
+        with open(self.filename, 'w') as fh:
+            LOG('writing:', self.filename)
+            fh.write('#' + '\t'.join(header) + '\n')
+            for _ in range(0, self.count):
+                row = pickle.load(self._spool)
+                fh.write('\t'.join([str(row.get(c, None)) for c in header]) + '\n')
+        self._spool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._spool.close()
+
+
 def write_bed_file(filename, bed_rows):
     LOG('writing:', filename)
     with open(filename, 'w') as fh:
@@ -300,6 +394,127 @@ def get_connected_components(adj_matrix):
     return components
 
 
+def peak_rss(who=resource.RUSAGE_SELF):
+    """
+    Args:
+        who (int): resource.RUSAGE_SELF for the current process or resource.RUSAGE_CHILDREN for the largest of its
+            terminated (and waited for) child processes
+
+    Returns:
+        float: the peak resident set size (high-water mark) in MB
+    """
+    rss = resource.getrusage(who).ru_maxrss
+    if sys.platform == 'darwin':  # reported in bytes rather than kB
+        return rss / 2 ** 20
+    return rss / 2 ** 10
+
+
+def resource_usage():
+    """
+    The resources used so far by the current process. The cpu time includes child processes (ex. the aligner) but the
+    bytes read and written do not and are only available where /proc/self/io exists (linux)
+
+    Returns:
+        dict: the user/system cpu time (s), peak resident set size (MB) and bytes read/written
+    """
+    usage = {'user_cpu_time': 0, 'system_cpu_time': 0, 'read_bytes': None, 'write_bytes': None}
+    for who in [resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN]:
+        rusage = resource.getrusage(who)
+        usage['user_cpu_time'] += rusage.ru_utime
+        usage['system_cpu_time'] += rusage.ru_stime
+    usage['max_rss_mb'] = round(max(peak_rss(), peak_rss(resource.RUSAGE_CHILDREN)), 1)
+    for attr in ['user_cpu_time', 'system_cpu_time']:
+        usage[attr] = round(usage[attr], 2)
+    usage['cpu_time'] = round(usage['user_cpu_time'] + usage['system_cpu_time'], 2)
+    try:
+        with open('/proc/self/io', 'r') as fh:
+            counters = dict([line.split(':') for line in fh.readlines() if ':' in line])
+        usage['read_bytes'] = int(counters['rchar'])
+        usage['write_bytes'] = int(counters['wchar'])
+    except (OSError, KeyError, ValueError):
+        pass
+    return usage
+
+
+def _total_file_size(*paths):
+    total = 0
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                total += sum([os.path.getsize(os.path.join(dirpath, f)) for f in filenames])
+        elif os.path.isfile(path):
+            total += os.path.getsize(path)
+    return total
+
+
+def write_resource_report(
+    output_dir, command, start_time, items=None, inputs=None, library=None, initial_usage=None, log=DEVNULL
+):
+    """
+    writes a json report (MAVIS.resources.json) of the resources used by a pipeline stage alongside its outputs. These
+    are collected by mavis schedule to summarize the resources used per library and stage
+
+    Args:
+        output_dir (str): path to the output directory of the stage (the report is written here)
+        command (SUBCOMMAND): the pipeline stage
+        start_time (int): the start time (epoch seconds)
+        items (:class:`dict` of :class:`int` by :class:`str`): counts of items processed (ex. clusters, evidence)
+        inputs (:class:`list` of :class:`str`): the input files (used to compute the input size)
+        library (str): the library the stage was run for (if specific to a single library)
+        initial_usage (dict): the :func:`resource_usage` at the start of the stage. Subtracted from the current usage
+            so that only the stage is counted when the process is reused for several jobs (ex. by the local scheduler)
+        log (function): function to print logging messages to
+
+    Returns:
+        str: path to the report
+
+    Note:
+        the peak resident set size is for the lifetime of the process and cannot be reset between stages
+    """
+    end_time = time.time()
+    wall_time = round(end_time - start_time, 2)
+    report = {
+        'command': command,
+        'library': library,
+        'hostname': platform.node(),
+        'start_time': start_time,
+        'end_time': int(end_time),
+        'wall_time': wall_time,
+        'input_bytes': _total_file_size(*(inputs or [])),
+        'output_bytes': _total_file_size(output_dir),
+        'items': dict(items or {}),
+        'items_per_second': {}
+    }
+    report.update(resource_usage())
+    if initial_usage:
+        for attr in ['user_cpu_time', 'system_cpu_time', 'cpu_time', 'read_bytes', 'write_bytes']:
+            if report[attr] is not None and initial_usage.get(attr) is not None:
+                report[attr] = round(report[attr] - initial_usage[attr], 2)
+    for item, count in report['items'].items():
+        report['items_per_second'][item] = round(count / wall_time, 3) if wall_time > 0 else None
+    filename = os.path.join(output_dir, RESOURCE_REPORT_FILENAME)
+    log('writing:', filename)
+    with open(filename, 'w') as fh:
+        json.dump(report, fh, sort_keys=True, indent=4)
+    return filename
+
+
+def load_resource_reports(*output_dirs):
+    """
+    load the resource reports (see :func:`write_resource_report`) from the stage output directories
+
+    Returns:
+        :class:`list` of :class:`dict`: the reports which exist
+    """
+    reports = []
+    for output_dir in output_dirs:
+        filename = os.path.join(output_dir, RESOURCE_REPORT_FILENAME)
+        if os.path.exists(filename):
+            with open(filename, 'r') as fh:
+                reports.append(json.load(fh))
+    return reports
+
+
 def generate_complete_stamp(output_dir, log=DEVNULL, prefix='MAVIS.', start_time=None):
     """
     writes a complete stamp, optionally including the run time if start_time is given
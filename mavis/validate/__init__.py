@@ -26,6 +26,8 @@ further into events and also for developers debugging when adding new features,
 +-----------------------------+------------------------+------------------------------------+
 | ``*.validation-passed.tab`` | text/tabbed            | validated events                   |
 +-----------------------------+------------------------+------------------------------------+
+| ``*.validation-stats.tab``  | text/tabbed            | per-evidence timings and counters  |
++-----------------------------+------------------------+------------------------------------+
 | ``*.contigs.fa``            | :term:`fasta`          | assembled contigs                  |
 +-----------------------------+------------------------+------------------------------------+
 | ``*.contigs.blat_out.pslx`` | :term:`pslx`           | results from blatting contigs      |
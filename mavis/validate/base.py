@@ -6,9 +6,10 @@ from ..bam import cigar as _cigar
 from ..bam import read as _read
 from ..bam.cache import BamCache
 from ..breakpoint import BreakpointPair
-from ..constants import CIGAR, COLUMNS, NA_MAPPING_QUALITY, ORIENT, PROTOCOL, PYSAM_READ_FLAGS, reverse_complement, STRAND, SVTYPE
+from ..constants import CIGAR, COLUMNS, NA_MAPPING_QUALITY, ORIENT, PROTOCOL, PYSAM_READ_FLAGS, STRAND, SVTYPE
 from ..error import NotSpecifiedError
 from ..interval import Interval
+from ..sequence import reverse_complement
 from ..util import DEVNULL
 
 
@@ -103,6 +104,8 @@ class Evidence(BreakpointPair):
         self.contigs = []
 
         self.half_mapped = (set(), set())
+        self.released_read_counts = None
+        self.assembly_stats = {}  # size of the assembly graph (see assemble)
 
         try:
             self.compute_fragment_size(None, None)
@@ -688,6 +691,7 @@ class Evidence(BreakpointPair):
             assembly_max_paths=self.assembly_max_paths,
             min_contig_length=self.read_length,
             log=log,
+            stats=self.assembly_stats,
             remap_min_overlap=remap_min_overlap,
             remap_min_exact_match=self.assembly_min_exact_match_to_remap,
             assembly_min_uniq=self.assembly_min_uniq,
@@ -935,15 +939,39 @@ class Evidence(BreakpointPair):
     def copy(self):
         raise NotImplementedError('not appropriate for copy of evidence')
 
-    def flatten(self):
-        row = BreakpointPair.flatten(self)
-        row.update({
+    def raw_read_counts(self):
+        """
+        Returns:
+            dict of int by str: the number of reads/pairs collected for each type of evidence by column name
+        """
+        if self.released_read_counts is not None:
+            return dict(self.released_read_counts)
+        return {
             COLUMNS.raw_flanking_pairs: len(self.flanking_pairs),
             COLUMNS.raw_spanning_reads: len(self.spanning_reads),
             COLUMNS.raw_break1_split_reads: len(self.split_reads[0]),
             COLUMNS.raw_break2_split_reads: len(self.split_reads[1]),
             COLUMNS.raw_break1_half_mapped_reads: len(self.half_mapped[0]),
             COLUMNS.raw_break2_half_mapped_reads: len(self.half_mapped[1]),
+        }
+
+    def release_reads(self):
+        """
+        drop the collected reads once events have been called for this evidence so that they can be garbage
+        collected. The raw read counts are kept for output. Reads referenced by the event calls or the contigs
+        are not affected
+        """
+        self.released_read_counts = self.raw_read_counts()
+        self.split_reads = (set(), set())
+        self.flanking_pairs = set()
+        self.compatible_flanking_pairs = set()
+        self.spanning_reads = set()
+        self.half_mapped = (set(), set())
+
+    def flatten(self):
+        row = BreakpointPair.flatten(self)
+        row.update(self.raw_read_counts())
+        row.update({
             COLUMNS.protocol: self.protocol,
             COLUMNS.event_type: ';'.join(sorted(self.putative_event_types())),
             COLUMNS.contigs_assembled: len(self.contigs),
@@ -1,3 +1,4 @@
+import heapq
 import itertools
 import math
 import statistics
@@ -6,8 +7,9 @@ from ..align import SplitAlignment, call_read_events, call_paired_read_event, co
 from ..bam import read as _read
 
 from ..breakpoint import Breakpoint, BreakpointPair
-from ..constants import CALL_METHOD, COLUMNS, ORIENT, PYSAM_READ_FLAGS, STRAND, SVTYPE, reverse_complement
+from ..constants import CALL_METHOD, COLUMNS, ORIENT, PYSAM_READ_FLAGS, STRAND, SVTYPE
 from ..interval import Interval
+from ..sequence import reverse_complement
 
 
 class EventCall(BreakpointPair):
@@ -670,6 +672,119 @@ def _call_interval_by_flanking_coverage(coverage, orientation, max_expected_frag
         raise ValueError('orientation must be specific', orientation)
 
 
+class _FlankingPairSelection:
+    """
+    the set of flanking pairs (and their fragment sizes) currently used to call an event by flanking pairs. Supports
+    removing the fragment size farthest from the average and computing the coverage intervals in O(log n) per
+    removal by keeping running sums and heaps (with lazy deletion) of the fragment and coverage extremes
+    """
+
+    def __init__(self, pairs, fragments, orient1, orient2):
+        """
+        Args:
+            pairs (:class:`list` of :class:`tuple` of :class:`~pysam.AlignedSegment`): the flanking read pairs
+            fragments (:class:`list` of :class:`Interval`): the fragment size of each pair
+            orient1 (ORIENT): the orientation of the first breakpoint
+            orient2 (ORIENT): the orientation of the second breakpoint
+        """
+        self.pairs = pairs
+        self.removed = set()
+        self.count = len(pairs)
+        # group the pairs by fragment size, in the order they are first seen
+        self.pairs_by_fragment = {}
+        for index, fragment in enumerate(fragments):
+            self.pairs_by_fragment.setdefault((fragment.start, fragment.end), []).append(index)
+        self.sum_start = sum([f.start for f in fragments])
+        self.sum_end = sum([f.end for f in fragments])
+        self.fragments_by_order = []
+        self.fragments_by_end = []
+        self.fragments_by_start = []
+        for fragment, indices in self.pairs_by_fragment.items():
+            first_index = indices[0]
+            self.fragments_by_order.append((first_index, fragment))
+            self.fragments_by_end.append((fragment[1], first_index, fragment))
+            self.fragments_by_start.append((-fragment[0], first_index, fragment))
+        for heap in [self.fragments_by_order, self.fragments_by_end, self.fragments_by_start]:
+            heapq.heapify(heap)
+        # coverage extremes of each pair on either side of the event
+        self.coverage_heaps = [[], [], [], []]
+        for index, (read, mate) in enumerate(pairs):
+            if orient1 == ORIENT.LEFT:
+                start1, end1 = read.reference_end - read.query_alignment_length + 1, read.reference_end
+            else:
+                start1, end1 = read.reference_start + 1, read.reference_start + read.query_alignment_length
+            if orient2 == ORIENT.LEFT:
+                start2, end2 = mate.reference_end - mate.query_alignment_length + 1, mate.reference_end
+            else:
+                start2, end2 = mate.reference_start + 1, mate.reference_start + mate.query_alignment_length
+            self.coverage_heaps[0].append((min(start1, end1), index))
+            self.coverage_heaps[1].append((-max(start1, end1), index))
+            self.coverage_heaps[2].append((min(start2, end2), index))
+            self.coverage_heaps[3].append((-max(start2, end2), index))
+        for heap in self.coverage_heaps:
+            heapq.heapify(heap)
+
+    def __len__(self):
+        return self.count
+
+    def selected_pairs(self):
+        """
+        Returns:
+            :class:`list` of :class:`tuple` of :class:`~pysam.AlignedSegment`: the remaining pairs (in the input order)
+        """
+        return [pair for index, pair in enumerate(self.pairs) if index not in self.removed]
+
+    def _top_fragment(self, heap):
+        # drop entries for removed fragment sizes from the top of the heap
+        while heap[0][-1] not in self.pairs_by_fragment:
+            heapq.heappop(heap)
+        return heap[0]
+
+    def _top_pair(self, heap):
+        # drop entries for removed pairs from the top of the heap
+        while heap[0][1] in self.removed:
+            heapq.heappop(heap)
+        return heap[0][0]
+
+    def coverage_intervals(self):
+        """
+        Returns:
+            tuple of Interval and Interval: the area covered by the remaining flanking reads and mates
+        """
+        cover1 = Interval(self._top_pair(self.coverage_heaps[0]), -self._top_pair(self.coverage_heaps[1]))
+        cover2 = Interval(self._top_pair(self.coverage_heaps[2]), -self._top_pair(self.coverage_heaps[3]))
+        return cover1, cover2
+
+    def remove_farthest_fragment(self):
+        """
+        removes all pairs with the fragment size which is farthest from the average fragment size. Where several
+        fragment sizes are equally far, the first one (in input order) is removed
+        """
+        average_start = self.sum_start / self.count
+        average_end = self.sum_end / self.count
+        min_end, left_index, left_fragment = self._top_fragment(self.fragments_by_end)
+        max_start, right_index, right_fragment = self._top_fragment(self.fragments_by_start)
+        max_start = -max_start
+        left_dist = average_start - min_end if min_end < average_start else 0
+        right_dist = max_start - average_end if max_start > average_end else 0
+
+        candidates = []
+        farthest_dist = max(left_dist, right_dist)
+        if farthest_dist == 0:
+            candidates.append(self._top_fragment(self.fragments_by_order)[::-1])
+        if left_dist == farthest_dist and farthest_dist:
+            candidates.append((left_fragment, left_index))
+        if right_dist == farthest_dist and farthest_dist:
+            candidates.append((right_fragment, right_index))
+        farthest = min(candidates, key=lambda c: c[1])[0]
+
+        indices = self.pairs_by_fragment.pop(farthest)
+        self.removed.update(indices)
+        self.count -= len(indices)
+        self.sum_start -= farthest[0] * len(indices)
+        self.sum_end -= farthest[1] * len(indices)
+
+
 def _call_by_flanking_pairs(evidence, event_type, consumed_evidence=None):
     """
     Given a set of flanking reads, computes the coverage interval (the area that is covered by flanking read alignments)
@@ -689,22 +804,6 @@ def _call_by_flanking_pairs(evidence, event_type, consumed_evidence=None):
     fragments = []
     available_flanking_pairs = filter_consumed_pairs(evidence.flanking_pairs, consumed_evidence)
 
-    def _compute_coverage_intervals(pairs):
-        first_positions = []
-        second_positions = []
-        for read, mate in pairs:
-            if evidence.break1.orient == ORIENT.LEFT:
-                first_positions.extend([read.reference_end, read.reference_end - read.query_alignment_length + 1])
-            else:
-                first_positions.extend([read.reference_start + 1, read.reference_start + read.query_alignment_length])
-            if evidence.break2.orient == ORIENT.LEFT:
-                second_positions.extend([mate.reference_end, mate.reference_end - mate.query_alignment_length + 1])
-            else:
-                second_positions.extend([mate.reference_start + 1, mate.reference_start + mate.query_alignment_length])
-        cover1 = Interval(min(first_positions), max(first_positions))
-        cover2 = Interval(min(second_positions), max(second_positions))
-        return cover1, cover2
-
     for read, mate in sorted(available_flanking_pairs, key=lambda r: (r[0].key(), r[1].key())):
         # check that the fragment size is reasonable
         fragment_size = evidence.compute_fragment_size(read, mate)
@@ -721,9 +820,11 @@ def _call_by_flanking_pairs(evidence, event_type, consumed_evidence=None):
     cover2 = None
     window1 = None
     window2 = None
+    selection = _FlankingPairSelection(
+        selected_flanking_pairs, fragments, evidence.break1.orient, evidence.break2.orient)
 
-    while selected_flanking_pairs:  # try calling until you run out of available reads
-        cover1, cover2 = _compute_coverage_intervals(selected_flanking_pairs)
+    while selection:  # try calling until you run out of available reads
+        cover1, cover2 = selection.coverage_intervals()
         try:
             window1 = _call_interval_by_flanking_coverage(
                 cover1, evidence.break1.orient, evidence.max_expected_fragment_size, evidence.read_length,
@@ -736,14 +837,10 @@ def _call_by_flanking_pairs(evidence, event_type, consumed_evidence=None):
         except AssertionError:
             # length of coverage is greater than expected
             # remove the farthest outlier from the pairs wrt fragment size (most likely to belong to a different event)
-            average = Interval(
-                sum([f.start for f in fragments]) / len(fragments),
-                sum([f.end for f in fragments]) / len(fragments))
-            farthest = max(fragments, key=lambda f: abs(Interval.dist(f, average)))
-            fragments = [f for f in fragments if f != farthest]
-            selected_flanking_pairs = [(r, m) for r, m in selected_flanking_pairs if evidence.compute_fragment_size(r, m) != farthest]
+            selection.remove_farthest_fragment()
         else:
             break
+    selected_flanking_pairs = selection.selected_pairs()
     if len(selected_flanking_pairs) < evidence.min_flanking_pairs_resolution:
         raise AssertionError('insufficient flanking pairs ({}) to call {} by flanking reads'.format(
             len(selected_flanking_pairs), event_type))
@@ -3,6 +3,8 @@ from ..align import SUPPORTED_ALIGNER
 from ..util import WeakMavisNamespace
 
 PASS_FILENAME = 'validation-passed.tab'
+STATS_FILENAME = 'validation-stats.tab'
+STATS_SUMMARY_FILENAME = 'validation-stats.summary'
 
 DEFAULTS = WeakMavisNamespace()
 """
@@ -18,6 +20,10 @@ DEFAULTS = WeakMavisNamespace()
 - :term:`blat_limit_top_aln`
 - :term:`blat_min_identity`
 - :term:`call_error`
+- :term:`contig_aln_batch_size`
+- :term:`contig_aln_cache`
+- :term:`contig_aln_cache_max_age`
+- :term:`contig_aln_cache_max_size`
 - :term:`contig_aln_max_event_size`
 - :term:`contig_aln_merge_inner_anchor`
 - :term:`contig_aln_merge_outer_anchor`
@@ -44,6 +50,7 @@ DEFAULTS = WeakMavisNamespace()
 - :term:`min_spanning_reads_resolution`
 - :term:`min_splits_reads_resolution`
 - :term:`outer_window_min_event_size`
+- :term:`persistent_aligner`
 - :term:`stdev_count_abnormal`
 - :term:`strand_determining_read`
 
@@ -195,6 +202,31 @@ DEFAULTS.add(
 DEFAULTS.add(
     'write_evidence_files', True, defn='write the intermediate bam and bed files containing the raw evidence collected and '
     'contigs aligned. Not required for subsequent steps but can be useful in debugging and deep investigation of events')
+DEFAULTS.add(
+    'persistent_aligner', False,
+    defn='keep the aligner reference loaded between alignments in the same process. For blat a local gfServer is '
+    'started and the contigs are aligned with gfClient. For bwa the index is loaded into shared memory (bwa shm) and shared by the jobs on the host. It is removed when the last job using it on the host ends. '
+    'Only applies to the local scheduler, whose worker processes run several validation jobs (see local_warm_workers). '
+    'It is ignored for the other schedulers since each of their tasks runs in a new process and would load the reference only to discard it')
+DEFAULTS.add(
+    'contig_aln_batch_size', None, cast_type=int, nullable=True,
+    defn='number of clusters whose contigs are aligned together. When given, the contigs are aligned in batches on a '
+    'background thread while the following clusters are assembled and events are called for each batch as its '
+    'alignments complete. Otherwise all contigs are aligned in a single call after assembly. Batching is best combined '
+    'with the persistent_aligner option so that the aligner reference is not re-loaded for each batch')
+DEFAULTS.add(
+    'contig_aln_cache', None, cast_type=str, nullable=True,
+    defn='path to a (sqlite) database used to cache the contig alignments between runs. Contigs which have already '
+    'been aligned with the same aligner version, aligner reference and alignment options are not re-aligned. The '
+    'database must be on a local disk (ex. /tmp) rather than a network file system, since sqlite locking is '
+    'unreliable over NFS. Jobs on the same node share the cache')
+DEFAULTS.add(
+    'contig_aln_cache_max_size', 1000000, cast_type=int, nullable=True,
+    defn='the maximum number of contig sequences to keep in the contig alignment cache. The least recently used '
+    'contigs are removed first')
+DEFAULTS.add(
+    'contig_aln_cache_max_age', None, cast_type=float, nullable=True,
+    defn='contigs which have not been used in this many days are removed from the contig alignment cache')
 DEFAULTS.add(
     'clean_aligner_files', False, defn='Remove the aligner output files after the validation stage is complete. Not'
     ' required for subsequent steps but can be useful in debugging and deep investigation of events')
@@ -134,11 +134,12 @@ class TranscriptomeEvidence(Evidence):
                 start > transcript.reference_object.end and not is_left
             ]):
                 continue
-            cdna_start, start_shift = transcript.convert_genomic_to_nearest_cdna(
+            coordinates = transcript.cdna_coordinate_index
+            cdna_start, start_shift = coordinates.convert_genomic_to_nearest_cdna(
                 start, stick_direction=ORIENT.LEFT if is_left else ORIENT.RIGHT, allow_outside=True)
             if abs(start_shift) > distance:  # entirely within an intron
                 continue
-            if transcript.is_reverse:
+            if coordinates.is_reverse:
                 if is_left:
                     cdna_end = cdna_start + (distance - start_shift)
                 else:
@@ -151,7 +152,7 @@ class TranscriptomeEvidence(Evidence):
             if cdna_end <= 0:
                 cdna_end -= 1
             # convert the cdna end back to genomic coordinates
-            genomic_end = transcript.convert_cdna_to_genomic(cdna_end)
+            genomic_end = coordinates.convert_cdna_to_genomic(cdna_end)
             if genomic_end == normal_end:
                 continue
             genomic_end_positions.add(genomic_end)
@@ -186,13 +187,12 @@ class TranscriptomeEvidence(Evidence):
         mixed = []
         inter = []
         transcripts = self._select_transcripts(chrom, strand)
-        genomic_distance = Evidence.distance(start, end).end
         # try to calculate assuming the positions are exonic
         for transcript in itertools.chain.from_iterable([t.transcripts for t in transcripts]):
             if not transcript.reference_object.position & Interval(start, end):
                 continue
-            cdna_start, start_shift = transcript.convert_genomic_to_nearest_cdna(start)
-            cdna_end, end_shift = transcript.convert_genomic_to_nearest_cdna(end)
+            (cdna_start, start_shift), (cdna_end, end_shift) = \
+                transcript.cdna_coordinate_index.convert_genomic_to_nearest_cdna_many([start, end])
             dist = abs(cdna_end - cdna_start) + abs(start_shift) + abs(end_shift)
             if cdna_start == cdna_end:
                 dist = abs(start_shift - end_shift)
@@ -1,23 +1,204 @@
+import collections
+from concurrent import futures
+import contextlib
 import hashlib
 import itertools
 import os
-import re
 import time
 import warnings
 
-import pysam
 from shortuuid import uuid
 
 from .call import call_events
-from .constants import DEFAULTS, PASS_FILENAME
+from .constants import DEFAULTS, PASS_FILENAME, STATS_FILENAME, STATS_SUMMARY_FILENAME
 from .evidence import GenomeEvidence, TranscriptomeEvidence
-from ..align import align_sequences, select_contig_alignments, SUPPORTED_ALIGNER
+from ..align import align_sequences, AlignmentCache, select_contig_alignments, SUPPORTED_ALIGNER
 from ..annotate.base import BioInterval
-from ..bam import cigar as _cigar
 from ..bam.cache import BamCache
+from ..bam.writer import SortedBamWriter
 from ..breakpoint import BreakpointPair
-from ..constants import CALL_METHOD, COLUMNS, MavisNamespace, PROTOCOL
-from ..util import filter_on_overlap, LOG, mkdirp, output_tabbed_file, read_inputs, write_bed_file
+from ..constants import CALL_METHOD, COLUMNS, MavisNamespace, PROTOCOL, SUBCOMMAND
+from ..util import (
+    filter_on_overlap, load_resource_reports, LOG, mkdirp, output_tabbed_file, peak_rss, read_inputs, resource_usage,
+    write_bed_file, write_resource_report
+)
+from ..work_queue import WorkQueue
+
+STAGES = ['load_evidence', 'assemble_contig', 'align', 'select_contig_alignments', 'call_events']
+COUNTERS = ['fetched_reads', 'mate_cache_hits', 'mate_cache_misses', COLUMNS.contigs_assembled, 'events_called']
+
+
+@contextlib.contextmanager
+def measure_stage(stats, stage):
+    """
+    records the wall time (s) and the peak memory of the process (MB) at the end of a stage of processing an evidence
+    object
+
+    Args:
+        stats (dict): the per-evidence stats to update
+        stage (str): the name of the stage being measured
+    """
+    start_time = time.time()
+    try:
+        yield
+    finally:
+        stats['{}_time'.format(stage)] = round(time.time() - start_time, 4)
+        stats['{}_peak_rss'.format(stage)] = round(peak_rss(), 1)
+
+
+def summarize_evidence_stats(rows):
+    """
+    Args:
+        rows (list of dict): the per-evidence stats
+
+    Returns:
+        list of str: lines summarizing the time spent in each stage and the totals for the counters
+    """
+    lines = ['evidence: {}'.format(len(rows))]
+    for stage in STAGES:
+        column = '{}_time'.format(stage)
+        total = sum([row.get(column, 0) for row in rows])
+        line = '{} time (s): total {:.2f}'.format(stage, total)
+        if rows:
+            slowest = max(rows, key=lambda row: row.get(column, 0))
+            line += '; mean {:.4f}; max {:.4f} ({})'.format(
+                total / len(rows), slowest.get(column, 0), slowest[COLUMNS.cluster_id])
+        lines.append(line)
+    for counter in COUNTERS:
+        lines.append('{}: {}'.format(counter, sum([row.get(counter, 0) for row in rows])))
+    lines.append('peak rss (MB): {:.1f}'.format(peak_rss()))
+    return lines
+
+
+def assemble_evidence(evidence, index=0, total=1, stats=None):
+    """
+    Gathers the evidence (reads) for a breakpoint pair and assembles the contigs
+
+    Args:
+        evidence (Evidence): the evidence object to collect reads and assemble contigs for
+        index (int): position of the evidence in the input (for logging)
+        total (int): number of input evidence objects (for logging)
+        stats (dict): if given, updated with the timings and counters for gathering and assembling the evidence
+
+    Returns:
+        dict of str by str: the contig sequences by name
+    """
+    if stats is None:
+        stats = {}
+    contig_sequences = {}
+    LOG()
+    LOG(
+        '({} of {})'.format(index + 1, total),
+        'gathered evidence for:', evidence.cluster_id,
+        '' if COLUMNS.tracking_id not in evidence.data else '(tracking_id: {})'.format(evidence.tracking_id),
+        time_stamp=True
+    )
+    LOG(evidence, time_stamp=False)
+    LOG('possible event type(s):', BreakpointPair.classify(evidence), time_stamp=False)
+    LOG('outer window regions:  {}:{}-{}  {}:{}-{}'.format(
+        evidence.break1.chr, evidence.outer_window1[0], evidence.outer_window1[1],
+        evidence.break2.chr, evidence.outer_window2[0], evidence.outer_window2[1]), time_stamp=False)
+    LOG('inner window regions:  {}:{}-{}  {}:{}-{}'.format(
+        evidence.break1.chr, evidence.inner_window1[0], evidence.inner_window1[1],
+        evidence.break2.chr, evidence.inner_window2[0], evidence.inner_window2[1]), time_stamp=False)
+    bam_cache = evidence.bam_cache
+    initial_counts = (bam_cache.fetched_reads, bam_cache.mate_cache_hits, bam_cache.mate_cache_misses)
+    with measure_stage(stats, 'load_evidence'):
+        evidence.load_evidence(log=LOG)
+    stats.update({
+        'fetched_reads': bam_cache.fetched_reads - initial_counts[0],
+        'mate_cache_hits': bam_cache.mate_cache_hits - initial_counts[1],
+        'mate_cache_misses': bam_cache.mate_cache_misses - initial_counts[2],
+        COLUMNS.break1_ewindow_count: evidence.counts[0],
+        COLUMNS.break2_ewindow_count: evidence.counts[1],
+    })
+    LOG(
+        'flanking pairs: {};'.format(len(evidence.flanking_pairs)),
+        'split reads: {}, {};'.format(*[len(a) for a in evidence.split_reads]),
+        'half-mapped reads: {}, {};'.format(*[len(a) for a in evidence.half_mapped]),
+        'spanning-reads: {};'.format(len(evidence.spanning_reads)),
+        'compatible flanking pairs:', len(evidence.compatible_flanking_pairs),
+        time_stamp=False
+    )
+    with measure_stage(stats, 'assemble_contig'):
+        evidence.assemble_contig(log=LOG)
+    stats.update({
+        'assembly_nodes': evidence.assembly_stats.get('assembly_nodes', 0),
+        'assembly_edges': evidence.assembly_stats.get('assembly_edges', 0),
+        COLUMNS.contigs_assembled: len(evidence.contigs)
+    })
+    LOG('assembled {} contigs'.format(len(evidence.contigs)), time_stamp=False)
+    for contig in evidence.contigs:
+        name = 'seq-{}'.format(hashlib.md5(contig.seq.encode('utf-8')).hexdigest())
+        LOG('>', name, '(size={}; reads={:.0f}; coverage={:.2f})'.format(
+            len(contig.seq), contig.remap_score(), contig.remap_coverage()), time_stamp=False)
+        LOG(contig.seq[:140], time_stamp=False)
+        contig_sequences[name] = contig.seq
+    return contig_sequences
+
+
+def call_evidence_events(evidence, validation_counts, index=0, total=1, alignment_stats=None):
+    """
+    Calls events for an evidence object (after the contig alignments have been selected) and assigns the validation ids
+
+    Args:
+        evidence (Evidence): the evidence object to call events for
+        validation_counts (dict of int by str): the number of events called so far by cluster id (updated)
+        index (int): position of the evidence in the input (for logging)
+        total (int): number of input evidence objects (for logging)
+        alignment_stats (MavisNamespace): the pair counts from selecting the contig alignments (for logging)
+
+    Returns:
+        list of EventCall: the events called. If none were called, the filter comment is added to the evidence
+    """
+    LOG()
+    LOG('({} of {}) calling events for: {} {} (tracking_id: {})'.format(
+        index + 1, total, evidence.cluster_id, evidence.putative_event_types(), evidence.tracking_id), time_stamp=True)
+    LOG('source:', evidence)
+    if alignment_stats is not None:
+        LOG('contig alignment pairs: {} possible, {} tried after pruning, {} supporting'.format(
+            alignment_stats.pairs, alignment_stats.candidate_pairs, alignment_stats.supporting_pairs), time_stamp=False)
+    calls = []
+    failure_comment = None
+    try:
+        calls = call_events(evidence)
+    except UserWarning as err:
+        LOG('warning: error in calling events', repr(err))
+        failure_comment = str(err)
+
+    if not calls:
+        failure_comment = ['zero events were called'] if failure_comment is None else failure_comment
+        evidence.data[COLUMNS.filter_comment] = failure_comment
+
+    LOG('called {} event(s)'.format(len(calls)), time_stamp=True)
+    for call in calls:
+        LOG(call)
+        if call.call_method == CALL_METHOD.CONTIG:
+            LOG('\t{} {} [{}] contig_alignment_score: {}, contig_alignment_mq: {} contig_alignment_rank: {}'.format(
+                call.event_type, call.call_method, call.contig_alignment.query_name,
+                round(call.contig_alignment.score(), 2), tuple(call.contig_alignment.mapping_quality()),
+                tuple(call.contig_alignment.alignment_rank())
+            ))
+            LOG('\talignment:', call.contig_alignment.alignment_id())
+        elif call.contig_alignment:
+            LOG('\t{} {} alignment:'.format(
+                call.event_type, call.call_method), call.contig_alignment.alignment_id())
+        else:
+            LOG('\t{} {}'.format(call.event_type, call.call_method), time_stamp=False)
+        validation_counts[call.cluster_id] = validation_counts.get(call.cluster_id, 0) + 1
+        call.data[COLUMNS.validation_id] = '{}-v{}'.format(call.cluster_id, validation_counts[call.cluster_id])
+        LOG(
+            '\tremapped reads: {}; spanning reads: {}; split reads: [{} ({}), {} ({}), {}]'
+            ', flanking pairs: {}{}'.format(
+                0 if not call.contig else len(call.contig.input_reads),
+                len(call.spanning_reads),
+                len(call.break1_split_read_names()), len(call.break1_split_read_names(tgt=True)),
+                len(call.break2_split_read_names()), len(call.break2_split_read_names(tgt=True)),
+                len(call.linking_split_read_names()),
+                len(call.flanking_pairs),
+                '' if not call.has_compatible else '(' + str(len(call.compatible_flanking_pairs)) + ')'
+            ))
+    return calls
 
 
 def main(
@@ -41,6 +222,7 @@ def main(
         masking (:class:`~mavis.annotate.file_io.ReferenceFile`): see :func:`~mavis.annotate.file_io.load_masking_regions`
         aligner_reference (:class:`~mavis.annotate.file_io.ReferenceFile`): path to the aligner reference file (e.g 2bit file for blat)
     """
+    initial_usage = resource_usage()
     mkdirp(output)
     # check the files exist early to avoid waiting for errors
     if protocol == PROTOCOL.TRANS:
@@ -53,12 +235,14 @@ def main(
     validation_settings.update({k: v for k, v in kwargs.items() if k in DEFAULTS})
     validation_settings = MavisNamespace(**validation_settings)
 
-    raw_evidence_bam = os.path.join(output, 'raw_evidence.bam')
-    contig_bam = os.path.join(output, 'contigs.bam')
+    raw_evidence_bam = os.path.join(output, 'raw_evidence.sorted.bam')
+    contig_bam = os.path.join(output, 'contigs.sorted.bam')
     evidence_bed = os.path.join(output, 'evidence.bed')
 
     passed_output_file = os.path.join(output, PASS_FILENAME)
     passed_bed_file = os.path.join(output, 'validation-passed.bed')
+    stats_output_file = os.path.join(output, STATS_FILENAME)
+    stats_summary_file = os.path.join(output, STATS_SUMMARY_FILENAME)
     failed_output_file = os.path.join(output, 'validation-failed.tab')
     contig_aligner_fa = os.path.join(output, 'contigs.fa')
     if validation_settings.aligner == SUPPORTED_ALIGNER.BLAT:
@@ -137,112 +321,172 @@ def main(
             ))
 
     evidence_clusters, filtered_evidence_clusters = filter_on_overlap(evidence_clusters, extended_masks)
-    contig_sequences = {}
-    for i, evidence in enumerate(evidence_clusters):
-        LOG()
-        LOG(
-            '({} of {})'.format(i + 1, len(evidence_clusters)),
-            'gathered evidence for:', evidence.cluster_id,
-            '' if COLUMNS.tracking_id not in evidence.data else '(tracking_id: {})'.format(evidence.tracking_id),
-            time_stamp=True
-        )
-        LOG(evidence, time_stamp=False)
-        LOG('possible event type(s):', BreakpointPair.classify(evidence), time_stamp=False)
-        LOG('outer window regions:  {}:{}-{}  {}:{}-{}'.format(
-            evidence.break1.chr, evidence.outer_window1[0], evidence.outer_window1[1],
-            evidence.break2.chr, evidence.outer_window2[0], evidence.outer_window2[1]), time_stamp=False)
-        LOG('inner window regions:  {}:{}-{}  {}:{}-{}'.format(
-            evidence.break1.chr, evidence.inner_window1[0], evidence.inner_window1[1],
-            evidence.break2.chr, evidence.inner_window2[0], evidence.inner_window2[1]), time_stamp=False)
-        evidence.load_evidence(log=LOG)
-        LOG(
-            'flanking pairs: {};'.format(len(evidence.flanking_pairs)),
-            'split reads: {}, {};'.format(*[len(a) for a in evidence.split_reads]),
-            'half-mapped reads: {}, {};'.format(*[len(a) for a in evidence.half_mapped]),
-            'spanning-reads: {};'.format(len(evidence.spanning_reads)),
-            'compatible flanking pairs:', len(evidence.compatible_flanking_pairs),
-            time_stamp=False
+    write_bed_file(evidence_bed, itertools.chain.from_iterable([e.get_bed_repesentation() for e in evidence_clusters]))
+
+    alignment_cache = None
+    if validation_settings.contig_aln_cache:
+        LOG('using the contig alignment cache:', validation_settings.contig_aln_cache)
+        alignment_cache = AlignmentCache(
+            validation_settings.contig_aln_cache,
+            aligner=kwargs.get('aligner', validation_settings.aligner),
+            aligner_reference=aligner_reference.name[0],
+            aligner_version=kwargs.get('aligner_version', None),
+            options={
+                'blat_min_identity': kwargs.get('blat_min_identity', validation_settings.blat_min_identity),
+                'blat_limit_top_aln': kwargs.get('blat_limit_top_aln', validation_settings.blat_limit_top_aln),
+                'persistent_aligner': validation_settings.persistent_aligner,
+                'reference_genome': reference_genome.name
+            },
+            max_size=validation_settings.contig_aln_cache_max_size,
+            max_age=validation_settings.contig_aln_cache_max_age
         )
-        evidence.assemble_contig(log=LOG)
-        LOG('assembled {} contigs'.format(len(evidence.contigs)), time_stamp=False)
-        for contig in evidence.contigs:
-            name = 'seq-{}'.format(hashlib.md5(contig.seq.encode('utf-8')).hexdigest())
-            LOG('>', name, '(size={}; reads={:.0f}; coverage={:.2f})'.format(
-                len(contig.seq), contig.remap_score(), contig.remap_coverage()), time_stamp=False)
-            LOG(contig.seq[:140], time_stamp=False)
-            contig_sequences[name] = contig.seq
-
-    LOG('will output:', contig_aligner_fa, contig_aligner_output)
-    raw_contig_alignments = align_sequences(
-        contig_sequences,
-        input_bam_cache,
+    align_kwargs = dict(
+        input_bam_cache=input_bam_cache,
         reference_genome=reference_genome.content,
-        aligner_fa_input_file=contig_aligner_fa,
-        aligner_output_file=contig_aligner_output,
         clean_files=validation_settings.clean_aligner_files,
+        persistent_aligner=validation_settings.persistent_aligner,
+        alignment_cache=alignment_cache,
         aligner=kwargs.get('aligner', validation_settings.aligner),
         aligner_reference=aligner_reference.name[0],
-        aligner_output_log=contig_aligner_log,
         blat_min_identity=kwargs.get('blat_min_identity', validation_settings.blat_min_identity),
         blat_limit_top_aln=kwargs.get('blat_limit_top_aln', validation_settings.blat_limit_top_aln),
         log=LOG
     )
-    for evidence in evidence_clusters:
-        select_contig_alignments(evidence, raw_contig_alignments)
-    LOG('alignment complete', time_stamp=True)
     event_calls = []
     total_pass = 0
-    write_bed_file(evidence_bed, itertools.chain.from_iterable([e.get_bed_repesentation() for e in evidence_clusters]))
     validation_counts = {}
-    for index, evidence in enumerate(evidence_clusters):
-        LOG()
-        LOG('({} of {}) calling events for: {} {} (tracking_id: {})'.format(
-            index + 1, len(evidence_clusters), evidence.cluster_id, evidence.putative_event_types(), evidence.tracking_id), time_stamp=True)
-        LOG('source:', evidence)
-        calls = []
-        failure_comment = None
-        try:
-            calls = call_events(evidence)
-            event_calls.extend(calls)
-        except UserWarning as err:
-            LOG('warning: error in calling events', repr(err))
-            failure_comment = str(err)
-
-        if not calls:
-            failure_comment = ['zero events were called'] if failure_comment is None else failure_comment
-            evidence.data[COLUMNS.filter_comment] = failure_comment
-            filtered_evidence_clusters.append(evidence)
-        else:
-            total_pass += 1
-
-        LOG('called {} event(s)'.format(len(calls)), time_stamp=True)
-        for call in calls:
-            LOG(call)
-            if call.call_method == CALL_METHOD.CONTIG:
-                LOG('\t{} {} [{}] contig_alignment_score: {}, contig_alignment_mq: {} contig_alignment_rank: {}'.format(
-                    call.event_type, call.call_method, call.contig_alignment.query_name,
-                    round(call.contig_alignment.score(), 2), tuple(call.contig_alignment.mapping_quality()),
-                    tuple(call.contig_alignment.alignment_rank())
-                ))
-                LOG('\talignment:', call.contig_alignment.alignment_id())
-            elif call.contig_alignment:
-                LOG('\t{} {} alignment:'.format(
-                    call.event_type, call.call_method), call.contig_alignment.alignment_id())
+    evidence_stats = [
+        {
+            COLUMNS.cluster_id: evidence.cluster_id,
+            COLUMNS.tracking_id: evidence.tracking_id,
+            COLUMNS.event_type: ';'.join(sorted(evidence.putative_event_types()))
+        } for evidence in evidence_clusters
+    ]
+
+    contig_writer = None
+    evidence_writer = None
+    written_evidence_reads = set()
+    if validation_settings.write_evidence_files:
+        # reads are written (sorted) as each evidence object is called rather than all at the end so that the
+        # collected reads can be released as we go
+        LOG('will output:', contig_bam, raw_evidence_bam)
+        contig_writer = SortedBamWriter(contig_bam, input_bam_cache.fh)
+        evidence_writer = SortedBamWriter(raw_evidence_bam, input_bam_cache.fh)
+
+    def align_batch(contig_sequences, **kwargs):
+        align_stats = {}
+        with measure_stage(align_stats, 'align'):
+            raw_contig_alignments = align_sequences(contig_sequences, **kwargs)
+        return raw_contig_alignments, align_stats
+
+    def call_batch(batch, aligned_batch):
+        nonlocal total_pass
+        raw_contig_alignments, align_stats = aligned_batch
+        # the alignment time is shared between the evidence in the batch by the number of contigs aligned
+        batch_contigs = sum([evidence_stats[index][COLUMNS.contigs_assembled] for index, _ in batch])
+        for index, evidence in batch:
+            stats = evidence_stats[index]
+            if batch_contigs:
+                stats['align_time'] = round(
+                    align_stats['align_time'] * stats[COLUMNS.contigs_assembled] / batch_contigs, 4)
             else:
-                LOG('\t{} {}'.format(call.event_type, call.call_method), time_stamp=False)
-            validation_counts[call.cluster_id] = validation_counts.get(call.cluster_id, 0) + 1
-            call.data[COLUMNS.validation_id] = '{}-v{}'.format(call.cluster_id, validation_counts[call.cluster_id])
-            LOG(
-                '\tremapped reads: {}; spanning reads: {}; split reads: [{} ({}), {} ({}), {}]'
-                ', flanking pairs: {}{}'.format(
-                    0 if not call.contig else len(call.contig.input_reads),
-                    len(call.spanning_reads),
-                    len(call.break1_split_read_names()), len(call.break1_split_read_names(tgt=True)),
-                    len(call.break2_split_read_names()), len(call.break2_split_read_names(tgt=True)),
-                    len(call.linking_split_read_names()),
-                    len(call.flanking_pairs),
-                    '' if not call.has_compatible else '(' + str(len(call.compatible_flanking_pairs)) + ')'
-                ))
+                stats['align_time'] = round(align_stats['align_time'] / len(batch), 4)
+            stats['align_peak_rss'] = align_stats['align_peak_rss']
+            with measure_stage(stats, 'select_contig_alignments'):
+                alignment_stats = select_contig_alignments(evidence, raw_contig_alignments)
+            with measure_stage(stats, 'call_events'):
+                calls = call_evidence_events(
+                    evidence, validation_counts, index=index, total=len(evidence_clusters),
+                    alignment_stats=alignment_stats)
+            stats.update({
+                'contig_alignment_pairs': alignment_stats.pairs,
+                'contig_alignment_candidate_pairs': alignment_stats.candidate_pairs,
+                'events_called': len(calls)
+            })
+            if calls:
+                event_calls.extend(calls)
+                total_pass += 1
+            else:
+                filtered_evidence_clusters.append(evidence)
+            if validation_settings.write_evidence_files:
+                for contig in evidence.contigs:
+                    for aln in contig.alignments:
+                        contig_writer.write(aln.read1)
+                        if aln.read2:
+                            contig_writer.write(aln.read2)
+                for read in evidence.supporting_reads():
+                    # keyed on the alignment rather than hash(read) which is only 32 bits and collides between reads
+                    read_key = (
+                        read.query_name, read.flag, read.reference_id, read.reference_start, read.cigarstring)
+                    if read_key not in written_evidence_reads:
+                        written_evidence_reads.add(read_key)
+                        evidence_writer.write(read)
+            evidence.release_reads()
+
+    aligner_bam_cache = None
+    try:
+        if not validation_settings.contig_aln_batch_size:
+            contig_sequences = {}
+            for i, evidence in enumerate(evidence_clusters):
+                contig_sequences.update(assemble_evidence(
+                    evidence, index=i, total=len(evidence_clusters), stats=evidence_stats[i]))
+
+            LOG('will output:', contig_aligner_fa, contig_aligner_output)
+            aligned_batch = align_batch(
+                contig_sequences,
+                aligner_fa_input_file=contig_aligner_fa,
+                aligner_output_file=contig_aligner_output,
+                aligner_output_log=contig_aligner_log,
+                **align_kwargs
+            )
+            LOG('alignment complete', time_stamp=True)
+            call_batch(list(enumerate(evidence_clusters)), aligned_batch)
+        else:
+            # align the contigs in batches on a background thread while the next clusters are assembled. Events are
+            # called for each batch, in input order, as soon as its alignments are available
+            pending = collections.deque()
+            batch = []
+            contig_sequences = {}
+
+            def batch_filename(filename, batch_number):
+                dirname, basename = os.path.split(filename)
+                return os.path.join(dirname, basename.replace('contigs.', 'contigs.batch-{}.'.format(batch_number), 1))
+
+            # pysam file handles are not thread-safe so the aligner thread looks up the reference ids of the
+            # alignments with its own handle on the input bam
+            aligner_bam_cache = BamCache(os.fsdecode(input_bam_cache.fh.filename), strand_specific)
+            align_kwargs['input_bam_cache'] = aligner_bam_cache
+
+            with futures.ThreadPoolExecutor(max_workers=1) as aligner_pool:
+                for i, evidence in enumerate(evidence_clusters):
+                    contig_sequences.update(assemble_evidence(
+                        evidence, index=i, total=len(evidence_clusters), stats=evidence_stats[i]))
+                    batch.append((i, evidence))
+                    if len(batch) >= validation_settings.contig_aln_batch_size or i == len(evidence_clusters) - 1:
+                        batch_number = batch[0][0] // validation_settings.contig_aln_batch_size + 1
+                        LOG('aligning batch', batch_number, '({} contigs)'.format(len(contig_sequences)), time_stamp=True)
+                        pending.append((batch, aligner_pool.submit(
+                            align_batch,
+                            contig_sequences,
+                            aligner_fa_input_file=batch_filename(contig_aligner_fa, batch_number),
+                            aligner_output_file=batch_filename(contig_aligner_output, batch_number),
+                            aligner_output_log=batch_filename(contig_aligner_log, batch_number),
+                            **align_kwargs
+                        )))
+                        batch = []
+                        contig_sequences = {}
+                    while pending and pending[0][1].done():
+                        done_batch, result = pending.popleft()
+                        call_batch(done_batch, result.result())
+                while pending:
+                    done_batch, result = pending.popleft()
+                    call_batch(done_batch, result.result())
+            LOG('alignment complete', time_stamp=True)
+    finally:
+        if aligner_bam_cache is not None:
+            aligner_bam_cache.close()
+        if alignment_cache is not None:
+            alignment_cache.close()
 
     # write the output validated clusters (split by type and contig)
     for i, call in enumerate(event_calls):
@@ -260,43 +504,18 @@ def main(
     output_tabbed_file(event_calls, passed_output_file)
     output_tabbed_file(filtered_evidence_clusters, failed_output_file)
     write_bed_file(passed_bed_file, itertools.chain.from_iterable([e.get_bed_repesentation() for e in event_calls]))
+    output_tabbed_file(evidence_stats, stats_output_file)
+    with open(stats_summary_file, 'w') as fh:
+        LOG('writing:', stats_summary_file)
+        for line in summarize_evidence_stats(evidence_stats):
+            LOG(line, time_stamp=False)
+            fh.write(line + '\n')
 
     if validation_settings.write_evidence_files:
-        with pysam.AlignmentFile(contig_bam, 'wb', template=input_bam_cache.fh) as fh:
-            LOG('writing:', contig_bam, time_stamp=True)
-            for evidence in evidence_clusters:
-                for contig in evidence.contigs:
-                    for aln in contig.alignments:
-                        aln.read1.cigar = _cigar.convert_for_igv(aln.read1.cigar)
-                        fh.write(aln.read1)
-                        if aln.read2:
-                            aln.read2.cigar = _cigar.convert_for_igv(aln.read2.cigar)
-                            fh.write(aln.read2)
-
-        # write the evidence
-        with pysam.AlignmentFile(raw_evidence_bam, 'wb', template=input_bam_cache.fh) as fh:
-            LOG('writing:', raw_evidence_bam, time_stamp=True)
-            reads = set()
-            for evidence in evidence_clusters:
-                reads.update(evidence.supporting_reads())
-            for read in reads:
-                read.cigar = _cigar.convert_for_igv(read.cigar)
-                fh.write(read)
-        # now sort the contig bam
-        sort = re.sub(r'.bam$', '.sorted.bam', contig_bam)
-        LOG('sorting the bam file:', contig_bam, time_stamp=True)
-        pysam.sort('-o', sort, contig_bam)
-        contig_bam = sort
-        LOG('indexing the sorted bam:', contig_bam)
-        pysam.index(contig_bam)
-
-        # then sort the evidence bam file
-        sort = re.sub(r'.bam$', '.sorted.bam', raw_evidence_bam)
-        LOG('sorting the bam file:', raw_evidence_bam, time_stamp=True)
-        pysam.sort('-o', sort, raw_evidence_bam)
-        raw_evidence_bam = sort
-        LOG('indexing the sorted bam:', raw_evidence_bam)
-        pysam.index(raw_evidence_bam)
+        LOG('writing:', contig_bam, '({} reads)'.format(contig_writer.count), time_stamp=True)
+        contig_writer.close()
+        LOG('writing:', raw_evidence_bam, '({} reads)'.format(evidence_writer.count), time_stamp=True)
+        evidence_writer.close()
 
         # write the igv batch file
         with open(igv_batch_file, 'w') as fh:
@@ -307,3 +526,77 @@ def main(
             fh.write('load {} name="{}"\n'.format(evidence_bed, 'evidence windows'))
             fh.write('load {} name="{}"\n'.format(raw_evidence_bam, 'raw evidence'))
             fh.write('load {} name="{} {} input"\n'.format(bam_file, library, protocol))
+    write_resource_report(output, SUBCOMMAND.VALIDATE, start_time, items={
+        'evidence': len(evidence_clusters),
+        COLUMNS.contigs_assembled: sum([stats.get(COLUMNS.contigs_assembled, 0) for stats in evidence_stats]),
+        'events_called': len(event_calls)
+    }, inputs=inputs, library=library, initial_usage=initial_usage, log=LOG)
+
+
+def queue_main(work_queue, inputs, output, library, start_time=int(time.time()), **kwargs):
+    """
+    Validates the input files by claiming them one at a time from a work queue shared with the other validation jobs
+    of the library. The results for each input file are written to the staging directory of its claim and moved to the
+    output directory the queue gives for it once the file is validated (see :meth:`~mavis.work_queue.WorkQueue.complete`).
+    Waits for files claimed by other workers so that abandoned claims can be taken over
+
+    Args:
+        work_queue (str): path to the work queue directory (see :class:`~mavis.work_queue.WorkQueue`)
+        inputs (list): the input files to validate (must be items of the work queue)
+        output (str): path to the output directory for this worker
+        **kwargs: arguments passed to :func:`main` for each input file
+    """
+    initial_usage = resource_usage()
+    mkdirp(output)
+    queue = WorkQueue(work_queue)
+    if queue.failed(inputs):
+        LOG('failed input files are not claimed until they are reset:', queue.failed(inputs))
+    validated = []
+    queue.start_heartbeat()
+    try:
+        while True:
+            index = queue.claim(inputs, log=LOG)
+            if index is None:
+                if queue.finished(inputs):
+                    break
+                time.sleep(queue.poll_interval)
+                continue
+            input_file, item_output = queue.items[index]
+            staging_output = queue.staging_output(index)
+            LOG('claimed:', input_file, time_stamp=True)
+            try:
+                main(inputs=[input_file], output=staging_output, library=library, start_time=int(time.time()), **kwargs)
+                # the igv batch file lists the results by their path, which changes when they are moved on completion
+                igv_batch_file = os.path.join(staging_output, 'igv.batch')
+                if os.path.exists(igv_batch_file):
+                    with open(igv_batch_file, 'r') as fh:
+                        content = fh.read()
+                    with open(igv_batch_file, 'w') as fh:
+                        fh.write(content.replace(staging_output, item_output))
+            except Exception as err:
+                if not queue.fail(index, repr(err)):
+                    LOG('claim was taken over by another worker, giving up:', input_file, time_stamp=True)
+                    continue
+                raise err
+            if not queue.complete(index):
+                LOG('claim was taken over by another worker, giving up:', input_file, time_stamp=True)
+                continue
+            validated.append(item_output)
+    finally:
+        queue.stop_heartbeat()
+
+    # merge the per-file summaries and resource reports of the files validated by this worker
+    stats_summary_file = os.path.join(output, STATS_SUMMARY_FILENAME)
+    items = {'validated_files': len(validated)}
+    with open(stats_summary_file, 'w') as fh:
+        LOG('writing:', stats_summary_file)
+        fh.write('validated files: {}\n'.format(len(validated)))
+        for item_output in validated:
+            fh.write('\n{}\n'.format(item_output))
+            with open(os.path.join(item_output, STATS_SUMMARY_FILENAME), 'r') as summary_fh:
+                fh.write(summary_fh.read())
+            for report in load_resource_reports(item_output):
+                for item, count in report.get('items', {}).items():
+                    items[item] = items.get(item, 0) + count
+    write_resource_report(
+        output, SUBCOMMAND.VALIDATE, start_time, items=items, library=library, initial_usage=initial_usage, log=LOG)
@@ -0,0 +1,303 @@
+"""
+A work queue shared by the jobs (or array tasks) of a stage through lock files in a directory on a shared file
+system. Each work item is claimed by creating its claim file exclusively. While a worker holds a claim it keeps
+touching the claim file (the heartbeat). A claim whose file has not been touched within the timeout is considered
+abandoned and is taken over by creating the next generation of the claim file, so that only one worker can reclaim it.
+A worker whose claim has been taken over gives up the item instead of marking it done or failed. The results of each
+claim are written to a staging directory of its own and only moved to the output directory of the item when the item
+is marked done, so that a worker whose claim was taken over cannot overwrite the results of the new owner
+"""
+import json
+import os
+import platform
+import re
+import shutil
+import threading
+import time
+
+import shortuuid
+
+from .util import DEVNULL, mkdirp
+
+QUEUE_FILENAME = 'queue.json'
+
+
+class WorkQueue:
+    """
+    Queue of work items (an input file and the output directory its results are written to)
+
+    Attributes:
+        items (:class:`list` of :class:`tuple` of :class:`str` and :class:`str`): the input and output of each item
+        timeout (int): the time (s) after which a claim without a heartbeat is considered abandoned
+        worker (str): the name of this worker (written to the claim files)
+        lost (:class:`set` of :class:`int`): the items whose claims were taken over by another worker
+    """
+    CLAIM_PATTERN = re.compile(r'^(\d+)\.claim\.(\d+)$')
+
+    def __init__(self, path, worker=None):
+        """
+        Args:
+            path (str): path to the queue directory
+            worker (str): the name of this worker. Defaults to the hostname, process id and a unique id
+        """
+        self.path = path
+        with open(os.path.join(path, QUEUE_FILENAME), 'r') as fh:
+            content = json.load(fh)
+        self.items = [(item['input'], item['output']) for item in content['items']]
+        self.timeout = content['timeout']
+        self.worker = worker if worker else '{}-{}-{}'.format(platform.node(), os.getpid(), shortuuid.uuid())
+        self.claims = {}  # claim files held by this worker by item index
+        self.staging = {}  # staging output directories of the claims of this worker by item index
+        self.lost = set()  # indices of the items whose claims were taken over from this worker
+        self._lock = threading.Lock()
+        self._stop_heartbeat = None
+
+    @classmethod
+    def create(cls, path, items, timeout=600):
+        """
+        Args:
+            path (str): path to the queue directory
+            items (:class:`list` of :class:`tuple` of :class:`str` and :class:`str`): the input and output of each item
+            timeout (int): the time (s) after which a claim without a heartbeat is considered abandoned
+
+        Returns:
+            WorkQueue: the new queue
+        """
+        mkdirp(path)
+        temp_file = os.path.join(path, '.{}.{}'.format(QUEUE_FILENAME, shortuuid.uuid()))
+        with open(temp_file, 'w') as fh:
+            json.dump({
+                'timeout': timeout,
+                'items': [{'input': input_file, 'output': output} for input_file, output in items]
+            }, fh, indent=4)
+        os.rename(temp_file, os.path.join(path, QUEUE_FILENAME))
+        return cls(path)
+
+    @property
+    def poll_interval(self):
+        """
+        the time (s) between heartbeats and between checks for abandoned claims
+        """
+        return max(1, self.timeout / 4)
+
+    def _filename(self, index, suffix):
+        return os.path.join(self.path, '{}.{}'.format(index, suffix))
+
+    def _read_state(self):
+        """
+        Returns:
+            tuple: the item indices which are done, the item indices which failed, and the latest claim generation by item index
+        """
+        done = set()
+        failed = set()
+        claims = {}
+        for name in os.listdir(self.path):
+            match = self.CLAIM_PATTERN.match(name)
+            if match:
+                index, generation = int(match.group(1)), int(match.group(2))
+                claims[index] = max(generation, claims.get(index, generation))
+            elif name.endswith('.done'):
+                done.add(int(name.split('.')[0]))
+            elif name.endswith('.failed'):
+                failed.add(int(name.split('.')[0]))
+        return done, failed, claims
+
+    def _is_stale(self, filename):
+        try:
+            return time.time() - os.path.getmtime(filename) > self.timeout
+        except FileNotFoundError:  # completed and removed in the meantime
+            return False
+
+    def _create_claim(self, index, generation):
+        filename = self._filename(index, 'claim.{}'.format(generation))
+        try:
+            fd = os.open(filename, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w') as fh:
+            fh.write(self.worker + '\n')
+        staging_output = '{}.claim.{}'.format(self.items[index][1].rstrip(os.sep), generation)
+        # left by a worker which held the same claim generation before the failed items were reset
+        shutil.rmtree(staging_output, ignore_errors=True)
+        with self._lock:
+            self.claims[index] = filename
+            self.staging[index] = staging_output
+        return True
+
+    def staging_output(self, index):
+        """
+        Returns:
+            str: path to the directory the results of the last claim on the item are written to. It is moved to the
+            output directory of the item when the item is marked done (see :meth:`complete`)
+        """
+        with self._lock:
+            return self.staging[index]
+
+    def _indices(self, inputs=None):
+        if inputs is None:
+            return list(range(len(self.items)))
+        inputs = set(inputs)
+        return [i for i, (input_file, output) in enumerate(self.items) if input_file in inputs]
+
+    def claim(self, inputs=None, log=DEVNULL):
+        """
+        claim the next item which is not done, failed, or claimed by another (live) worker
+
+        Args:
+            inputs (list of str): only claim items for these input files
+
+        Returns:
+            int: the index of the claimed item or None if there are no items to claim
+        """
+        done, failed, claims = self._read_state()
+        for index in self._indices(inputs):
+            if index in done or index in failed:
+                continue
+            if index not in claims:
+                if self._create_claim(index, 0):
+                    return index
+            elif self._is_stale(self._filename(index, 'claim.{}'.format(claims[index]))):
+                if self._create_claim(index, claims[index] + 1):
+                    log('reclaimed abandoned item:', self.items[index][0])
+                    return index
+        return None
+
+    def holds(self, index):
+        """
+        Returns:
+            bool: True if this worker holds the newest claim on the item and it is not already done or failed
+        """
+        with self._lock:
+            filename = self.claims.get(index, None)
+        if filename is None or not os.path.exists(filename):
+            return False
+        generation = int(self.CLAIM_PATTERN.match(os.path.basename(filename)).group(2))
+        done, failed, claims = self._read_state()
+        return index not in done and index not in failed and claims.get(index, None) == generation
+
+    def _remove_staging_output(self, index):
+        with self._lock:
+            staging_output = self.staging.pop(index, None)
+        if staging_output:
+            shutil.rmtree(staging_output, ignore_errors=True)
+
+    def _release(self, index):
+        with self._lock:
+            filename = self.claims.pop(index, None)
+        if filename:
+            try:
+                os.remove(filename)
+            except FileNotFoundError:
+                pass
+
+    def complete(self, index):
+        """
+        mark a claimed item as done and move the results of the claim (see :meth:`staging_output`) to the output
+        directory of the item, replacing any earlier results
+
+        Returns:
+            bool: False if the claim was taken over by another worker, in which case the item and its results are given up instead
+        """
+        if not self.holds(index):
+            self._remove_staging_output(index)
+            self._release(index)
+            return False
+        with self._lock:
+            staging_output = self.staging.pop(index, None)
+        output = self.items[index][1]
+        if staging_output and os.path.exists(staging_output):
+            if os.path.exists(output):
+                shutil.rmtree(output)
+            os.replace(staging_output, output)
+        with open(self._filename(index, 'done'), 'w') as fh:
+            fh.write(self.worker + '\n')
+        self._release(index)
+        return True
+
+    def fail(self, index, error=''):
+        """
+        mark a claimed item as failed. Failed items are not claimed again until they are reset (see :meth:`reset_failed`).
+        The partial results are left in the staging directory of the claim
+
+        Returns:
+            bool: False if the claim was taken over by another worker, in which case the item is given up instead
+        """
+        if not self.holds(index):
+            self._remove_staging_output(index)
+            self._release(index)
+            return False
+        with self._lock:
+            self.staging.pop(index, None)
+        with open(self._filename(index, 'failed'), 'w') as fh:
+            fh.write('{}\n{}\n'.format(self.worker, error))
+        self._release(index)
+        return True
+
+    def reset_failed(self):
+        """
+        make the failed items claimable again
+
+        Returns:
+            int: the number of items reset
+        """
+        done, failed, claims = self._read_state()
+        for index in failed:
+            for name in os.listdir(self.path):
+                match = self.CLAIM_PATTERN.match(name)
+                if match and int(match.group(1)) == index:
+                    os.remove(os.path.join(self.path, name))
+            os.remove(self._filename(index, 'failed'))
+        return len(failed)
+
+    def finished(self, inputs=None):
+        """
+        Returns:
+            bool: True if every item is done or failed
+        """
+        done, failed, claims = self._read_state()
+        return all([index in done or index in failed for index in self._indices(inputs)])
+
+    def failed(self, inputs=None):
+        """
+        Returns:
+            list of str: the input files of the items which failed
+        """
+        done, failed, claims = self._read_state()
+        return [self.items[index][0] for index in self._indices(inputs) if index in failed]
+
+    def heartbeat(self):
+        """
+        touch the claim files held by this worker so that other workers do not consider them abandoned. Claims which
+        have been taken over by another worker are given up (see :attr:`lost`)
+        """
+        with self._lock:
+            claims = list(self.claims.items())
+        for index, filename in claims:
+            if not self.holds(index):
+                self._release(index)
+                self.lost.add(index)
+                continue
+            try:
+                os.utime(filename)
+            except FileNotFoundError:
+                pass
+
+    def start_heartbeat(self):
+        """
+        start a background thread which sends a heartbeat every :attr:`poll_interval` seconds
+        """
+        if self._stop_heartbeat is not None:
+            return
+        self._stop_heartbeat = threading.Event()
+
+        def beat(stop):
+            while not stop.wait(self.poll_interval):
+                self.heartbeat()
+
+        thread = threading.Thread(target=beat, args=(self._stop_heartbeat, ), daemon=True)
+        thread.start()
+
+    def stop_heartbeat(self):
+        if self._stop_heartbeat is not None:
+            self._stop_heartbeat.set()
+            self._stop_heartbeat = None
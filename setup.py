@@ -76,7 +76,7 @@ INSTALL_REQS = [
     'colour',
     'networkx==1.11.0',
     'numpy>=1.13.1',
-    'pysam>=0.9',
+    'pysam>=0.14',
     'pyvcf==0.6.8',
     'shortuuid>=0.5.0',
     'svgwrite'
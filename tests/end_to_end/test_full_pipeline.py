@@ -46,7 +46,7 @@ class TestPipeline(unittest.TestCase):
         # run annotation
         self.assertTrue(glob_exists(self.temp_output, lib, SUBCOMMAND.ANNOTATE))
         # check the generated files
-        for filename in ['annotations.tab', 'annotations.fusion-cdna.fa', 'drawings', 'drawings/*svg', 'drawings/*json', 'MAVIS-*.COMPLETE']:
+        for filename in ['annotations.tab', 'annotations.fusion-cdna.fa', 'drawings', 'drawings/*svg', 'drawings/*json', 'MAVIS-*.COMPLETE', 'MAVIS.resources.json']:
             filename = os.path.join(self.temp_output, lib, SUBCOMMAND.ANNOTATE, '*-1', filename)
             self.assertTrue(glob_exists(filename), msg=filename)
 
@@ -55,18 +55,17 @@ class TestPipeline(unittest.TestCase):
         self.assertTrue(glob_exists(self.temp_output, lib, SUBCOMMAND.VALIDATE))
 
         for suffix in [
-            'contigs.bam',
             'contigs.fa',
             'contigs.sorted.bam',
             'contigs.sorted.bam.bai',
             'evidence.bed',
             'igv.batch',
-            'raw_evidence.bam',
             'raw_evidence.sorted.bam',
             'raw_evidence.sorted.bam.bai',
             'validation-failed.tab',
             'validation-passed.tab',
-            'MAVIS-*.COMPLETE'
+            'MAVIS-*.COMPLETE',
+            'MAVIS.resources.json'
         ]:
             self.assertTrue(glob_exists(self.temp_output, lib, SUBCOMMAND.VALIDATE + '/*-1', suffix), msg=suffix)
 
@@ -89,6 +88,7 @@ class TestPipeline(unittest.TestCase):
         else:
             self.assertTrue(glob_exists(self.temp_output, lib, SUBCOMMAND.CLUSTER, 'cluster_assignment.tab'))
         self.assertTrue(glob_exists(self.temp_output, lib, SUBCOMMAND.CLUSTER, 'MAVIS-*.COMPLETE'))
+        self.assertTrue(glob_exists(self.temp_output, lib, SUBCOMMAND.CLUSTER, 'MAVIS.resources.json'))
 
     def check_pairing(self):
         self.assertTrue(glob_exists(self.temp_output, SUBCOMMAND.PAIR))
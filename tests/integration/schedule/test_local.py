@@ -0,0 +1,233 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from mavis import align
+from mavis.align import recorded_aligner_servers
+from mavis.annotate.file_io import ReferenceFile
+from mavis.schedule.local import LocalJob, LocalScheduler, run_warm
+from mavis.schedule.constants import JOB_STATUS
+from mavis.constants import SUBCOMMAND
+
+from ...util import get_data
+
+
+def touch_after(args):
+    # args: [delay in seconds, output file]
+    time.sleep(float(args[0]))
+    with open(args[1], 'w') as fh:
+        fh.write('{}\n'.format(time.time()))
+
+
+def fail(args):
+    raise ValueError('expected failure')
+
+
+def start_persistent_aligner(args):
+    # args: [aligner reference, output file for the server process id]
+    popen = subprocess.Popen
+
+    def start_server(command, **kwargs):  # stands in for gfServer
+        return popen(['sleep', '600'], **kwargs)
+
+    with mock.patch('subprocess.Popen', start_server), mock.patch('subprocess.call', return_value=0):
+        server = align.get_persistent_aligner(align.SUPPORTED_ALIGNER.BLAT, args[0])
+    with open(args[1], 'w') as fh:
+        fh.write('{}\n'.format(server.process.pid))
+
+
+def is_running(pid):
+    try:
+        with open('/proc/{}/stat'.format(pid), 'r') as fh:
+            return fh.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except FileNotFoundError:
+        return False
+
+
+def cached_keys(args):
+    return [key for key in ReferenceFile.CACHE if key == tuple(args)]
+
+
+class TestLocalScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_output = tempfile.mkdtemp()
+        self.scheduler = LocalScheduler(concurrency_limit=2, memory_limit=10000)
+
+    def job(self, name, func, args, dependencies=None, memory_limit=1000):
+        return LocalJob(
+            args=args, func=func, stage=SUBCOMMAND.VALIDATE, output_dir=os.path.join(self.temp_output, name),
+            name=name, dependencies=dependencies, memory_limit=memory_limit
+        )
+
+    def output(self, name):
+        return os.path.join(self.temp_output, name + '.txt')
+
+    def test_dependent_released_before_stage_completes(self):
+        for name in ['slow', 'fast', 'dependent']:
+            os.makedirs(os.path.join(self.temp_output, name))
+        slow = self.job('slow', touch_after, ['2', self.output('slow')])
+        fast = self.job('fast', touch_after, ['0', self.output('fast')])
+        dependent = self.job('dependent', touch_after, ['0', self.output('dependent')], dependencies=[fast])
+        for job in [slow, fast, dependent]:
+            self.scheduler.submit(job)
+        self.assertIn(dependent.job_ident, self.scheduler.held)
+        self.scheduler.update_info(dependent)
+        self.assertEqual(JOB_STATUS.PENDING, dependent.status)
+        self.scheduler.wait()
+        for job in [slow, fast, dependent]:
+            self.assertEqual(JOB_STATUS.COMPLETED, job.status)
+            self.assertTrue(os.path.exists(job.complete_stamp()))
+        # the dependent job did not wait on the unrelated slow job
+        with open(self.output('dependent'), 'r') as fh:
+            dependent_end = float(fh.read())
+        with open(self.output('slow'), 'r') as fh:
+            slow_end = float(fh.read())
+        self.assertLess(dependent_end, slow_end)
+        self.assertIsNotNone(self.scheduler.pool)
+
+    def test_failed_dependency_cancels_dependents(self):
+        for name in ['failed', 'dependent', 'second']:
+            os.makedirs(os.path.join(self.temp_output, name))
+        failed = self.job('failed', fail, [])
+        dependent = self.job('dependent', touch_after, ['0', self.output('dependent')], dependencies=[failed])
+        second = self.job('second', touch_after, ['0', self.output('second')], dependencies=[dependent])
+        for job in [failed, dependent, second]:
+            self.scheduler.submit(job)
+        self.scheduler.wait()
+        self.assertEqual(JOB_STATUS.FAILED, failed.status)
+        self.assertEqual(JOB_STATUS.CANCELLED, dependent.status)
+        self.assertEqual(JOB_STATUS.CANCELLED, second.status)
+        self.assertFalse(os.path.exists(self.output('dependent')))
+        self.assertFalse(self.scheduler.held)
+
+    def test_unsubmitted_dependency_not_submitted(self):
+        os.makedirs(os.path.join(self.temp_output, 'dependent'))
+        prior = self.job('prior', touch_after, ['0', self.output('prior')])
+        dependent = self.job('dependent', touch_after, ['0', self.output('dependent')], dependencies=[prior])
+        self.scheduler.submit(dependent)
+        self.assertIsNone(dependent.job_ident)
+        self.assertEqual(JOB_STATUS.NOT_SUBMITTED, dependent.status)
+        self.scheduler.wait()
+
+    def test_cancel_held_job(self):
+        for name in ['slow', 'dependent']:
+            os.makedirs(os.path.join(self.temp_output, name))
+        slow = self.job('slow', touch_after, ['1', self.output('slow')])
+        dependent = self.job('dependent', touch_after, ['0', self.output('dependent')], dependencies=[slow])
+        self.scheduler.submit(slow)
+        self.scheduler.submit(dependent)
+        self.scheduler.cancel(dependent)
+        self.assertEqual(JOB_STATUS.CANCELLED, dependent.status)
+        self.assertNotIn(dependent.job_ident, self.scheduler.submitted)
+        self.scheduler.wait()
+        self.assertFalse(os.path.exists(self.output('dependent')))
+
+    def end_time(self, name):
+        with open(self.output(name), 'r') as fh:
+            return float(fh.read())
+
+    def test_memory_admission_largest_first(self):
+        self.scheduler = LocalScheduler(concurrency_limit=3, memory_limit=1000)
+        jobs = {}
+        for name, memory_limit in [('blocker', 1000), ('small', 200), ('large', 700), ('medium', 300)]:
+            os.makedirs(os.path.join(self.temp_output, name))
+            jobs[name] = self.job(name, touch_after, ['0.5', self.output(name)], memory_limit=memory_limit)
+            self.scheduler.submit(jobs[name])
+        self.assertEqual(['blocker'], [job.name for job in self.scheduler._running_jobs()])
+        self.assertEqual(1000, self.scheduler.committed_memory())
+        self.assertEqual({'small', 'large', 'medium'}, {job.name for job in self.scheduler.queued.values()})
+        self.scheduler.update_info(jobs['small'])
+        self.assertEqual(JOB_STATUS.PENDING, jobs['small'].status)
+        self.scheduler.wait()
+        for job in jobs.values():
+            self.assertEqual(JOB_STATUS.COMPLETED, job.status)
+        # large and medium fill the memory limit so small must wait for one of them
+        self.assertLess(self.end_time('blocker'), self.end_time('large'))
+        self.assertLess(self.end_time('large'), self.end_time('small'))
+        self.assertLess(self.end_time('medium'), self.end_time('small'))
+        self.assertFalse(self.scheduler.queued)
+
+    def test_job_larger_than_memory_limit_runs_alone(self):
+        self.scheduler = LocalScheduler(concurrency_limit=2, memory_limit=100, measure_memory=True)
+        os.makedirs(os.path.join(self.temp_output, 'large'))
+        large = self.job('large', touch_after, ['0', self.output('large')], memory_limit=1000)
+        self.scheduler.submit(large)
+        self.assertEqual([large], self.scheduler._running_jobs())
+        self.scheduler.wait()
+        self.assertEqual(JOB_STATUS.COMPLETED, large.status)
+        self.assertGreater(self.scheduler.committed_memory(), 0)  # measured memory of the idle workers
+
+    def test_worker_pids(self):
+        os.makedirs(os.path.join(self.temp_output, 'job'))
+        job = self.job('job', touch_after, ['0', self.output('job')])
+        self.scheduler.submit(job)
+        self.scheduler.wait()
+        pids = self.scheduler.worker_pids()
+        self.assertTrue(pids)
+        self.assertLessEqual(len(pids), 2)
+        self.assertNotIn(os.getpid(), pids)
+
+    def test_worker_pids_without_private_processes(self):
+        # the private process mapping of the pool may change between python versions
+        self.scheduler.pool = mock.Mock(spec=[])
+        child = mock.Mock(pid=1234)
+        with mock.patch('multiprocessing.active_children', return_value=[child]):
+            self.assertEqual([1234], self.scheduler.worker_pids())
+        self.scheduler.pool = None
+        self.assertEqual([], self.scheduler.worker_pids())
+
+    def test_aligner_server_stopped_on_close(self):
+        os.makedirs(os.path.join(self.temp_output, 'job'))
+        job = self.job('job', start_persistent_aligner, [os.path.join(self.temp_output, 'ref.2bit'), self.output('job')])
+        self.scheduler.submit(job)
+        self.scheduler.wait()
+        self.assertEqual(JOB_STATUS.COMPLETED, job.status)
+        with open(self.output('job'), 'r') as fh:
+            pid = int(fh.read())
+        self.assertEqual([pid], recorded_aligner_servers(self.scheduler.aligner_servers))
+        self.scheduler.close()
+        for _ in range(50):  # the server is reaped by init once it is stopped
+            if not is_running(pid):
+                break
+            time.sleep(0.1)
+        self.assertFalse(is_running(pid))
+        self.assertIsNone(self.scheduler.aligner_servers)
+
+    def test_reference_files(self):
+        job = self.job('job', touch_after, [])
+        job.reference_genome = 'genome.fa'
+        job.annotations = 'annotations1.json\nannotations2.json'
+        job.template_metadata = ['cytoband.txt']
+        self.assertEqual([
+            ('template_metadata', ('cytoband.txt', )),
+            ('annotations', ('annotations1.json', 'annotations2.json')),
+            ('reference_genome', ('genome.fa', ))
+        ], job.reference_files())
+
+    def test_run_warm(self):
+        key = (get_data('cytoBand.txt'), )
+        ReferenceFile.CACHE.pop(key, None)
+        result = run_warm(cached_keys, list(key), [('template_metadata', key)])
+        self.assertEqual([key], result)
+        self.assertIn(key, ReferenceFile.CACHE)
+
+    def test_warm_workers(self):
+        self.scheduler = LocalScheduler(concurrency_limit=2, memory_limit=10000, warm_workers=True)
+        os.makedirs(os.path.join(self.temp_output, 'job'))
+        job = self.job('job', cached_keys, [get_data('cytoBand.txt')])
+        job.template_metadata = get_data('cytoBand.txt')
+        self.scheduler.preload([job])
+        self.assertEqual([('template_metadata', (get_data('cytoBand.txt'), ))], self.scheduler.references)
+        self.scheduler.submit(job)
+        self.scheduler.wait()
+        self.assertEqual(JOB_STATUS.COMPLETED, job.status)
+        self.assertEqual([(get_data('cytoBand.txt'), )], job.response.result())
+
+    def tearDown(self):
+        self.scheduler.close()
+        shutil.rmtree(self.temp_output)
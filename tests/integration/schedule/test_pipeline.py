@@ -4,9 +4,14 @@ import configparser
 import tempfile
 import shutil
 import os
+import subprocess
+import sys
 
 from mavis.schedule import pipeline as _pipeline
 from mavis.schedule import scheduler
+from mavis.work_queue import WorkQueue
+from mavis.schedule.constants import JOB_STATUS
+from mavis.constants import EXIT_INCOMPLETE, SUBCOMMAND
 from mavis.main import main
 
 from ...util import get_data
@@ -146,6 +151,146 @@ class TestBuildPipeline(unittest.TestCase):
         self.assertIsNotNone(build.pairing)
         self.assertIsNotNone(build.summary)
 
+    def test_profile_passed_to_scripts(self):
+        os.environ['MAVIS_SCHEDULER'] = 'SLURM'
+        config = os.path.join(self.temp_output, 'pipeline_config.cfg')
+        with open(get_data('pipeline_config.cfg'), 'r') as fh:
+            content = fh.read().replace('[schedule]\n', '[schedule]\nprofile = True\nprofile_top = 10\n')
+        with open(config, 'w') as fh:
+            fh.write(content)
+        output = os.path.join(self.temp_output, 'output')
+
+        with mock.patch('sys.argv', ['mavis', 'setup', '--output', output, config]):
+            self.assertEqual(0, main())
+        build = _pipeline.Pipeline.read_build_file(os.path.join(output, 'build.cfg'))
+        for job in build.validations + build.annotations + [build.pairing, build.summary]:
+            with open(job.script, 'r') as fh:
+                content = fh.read()
+            self.assertIn('--profile True', content)
+            self.assertIn('--profile_memory False', content)
+            self.assertIn('--profile_top 10', content)
+        # clustering is run during setup so should already be profiled
+        for job in build.validations:
+            cluster_dir = os.path.join(os.path.dirname(os.path.dirname(job.script)), 'cluster')
+            self.assertTrue(os.path.exists(os.path.join(cluster_dir, 'profile.cluster.pstats')))
+            self.assertTrue(os.path.exists(os.path.join(cluster_dir, 'profile.cluster.txt')))
+
+    def test_persistent_aligner_ignored_for_array_jobs(self):
+        os.environ['MAVIS_SCHEDULER'] = 'SLURM'
+        config = os.path.join(self.temp_output, 'pipeline_config.cfg')
+        with open(get_data('pipeline_config.cfg'), 'r') as fh:
+            content = fh.read().replace('[validate]\n', '[validate]\npersistent_aligner = True\n')
+        with open(config, 'w') as fh:
+            fh.write(content)
+        output = os.path.join(self.temp_output, 'output')
+
+        with mock.patch('sys.argv', ['mavis', 'setup', '--output', output, config]):
+            self.assertEqual(0, main())
+        build = _pipeline.Pipeline.read_build_file(os.path.join(output, 'build.cfg'))
+        for job in build.validations:
+            with open(job.script, 'r') as fh:
+                self.assertIn('--persistent_aligner False', fh.read())
+
+    def test_validation_work_queue(self):
+        os.environ['MAVIS_SCHEDULER'] = 'SLURM'
+        os.environ['MAVIS_VALIDATION_QUEUE_WORKERS'] = '1'
+        config = get_data('pipeline_config.cfg')
+
+        with mock.patch('sys.argv', ['mavis', 'setup', '--output', self.temp_output, config]):
+            self.assertEqual(0, main())
+        build = _pipeline.Pipeline.read_build_file(os.path.join(self.temp_output, 'build.cfg'))
+        for job in build.validations:
+            queue = WorkQueue(job.work_queue)
+            self.assertEqual(1, job.tasks)
+            self.assertGreater(len(queue.items), 1)
+            with open(job.script, 'r') as fh:
+                content = fh.read()
+            self.assertIn('--work_queue "{}"'.format(job.work_queue), content)
+            self.assertIn('--inputs {}'.format(' '.join([item[0] for item in queue.items])), content)
+            # the annotations read the outputs the queue gives for the clustered files
+            annotate_job = [ajob for ajob in build.annotations if ajob.dependencies == [job]][0]
+            self.assertEqual(len(queue.items), annotate_job.tasks)
+            for task_ident, (input_file, output) in enumerate(queue.items, 1):
+                self.assertTrue(output.endswith('-{}'.format(task_ident)))
+
+    def test_scheduled_clustering(self):
+        os.environ['MAVIS_SCHEDULER'] = 'SLURM'
+        os.environ['MAVIS_SCHEDULED_CLUSTERING'] = 'true'
+        config = get_data('pipeline_config.cfg')
+
+        with mock.patch('sys.argv', ['mavis', 'setup', '--output', self.temp_output, config]):
+            self.assertEqual(0, main())
+        build_file = os.path.join(self.temp_output, 'build.cfg')
+        build = _pipeline.Pipeline.read_build_file(build_file)
+        self.assertEqual(2, len(build.clusterings))
+        self.assertEqual([], build.validations)
+        self.assertEqual([], build.annotations)
+        self.assertIsNone(build.pairing)
+        self.assertIsNone(build.summary)
+        for job in build.clusterings:
+            self.assertEqual(SUBCOMMAND.CLUSTER, job.stage)
+            self.assertTrue(os.path.exists(job.script))
+        self.assertEqual(build.clusterings, build.plan.dependencies)
+        with open(build.plan.script, 'r') as fh:
+            content = fh.read()
+        self.assertIn('setup \\\n\t"{}"'.format(os.path.abspath(config)), content)
+        self.assertIn('--plan True', content)
+
+        # the clustering jobs have completed
+        for job in build.clusterings:
+            for task_ident in [1, 2]:
+                with open(os.path.join(job.output_dir, '{}-{}.tab'.format(build.batch_id, task_ident)), 'w') as fh:
+                    fh.write('')
+        # checked before the plan job has added the remaining jobs
+        for job in build.clusterings + [build.plan]:
+            job.status = JOB_STATUS.COMPLETED
+        with mock.patch.object(build.scheduler, 'update_info'):
+            self.assertEqual(EXIT_INCOMPLETE, build.check_status())
+
+        def command(cmd, **kwargs):
+            if cmd[0] == 'sbatch':
+                command.submitted += 1
+                return 'Submitted batch job {}'.format(command.submitted)
+            return 'JobID|State\n'
+        command.submitted = 0
+
+        with mock.patch('sys.argv', ['mavis', 'setup', config, '--output', self.temp_output, '--plan', 'True']):
+            with mock.patch('mavis.schedule.scheduler.SlurmScheduler.command', side_effect=command):
+                self.assertEqual(0, main())
+        build = _pipeline.Pipeline.read_build_file(build_file)
+        self.assertEqual(2, len(build.clusterings))
+        self.assertEqual(2, len(build.validations))
+        self.assertEqual(2, len(build.annotations))
+        for job in build.validations:
+            self.assertEqual(2, job.tasks)
+        for job in build.validations + build.annotations + [build.pairing, build.summary]:
+            self.assertIsNotNone(job.job_ident)
+
+    def test_scheduled_clustering_local(self):
+        os.environ['MAVIS_SCHEDULER'] = 'LOCAL'
+        os.environ['MAVIS_SCHEDULED_CLUSTERING'] = 'true'
+        config = get_data('pipeline_config.cfg')
+
+        with mock.patch('sys.argv', ['mavis', 'setup', '--output', self.temp_output, config]):
+            self.assertEqual(0, main())
+        build = _pipeline.Pipeline.read_build_file(os.path.join(self.temp_output, 'build.cfg'))
+        self.assertIsNone(build.plan)
+        self.assertEqual(2, len(build.clusterings))
+        for job in build.clusterings:
+            self.assertEqual(JOB_STATUS.COMPLETED, job.status)
+        self.assertGreaterEqual(len(build.validations), 2)
+        self.assertGreaterEqual(len(build.annotations), 2)
+        self.assertIsNotNone(build.pairing)
+        self.assertIsNotNone(build.summary)
+
+    def test_build_file_lock_excludes_other_processes(self):
+        build_file = os.path.join(self.temp_output, 'build.cfg')
+        try_lock = 'import fcntl, sys\nwith open(sys.argv[1], "a") as fh:\n    fcntl.lockf(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)\n'
+        with _pipeline.build_file_lock(build_file):
+            self.assertNotEqual(0, subprocess.call(
+                [sys.executable, '-c', try_lock, build_file + '.lock'], stderr=subprocess.DEVNULL))
+        self.assertEqual(0, subprocess.call([sys.executable, '-c', try_lock, build_file + '.lock']))
+
     # TODO: test_basic_submit
     # TODO: test pipeline failure
     # TODO: test conversion failure
@@ -233,6 +233,35 @@ job-ID  prior   name       user         state submit/start at     queue
             self.assertEqual(_constants.JOB_STATUS.COMPLETED, task.status)
 
 
+class TestCachedInfo(unittest.TestCase):
+
+    @mock.patch('mavis.schedule.scheduler.SgeScheduler.command')
+    def test_single_query_for_all_jobs(self, patcher):
+        patcher.side_effect = [
+            """
+job-ID  prior   name       user         state submit/start at     queue                          slots ja-task-ID
+-----------------------------------------------------------------------------------------------------------------
+3751935 0.50500 subtest.sh creisle      r     05/23/2018 13:44:12 merge.q@n601.numbers.bcgsc.ca      1 1
+3751935 0.50500 subtest.sh creisle      qw    05/23/2018 13:44:12 merge.q@n602.numbers.bcgsc.ca      1 2
+ 217940 1.50000 subtest.sh creisle      qw    05/22/2018 23:39:55                                    1
+            """,
+            QACCT_ARR3_OK
+        ]
+        scheduler = _scheduler.SgeScheduler()
+        queued = _job.ArrayJob(output_dir='temp', job_ident='3751935', task_list=2, stage='validate')
+        finished = _job.ArrayJob(output_dir='temp', job_ident='3757289', task_list=3, stage='validate')
+        other = _job.Job(output_dir='temp', job_ident='3757290', stage='annotate')
+        with scheduler.cached_info([queued, finished, other]) as cache:
+            self.assertEqual({'3751935', '3757289'}, set(cache))
+            for job in [queued, finished]:
+                scheduler.update_info(job)
+        self.assertEqual(2, patcher.call_count)
+        patcher.assert_called_with('qacct -j 3757289 2>/dev/null ; qacct -j 3757290 2>/dev/null ; true', shell=True)
+        self.assertEqual(_constants.JOB_STATUS.RUNNING, queued.get_task(1).status)
+        self.assertEqual(_constants.JOB_STATUS.PENDING, queued.get_task(2).status)
+        self.assertEqual(_constants.JOB_STATUS.COMPLETED, finished.status)
+
+
 class TestParseQacct(unittest.TestCase):
 
     def test_job_array(self):
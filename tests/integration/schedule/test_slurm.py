@@ -318,6 +318,49 @@ JobID|JobIDRaw|JobName|Partition|MaxVMSize|MaxVMSizeNode|MaxVMSizeTask|AveVMSize
         self.assertEqual(3, len(job.task_list))
 
 
+class TestCachedInfo(unittest.TestCase):
+
+    @mock.patch('mavis.schedule.scheduler.SlurmScheduler.command')
+    def test_single_query_for_all_jobs(self, patcher):
+        patcher.return_value = """
+JobID|JobName|User|ReqMem|Elapsed|State|MaxRSS|AveRSS|Partition
+1697503_1|MV_mock-A47933_batch-uwSwW68EW43XNdvq85NxJ7|creisle|18000Mn|00:00:02|CANCELLED by 1365|||all
+1697503_1.batch|batch||18000Mn|00:00:02|CANCELLED|896K|896K|
+1697503_2|MV_mock-A47933_batch-uwSwW68EW43XNdvq85NxJ7|creisle|18000Mn|00:00:10|COMPLETED|||all
+1697503_2.batch|batch||18000Mn|00:00:10|COMPLETED|904K|904K|
+1697504|MA_mock-A47933_batch-uwSwW68EW43XNdvq85NxJ7|creisle|18000Mn|00:00:00|PENDING|||all
+        """
+        scheduler = _scheduler.SlurmScheduler()
+        validate = _job.ArrayJob(stage=SUBCOMMAND.VALIDATE, job_ident='1697503', output_dir='', task_list=2)
+        annotate = _job.Job(stage=SUBCOMMAND.ANNOTATE, job_ident='1697504', output_dir='')
+        unsubmitted = _job.Job(stage=SUBCOMMAND.PAIR, output_dir='')
+        with scheduler.cached_info([validate, annotate, unsubmitted]):
+            for job in [validate, annotate, unsubmitted]:
+                scheduler.update_info(job)
+        patcher.assert_called_once_with(['sacct', '-j', '1697503,1697504', '--long', '--parsable2'])
+        self.assertEqual(_constants.JOB_STATUS.CANCELLED, validate.get_task(1).status)
+        self.assertEqual(_constants.JOB_STATUS.COMPLETED, validate.get_task(2).status)
+        self.assertEqual(_constants.JOB_STATUS.PENDING, annotate.status)
+        self.assertIsNone(scheduler.info_cache)
+
+    @mock.patch('mavis.schedule.scheduler.SlurmScheduler.command')
+    def test_job_missing_from_batch(self, patcher):
+        patcher.side_effect = [
+            subprocess.CalledProcessError(1, 'cmd'),
+            """
+JobID|JobName|User|ReqMem|Elapsed|State|MaxRSS|AveRSS|Partition
+1697504|MA_mock-A47933_batch-uwSwW68EW43XNdvq85NxJ7|creisle|18000Mn|00:00:00|PENDING|||all
+            """
+        ]
+        scheduler = _scheduler.SlurmScheduler()
+        annotate = _job.Job(stage=SUBCOMMAND.ANNOTATE, job_ident='1697504', output_dir='')
+        with scheduler.cached_info([annotate]) as cache:
+            self.assertEqual({}, cache)
+            scheduler.update_info(annotate)
+        self.assertEqual(_constants.JOB_STATUS.PENDING, annotate.status)
+        self.assertEqual(2, patcher.call_count)
+
+
 class TestParseScontrolShow(unittest.TestCase):
 
     def test_pending_job(self):
@@ -198,6 +198,39 @@ Job Id: 48[1].torque01.bcgsc.ca
     # TODO: batch job exiting
 
 
+class TestCachedInfo(unittest.TestCase):
+
+    @mock.patch('mavis.schedule.scheduler.TorqueScheduler.command')
+    def test_single_query_for_all_jobs(self, patcher):
+        patcher.return_value = """
+Job Id: 48[1].torque01.bcgsc.ca
+    Job_Name = MA_mock-A47933_batch-JT3CUggKXNStHcoFXYaGR3-1
+    job_state = R
+    queue = batch
+
+Job Id: 48[2].torque01.bcgsc.ca
+    Job_Name = MA_mock-A47933_batch-JT3CUggKXNStHcoFXYaGR3-2
+    job_state = Q
+    queue = batch
+
+Job Id: 49.torque01.bcgsc.ca
+    Job_Name = MP_batch-JT3CUggKXNStHcoFXYaGR3
+    job_state = C
+    queue = batch
+    exit_status = 0
+        """
+        scheduler = _scheduler.TorqueScheduler()
+        annotate = _job.ArrayJob(stage=SUBCOMMAND.ANNOTATE, job_ident='48[].torque01.bcgsc.ca', output_dir='', task_list=2)
+        pairing = _job.Job(stage=SUBCOMMAND.PAIR, job_ident='49.torque01.bcgsc.ca', output_dir='')
+        with scheduler.cached_info([annotate, pairing]):
+            scheduler.update_info(annotate)
+            scheduler.update_info(pairing)
+        patcher.assert_called_once_with(['qstat', '-f', '-t', '48[].torque01.bcgsc.ca', '49.torque01.bcgsc.ca'])
+        self.assertEqual(_constants.JOB_STATUS.RUNNING, annotate.get_task(1).status)
+        self.assertEqual(_constants.JOB_STATUS.PENDING, annotate.get_task(2).status)
+        self.assertEqual(_constants.JOB_STATUS.COMPLETED, pairing.status)
+
+
 class TestCancel(unittest.TestCase):
 
     @mock.patch('mavis.schedule.scheduler.TorqueScheduler.command')
@@ -1,4 +1,7 @@
+import fcntl
+import os
 import shutil
+import tempfile
 import unittest
 from unittest import mock
 
@@ -674,9 +677,23 @@ class TestSelectContigAlignments(unittest.TestCase):
             query_sequence=reverse_complement(s), is_reverse=True, reference_name='3', alignment_rank=1
         )
         raw_alignments = {s: [read1, read2]}
-        align.select_contig_alignments(evidence, raw_alignments)
+        stats = align.select_contig_alignments(evidence, raw_alignments)
         alignments = list(evidence.contigs[0].alignments)
         self.assertEqual(2, len(alignments))
+        self.assertEqual(stats.supporting_pairs, 1)
+
+        # alignments outside the evidence windows are not paired
+        evidence.contigs[0].alignments = set()
+        read3 = SamRead(
+            reference_id=3, reference_start=5114, cigar=[(CIGAR.S, 125), (CIGAR.EQ, 120)], query_sequence=s,
+            is_reverse=False, reference_name='3', alignment_rank=2
+        )
+        raw_alignments = {s: [read1, read2, read3]}
+        pruned_stats = align.select_contig_alignments(evidence, raw_alignments)
+        self.assertEqual(alignments, list(evidence.contigs[0].alignments))
+        self.assertLess(pruned_stats.candidate_pairs, pruned_stats.pairs)
+        self.assertEqual(stats.candidate_pairs, pruned_stats.candidate_pairs)
+        self.assertEqual(1, pruned_stats.supporting_pairs)
 
 
 class TestGetAlignerVersion(unittest.TestCase):
@@ -700,3 +717,178 @@ class TestGetAlignerVersion(unittest.TestCase):
         content = "\nProgram: bwa (alignment via Burrows-Wheeler transformation)\nVersion: 0.7.12-r1039"
         with mock.patch('subprocess.getoutput', mock.Mock(return_value=content)):
             self.assertEqual('0.7.12-r1039', align.get_aligner_version(align.SUPPORTED_ALIGNER.BWA_MEM))
+
+
+class TestPersistentAligner(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.lock_file = os.path.join(self.temp_dir, 'bwa-shm.lock')
+
+    def tearDown(self):
+        align._PERSISTENT_ALIGNERS.clear()
+        shutil.rmtree(self.temp_dir)
+
+    def test_bwa_loads_shared_index_once(self):
+        reference = os.path.abspath('ref.fa')
+        listing = mock.Mock(side_effect=['', 'ref.fa\t1000\n', 'ref.fa\t1000\n'])
+        with mock.patch('subprocess.getoutput', listing), mock.patch('subprocess.check_call') as check_call, \
+                mock.patch('tempfile.gettempdir', mock.Mock(return_value=self.temp_dir)):
+            first = align.get_persistent_aligner(align.SUPPORTED_ALIGNER.BWA_MEM, 'ref.fa')
+            second = align.get_persistent_aligner(align.SUPPORTED_ALIGNER.BWA_MEM, reference)
+            check_call.assert_called_once_with(['bwa', 'shm', reference])
+        self.assertIs(first, second)
+        self.assertTrue(first.loaded)
+        with mock.patch('subprocess.getoutput', mock.Mock(return_value='ref.fa\t1000\n')), \
+                mock.patch('subprocess.call') as call:
+            first.stop()
+            call.assert_called_once_with(['bwa', 'shm', '-d'])
+
+    def test_bwa_last_user_removes_index(self):
+        aligner = align.BwaSharedIndex('ref.fa', lock_file=self.lock_file)
+        with mock.patch('subprocess.getoutput', mock.Mock(side_effect=['', 'ref.fa\t1000\n'])), \
+                mock.patch('subprocess.check_call'), mock.patch('subprocess.call') as call:
+            aligner.start()
+            aligner.stop()
+            call.assert_called_once_with(['bwa', 'shm', '-d'])
+        self.assertFalse(aligner.loaded)
+        self.assertIsNone(aligner.users_fh)
+
+    def test_bwa_index_kept_for_other_users(self):
+        other = open(self.lock_file + '.users', 'a')
+        fcntl.flock(other, fcntl.LOCK_SH)  # another job on the host using the index
+        try:
+            aligner = align.BwaSharedIndex('ref.fa', lock_file=self.lock_file)
+            with mock.patch('subprocess.getoutput', mock.Mock(side_effect=['', 'ref.fa\t1000\n'])), \
+                    mock.patch('subprocess.check_call'), mock.patch('subprocess.call') as call:
+                aligner.start()
+                aligner.stop()
+                call.assert_not_called()
+        finally:
+            other.close()
+
+    def test_bwa_index_not_loaded_by_mavis(self):
+        aligner = align.BwaSharedIndex('ref.fa', lock_file=self.lock_file)
+        with mock.patch('subprocess.getoutput', mock.Mock(return_value='ref.fa\t1000\nother.fa\t1000\n')), \
+                mock.patch('subprocess.check_call') as check_call, mock.patch('subprocess.call') as call:
+            aligner.start()
+            aligner.stop()
+            check_call.assert_not_called()
+            call.assert_not_called()  # bwa shm -d would also remove indices which were not loaded by mavis
+
+    def test_bwa_lock_file_of_another_user(self):
+        aligner = align.BwaSharedIndex('ref.fa', lock_file=self.lock_file)
+        with mock.patch('os.open', side_effect=PermissionError), mock.patch('subprocess.getoutput') as getoutput, \
+                mock.patch('subprocess.check_call') as check_call, mock.patch('subprocess.call') as call:
+            aligner.start()
+            self.assertFalse(aligner.shared)
+            self.assertTrue(aligner.is_alive())
+            aligner.stop()
+            getoutput.assert_not_called()
+            check_call.assert_not_called()
+            call.assert_not_called()
+
+    def test_bwa_shared_files_writable_by_other_users(self):
+        aligner = align.BwaSharedIndex('ref.fa', lock_file=self.lock_file)
+        with mock.patch('subprocess.getoutput', mock.Mock(side_effect=['', 'ref.fa\t1000\n'])), \
+                mock.patch('subprocess.check_call'), mock.patch('subprocess.call'):
+            aligner.start()
+            for filename in [aligner.lock_file, aligner.users_file, aligner.loaded_file]:
+                self.assertEqual(0o666, os.stat(filename).st_mode & 0o777)
+            aligner.stop()
+
+    def test_remove_unused_bwa_indices_none_loaded(self):
+        with mock.patch('subprocess.getoutput') as getoutput, mock.patch('subprocess.call') as call:
+            self.assertFalse(align.remove_unused_bwa_indices(self.lock_file))
+            getoutput.assert_not_called()
+            call.assert_not_called()
+
+    def test_blat_server_stopped_through_process(self):
+        server = align.BlatServer('/path/to/ref.2bit', port=1234)
+        server.process = mock.Mock(poll=mock.Mock(return_value=None))
+        process = server.process
+        with mock.patch('subprocess.call') as call:
+            server.stop()
+            call.assert_not_called()
+        process.terminate.assert_called_once_with()
+        process.wait.assert_called_once_with(timeout=10)
+        self.assertIsNone(server.process)
+
+    def test_blat_client_command(self):
+        server = align.BlatServer('/path/to/ref.2bit', port=1234)
+        self.assertEqual(
+            'gfClient localhost 1234 /path/to in.fa out.pslx -out=pslx -nohead -minScore=0',
+            server.command('in.fa', 'out.pslx', '-minScore=0'))
+
+
+class TestAlignmentCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.reference = get_data('mock_reference_genome.2bit')
+        self.bam_cache = mock.Mock(reference_id=lambda name: {'fake': 0}[name])
+
+    def new_cache(self, **kwargs):
+        kwargs.setdefault('aligner_version', '36x2')
+        return align.AlignmentCache(
+            os.path.join(self.temp_dir, 'cache.db'), align.SUPPORTED_ALIGNER.BLAT, self.reference, **kwargs)
+
+    def new_read(self, seq, start=10):
+        read = SamRead(
+            reference_name='fake', reference_id=0, query_sequence=seq, reference_start=start,
+            cigar=[(CIGAR.EQ, len(seq))], query_name='seq-1', alignment_rank=0)
+        read.set_tags([('NM', 0)])
+        return read
+
+    def test_round_trip(self):
+        cache = self.new_cache()
+        read = self.new_read('ACTGACTG')
+        cache.put({'ACTGACTG': [read], 'AAAAAAA': []})
+        cache.close()
+        cache = self.new_cache()
+        cached = cache.get(['ACTGACTG', 'AAAAAAA', 'CCCCC'], self.bam_cache)
+        self.assertEqual({'ACTGACTG', 'AAAAAAA'}, set(cached))
+        self.assertEqual([], cached['AAAAAAA'])
+        self.assertEqual(1, len(cached['ACTGACTG']))
+        cached_read = cached['ACTGACTG'][0]
+        self.assertEqual(read.key(), cached_read.key())
+        self.assertEqual(read.cigar, cached_read.cigar)
+        self.assertEqual('fake', cached_read.reference_name)
+        self.assertEqual(0, cached_read.alignment_rank)
+        self.assertEqual([('NM', 0)], cached_read.get_tags())
+        cache.close()
+
+    def test_different_options_not_shared(self):
+        cache = self.new_cache(options={'blat_min_identity': 0.9})
+        cache.put({'ACTGACTG': [self.new_read('ACTGACTG')]})
+        cache.close()
+        cache = self.new_cache(options={'blat_min_identity': 0.8})
+        self.assertEqual({}, cache.get(['ACTGACTG'], self.bam_cache))
+        cache.close()
+        cache = self.new_cache(options={'blat_min_identity': 0.9}, aligner_version='35')
+        self.assertEqual({}, cache.get(['ACTGACTG'], self.bam_cache))
+        cache.close()
+
+    def test_evict_least_recently_used(self):
+        cache = self.new_cache(max_size=2)
+        for i, seq in enumerate(['AAAA', 'CCCC', 'GGGG']):
+            cache.put({seq: [self.new_read(seq)]})
+        cache.get(['AAAA'], self.bam_cache)
+        cache.close()
+        cache = self.new_cache()
+        self.assertEqual({'AAAA', 'GGGG'}, set(cache.get(['AAAA', 'CCCC', 'GGGG'], self.bam_cache)))
+        cache.close()
+
+    def test_align_sequences_skips_cached(self):
+        cache = self.new_cache()
+        cache.put({'ACTGACTG': [self.new_read('ACTGACTG')]})
+        with mock.patch('subprocess.check_call') as check_call:
+            reads_by_query = align.align_sequences(
+                {'seq-1': 'ACTGACTG'}, self.bam_cache, {}, aligner=align.SUPPORTED_ALIGNER.BLAT,
+                aligner_reference=self.reference, alignment_cache=cache)
+            check_call.assert_not_called()
+        self.assertEqual(['ACTGACTG'], list(reads_by_query))
+        cache.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
@@ -946,6 +946,84 @@ class TestCoordinateCoversion(unittest.TestCase):
     def test_genomic_to_nearest_cdna_rev_intronic_neg(self):
         self.assertEqual((200, 2), self.rev_transcript.convert_genomic_to_nearest_cdna(299))
 
+    def baseline_mapping(self, transcript):
+        # the genomic to cdna mapping computed directly from the splicing pattern (independent of the index)
+        pre_transcript = transcript.unspliced_transcript
+        pos = sorted([s.pos for s in transcript.splicing_pattern] + [pre_transcript.start, pre_transcript.end])
+        genome_intervals = [Interval(s, t) for s, t in zip(pos[::2], pos[1::2])]
+        if transcript.is_reverse:
+            genome_intervals.reverse()
+        mapping = {}
+        length = 1
+        for exon in genome_intervals:
+            mapping[exon] = Interval(length, length + len(exon) - 1)
+            length += len(exon)
+        return mapping
+
+    def baseline_genomic_to_nearest_cdna(self, transcript, pos, stick_direction=None):
+        mapping = self.baseline_mapping(transcript)
+        exons = sorted(list(mapping.keys()))
+        for ex in exons:
+            if pos <= ex.end and pos >= ex.start:
+                return Interval.convert_pos(mapping, pos, transcript.is_reverse), 0
+        for ex1, ex2 in zip(exons, exons[1::]):
+            if pos > ex1.end and pos < ex2.start:
+                if (abs(pos - ex1.end) <= abs(pos - ex2.start) or stick_direction == ORIENT.LEFT) and stick_direction != ORIENT.RIGHT:
+                    cdna_pos = Interval.convert_pos(mapping, ex1.end, transcript.is_reverse)
+                    return cdna_pos, ex1.end - pos if transcript.is_reverse else pos - ex1.end
+                cdna_pos = Interval.convert_pos(mapping, ex2.start, transcript.is_reverse)
+                return cdna_pos, ex2.start - pos if transcript.is_reverse else pos - ex2.start
+        cdna_length = sum([len(e) for e in exons])
+        if pos < exons[0].start:
+            return cdna_length if transcript.is_reverse else 1, pos - exons[0].start
+        return 1 if transcript.is_reverse else cdna_length, pos - exons[-1].end
+
+    def baseline_cdna_to_genomic(self, transcript, pos):
+        mapping = {v: k for k, v in self.baseline_mapping(transcript).items()}
+        exons = sorted(mapping.values())
+        length = sum([len(e) for e in mapping])
+        if pos < 0:
+            if transcript.is_reverse:
+                return exons[-1].end + abs(pos)
+            return exons[0].start + pos
+        if pos > length:
+            pos -= length
+            if transcript.is_reverse:
+                return exons[0].start - pos
+            return exons[-1].end + pos
+        return Interval.convert_pos(mapping, pos, transcript.is_reverse)
+
+    def test_cdna_coordinate_index_same_as_mapping(self):
+        for transcript in [self.transcript, self.rev_transcript]:
+            index = transcript.cdna_coordinate_index
+            self.assertIs(index, transcript.cdna_coordinate_index)
+            for pos in range(1, 701):
+                for stick_direction in [None, ORIENT.LEFT, ORIENT.RIGHT]:
+                    expected = self.baseline_genomic_to_nearest_cdna(transcript, pos, stick_direction=stick_direction)
+                    self.assertEqual(expected, index.convert_genomic_to_nearest_cdna(pos, stick_direction=stick_direction))
+                    self.assertEqual(
+                        expected, transcript.convert_genomic_to_nearest_cdna(pos, stick_direction=stick_direction))
+            for pos in range(-50, 400):
+                if pos == 0:
+                    with self.assertRaises(IndexError):
+                        index.convert_cdna_to_genomic(pos)
+                else:
+                    expected = self.baseline_cdna_to_genomic(transcript, pos)
+                    self.assertEqual(expected, index.convert_cdna_to_genomic(pos))
+                    self.assertEqual(expected, transcript.convert_cdna_to_genomic(pos))
+            self.assertEqual(
+                [transcript.convert_cdna_to_genomic(pos) for pos in [1, 150, 300]],
+                index.convert_cdna_to_genomic_many([1, 150, 300]))
+
+    def test_cdna_coordinate_index_cleared_on_exon_change(self):
+        index = self.transcript.cdna_coordinate_index
+        self.pre_transcript.exons = self.pre_transcript.exons
+        self.assertIsNot(index, self.transcript.cdna_coordinate_index)
+
+    def test_cdna_coordinate_index_outside(self):
+        with self.assertRaises(IndexError):
+            self.transcript.cdna_coordinate_index.convert_genomic_to_nearest_cdna(50, allow_outside=False)
+
 
 class TestUSTranscript(unittest.TestCase):
 
@@ -236,6 +236,7 @@ class TestAssemble(unittest.TestCase):
         for seq in sequences:
             assert reverse_complement(seq) in sequences
         kmer_size = 0.75 * len(list(sequences)[0])
+        stats = {}
         assemblies = assemble(
             sequences, kmer_size,
             min_edge_trim_weight=2,
@@ -243,10 +244,13 @@ class TestAssemble(unittest.TestCase):
             remap_min_exact_match=6,
             assembly_max_paths=20,
             assembly_min_uniq=0.01,
-            log=self.log)
+            log=self.log,
+            stats=stats)
         for assembly in assemblies:
             print(assembly.seq)
         self.assertEqual(2, len(assemblies))
+        self.assertLess(0, stats['assembly_nodes'])
+        self.assertLessEqual(stats['assembly_nodes'] - 2 * len(sequences), stats['assembly_edges'])
 
     def test_low_evidence(self):
         seqs = [
@@ -1,15 +1,19 @@
 import logging
 import os
+import shutil
+import tempfile
 import unittest
 from unittest import mock
 import warnings
 
+import pysam
 from mavis.annotate.file_io import load_reference_genes, load_reference_genome
 from mavis.bam import cigar as _cigar
 from mavis.bam import read as _read
 from mavis.bam.cache import BamCache
 from mavis.bam.read import breakpoint_pos, orientation_supports_type, read_pair_type, sequenced_strand
 from mavis.bam.stats import compute_genome_bam_stats, compute_transcriptome_bam_stats, Histogram
+from mavis.bam.writer import SortedBamWriter
 from mavis.constants import CIGAR, DNA_ALPHABET, ORIENT, READ_PAIR_TYPE, STRAND, SVTYPE, NA_MAPPING_QUALITY
 from mavis.interval import Interval
 import timeout_decorator
@@ -445,3 +449,51 @@ class TestMapRefRangeToQueryRange(unittest.TestCase):
         self.assertEqual(10, len(qrange))
         self.assertEqual(6, qrange.start)
         self.assertEqual(15, qrange.end)
+
+
+class TestSortedBamWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_output = tempfile.mkdtemp()
+        self.input_bam = get_data('mini_mock_reads_for_events.sorted.bam')
+
+    def test_spill_and_merge(self):
+        output = os.path.join(self.temp_output, 'output.bam')
+        with pysam.AlignmentFile(self.input_bam, 'rb') as fh:
+            reads = list(fh.fetch(until_eof=True))
+            cigars = [read.cigar for read in reads]
+            with SortedBamWriter(output, fh, buffer_size=7) as writer:
+                for read in reversed(reads):
+                    writer.write(read)
+        self.assertEqual(len(reads), writer.count)
+        self.assertEqual([], writer.spills)
+        self.assertEqual(cigars, [read.cigar for read in reads])  # inputs are not modified
+        self.assertTrue(os.path.exists(output + '.bai'))
+        self.assertEqual([], [f for f in os.listdir(self.temp_output) if f.startswith('mavis-sort-')])
+
+        with pysam.AlignmentFile(output, 'rb') as fh:
+            result = list(fh.fetch(until_eof=True))
+        self.assertEqual(len(reads), len(result))
+        keys = [SortedBamWriter.sort_key(read) for read in result]
+        self.assertEqual(sorted(keys), keys)
+        self.assertEqual(
+            sorted([(r.query_name, r.flag, r.reference_start) for r in reads]),
+            sorted([(r.query_name, r.flag, r.reference_start) for r in result])
+        )
+        expected = {(r.query_name, r.flag): _cigar.convert_for_igv(r.cigar) for r in reads}
+        self.assertEqual(expected, {(r.query_name, r.flag): r.cigar for r in result})
+
+    def test_no_conversion(self):
+        output = os.path.join(self.temp_output, 'output.bam')
+        with pysam.AlignmentFile(self.input_bam, 'rb') as fh:
+            reads = list(fh.fetch(until_eof=True))[:10]
+            with SortedBamWriter(output, fh, convert_for_igv=False, index=False) as writer:
+                for read in reads:
+                    writer.write(read)
+        self.assertFalse(os.path.exists(output + '.bai'))
+        with pysam.AlignmentFile(output, 'rb') as fh:
+            result = list(fh.fetch(until_eof=True))
+        self.assertEqual({(r.query_name, r.flag): r.cigar for r in reads}, {(r.query_name, r.flag): r.cigar for r in result})
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_output)
@@ -1,9 +1,10 @@
+import random
 import unittest
 import warnings
 
 from mavis.annotate.file_io import load_reference_genome
-from mavis.bam.cigar import alignment_matches, compute, convert_for_igv, convert_string_to_cigar, extend_softclipping, hgvs_standardize_cigar, join, longest_fuzzy_match, match_percent, merge_internal_events, recompute_cigar_mismatch, score
-from mavis.constants import CIGAR
+from mavis.bam.cigar import alignment_matches, compute, convert_for_igv, convert_string_to_cigar, extend_softclipping, hgvs_standardize_cigar, join, longest_fuzzy_match, match_percent, merge_internal_events, match_mask, recompute_cigar_mismatch, score
+from mavis.constants import CIGAR, DNA_ALPHABET
 from mavis.bam.read import SamRead
 from mavis.bam import read as _read
 import timeout_decorator
@@ -97,6 +98,52 @@ class TestRecomputeCigarMismatch(unittest.TestCase):
             recompute_cigar_mismatch(r, REFERENCE_GENOME['fake'])
         )
 
+    def test_ambiguous_and_non_dna_characters(self):
+        chars = 'ACGTNRYacgtnx-.*'
+        ref = ''.join([a for a in chars for b in chars])
+        seq = ''.join([b for a in chars for b in chars])
+        expected = [DNA_ALPHABET.match(a, b) for a, b in zip(ref, seq)]
+        self.assertEqual(expected, match_mask(ref, seq).tolist())
+
+    def test_same_as_per_base_comparison(self):
+        def per_base(read, ref):
+            result = []
+            ref_pos = read.reference_start
+            seq_pos = 0
+            for cigar_value, freq in read.cigar:
+                if cigar_value in {CIGAR.M, CIGAR.X, CIGAR.EQ}:
+                    for offset in range(0, freq):
+                        state = CIGAR.EQ if DNA_ALPHABET.match(ref[ref_pos], read.query_sequence[seq_pos]) else CIGAR.X
+                        if result and result[-1][0] == state:
+                            result[-1] = (state, result[-1][1] + 1)
+                        else:
+                            result.append((state, 1))
+                        ref_pos += 1
+                        seq_pos += 1
+                    continue
+                if cigar_value in {CIGAR.M, CIGAR.X, CIGAR.EQ, CIGAR.I, CIGAR.S}:
+                    seq_pos += freq
+                if cigar_value in {CIGAR.M, CIGAR.X, CIGAR.EQ, CIGAR.D, CIGAR.N}:
+                    ref_pos += freq
+                result.append((cigar_value, freq))
+            return result
+
+        rand = random.Random(1)
+        ref = REFERENCE_GENOME['fake'].seq
+        for i in range(0, 200):
+            cigar = []
+            for j in range(0, rand.randint(1, 6)):
+                cigar.append((rand.choice([CIGAR.M, CIGAR.M, CIGAR.EQ, CIGAR.X, CIGAR.I, CIGAR.D, CIGAR.S]), rand.randint(0, 40)))
+            start = rand.randint(0, 5000)
+            query_length = sum([f for s, f in cigar if s in {CIGAR.M, CIGAR.X, CIGAR.EQ, CIGAR.I, CIGAR.S}])
+            # mostly matching the reference with some mismatches and ambiguous bases
+            seq = list(str(ref[start:start + query_length]))
+            for k in range(0, len(seq)):
+                if rand.random() < 0.1:
+                    seq[k] = rand.choice('ACGTNRn')
+            read = MockRead(reference_start=start, query_sequence=''.join(seq), cigar=cigar)
+            self.assertEqual(per_base(read, ref), recompute_cigar_mismatch(read, REFERENCE_GENOME['fake']))
+
 
 class TestExtendSoftclipping(unittest.TestCase):
 
@@ -88,6 +88,32 @@ IndexError: list index out of range"""
 
 class TestModule(unittest.TestCase):
 
+    def test_summarize_resource_reports(self):
+        def report(command, library, wall_time, max_rss_mb, items):
+            return {
+                'command': command, 'library': library, 'wall_time': wall_time, 'cpu_time': wall_time / 2,
+                'max_rss_mb': max_rss_mb, 'input_bytes': 10, 'output_bytes': 20, 'read_bytes': None,
+                'write_bytes': 5, 'items': items
+            }
+        rows = _pipeline.summarize_resource_reports([
+            report('pairing', None, 4, 50, {'breakpoint_pairs': 8}),
+            report('validate', 'lib1', 10, 100, {'evidence': 5}),
+            report('validate', 'lib1', 30, 300, {'evidence': 15}),
+            report('cluster', 'lib1', 5, 20, {'clusters': 20}),
+        ])
+        self.assertEqual([('all', 'pairing'), ('lib1', 'cluster'), ('lib1', 'validate')], [(r['library'], r['stage']) for r in rows])
+        validate = rows[-1]
+        self.assertEqual(2, validate['tasks'])
+        self.assertEqual(40, validate['wall_time_total'])
+        self.assertEqual(30, validate['wall_time_max'])
+        self.assertEqual(20, validate['cpu_time_total'])
+        self.assertEqual(300, validate['max_rss_mb'])
+        self.assertEqual(20, validate['input_bytes'])
+        self.assertIsNone(validate['read_bytes'])
+        self.assertEqual(10, validate['write_bytes'])
+        self.assertEqual(20, validate['evidence'])
+        self.assertEqual(0.5, validate['evidence_per_second'])
+
     def test_parse_run_time_none(self):
         content = ""
         mockopen = mock_open(read_data=content)
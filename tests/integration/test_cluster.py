@@ -1,10 +1,17 @@
+import os
+import shutil
+import tempfile
 import unittest
+from unittest import mock
 
 from mavis.breakpoint import Breakpoint, BreakpointPair
 from mavis.cluster.cluster import merge_breakpoint_pairs, merge_integer_intervals
-from mavis.constants import COLUMNS, PROTOCOL, SVTYPE
+from mavis.cluster.main import (
+    estimate_cluster_cost, main as cluster_main, read_density_from_index, split_clusters, summarize_clusters
+)
+from mavis.constants import COLUMNS, DISEASE_STATUS, PROTOCOL, SVTYPE
 from mavis.interval import Interval
-from mavis.util import read_bpp_from_input_file
+from mavis.util import read_bpp_from_input_file, read_inputs, read_inputs_in_chunks
 
 
 from ..util import get_data
@@ -86,6 +93,160 @@ class TestMergeBreakpointPairs(unittest.TestCase):
         mapping = merge_breakpoint_pairs(bpps, 100, 25, verbose=True)
         self.assertEqual(2, len(mapping))
 
+    def test_parallel_groups_same_as_serial(self):
+        bpps = [
+            bpp for bpp in read_bpp_from_input_file(FULL_BASE_EVENTS, expand_orient=True)
+            if bpp.data[COLUMNS.protocol] == PROTOCOL.GENOME
+        ]
+        serial = merge_breakpoint_pairs(bpps, 100, 25)
+        parallel = merge_breakpoint_pairs(bpps, 100, 25, processes=2)
+        self.assertEqual(list(serial.keys()), list(parallel.keys()))
+        for node, inputs in serial.items():
+            self.assertEqual([p.data['tag'] for p in inputs], [p.data['tag'] for p in parallel[node]])
+            for pair in parallel[node]:
+                self.assertIn(pair, bpps)
+
+
+class TestSummarizeClusters(unittest.TestCase):
+    def cluster_ids(self, **kwargs):
+        clusters = merge_breakpoint_pairs(read_inputs([FULL_BASE_EVENTS]), 100, 25)
+        summarize_clusters(clusters, cluster_id_seed=1, **kwargs)
+        return [cluster.data[COLUMNS.cluster_id] for cluster in clusters]
+
+    def test_seeded_ids_reproducible(self):
+        self.assertEqual(
+            self.cluster_ids(library='lib1', batch_id='batch'), self.cluster_ids(library='lib1', batch_id='batch'))
+
+    def test_seeded_ids_unique_between_libraries(self):
+        ids = self.cluster_ids(library='lib1', batch_id='batch')
+        self.assertFalse(set(ids) & set(self.cluster_ids(library='lib2', batch_id='batch')))
+        self.assertFalse(set(ids) & set(self.cluster_ids(library='lib1', batch_id='other')))
+
+
+class TestSplitClusters(unittest.TestCase):
+    def setUp(self):
+        self.output = tempfile.mkdtemp()
+        self.clusters = [
+            BreakpointPair(Breakpoint('1', 1000 * i, orient='L'), Breakpoint('1', 1000 * i + 500, orient='R'), opposing_strands=False)
+            for i in range(1, 9)
+        ]
+        self.clusters.append(BreakpointPair(
+            Breakpoint('2', 1000, 50000, orient='L'), Breakpoint('2', 60000, 90000, orient='R'), opposing_strands=False))
+
+    def test_split_by_count(self):
+        files = split_clusters(self.clusters, self.output, 'batch', min_clusters_per_file=1, max_files=3)
+        self.assertEqual(3, len(files))
+        for filename in files:
+            self.assertEqual(3, len(read_bpp_from_input_file(filename)))
+        self.assertFalse(os.path.exists(os.path.join(self.output, 'split_cost_estimates.tab')))
+
+    def test_split_by_cost(self):
+        files = split_clusters(
+            self.clusters, self.output, 'batch', min_clusters_per_file=1, max_files=3,
+            cost_func=lambda c: estimate_cluster_cost(c, window_buffer=100))
+        self.assertEqual(3, len(files))
+        counts = sorted([len(read_bpp_from_input_file(filename)) for filename in files])
+        self.assertEqual([1, 4, 4], counts)  # the large cluster is given its own file
+        self.assertTrue(os.path.exists(os.path.join(self.output, 'split_cost_estimates.tab')))
+
+    def test_split_equal_cost_by_count(self):
+        files = split_clusters(
+            self.clusters, self.output, 'batch', min_clusters_per_file=1, max_files=3, cost_func=lambda c: 0)
+        self.assertEqual([3, 3, 3], [len(read_bpp_from_input_file(filename)) for filename in files])
+
+    def tearDown(self):
+        shutil.rmtree(self.output)
+
+
+class TestStreamClusters(unittest.TestCase):
+    def setUp(self):
+        self.output = tempfile.mkdtemp()
+
+    def run_cluster(self, dirname, **kwargs):
+        output = os.path.join(self.output, dirname)
+        os.makedirs(output)
+        files = cluster_main(
+            [FULL_BASE_EVENTS], output, False, 'mock-A36971', PROTOCOL.GENOME, DISEASE_STATUS.DISEASED,
+            masking=mock.Mock(content={}), annotations=None, limit_to_chr=['reference{}'.format(i) for i in range(1, 21)],
+            cluster_radius=20, min_clusters_per_file=5, max_files=3, cluster_id_seed=1, batch_id='batch', **kwargs
+        )
+        return output, files
+
+    def read_rows(self, filename):
+        # tracking ids are random when not given and tags are the index of the pair within its partition
+        with open(filename, 'r') as fh:
+            lines = [line.rstrip('\n').split('\t') for line in fh.readlines()]
+        header = lines[0]
+        rows = [
+            {col: val for col, val in zip(header, line) if col not in {'#' + COLUMNS.tracking_id, COLUMNS.tracking_id, 'tag'}}
+            for line in lines[1:]
+        ]
+        return header, rows
+
+    def test_read_inputs_in_chunks(self):
+        chunks = list(read_inputs_in_chunks([FULL_BASE_EVENTS], 7))
+        self.assertGreater(len(chunks), 1)
+        streamed = [bpp for chunk in chunks for bpp in chunk]
+        expected = read_inputs([FULL_BASE_EVENTS])
+        self.assertEqual(expected, streamed)
+        self.assertEqual([p.data['line_no'] for p in expected], [p.data['line_no'] for p in streamed])
+
+    def test_read_inputs_in_chunks_exact_multiple(self):
+        with open(FULL_BASE_EVENTS, 'r') as fh:
+            rows = len([line for line in fh if not line.startswith('#')])
+        with mock.patch('mavis.util.LOG') as log:
+            chunks = list(read_inputs_in_chunks([FULL_BASE_EVENTS], rows // 2))
+        # no trailing chunk is read after the last row
+        self.assertEqual([rows // 2, rows // 2], [len(chunk) for chunk in chunks])
+        for call in log.call_args_list:
+            self.assertNotIn('ignoring empty file:', call[0])
+
+    def test_same_as_in_memory(self):
+        expected_output, expected_files = self.run_cluster('in_memory')
+        output, files = self.run_cluster('streamed', stream_chunk_size=7)
+        self.assertEqual(3, len(files))
+        for expected_file, filename in zip(expected_files, files):
+            self.assertEqual(self.read_rows(expected_file), self.read_rows(filename))
+        with open(os.path.join(expected_output, 'clusters.bed'), 'r') as expected_fh:
+            with open(os.path.join(output, 'clusters.bed'), 'r') as fh:
+                self.assertEqual(expected_fh.readlines(), fh.readlines())
+        for basename in ['filtered_pairs.tab', 'cluster_assignment.tab']:
+            expected_header, expected_rows = self.read_rows(os.path.join(expected_output, basename))
+            header, rows = self.read_rows(os.path.join(output, basename))
+            self.assertEqual(expected_header, header)
+
+            def row_key(row):
+                return sorted(row.items())
+            self.assertEqual(sorted(expected_rows, key=row_key), sorted(rows, key=row_key))
+
+    def tearDown(self):
+        shutil.rmtree(self.output)
+
+
+class TestEstimateClusterCost(unittest.TestCase):
+    def test_overlapping_windows_counted_once(self):
+        bpp = BreakpointPair(Breakpoint('1', 1000, orient='L'), Breakpoint('1', 1100, orient='R'), opposing_strands=False)
+        self.assertEqual(301, estimate_cluster_cost(bpp, window_buffer=100))
+
+    def test_interchromosomal(self):
+        bpp = BreakpointPair(Breakpoint('1', 1000, orient='L'), Breakpoint('2', 1000, orient='R'), opposing_strands=False)
+        self.assertEqual(402 * 1.5, estimate_cluster_cost(bpp, window_buffer=100, interchromosomal_weight=1.5))
+
+    def test_transcriptome(self):
+        bpp = BreakpointPair(Breakpoint('1', 1000, orient='L'), Breakpoint('1', 5000, orient='R'), opposing_strands=False)
+        self.assertEqual(402 * 2, estimate_cluster_cost(bpp, window_buffer=100, protocol=PROTOCOL.TRANS, transcriptome_weight=2))
+
+    def test_read_density(self):
+        bpp = BreakpointPair(Breakpoint('1', 1000, orient='L'), Breakpoint('1', 5000, orient='R'), opposing_strands=False)
+        self.assertEqual(201 * 0.5, estimate_cluster_cost(bpp, window_buffer=100, read_density={'1': 0.25}))
+
+    def test_read_density_from_index(self):
+        density = read_density_from_index(get_data('mock_reads_for_events.sorted.bam'))
+        self.assertTrue(density)
+        for chrom, value in density.items():
+            self.assertFalse(chrom.startswith('chr'))
+            self.assertGreaterEqual(value, 0)
+
 
 class TestMergeIntervals(unittest.TestCase):
 
@@ -70,12 +70,10 @@ class TestPipeline(unittest.TestCase):
         for suffix in [
             'validation-passed.tab',
             'validation-failed.tab',
-            'raw_evidence.bam',
             'raw_evidence.sorted.bam',
             'raw_evidence.sorted.bam.bai',
             'contigs.sorted.bam',
             'contigs.sorted.bam.bai',
-            'contigs.bam',
             'igv.batch'
         ]:
             self.assertTrue(os.path.exists(os.path.join(self.output, suffix)))
@@ -92,3 +90,57 @@ class TestPipeline(unittest.TestCase):
         self.assertTrue(os.path.exists(drawings_dir))
         self.assertLessEqual(1, len(glob.glob(os.path.join(drawings_dir, '*.svg'))))
         self.assertLessEqual(1, len(glob.glob(os.path.join(drawings_dir, '*.legend.json'))))
+
+
+@unittest.skipIf(not RUN_FULL, 'slower tests will not be run unless the environment variable RUN_FULL is given')
+class TestValidateContigAlignmentBatches(unittest.TestCase):
+    def setUp(self):
+        self.output = mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output)
+
+    def run_validate(self, cluster_file, output, **kwargs):
+        aligned = []
+        self.aligner_bam_handles = []
+
+        def mock_align(sequences, **kwargs):
+            aligned.append(dict(sequences))
+            self.aligner_bam_handles.append(kwargs['input_bam_cache'].fh)
+            return {}
+
+        os.makedirs(output)
+        with mock.patch('mavis.validate.main.align_sequences', side_effect=mock_align):
+            validate_main(
+                [cluster_file], output, genome_bam_fh, False, 'mock-A36971', PROTOCOL.GENOME,
+                median_fragment_size=427, stdev_fragment_size=106, read_length=150,
+                reference_genome=reference_genome, annotations=annotations, masking=masking,
+                aligner_reference=ReferenceFile('aligner_reference', get_data('mock_reference_genome.2bit')),
+                write_evidence_files=False, **kwargs
+            )
+        rows = {}
+        for basename in ['validation-passed.tab', 'validation-failed.tab']:
+            with open(os.path.join(output, basename), 'r') as fh:
+                rows[basename] = fh.readlines()
+        return aligned, rows
+
+    def test_same_as_single_alignment(self):
+        os.makedirs(os.path.join(self.output, 'cluster'))
+        cluster_files = cluster_main(
+            [get_data('mock_sv_events.tsv')], os.path.join(self.output, 'cluster'), False, 'mock-A36971',
+            PROTOCOL.GENOME, DISEASE_STATUS.DISEASED, limit_to_chr=[None], masking=masking, cluster_radius=20,
+            annotations=annotations, min_clusters_per_file=100, max_files=1, cluster_id_seed=1
+        )
+        aligned, rows = self.run_validate(cluster_files[0], os.path.join(self.output, 'single'))
+        batch_aligned, batch_rows = self.run_validate(
+            cluster_files[0], os.path.join(self.output, 'batches'), contig_aln_batch_size=3)
+        self.assertEqual(1, len(aligned))
+        self.assertLess(1, len(batch_aligned))
+        merged = {}
+        for sequences in batch_aligned:
+            merged.update(sequences)
+        self.assertEqual(aligned[0], merged)
+        self.assertEqual(rows, batch_rows)
+        # the background aligner thread does not share the bam file handle
+        for fh in self.aligner_bam_handles:
+            self.assertIsNot(genome_bam_fh, fh)
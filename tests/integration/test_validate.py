@@ -3,7 +3,7 @@ import unittest
 from mavis.annotate.file_io import load_reference_genome
 from mavis.bam.cache import BamCache
 from mavis.breakpoint import Breakpoint
-from mavis.constants import ORIENT, PYSAM_READ_FLAGS, NA_MAPPING_QUALITY
+from mavis.constants import COLUMNS, ORIENT, PYSAM_READ_FLAGS, NA_MAPPING_QUALITY
 from mavis.validate.evidence import GenomeEvidence
 from mavis.validate.base import Evidence
 from mavis.bam.read import SamRead
@@ -594,6 +594,15 @@ class TestEvidenceGathering(unittest.TestCase):
             2,
             len([r for r in self.ev1.split_reads[1] if not r.has_tag(PYSAM_READ_FLAGS.TARGETED_ALIGNMENT)]))
 
+    def test_release_reads(self):
+        self.ev1.load_evidence()
+        row = self.ev1.flatten()
+        self.assertEqual(7, row[COLUMNS.raw_flanking_pairs])
+        self.ev1.release_reads()
+        self.assertEqual(0, len(self.ev1.flanking_pairs))
+        self.assertEqual(set(), self.ev1.supporting_reads())
+        self.assertEqual(row, self.ev1.flatten())
+
 #    @unittest.skip("demonstrating skipping")
     def test_assemble_split_reads(self):
         sr1 = MockRead(query_name='HISEQX1_11:3:1105:15351:25130:split',
@@ -1,3 +1,5 @@
+import itertools
+import random
 import unittest
 from unittest import mock
 
@@ -1005,6 +1007,60 @@ class TestCallByFlankingReadsGenome(unittest.TestCase):
             bpp = call._call_by_flanking_pairs(evidence, SVTYPE.DUP)
 
 
+class TestFlankingPairSelection(unittest.TestCase):
+
+    def reference_removal(self, pairs, fragments, orient1, orient2, rounds):
+        # the original implementation: recompute everything after each removal
+        result = []
+        for _ in range(rounds):
+            if not pairs:
+                break
+            first_positions = []
+            second_positions = []
+            for read, mate in pairs:
+                if orient1 == ORIENT.LEFT:
+                    first_positions.extend([read.reference_end, read.reference_end - read.query_alignment_length + 1])
+                else:
+                    first_positions.extend([read.reference_start + 1, read.reference_start + read.query_alignment_length])
+                if orient2 == ORIENT.LEFT:
+                    second_positions.extend([mate.reference_end, mate.reference_end - mate.query_alignment_length + 1])
+                else:
+                    second_positions.extend([mate.reference_start + 1, mate.reference_start + mate.query_alignment_length])
+            result.append((
+                Interval(min(first_positions), max(first_positions)),
+                Interval(min(second_positions), max(second_positions)),
+                list(pairs)
+            ))
+            average = Interval(
+                sum([f.start for f in fragments]) / len(fragments),
+                sum([f.end for f in fragments]) / len(fragments))
+            farthest = max(fragments, key=lambda f: abs(Interval.dist(f, average)))
+            pairs = [p for p, f in zip(pairs, fragments) if f != farthest]
+            fragments = [f for f in fragments if f != farthest]
+        return result
+
+    def test_same_as_recomputing(self):
+        rand = random.Random(1)
+        for orient1, orient2 in itertools.product([ORIENT.LEFT, ORIENT.RIGHT], repeat=2):
+            pairs = []
+            fragments = []
+            for i in range(0, 200):
+                start1 = rand.randint(1, 500)
+                start2 = rand.randint(1000, 1500)
+                pairs.append((
+                    MockRead(reference_start=start1, reference_end=start1 + 50, query_alignment_length=rand.randint(30, 50)),
+                    MockRead(reference_start=start2, reference_end=start2 + 50, query_alignment_length=rand.randint(30, 50))
+                ))
+                size = rand.randint(300, 350) if rand.random() < 0.7 else rand.randint(100, 1000)
+                fragments.append(Interval(size, size + rand.choice([0, 0, 10])))
+            selection = call._FlankingPairSelection(pairs, fragments, orient1, orient2)
+            for cover1, cover2, expected_pairs in self.reference_removal(pairs, fragments, orient1, orient2, 150):
+                self.assertEqual((cover1, cover2), selection.coverage_intervals())
+                self.assertEqual(expected_pairs, selection.selected_pairs())
+                self.assertEqual(len(expected_pairs), len(selection))
+                selection.remove_farthest_fragment()
+
+
 class TestCallByFlankingReadsTranscriptome(unittest.TestCase):
 
     def build_transcriptome_evidence(self, b1, b2, opposing_strands=False):
@@ -0,0 +1,142 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from mavis.work_queue import WorkQueue
+
+
+class TestWorkQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_output = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_output, 'batch.queue')
+        self.items = [('input{}.tab'.format(i), os.path.join(self.temp_output, 'output{}'.format(i))) for i in range(1, 4)]
+        WorkQueue.create(self.path, self.items, timeout=60)
+
+    def test_create(self):
+        queue = WorkQueue(self.path)
+        self.assertEqual(self.items, queue.items)
+        self.assertEqual(60, queue.timeout)
+        self.assertEqual(15, queue.poll_interval)
+
+    def test_claim_exclusive(self):
+        first = WorkQueue(self.path, worker='first')
+        second = WorkQueue(self.path, worker='second')
+        self.assertEqual(0, first.claim())
+        self.assertEqual(1, second.claim())
+        self.assertEqual(2, first.claim())
+        self.assertIsNone(second.claim())
+        self.assertFalse(first.finished())
+
+    def test_claim_only_given_inputs(self):
+        queue = WorkQueue(self.path)
+        self.assertEqual(2, queue.claim(['input3.tab']))
+        self.assertIsNone(queue.claim(['input3.tab']))
+
+    def test_complete(self):
+        queue = WorkQueue(self.path)
+        for index in range(3):
+            self.assertEqual(index, queue.claim())
+            queue.complete(index)
+        self.assertIsNone(queue.claim())
+        self.assertTrue(queue.finished())
+        self.assertEqual({}, queue.claims)
+
+    def test_reclaim_abandoned(self):
+        abandoned = WorkQueue(self.path, worker='abandoned')
+        self.assertEqual(0, abandoned.claim(['input1.tab']))
+        queue = WorkQueue(self.path, worker='live')
+        self.assertIsNone(queue.claim(['input1.tab']))
+        # the abandoned worker stops sending heartbeats
+        old_time = time.time() - 120
+        os.utime(abandoned.claims[0], (old_time, old_time))
+        self.assertEqual(0, queue.claim(['input1.tab']))
+        self.assertTrue(queue.claims[0].endswith('0.claim.1'))
+        # only one worker can take over the abandoned claim
+        other = WorkQueue(self.path, worker='other')
+        self.assertIsNone(other.claim(['input1.tab']))
+
+    def test_claim_taken_over(self):
+        abandoned = WorkQueue(self.path, worker='abandoned')
+        index = abandoned.claim(['input1.tab'])
+        old_time = time.time() - 120
+        os.utime(abandoned.claims[index], (old_time, old_time))
+        queue = WorkQueue(self.path, worker='live')
+        self.assertEqual(index, queue.claim(['input1.tab']))
+        self.assertFalse(abandoned.holds(index))
+        self.assertTrue(queue.holds(index))
+        # the abandoned worker gives up the item rather than marking it
+        self.assertFalse(abandoned.complete(index))
+        self.assertFalse(queue.finished(['input1.tab']))
+        self.assertTrue(queue.complete(index))
+        self.assertTrue(queue.finished(['input1.tab']))
+
+    def test_complete_moves_staging_output(self):
+        queue = WorkQueue(self.path)
+        index = queue.claim(['input1.tab'])
+        staging_output = queue.staging_output(index)
+        self.assertNotEqual(self.items[index][1], staging_output)
+        os.makedirs(staging_output)
+        with open(os.path.join(staging_output, 'result.tab'), 'w') as fh:
+            fh.write('result\n')
+        self.assertTrue(queue.complete(index))
+        self.assertFalse(os.path.exists(staging_output))
+        self.assertTrue(os.path.exists(os.path.join(self.items[index][1], 'result.tab')))
+
+    def test_claim_taken_over_keeps_owner_output(self):
+        abandoned = WorkQueue(self.path, worker='abandoned')
+        index = abandoned.claim(['input1.tab'])
+        old_time = time.time() - 120
+        os.utime(abandoned.claims[index], (old_time, old_time))
+        queue = WorkQueue(self.path, worker='live')
+        queue.claim(['input1.tab'])
+        self.assertNotEqual(abandoned.staging_output(index), queue.staging_output(index))
+        for worker in [queue, abandoned]:
+            os.makedirs(worker.staging_output(index))
+            with open(os.path.join(worker.staging_output(index), 'result.tab'), 'w') as fh:
+                fh.write(worker.worker + '\n')
+        self.assertTrue(queue.complete(index))
+        abandoned_staging_output = abandoned.staging_output(index)
+        self.assertFalse(abandoned.complete(index))
+        self.assertFalse(os.path.exists(abandoned_staging_output))
+        with open(os.path.join(self.items[index][1], 'result.tab'), 'r') as fh:
+            self.assertEqual('live\n', fh.read())
+
+    def test_heartbeat_gives_up_lost_claims(self):
+        abandoned = WorkQueue(self.path, worker='abandoned')
+        index = abandoned.claim(['input1.tab'])
+        old_time = time.time() - 120
+        os.utime(abandoned.claims[index], (old_time, old_time))
+        queue = WorkQueue(self.path, worker='live')
+        queue.claim(['input1.tab'])
+        abandoned.heartbeat()
+        self.assertEqual({}, abandoned.claims)
+        self.assertEqual({index}, abandoned.lost)
+        self.assertFalse(abandoned.fail(index))
+        self.assertEqual([], queue.failed())
+        self.assertTrue(queue.holds(index))
+
+    def test_heartbeat(self):
+        queue = WorkQueue(self.path)
+        index = queue.claim()
+        old_time = time.time() - 120
+        os.utime(queue.claims[index], (old_time, old_time))
+        queue.heartbeat()
+        self.assertGreater(os.path.getmtime(queue.claims[index]), old_time + 60)
+        self.assertIsNone(WorkQueue(self.path).claim(['input1.tab']))
+
+    def test_fail_and_reset(self):
+        queue = WorkQueue(self.path)
+        index = queue.claim(['input1.tab'])
+        queue.fail(index, 'error')
+        self.assertEqual(['input1.tab'], queue.failed())
+        self.assertIsNone(queue.claim(['input1.tab']))
+        self.assertTrue(queue.finished(['input1.tab']))
+        self.assertEqual(1, queue.reset_failed())
+        self.assertEqual([], queue.failed())
+        self.assertEqual(0, queue.claim(['input1.tab']))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_output)
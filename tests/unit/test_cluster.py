@@ -1,6 +1,9 @@
 import unittest
 
-from mavis.cluster.cluster import merge_integer_intervals
+import numpy as np
+
+from mavis.breakpoint import Breakpoint, BreakpointPair
+from mavis.cluster.cluster import merge_integer_intervals, PairCenterIndex, union_find_components, WeightedIntervalSum
 from mavis.interval import Interval
 
 
@@ -26,5 +29,92 @@ class TestMergeIntegerIntervals(unittest.TestCase):
         self.assertEqual(Interval(1, 3), m)
 
 
+class TestWeightedIntervalSum(unittest.TestCase):
+    def test_incremental_matches_merge(self):
+        intervals = [(1, 2), (1, 9), (2, 10), (4, 4)]
+        running = WeightedIntervalSum(weight_adjustment=5)
+        for i, itvl in enumerate(intervals):
+            running.add(itvl)
+            self.assertEqual(merge_integer_intervals(*intervals[:i + 1], weight_adjustment=5), running.interval())
+
+    def test_copy_is_independent(self):
+        first = WeightedIntervalSum().add((1, 1))
+        second = first.copy().add((10, 10))
+        self.assertEqual(merge_integer_intervals((1, 1)), first.interval())
+        self.assertEqual(Interval(6), second.interval())
+
+    def test_empty_error(self):
+        with self.assertRaises(AttributeError):
+            WeightedIntervalSum().interval()
+
+
+class TestPairCenterIndex(unittest.TestCase):
+    @staticmethod
+    def pair(pos1, pos2):
+        return BreakpointPair(Breakpoint('1', pos1, orient='L'), Breakpoint('1', pos2, orient='R'), opposing_strands=False)
+
+    def test_nearest_within_distance(self):
+        index = PairCenterIndex(100)
+        near = self.pair(150, 1000)
+        index.add(near)
+        index.add(self.pair(300, 1000))
+        self.assertEqual([near], index.nearest(self.pair(100, 1000), 100))
+
+    def test_nearest_none_within_distance(self):
+        index = PairCenterIndex(100)
+        index.add(self.pair(150, 1000))
+        self.assertEqual([], index.nearest(self.pair(100, 1100), 100))
+
+    def test_ties_in_insertion_order(self):
+        index = PairCenterIndex(100)
+        second = self.pair(120, 1000)
+        first = self.pair(80, 1000)
+        index.add(second)
+        index.add(first)
+        self.assertEqual([second, first], index.nearest(self.pair(100, 1000), 100))
+
+    def test_remove(self):
+        index = PairCenterIndex(100)
+        pair = self.pair(150, 1000)
+        index.add(pair)
+        index.remove(pair)
+        self.assertNotIn(pair, index)
+        self.assertEqual([], index.nearest(pair, 100))
+
+
+class TestUnionFindComponents(unittest.TestCase):
+    def components(self, *coordinates, cluster_radius=10):
+        coordinates = np.array(coordinates, dtype=np.int64).reshape(-1, 4)
+        labels = union_find_components(*coordinates.T, cluster_radius=cluster_radius)
+        result = {}
+        for i, label in enumerate(labels):
+            result.setdefault(label, set()).add(i)
+        return sorted([sorted(c) for c in result.values()])
+
+    def test_empty(self):
+        self.assertEqual([], self.components())
+
+    def test_within_radius(self):
+        self.assertEqual([[0, 1]], self.components((1, 1, 100, 100), (6, 6, 105, 105)))
+
+    def test_sum_of_distances_outside_radius(self):
+        self.assertEqual([[0], [1]], self.components((1, 1, 100, 100), (7, 7, 106, 106)))
+
+    def test_overlapping_intervals(self):
+        self.assertEqual([[0, 1]], self.components((1, 50, 100, 100), (40, 40, 90, 110)))
+
+    def test_transitive_merge(self):
+        self.assertEqual(
+            [[0, 2, 3], [1]],
+            self.components((1, 1, 100, 100), (400, 400, 1, 1), (9, 9, 100, 100), (17, 17, 100, 100), cluster_radius=8)
+        )
+
+    def test_chained_out_of_order(self):
+        self.assertEqual(
+            [[0, 1, 2]],
+            self.components((21, 21, 100, 100), (1, 1, 100, 100), (11, 11, 100, 100))
+        )
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -365,3 +365,22 @@ class TestIntervalMapping(unittest.TestCase):
         mapping = IntervalMapping(mapping)
         for pos in range(1, 101):
             self.assertEqual(pos, mapping.convert_pos(pos))
+
+    def test_add(self):
+        mapping = IntervalMapping()
+        mapping.add((21, 30), (201, 210), opposing_directions=False)
+        mapping.add((1, 10), (101, 110), opposing_directions=False)
+        self.assertEqual(205, mapping.convert_pos(25))
+        mapping.add((41, 50), (301, 310), opposing_directions=True)
+        self.assertEqual(105, mapping.convert_pos(5))
+        self.assertEqual(310, mapping.convert_pos(41))
+        with self.assertRaises(IndexError):
+            mapping.convert_pos(35)
+        with self.assertRaises(ValueError):
+            mapping.add((5, 15), (1, 11))
+        with self.assertRaises(ValueError):
+            mapping.add((45, 60), (1, 16))
+        with self.assertRaises(ValueError):
+            mapping.add((31, 60), (1, 30))
+        mapping.add((31, 40), (1, 10))
+        self.assertEqual(6, mapping.convert_pos(35))
@@ -0,0 +1,44 @@
+import os
+import pstats
+import shutil
+import tempfile
+import unittest
+
+from mavis.profiling import CommandProfiler
+
+
+def busy_function():
+    return sorted([str(i) for i in range(0, 20000)])
+
+
+class TestCommandProfiler(unittest.TestCase):
+    def setUp(self):
+        self.temp_output = tempfile.mkdtemp()
+
+    def test_profile(self):
+        profiler = CommandProfiler(self.temp_output, 'cluster', top=5)
+        profiler.start()
+        busy_function()
+        report = profiler.stop()
+        self.assertEqual(os.path.join(self.temp_output, 'profile.cluster.txt'), report)
+        stats = pstats.Stats(os.path.join(self.temp_output, 'profile.cluster.pstats'))
+        self.assertIn('busy_function', [func[2] for func in stats.stats])
+        with open(report, 'r') as fh:
+            content = fh.read()
+        self.assertIn('top 5 functions by cumulative time', content)
+        self.assertIn('top 5 functions by internal time', content)
+        self.assertNotIn('allocation sites', content)
+
+    def test_profile_memory(self):
+        output = os.path.join(self.temp_output, 'new_dir')
+        profiler = CommandProfiler(output, 'validate', memory=True, top=3)
+        profiler.start()
+        busy_function()
+        report = profiler.stop()
+        with open(report, 'r') as fh:
+            content = fh.read()
+        self.assertIn('peak traced memory (MB):', content)
+        self.assertIn('top 3 allocation sites by size', content)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_output)
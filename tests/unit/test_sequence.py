@@ -0,0 +1,72 @@
+import itertools
+import random
+import string
+import unittest
+
+from Bio.Data.CodonTable import TranslationError
+from Bio.Seq import Seq
+from mavis.constants import _match_ambiguous_dna, DNA_ALPHABET
+from mavis.sequence import dna_match, match_mask, reverse_complement, translate
+
+IUPAC_DNA = 'ACGTMRWSYKVHDBXNacgtmrwsykvhdbxn'
+
+
+class TestReverseComplement(unittest.TestCase):
+
+    def test_same_as_bio(self):
+        for seq in [string.ascii_letters, IUPAC_DNA, '', 'A', 'atcgGGTTn']:
+            self.assertEqual(str(Seq(seq, DNA_ALPHABET).reverse_complement()), reverse_complement(seq))
+
+    def test_seq_object(self):
+        self.assertEqual('CCGAT', reverse_complement(Seq('ATCGG', DNA_ALPHABET)))
+
+    def test_error_on_non_letters(self):
+        with self.assertRaises(ValueError):
+            reverse_complement('AT-CG')
+        with self.assertRaises(ValueError):
+            reverse_complement('ATC G')
+
+
+class TestTranslate(unittest.TestCase):
+
+    def bio_translate(self, seq, reading_frame=0):
+        seq = seq[reading_frame % 3:]
+        seq = seq[:len(seq) - len(seq) % 3]
+        return str(Seq(seq, DNA_ALPHABET).translate())
+
+    def test_all_codons(self):
+        for codon in itertools.product('ACGTacgtNRY', repeat=3):
+            codon = ''.join(codon)
+            self.assertEqual(self.bio_translate(codon), translate(codon))
+
+    def test_reading_frames(self):
+        rand = random.Random(1)
+        seq = ''.join(rand.choice('ACGT') for i in range(0, 200))
+        for reading_frame in range(-3, 6):
+            for length in [0, 1, 2, 3, 4, 5, 199, 200]:
+                self.assertEqual(
+                    self.bio_translate(seq[:length], reading_frame), translate(seq[:length], reading_frame))
+
+    def test_invalid_codon(self):
+        with self.assertRaises(TranslationError):
+            translate('ATGJJJ')
+
+
+class TestDnaMatch(unittest.TestCase):
+
+    def test_same_as_bio(self):
+        chars = IUPAC_DNA + 'uUeE-.*'
+        for x, y in itertools.product(chars, repeat=2):
+            self.assertEqual(_match_ambiguous_dna(x, y), dna_match(x, y), (x, y))
+
+    def test_multiple_characters(self):
+        self.assertEqual(DNA_ALPHABET.match('AC', 'A'), dna_match('AC', 'A'))
+        self.assertEqual(DNA_ALPHABET.match('AC', 'G'), dna_match('AC', 'G'))
+
+    def test_match_mask(self):
+        chars = IUPAC_DNA + 'uUeE-.*'
+        ref, seq = zip(*itertools.product(chars, repeat=2))
+        self.assertEqual(
+            [dna_match(x, y) for x, y in zip(ref, seq)],
+            match_mask(''.join(ref), ''.join(seq)).tolist()
+        )
@@ -1,9 +1,14 @@
+import json
 import os
+import shutil
+import tempfile
+import time
 import unittest
 
-from mavis.constants import COLUMNS, ORIENT, STRAND
+from mavis.constants import COLUMNS, ORIENT, STRAND, SUBCOMMAND
 from mavis.error import NotSpecifiedError
 from mavis.util import cast, ENV_VAR_PREFIX, get_env_variable, MavisNamespace, WeakMavisNamespace, read_bpp_from_input_file, get_connected_components
+from mavis.util import RESOURCE_REPORT_FILENAME, resource_usage, write_resource_report
 
 from .mock import Mock
 
@@ -40,6 +45,39 @@ class TestGetConnectedComponents(unittest.TestCase):
         self.assertEqual({6, 7, 8}, components[1])
 
 
+class TestResourceReport(unittest.TestCase):
+
+    def setUp(self):
+        self.output = tempfile.mkdtemp()
+
+    def test_resource_usage(self):
+        usage = resource_usage()
+        self.assertLess(0, usage['max_rss_mb'])
+        self.assertEqual(round(usage['user_cpu_time'] + usage['system_cpu_time'], 2), usage['cpu_time'])
+
+    def test_write_resource_report(self):
+        input_file = os.path.join(self.output, 'input.tab')
+        with open(input_file, 'w') as fh:
+            fh.write('x' * 100)
+        filename = write_resource_report(
+            self.output, SUBCOMMAND.VALIDATE, int(time.time()) - 10, items={'evidence': 20}, inputs=[input_file],
+            library='lib')
+        self.assertEqual(os.path.join(self.output, RESOURCE_REPORT_FILENAME), filename)
+        with open(filename) as fh:
+            report = json.load(fh)
+        self.assertEqual(SUBCOMMAND.VALIDATE, report['command'])
+        self.assertEqual('lib', report['library'])
+        self.assertEqual(100, report['input_bytes'])
+        self.assertEqual(100, report['output_bytes'])
+        self.assertEqual({'evidence': 20}, report['items'])
+        self.assertEqual(round(20 / report['wall_time'], 3), report['items_per_second']['evidence'])
+        for attr in ['cpu_time', 'max_rss_mb', 'wall_time']:
+            self.assertIn(attr, report)
+
+    def tearDown(self):
+        shutil.rmtree(self.output)
+
+
 class TestCast(unittest.TestCase):
     def test_float(self):
         self.assertEqual(type(1.0), type(cast('1', float)))
@@ -1,9 +1,10 @@
 import unittest
 
-from mavis.constants import ORIENT
+from mavis.constants import COLUMNS, ORIENT
 from mavis.validate.call import _call_interval_by_flanking_coverage
 from mavis.validate.evidence import GenomeEvidence
 from mavis.validate.base import Evidence
+from mavis.validate.main import measure_stage, STAGES, summarize_evidence_stats
 from mavis.interval import Interval
 
 from .mock import Mock
@@ -50,3 +51,36 @@ class TestDistanceAndTraverse(unittest.TestCase):
 
     def test_traverse_left(self):
         self.assertEqual(Interval(10), Evidence.traverse(20, 10, ORIENT.LEFT))
+
+
+class TestEvidenceStats(unittest.TestCase):
+    def test_measure_stage(self):
+        stats = {}
+        with measure_stage(stats, 'call_events'):
+            pass
+        self.assertLessEqual(0, stats['call_events_time'])
+        self.assertLess(0, stats['call_events_peak_rss'])
+
+    def test_measure_stage_error(self):
+        stats = {}
+        with self.assertRaises(KeyError):
+            with measure_stage(stats, 'load_evidence'):
+                raise KeyError('missing')
+        self.assertIn('load_evidence_time', stats)
+
+    def test_summarize(self):
+        rows = [
+            {COLUMNS.cluster_id: 'c1', 'load_evidence_time': 1.5, 'fetched_reads': 10, 'events_called': 1},
+            {COLUMNS.cluster_id: 'c2', 'load_evidence_time': 0.5, 'fetched_reads': 5, 'events_called': 0},
+        ]
+        lines = summarize_evidence_stats(rows)
+        self.assertEqual('evidence: 2', lines[0])
+        self.assertEqual('load_evidence time (s): total 2.00; mean 1.0000; max 1.5000 (c1)', lines[1])
+        self.assertEqual('align time (s): total 0.00; mean 0.0000; max 0.0000 (c1)', lines[1 + STAGES.index('align')])
+        self.assertIn('fetched_reads: 15', lines)
+        self.assertIn('events_called: 1', lines)
+
+    def test_summarize_empty(self):
+        lines = summarize_evidence_stats([])
+        self.assertEqual('evidence: 0', lines[0])
+        self.assertEqual('load_evidence time (s): total 0.00', lines[1])
@@ -0,0 +1,893 @@
+"""
+Reproducible benchmarks of the MAVIS pipeline stages on seeded synthetic data
+
+The generator writes a random reference genome (fasta), gene annotations (json) with valid translations, a coordinate
+sorted bam of simulated structural variant supporting reads (on a background of normal read pairs) and a mavis-style
+tool calls file (calls from several tools with jittered breakpoints and some false positives). The same seed and scale
+options always produce the same data.
+
+Each stage is timed over a number of repeats and then run once more under tracemalloc to record the peak memory. The
+results are written as json (along with the versions, scale options and a checksum of the generated data) so that two
+results files can be compared to detect regressions
+
+Example:
+    python tools/benchmark_pipeline.py generate /tmp/mavis_benchmark_data --events 100
+    python tools/benchmark_pipeline.py run -o results.json
+    python tools/benchmark_pipeline.py compare baseline.json results.json
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pysam
+
+from mavis import __version__
+from mavis.annotate.constants import DEFAULTS as ANNOTATION_DEFAULTS
+from mavis.annotate.file_io import load_annotations, load_reference_genome
+from mavis.annotate.variant import annotate_events
+from mavis.assemble import assemble
+from mavis.bam.cache import BamCache
+from mavis.bam.read import nsb_align
+from mavis.breakpoint import Breakpoint, BreakpointPair
+from mavis.cluster.cluster import merge_breakpoint_pairs
+from mavis.cluster.constants import DEFAULTS as CLUSTER_DEFAULTS
+from mavis.constants import CALL_METHOD, CIGAR, COLUMNS, ORIENT, PROTOCOL, STRAND, SVTYPE
+from mavis.pairing.constants import DEFAULTS as PAIRING_DEFAULTS
+from mavis.pairing.pairing import pair_by_distance
+from mavis.sequence import reverse_complement
+from mavis.summary.summary import filter_by_annotations, filter_by_call_method, filter_by_evidence, group_by_distance
+from mavis.util import output_tabbed_file, read_inputs
+from mavis.validate.constants import DEFAULTS as VALIDATION_DEFAULTS
+from mavis.validate.evidence import GenomeEvidence
+
+RESULTS_FORMAT_VERSION = 1
+REFERENCE_FILENAME = 'reference.fa'
+ANNOTATIONS_FILENAME = 'annotations.json'
+BAM_FILENAME = 'reads.sorted.bam'
+CALLS_FILENAME = 'calls.tab'
+DATASET_FILENAME = 'dataset.json'
+
+START_CODON = 'ATG'
+STOP_CODONS = ['TAA', 'TAG', 'TGA']
+# orientations of the breakpoints for the simulated event types
+EVENT_ORIENTATIONS = [
+    (SVTYPE.DEL, ORIENT.LEFT, ORIENT.RIGHT),
+    (SVTYPE.DUP, ORIENT.RIGHT, ORIENT.LEFT),
+    (SVTYPE.INV, ORIENT.LEFT, ORIENT.LEFT),
+    (SVTYPE.INV, ORIENT.RIGHT, ORIENT.RIGHT),
+    (SVTYPE.TRANS, ORIENT.LEFT, ORIENT.RIGHT),
+]
+SCALE_OPTIONS = [
+    'seed', 'chromosomes', 'chromosome_length', 'genes_per_chromosome', 'events', 'support', 'coverage',
+    'read_length', 'median_fragment_size', 'stdev_fragment_size', 'error_rate', 'tools', 'false_calls', 'libraries'
+]
+
+
+class SyntheticDataset:
+    """
+    Seeded synthetic data for benchmarking. All positions are 1-based and inclusive unless noted
+
+    Attributes:
+        reference (:class:`dict` of :class:`str` by :class:`str`): reference sequences by chromosome name
+        genes (:class:`list` of :class:`dict`): genes in the annotations json format
+        events (:class:`list` of :class:`dict`): the simulated events with their supporting reads
+        reads (:class:`list` of :class:`tuple`): the simulated reads to be written to the bam
+        calls (:class:`list` of :class:`dict`): the tool calls as rows of the mavis input format
+    """
+
+    def __init__(
+        self, seed=1, chromosomes=3, chromosome_length=200000, genes_per_chromosome=10, events=40, support=30,
+        coverage=2, read_length=100, median_fragment_size=400, stdev_fragment_size=40, error_rate=0.002, tools=2,
+        false_calls=20, libraries=2
+    ):
+        self.options = dict(
+            seed=seed, chromosomes=chromosomes, chromosome_length=chromosome_length,
+            genes_per_chromosome=genes_per_chromosome, events=events, support=support, coverage=coverage,
+            read_length=read_length, median_fragment_size=median_fragment_size,
+            stdev_fragment_size=stdev_fragment_size, error_rate=error_rate, tools=tools, false_calls=false_calls,
+            libraries=libraries
+        )
+        for attr, value in self.options.items():
+            setattr(self, attr, value)
+        self.rand = random.Random(seed)
+        # the flanking sequence on either side of a junction must fit the largest simulated fragment
+        self.flank = median_fragment_size + 5 * stdev_fragment_size
+        self.reference = {}
+        self.genes = []
+        self.events = []
+        self.reads = []
+        self.calls = []
+        self._generate_reference()
+        self._generate_genes()
+        self._generate_events()
+        self._generate_background_reads()
+        self._generate_calls()
+
+    def _random_seq(self, length, alphabet='ACGT'):
+        return ''.join(self.rand.choice(alphabet) for i in range(0, length))
+
+    def _generate_reference(self):
+        for i in range(0, self.chromosomes):
+            self.reference['chr{}'.format(i + 1)] = list(self._random_seq(self.chromosome_length))
+
+    def _random_cds(self, codons):
+        sense_codons = [a + b + c for a in 'ACGT' for b in 'ACGT' for c in 'ACGT' if a + b + c not in STOP_CODONS]
+        return START_CODON + ''.join(self.rand.choice(sense_codons) for i in range(0, codons)) + self.rand.choice(STOP_CODONS)
+
+    def _generate_genes(self):
+        """
+        place non-overlapping single transcript genes along each chromosome. The exons are written into the reference
+        so that the transcript has a valid translation and the introns have canonical (GT-AG) splice sites
+        """
+        for chr_name, seq in sorted(self.reference.items()):
+            region_size = len(seq) // self.genes_per_chromosome
+            for i in range(0, self.genes_per_chromosome):
+                exon_lengths = [self.rand.randint(80, 250) for j in range(0, self.rand.randint(3, 8))]
+                intron_lengths = [self.rand.randint(200, 2000) for j in range(0, len(exon_lengths) - 1)]
+                gene_length = sum(exon_lengths) + sum(intron_lengths)
+                if gene_length + 20 > region_size:
+                    continue
+                gene_start = i * region_size + self.rand.randint(10, region_size - gene_length - 10)
+                exons = []
+                pos = gene_start
+                for j, exon_length in enumerate(exon_lengths):
+                    exons.append((pos, pos + exon_length - 1))
+                    pos += exon_length + (intron_lengths[j] if j < len(intron_lengths) else 0)
+                strand = self.rand.choice([STRAND.POS, STRAND.NEG])
+                # build the cdna (in the direction of transcription) as utr + cds + utr
+                cdna_length = sum(exon_lengths)
+                utr5 = self.rand.randint(10, 50)
+                codons = (cdna_length - utr5 - self.rand.randint(10, 50)) // 3 - 2
+                cds = self._random_cds(codons)
+                cdna = self._random_seq(utr5) + cds
+                cdna += self._random_seq(cdna_length - len(cdna))
+                if strand == STRAND.NEG:
+                    cdna = reverse_complement(cdna)
+                offset = 0
+                for start, end in exons:
+                    seq[start - 1:end] = cdna[offset:offset + end - start + 1]
+                    offset += end - start + 1
+                for (start1, end1), (start2, end2) in zip(exons, exons[1:]):
+                    donor, acceptor = ('GT', 'AG') if strand == STRAND.POS else ('CT', 'AC')
+                    seq[end1:end1 + 2] = donor
+                    seq[start2 - 3:start2 - 1] = acceptor
+                gene_name = 'GENE{}'.format(len(self.genes) + 1)
+                self.genes.append({
+                    'name': gene_name,
+                    'chr': chr_name,
+                    'start': exons[0][0],
+                    'end': exons[-1][1],
+                    'strand': '1' if strand == STRAND.POS else '-1',
+                    'aliases': [],
+                    'transcripts': [{
+                        'name': '{}-T1'.format(gene_name),
+                        'start': exons[0][0],
+                        'end': exons[-1][1],
+                        'is_best_transcript': True,
+                        'aliases': [],
+                        'exons': [
+                            {'start': start, 'end': end, 'name': '{}-E{}'.format(gene_name, j + 1)}
+                            for j, (start, end) in enumerate(exons)
+                        ],
+                        'cdna_coding_start': utr5 + 1,
+                        'cdna_coding_end': utr5 + len(cds),
+                        'domains': [{
+                            'name': '{}-D1'.format(gene_name),
+                            'regions': [{'start': 1, 'end': max(1, len(cds) // 6)}]
+                        }]
+                    }]
+                })
+
+    def _breakpoint_segment(self, chr_name, pos, orient, first):
+        """
+        the reference sequence on the retained side of a breakpoint, in the direction of the junction
+
+        Returns:
+            tuple: the sequence and a function mapping a 0-based junction offset (within the segment) to the 1-based
+            reference position, and whether the segment is reverse complemented relative to the reference
+        """
+        ref = self.reference[chr_name]
+        if first:
+            if orient == ORIENT.LEFT:
+                return ''.join(ref[pos - self.flank:pos]), lambda j: pos - self.flank + 1 + j, False
+            return reverse_complement(''.join(ref[pos - 1:pos - 1 + self.flank])), lambda j: pos + self.flank - 1 - j, True
+        if orient == ORIENT.RIGHT:
+            return ''.join(ref[pos - 1:pos - 1 + self.flank]), lambda j: pos + j, False
+        return reverse_complement(''.join(ref[pos - self.flank:pos])), lambda j: pos - j, True
+
+    def _pick_position(self, chr_name, used):
+        """
+        pick a breakpoint position away from the other breakpoints. Half of the positions are picked within genes so
+        that some of the events produce fusion transcripts
+        """
+        margin = self.flank + 1
+        genes = [gene for gene in self.genes if gene['chr'] == chr_name]
+        while True:
+            start, end = margin, self.chromosome_length - margin
+            if genes and self.rand.random() < 0.5:
+                gene = self.rand.choice(genes)
+                start, end = max(start, gene['start']), min(end, gene['end'])
+            pos = self.rand.randint(start, end)
+            if all([abs(pos - other) > 2 * self.flank for other in used.get(chr_name, [])]):
+                used.setdefault(chr_name, []).append(pos)
+                return pos
+
+    def _generate_events(self):
+        used = {}
+        chr_names = sorted(self.reference)
+        for i in range(0, self.options['events']):
+            event_type, orient1, orient2 = self.rand.choice(EVENT_ORIENTATIONS)
+            if event_type == SVTYPE.TRANS and len(chr_names) < 2:
+                event_type, orient1, orient2 = EVENT_ORIENTATIONS[0]
+            if event_type == SVTYPE.TRANS:
+                chr1, chr2 = sorted(self.rand.sample(chr_names, 2))
+                pos1 = self._pick_position(chr1, used)
+                pos2 = self._pick_position(chr2, used)
+            else:
+                chr1 = chr2 = self.rand.choice(chr_names)
+                while True:
+                    pos1 = self._pick_position(chr1, used)
+                    pos2 = pos1 + self.rand.randint(2 * self.flank + 1, 20000)
+                    if pos2 + self.flank < self.chromosome_length:
+                        used[chr1].append(pos2)
+                        break
+            seq1, map1, rev1 = self._breakpoint_segment(chr1, pos1, orient1, True)
+            seq2, map2, rev2 = self._breakpoint_segment(chr2, pos2, orient2, False)
+            event = {
+                'name': 'event{}'.format(i + 1),
+                'event_type': event_type,
+                'break1': (chr1, pos1, orient1),
+                'break2': (chr2, pos2, orient2),
+                'reads': [],
+                'split_reads': []
+            }
+            segments = [(chr1, map1, rev1), (chr2, map2, rev2)]
+            junction = seq1 + seq2
+            for j in range(0, self.support):
+                fragment_size = self._fragment_size()
+                start = self.rand.randint(self.flank - fragment_size + 10, self.flank - 10)
+                pair = self._simulate_pair(
+                    '{}-r{}'.format(event['name'], j + 1), junction, start, fragment_size, segments, self.flank)
+                for read in pair:
+                    event['reads'].append(read['junction_seq'])
+                    if read['clipped']:
+                        event['split_reads'].append(read)
+            self.events.append(event)
+
+    def _fragment_size(self):
+        return max(self.read_length, int(round(self.rand.gauss(self.median_fragment_size, self.stdev_fragment_size))))
+
+    def _add_errors(self, seq):
+        seq = list(seq)
+        for i in range(0, len(seq)):
+            if self.rand.random() < self.error_rate:
+                seq[i] = self.rand.choice([c for c in 'ACGT' if c != seq[i]])
+        return ''.join(seq)
+
+    def _map_read(self, name, junction, start, revcomp, segments, split):
+        """
+        map a read (0-based start in junction coordinates) back to the reference. Reads which cross the junction
+        (split is the 0-based junction offset of the first base of the second segment) are aligned to the side with
+        the larger overlap and soft clipped
+        """
+        end = start + self.read_length
+        seq = self._add_errors(junction[start:end])
+        if end <= split:
+            seg, aligned, cigar = 0, (start, end), [(CIGAR.M, self.read_length)]
+        elif start >= split:
+            seg, aligned, cigar = 1, (start - split, end - split), [(CIGAR.M, self.read_length)]
+        elif split - start >= end - split:
+            seg, aligned, cigar = 0, (start, split), [(CIGAR.M, split - start), (CIGAR.S, end - split)]
+        else:
+            seg, aligned, cigar = 1, (0, end - split), [(CIGAR.S, split - start), (CIGAR.M, end - split)]
+        chr_name, mapping, seg_reverse = segments[seg]
+        positions = [mapping(aligned[0]), mapping(aligned[1] - 1)]
+        if seg_reverse:
+            cigar.reverse()
+            seq = reverse_complement(seq)
+        return {
+            'name': name,
+            'chr': chr_name,
+            'start': min(positions),
+            'end': max(positions),
+            'cigar': cigar,
+            'seq': seq,
+            'reverse': revcomp != seg_reverse,
+            'clipped': len(cigar) > 1,
+            'junction_seq': junction[start:end] if not revcomp else reverse_complement(junction[start:end]),
+            'junction_start': start,
+            'opposite_segment': segments[1 - seg]
+        }
+
+    def _simulate_pair(self, name, junction, start, fragment_size, segments, split):
+        read1 = self._map_read(name, junction, start, False, segments, split)
+        read2 = self._map_read(name, junction, start + fragment_size - self.read_length, True, segments, split)
+        if self.rand.random() < 0.5:  # randomize which strand was sequenced first
+            read1, read2 = read2, read1
+        self.reads.append((read1, read2))
+        return read1, read2
+
+    def _generate_background_reads(self):
+        total = sum([len(s) for s in self.reference.values()])
+        pairs = int(self.coverage * total / (2 * self.read_length))
+        for i in range(0, pairs):
+            chr_name = self.rand.choice(sorted(self.reference))
+            fragment_size = self._fragment_size()
+            start = self.rand.randint(0, len(self.reference[chr_name]) - fragment_size)
+            sequence = ''.join(self.reference[chr_name][start:start + fragment_size])
+            segment = (chr_name, lambda j, start=start: start + 1 + j, False)
+            self._simulate_pair('normal{}'.format(i + 1), sequence, 0, fragment_size, [segment, segment], fragment_size)
+
+    def _generate_calls(self):
+        library_names = ['library{}'.format(i + 1) for i in range(0, self.libraries)]
+        tool_names = ['tool{}'.format(i + 1) for i in range(0, self.tools)]
+        jitter = self.read_length // 2
+
+        def call_row(library, tool, event_type, break1, break2):
+            row = {
+                COLUMNS.library: library,
+                COLUMNS.protocol: PROTOCOL.GENOME,
+                COLUMNS.tools: tool,
+                COLUMNS.event_type: event_type,
+                COLUMNS.stranded: False
+            }
+            for prefix, (chr_name, pos, orient) in [('break1', break1), ('break2', break2)]:
+                start = max(1, pos - self.rand.randint(0, jitter))
+                row['{}_chromosome'.format(prefix)] = chr_name
+                row['{}_position_start'.format(prefix)] = start
+                row['{}_position_end'.format(prefix)] = max(start, pos + self.rand.randint(-jitter, jitter))
+                row['{}_orientation'.format(prefix)] = orient
+                row['{}_strand'.format(prefix)] = STRAND.NS
+            return row
+
+        chr_names = sorted(self.reference)
+        for library in library_names:
+            for tool in tool_names:
+                for event in self.events:
+                    if self.rand.random() < 0.9:
+                        self.calls.append(call_row(library, tool, event['event_type'], event['break1'], event['break2']))
+                for i in range(0, self.false_calls):
+                    chr1, chr2 = sorted([self.rand.choice(chr_names), self.rand.choice(chr_names)])
+                    pos1 = self.rand.randint(1, self.chromosome_length)
+                    pos2 = self.rand.randint(1, self.chromosome_length)
+                    if chr1 == chr2:
+                        pos1, pos2 = sorted([pos1, pos2])
+                    self.calls.append(call_row(
+                        library, tool, SVTYPE.TRANS if chr1 != chr2 else SVTYPE.DEL,
+                        (chr1, pos1, ORIENT.NS), (chr2, pos2, ORIENT.NS)))
+
+    def write(self, output):
+        """
+        write the reference, annotations, bam and tool calls to the output directory
+
+        Returns:
+            str: a checksum of the generated data
+        """
+        os.makedirs(output, exist_ok=True)
+        with open(os.path.join(output, REFERENCE_FILENAME), 'w') as fh:
+            for chr_name, seq in sorted(self.reference.items()):
+                fh.write('>{}\n'.format(chr_name))
+                for i in range(0, len(seq), 60):
+                    fh.write(''.join(seq[i:i + 60]) + '\n')
+        with open(os.path.join(output, ANNOTATIONS_FILENAME), 'w') as fh:
+            json.dump({'genes': self.genes}, fh, sort_keys=True)
+        self._write_bam(os.path.join(output, BAM_FILENAME))
+        output_tabbed_file(self.calls, os.path.join(output, CALLS_FILENAME))
+        checksum = hashlib.sha1()
+        for filename in [REFERENCE_FILENAME, ANNOTATIONS_FILENAME, CALLS_FILENAME]:
+            with open(os.path.join(output, filename), 'rb') as fh:
+                checksum.update(fh.read())
+        # the bam records are hashed rather than the file since the header (@PG) includes the output path
+        with pysam.AlignmentFile(os.path.join(output, BAM_FILENAME), 'rb') as fh:
+            for read in fh.fetch(until_eof=True):
+                checksum.update(read.to_string().encode('utf-8'))
+        with open(os.path.join(output, DATASET_FILENAME), 'w') as fh:
+            json.dump({'options': self.options, 'checksum': checksum.hexdigest()}, fh, sort_keys=True, indent=4)
+        return checksum.hexdigest()
+
+    def _write_bam(self, filename):
+        chr_names = sorted(self.reference)
+        header = {
+            'HD': {'VN': '1.0', 'SO': 'unsorted'},
+            'SQ': [{'SN': chr_name, 'LN': len(self.reference[chr_name])} for chr_name in chr_names]
+        }
+        reference_ids = {chr_name: i for i, chr_name in enumerate(chr_names)}
+        unsorted_bam = filename + '.unsorted.bam'
+        with pysam.AlignmentFile(unsorted_bam, 'wb', header=header) as fh:
+            for read1, read2 in self.reads:
+                same_chr = read1['chr'] == read2['chr']
+                template_length = max(read1['end'], read2['end']) - min(read1['start'], read2['start']) + 1
+                for read, mate, flag in [(read1, read2, 64), (read2, read1, 128)]:
+                    segment = pysam.AlignedSegment(fh.header)
+                    segment.query_name = read['name']
+                    segment.flag = 1 | flag | (16 if read['reverse'] else 0) | (32 if mate['reverse'] else 0)
+                    if read['name'].startswith('normal'):
+                        segment.flag |= 2  # proper pair
+                    segment.reference_id = reference_ids[read['chr']]
+                    segment.reference_start = read['start'] - 1
+                    segment.mapping_quality = 60
+                    segment.cigartuples = read['cigar']
+                    segment.next_reference_id = reference_ids[mate['chr']]
+                    segment.next_reference_start = mate['start'] - 1
+                    if same_chr:
+                        segment.template_length = template_length if read['start'] <= mate['start'] else -template_length
+                    segment.query_sequence = read['seq']
+                    segment.query_qualities = pysam.qualitystring_to_array('I' * len(read['seq']))
+                    fh.write(segment)
+        pysam.sort('-o', filename, unsorted_bam)
+        pysam.index(filename)
+        os.remove(unsorted_bam)
+
+    def breakpoint_pairs(self, library='library1'):
+        """
+        Returns:
+            :class:`list` of :class:`~mavis.breakpoint.BreakpointPair`: the true events as breakpoint pairs
+        """
+        bpps = []
+        for event in self.events:
+            (chr1, pos1, orient1), (chr2, pos2, orient2) = event['break1'], event['break2']
+            bpps.append(BreakpointPair(
+                Breakpoint(chr1, pos1, orient=orient1), Breakpoint(chr2, pos2, orient=orient2),
+                opposing_strands=orient1 == orient2,
+                data={
+                    COLUMNS.event_type: event['event_type'],
+                    COLUMNS.library: library,
+                    COLUMNS.protocol: PROTOCOL.GENOME,
+                    COLUMNS.cluster_id: event['name']
+                }
+            ))
+        return bpps
+
+
+def summary_calls(dataset, annotations):
+    """
+    convert the annotated events into the annotated calls (by several call methods in each library) which are the
+    input to the pairing and summary stages
+
+    Returns:
+        :class:`list` of :class:`dict`: the breakpoints and data for each call
+    """
+    rand = random.Random(dataset.seed)
+    calls = []
+    methods = [CALL_METHOD.CONTIG, CALL_METHOD.SPLIT, CALL_METHOD.FLANK]
+    for ann in annotations:
+        row = ann.flatten()
+        translations = []
+        if ann.fusion:
+            for transcript in ann.fusion.transcripts:
+                for translation in transcript.translations:
+                    translations.append((transcript.splicing_pattern.splice_type, translation.start, translation.end))
+        for library_index in range(0, dataset.libraries):
+            library = 'library{}'.format(library_index + 1)
+            for method in methods:
+                shift = 0 if method == CALL_METHOD.CONTIG else rand.randint(-10, 10)
+                for splicing_pattern, coding_start, coding_end in translations or [(None, None, None)]:
+                    data = {
+                        key: row.get(key) for key in [
+                            COLUMNS.event_type, COLUMNS.gene1, COLUMNS.gene2, COLUMNS.transcript1, COLUMNS.transcript2
+                        ]
+                    }
+                    data.update({
+                        COLUMNS.library: library,
+                        COLUMNS.protocol: PROTOCOL.GENOME,
+                        COLUMNS.call_method: method,
+                        COLUMNS.annotation_id: '{}-{}'.format(row[COLUMNS.annotation_id], method),
+                        COLUMNS.fusion_splicing_pattern: splicing_pattern,
+                        COLUMNS.fusion_cdna_coding_start: coding_start,
+                        COLUMNS.fusion_cdna_coding_end: coding_end,
+                        COLUMNS.contig_remapped_reads: rand.randint(0, 20) if method == CALL_METHOD.CONTIG else None,
+                        COLUMNS.contig_alignment_score: rand.random() if method == CALL_METHOD.CONTIG else None,
+                        COLUMNS.spanning_reads: 0,
+                        COLUMNS.break1_split_reads: rand.randint(0, 20),
+                        COLUMNS.break2_split_reads: rand.randint(0, 20),
+                        COLUMNS.break1_split_reads_forced: rand.randint(0, 5),
+                        COLUMNS.break2_split_reads_forced: rand.randint(0, 5),
+                        COLUMNS.linking_split_reads: rand.randint(0, 10),
+                        COLUMNS.flanking_pairs: rand.randint(0, 30)
+                    })
+                    calls.append({
+                        'break1': (ann.break1.chr, ann.break1.start + shift, ann.break1.end + shift, ann.break1.orient),
+                        'break2': (ann.break2.chr, ann.break2.start + shift, ann.break2.end + shift, ann.break2.orient),
+                        'opposing_strands': ann.opposing_strands,
+                        'data': data
+                    })
+    return calls
+
+
+def build_calls(calls):
+    return [
+        BreakpointPair(
+            Breakpoint(call['break1'][0], call['break1'][1], call['break1'][2], orient=call['break1'][3]),
+            Breakpoint(call['break2'][0], call['break2'][1], call['break2'][2], orient=call['break2'][3]),
+            opposing_strands=call['opposing_strands'],
+            data=dict(call['data'])
+        ) for call in calls
+    ]
+
+
+class BenchmarkInputs:
+    """
+    loads the generated data files (untimed) for use by the stage benchmarks
+    """
+
+    def __init__(self, dataset, data_dir):
+        self.dataset = dataset
+        self.bam = os.path.join(data_dir, BAM_FILENAME)
+        self.reference_genome = load_reference_genome(os.path.join(data_dir, REFERENCE_FILENAME))
+        self.annotations = load_annotations(
+            os.path.join(data_dir, ANNOTATIONS_FILENAME), reference_genome=self.reference_genome)
+        self.calls_file = os.path.join(data_dir, CALLS_FILENAME)
+        self.distances = {
+            CALL_METHOD.FLANK: PAIRING_DEFAULTS.flanking_call_distance,
+            CALL_METHOD.SPLIT: PAIRING_DEFAULTS.split_call_distance,
+            CALL_METHOD.CONTIG: PAIRING_DEFAULTS.contig_call_distance,
+            CALL_METHOD.SPAN: PAIRING_DEFAULTS.spanning_call_distance
+        }
+        self.annotated = annotate_events(
+            dataset.breakpoint_pairs(), self.annotations, self.reference_genome,
+            max_proximity=CLUSTER_DEFAULTS.max_proximity,
+            min_orf_size=ANNOTATION_DEFAULTS.min_orf_size,
+            max_orf_cap=ANNOTATION_DEFAULTS.max_orf_cap,
+            min_domain_mapping_match=ANNOTATION_DEFAULTS.min_domain_mapping_match
+        )
+        self.summary_calls = summary_calls(dataset, self.annotated)
+
+
+def bench_merge_breakpoint_pairs(inputs):
+    bpps = read_inputs(
+        [inputs.calls_file],
+        cast={COLUMNS.tools: lambda x: set(x.split(';')) if x else set()},
+        add_default={COLUMNS.stranded: False, COLUMNS.tools: ''},
+        expand_strand=False, expand_orient=True, expand_svtype=True
+    )
+    bpps_by_library = {}
+    for bpp in bpps:
+        bpps_by_library.setdefault(bpp.library, []).append(bpp)
+
+    def run():
+        for library_bpps in bpps_by_library.values():
+            merge_breakpoint_pairs(
+                library_bpps, cluster_radius=CLUSTER_DEFAULTS.cluster_radius,
+                cluster_initial_size_limit=CLUSTER_DEFAULTS.cluster_initial_size_limit)
+        return len(bpps)
+    return run
+
+
+def bench_assemble(inputs):
+    kmer_size = inputs.dataset.read_length * VALIDATION_DEFAULTS.assembly_kmer_size
+    sequence_sets = []
+    for event in inputs.dataset.events:
+        sequences = set(event['reads'])
+        sequences.update([reverse_complement(s) for s in event['reads']])
+        sequence_sets.append(sorted(sequences))
+
+    def run():
+        for sequences in sequence_sets:
+            assemble(
+                sequences, kmer_size,
+                min_edge_trim_weight=VALIDATION_DEFAULTS.assembly_min_edge_trim_weight,
+                assembly_max_paths=VALIDATION_DEFAULTS.assembly_max_paths,
+                min_contig_length=inputs.dataset.read_length,
+                remap_min_exact_match=VALIDATION_DEFAULTS.assembly_min_exact_match_to_remap,
+                assembly_min_uniq=VALIDATION_DEFAULTS.assembly_min_uniq,
+                min_complexity=VALIDATION_DEFAULTS.min_call_complexity
+            )
+        return len(sequence_sets)
+    return run
+
+
+def bench_nsb_align(inputs):
+    """
+    align the split reads to the reference around the opposite breakpoint (as is done to find the second breakpoint
+    of a split read in validation)
+    """
+    dataset = inputs.dataset
+    window = dataset.read_length + VALIDATION_DEFAULTS.call_error
+    alignments = []
+    for event in dataset.events:
+        for read in event['split_reads']:
+            chr_name, mapping, reverse = read['opposite_segment']
+            breakpoint_pos = mapping(0)
+            ref = ''.join(dataset.reference[chr_name][breakpoint_pos - window - 1:breakpoint_pos + window])
+            clipped = sum([length for state, length in read['cigar'] if state == CIGAR.S])
+            if clipped < VALIDATION_DEFAULTS.min_softclipping:
+                continue
+            min_match = min(clipped * VALIDATION_DEFAULTS.min_anchor_match, clipped - 1) / len(read['seq'])
+            alignments.append((ref, read['seq'], min_match))
+
+    def run():
+        for ref, seq, min_match in alignments:
+            for query in [seq, reverse_complement(seq)]:
+                nsb_align(
+                    ref, query, min_consecutive_match=VALIDATION_DEFAULTS.min_anchor_exact,
+                    min_match=min_match, min_overlap_percent=min_match)
+        return len(alignments)
+    return run
+
+
+def bench_load_evidence(inputs):
+    dataset = inputs.dataset
+
+    def run():
+        bam_cache = BamCache(inputs.bam)
+        try:
+            for bpp in dataset.breakpoint_pairs():
+                evidence = GenomeEvidence(
+                    bpp.break1, bpp.break2, bam_cache, inputs.reference_genome,
+                    opposing_strands=bpp.opposing_strands,
+                    data=bpp.data,
+                    read_length=dataset.read_length,
+                    stdev_fragment_size=dataset.stdev_fragment_size,
+                    median_fragment_size=dataset.median_fragment_size
+                )
+                evidence.load_evidence()
+        finally:
+            bam_cache.close()
+        return len(dataset.events)
+    return run
+
+
+def bench_annotate_events(inputs):
+    bpps = inputs.dataset.breakpoint_pairs()
+
+    def run():
+        annotate_events(
+            bpps, inputs.annotations, inputs.reference_genome,
+            max_proximity=CLUSTER_DEFAULTS.max_proximity,
+            min_orf_size=ANNOTATION_DEFAULTS.min_orf_size,
+            max_orf_cap=ANNOTATION_DEFAULTS.max_orf_cap,
+            min_domain_mapping_match=ANNOTATION_DEFAULTS.min_domain_mapping_match
+        )
+        return len(bpps)
+    return run
+
+
+def bench_pair_by_distance(inputs):
+    calls_by_category = {}
+    for bpp in build_calls(inputs.summary_calls):
+        category = (bpp.break1.chr, bpp.break2.chr, bpp.opposing_strands, bpp.event_type)
+        calls_by_category.setdefault(category, []).append(bpp)
+
+    def run():
+        for calls in calls_by_category.values():
+            pair_by_distance(calls, inputs.distances, against_self=False)
+        return len(inputs.summary_calls)
+    return run
+
+
+def bench_filter_by_evidence(inputs):
+    bpps = build_calls(inputs.summary_calls)
+
+    def run():
+        filter_by_evidence(bpps)
+        return len(bpps)
+    return run
+
+
+def bench_filter_by_call_method(inputs):
+    groups = {}
+    for bpp in build_calls(inputs.summary_calls):
+        groups.setdefault((bpp.library, bpp, bpp.transcript1, bpp.transcript2), []).append(bpp)
+
+    def run():
+        for group in groups.values():
+            filter_by_call_method(group)
+        return len(inputs.summary_calls)
+    return run
+
+
+def bench_filter_by_annotations(inputs):
+    best_transcripts = {}
+    for genes in inputs.annotations.values():
+        for gene in genes:
+            for transcript in gene.transcripts:
+                if transcript.is_best_transcript:
+                    best_transcripts[transcript.name] = transcript
+    groups = {}
+    for bpp in build_calls(inputs.summary_calls):
+        groups.setdefault((bpp.library, bpp), []).append(bpp)
+
+    def run():
+        for group in groups.values():
+            filter_by_annotations(group, best_transcripts)
+        return len(inputs.summary_calls)
+    return run
+
+
+def bench_group_by_distance(inputs):
+    groups = {}
+    for bpp in build_calls(inputs.summary_calls):
+        groups.setdefault((
+            bpp.library, bpp.event_type, bpp.break1.chr, bpp.break2.chr, bpp.break1.orient, bpp.break2.orient,
+            bpp.opposing_strands, bpp.transcript1, bpp.transcript2, bpp.fusion_cdna_coding_start,
+            bpp.fusion_cdna_coding_end
+        ), []).append(bpp)
+
+    def run():
+        for group in groups.values():
+            group_by_distance(group, inputs.distances)
+        return len(inputs.summary_calls)
+    return run
+
+
+BENCHMARKS = [
+    ('cluster.merge_breakpoint_pairs', bench_merge_breakpoint_pairs),
+    ('validate.load_evidence', bench_load_evidence),
+    ('validate.nsb_align', bench_nsb_align),
+    ('validate.assemble', bench_assemble),
+    ('annotate.annotate_events', bench_annotate_events),
+    ('pairing.pair_by_distance', bench_pair_by_distance),
+    ('summary.filter_by_evidence', bench_filter_by_evidence),
+    ('summary.filter_by_call_method', bench_filter_by_call_method),
+    ('summary.filter_by_annotations', bench_filter_by_annotations),
+    ('summary.group_by_distance', bench_group_by_distance),
+]
+
+
+def run_benchmark(setup, inputs, repeat):
+    """
+    time a benchmark (fresh inputs are set up, untimed, for every repeat) and then run it once more under tracemalloc
+    to measure the peak memory it allocates
+
+    Returns:
+        dict: the timing and memory results
+    """
+    times = []
+    items = 0
+    for i in range(0, repeat):
+        func = setup(inputs)
+        start_time = time.perf_counter()
+        items = func()
+        times.append(time.perf_counter() - start_time)
+    func = setup(inputs)
+    tracemalloc.start()
+    try:
+        func()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'items': items,
+        'times': times,
+        'min_time': min(times),
+        'median_time': statistics.median(times),
+        'items_per_second': items / min(times) if min(times) else None,
+        'peak_memory_mb': peak_memory / 2 ** 20
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL).decode('utf8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(baseline, current, threshold=0.1):
+    """
+    compare two results files. A benchmark has regressed if its best time or peak memory has increased by more than
+    the threshold fraction
+
+    Returns:
+        :class:`list` of :class:`str`: the names of the regressed benchmarks
+    """
+    if baseline.get('format_version') != current.get('format_version'):
+        print('warning: the results files have different format versions')
+    if baseline['dataset'] != current['dataset']:
+        print('warning: the results were generated from different data and may not be comparable')
+    regressions = []
+    print('benchmark', 'baseline_s', 'current_s', 'time_ratio', 'baseline_mb', 'current_mb', 'memory_ratio', '', sep='\t')
+    for name, result in current['benchmarks'].items():
+        if name not in baseline['benchmarks']:
+            print(name, None, '{:.4f}'.format(result['min_time']), None, None, '{:.2f}'.format(result['peak_memory_mb']), sep='\t')
+            continue
+        base = baseline['benchmarks'][name]
+        time_ratio = result['min_time'] / base['min_time'] if base['min_time'] else 1
+        memory_ratio = result['peak_memory_mb'] / base['peak_memory_mb'] if base['peak_memory_mb'] else 1
+        regressed = time_ratio > 1 + threshold or memory_ratio > 1 + threshold
+        if regressed:
+            regressions.append(name)
+        print(
+            name, '{:.4f}'.format(base['min_time']), '{:.4f}'.format(result['min_time']), '{:.2f}'.format(time_ratio),
+            '{:.2f}'.format(base['peak_memory_mb']), '{:.2f}'.format(result['peak_memory_mb']),
+            '{:.2f}'.format(memory_ratio), 'REGRESSION' if regressed else '', sep='\t')
+    return regressions
+
+
+def add_scale_arguments(parser):
+    defaults = SyntheticDataset.__init__.__defaults__
+    for option, default in zip(SCALE_OPTIONS, defaults):
+        parser.add_argument('--{}'.format(option), default=default, type=type(default), help='(default: %(default)s)')
+
+
+def parse_arguments():
+    """
+    parse command line arguments
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    generate_parser = subparsers.add_parser('generate', help='write the synthetic data files')
+    generate_parser.add_argument('output', help='directory to write the data files to')
+    add_scale_arguments(generate_parser)
+
+    run_parser = subparsers.add_parser('run', help='generate the synthetic data and benchmark the pipeline stages')
+    run_parser.add_argument('-o', '--output', required=True, help='path to the results (json) file')
+    run_parser.add_argument('--data_dir', help='directory to write the data files to (default: a temporary directory)')
+    run_parser.add_argument('--repeat', default=3, type=int, help='number of timing repeats (best is compared)')
+    run_parser.add_argument(
+        '--benchmarks', nargs='+', choices=[name for name, func in BENCHMARKS], metavar='NAME',
+        help='only run these benchmarks')
+    run_parser.add_argument('--compare', help='a previous results file to compare against')
+    run_parser.add_argument('--threshold', default=0.1, type=float, help='fractional increase reported as a regression')
+    add_scale_arguments(run_parser)
+
+    compare_parser = subparsers.add_parser('compare', help='compare two results files')
+    compare_parser.add_argument('baseline', help='the baseline results file')
+    compare_parser.add_argument('current', help='the results file to check for regressions')
+    compare_parser.add_argument(
+        '--threshold', default=0.1, type=float, help='fractional increase reported as a regression')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    if args.command == 'compare':
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        with open(args.current) as fh:
+            current = json.load(fh)
+        return 1 if compare_results(baseline, current, args.threshold) else 0
+
+    dataset = SyntheticDataset(**{option: getattr(args, option) for option in SCALE_OPTIONS})
+    if args.command == 'generate':
+        dataset.write(args.output)
+        return 0
+
+    with tempfile.TemporaryDirectory(prefix='mavis-benchmark-') as temp_dir:
+        data_dir = args.data_dir or temp_dir
+        checksum = dataset.write(data_dir)
+        inputs = BenchmarkInputs(dataset, data_dir)
+        results = {
+            'format_version': RESULTS_FORMAT_VERSION,
+            'mavis_version': __version__,
+            'git_revision': git_revision(),
+            'python_version': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': datetime.datetime.now().isoformat(),
+            'repeat': args.repeat,
+            'dataset': {'options': dataset.options, 'checksum': checksum},
+            'benchmarks': {}
+        }
+        for name, setup in BENCHMARKS:
+            if args.benchmarks and name not in args.benchmarks:
+                continue
+            result = run_benchmark(setup, inputs, args.repeat)
+            results['benchmarks'][name] = result
+            print('{}: {:.4f}s ({} items, {:.2f} MB peak)'.format(
+                name, result['min_time'], result['items'], result['peak_memory_mb']), flush=True)
+    with open(args.output, 'w') as fh:
+        json.dump(results, fh, sort_keys=True, indent=4)
+    print('wrote:', args.output)
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+        return 1 if compare_results(baseline, results, args.threshold) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
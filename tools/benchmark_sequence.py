@@ -0,0 +1,62 @@
+"""
+Micro-benchmarks comparing the sequence primitives in mavis.sequence to the equivalent Bio.Seq operations
+"""
+import argparse
+import random
+import timeit
+
+from Bio.Seq import Seq
+
+from mavis.constants import _match_ambiguous_dna, DNA_ALPHABET
+from mavis.sequence import dna_match, match_mask, reverse_complement, translate
+
+
+def bio_reverse_complement(seq):
+    return str(Seq(seq, DNA_ALPHABET).reverse_complement())
+
+
+def bio_translate(seq, reading_frame=0):
+    seq = seq[reading_frame:]
+    seq = seq[:len(seq) - len(seq) % 3]
+    return str(Seq(seq, DNA_ALPHABET).translate())
+
+
+def bio_match_all(ref, seq):
+    return [_match_ambiguous_dna(r, s) for r, s in zip(ref, seq)]
+
+
+def parse_arguments():
+    """
+    parse command line arguments
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--lengths', default=[1, 150, 2000], type=int, nargs='+', help='sequence lengths to benchmark', metavar='INT')
+    parser.add_argument('--repeat', default=5, type=int, help='number of timing repeats (best is reported)')
+    parser.add_argument('--seed', default=1, type=int, help='random seed used to generate the sequences')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    rand = random.Random(args.seed)
+    print('operation', 'length', 'bio_us', 'mavis_us', 'speedup', sep='\t')
+    for length in args.lengths:
+        ref = ''.join(rand.choice('ACGTN') for i in range(0, length))
+        seq = ''.join(rand.choice('ACGTN') for i in range(0, length))
+        number = max(10, 100000 // length)
+        cases = [
+            ('reverse_complement', lambda: bio_reverse_complement(ref), lambda: reverse_complement(ref)),
+            ('translate', lambda: bio_translate(ref, 1), lambda: translate(ref, 1)),
+            ('match', lambda: bio_match_all(ref, seq), lambda: [dna_match(r, s) for r, s in zip(ref, seq)]),
+            ('match_mask', lambda: bio_match_all(ref, seq), lambda: match_mask(ref, seq)),
+        ]
+        for name, bio_func, mavis_func in cases:
+            bio_time = min(timeit.repeat(bio_func, number=number, repeat=args.repeat)) / number * 1e6
+            mavis_time = min(timeit.repeat(mavis_func, number=number, repeat=args.repeat)) / number * 1e6
+            print(name, length, '{:.2f}'.format(bio_time), '{:.2f}'.format(mavis_time),
+                  '{:.1f}x'.format(bio_time / mavis_time), sep='\t')
+
+
+if __name__ == '__main__':
+    main()